@@ -0,0 +1,95 @@
+import threading
+from http.server import ThreadingHTTPServer
+
+
+class BackgroundServer:
+    """
+    Основа локальных HTTP серверов тестов: ThreadingHTTPServer, который
+    работает в фоновом потоке (или в текущем - из командной строки).
+
+    Наследник задаёт _make_handler() и имя потока THREAD_NAME и
+    вызывает __init__ базового класса после инициализации своего
+    состояния: обработчик создаётся сразу.
+    """
+
+    THREAD_NAME = "background-server"
+
+    def __init__(self, host: str, port: int) -> None:
+        """
+        Инициализация сервера.
+
+        :param host: адрес для прослушивания
+        :type host: str
+        :param port: порт (0 - выбрать свободный)
+        :type port: int
+        """
+        self._server = ThreadingHTTPServer((host, port),
+                                           self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    def _make_handler(self) -> type:
+        """
+        Создать класс обработчика, привязанный к этому серверу.
+
+        :return: класс обработчика запросов
+        :rtype: type
+        """
+        raise NotImplementedError
+
+    @property
+    def base_url(self) -> str:
+        """
+        Базовый адрес сервера.
+
+        :return: адрес вида http://host:port
+        :rtype: str
+        """
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def url_ui(self) -> str:
+        return f"{self.base_url}/"
+
+    def start(self) -> "BackgroundServer":
+        """
+        Запустить сервер в фоновом потоке.
+
+        :return: экземпляр сервера
+        :rtype: BackgroundServer
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name=self.THREAD_NAME, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """
+        Остановить сервер.
+
+        :return: None
+        """
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def serve_forever(self) -> None:
+        """
+        Обслуживать запросы в текущем потоке до Ctrl+C.
+
+        :return: None
+        """
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+
+    def __enter__(self) -> "BackgroundServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
@@ -0,0 +1,96 @@
+import threading
+from typing import Any
+
+from cache_helper import read_json, write_json
+
+
+class BaselineReport:
+    """
+    Отчёт о замерах с базовыми значениями.
+
+    В базовом режиме замеры сохраняются в файл как базовые значения по
+    ключу (странице, сценарию); в оптимизированном режиме экономия
+    считается относительно этих базовых значений.
+
+    Наследники задают savings() и поля сводки: MODE_KEY - имя признака
+    режима, COUNT_KEY - имя числа замеров, SUMMED - суммируемые поля.
+    """
+
+    MODE_KEY = "optimized"
+    COUNT_KEY = "entries"
+    SUMMED = ()
+
+    def __init__(self, optimized: bool, baseline_file: str) -> None:
+        """
+        Инициализация отчёта.
+
+        :param optimized: оптимизированный режим (экономия считается,
+            базовые значения не перезаписываются)
+        :type optimized: bool
+        :param baseline_file: файл базовых значений
+        :type baseline_file: str
+        """
+        self.optimized = optimized
+        self.baseline_file = baseline_file
+        self.baseline = read_json(baseline_file, {})
+        self.entries = []
+        self._lock = threading.Lock()
+
+    def add(self, key: str, entry: dict, value: Any) -> dict:
+        """
+        Добавить замер: сохранить базовое значение или дополнить замер
+        экономией относительно него.
+
+        :param key: ключ базового значения
+        :type key: str
+        :param entry: замер
+        :type entry: dict
+        :param value: базовое значение для сохранения
+        :return: замер
+        :rtype: dict
+        """
+        with self._lock:
+            if self.optimized:
+                base = self.baseline.get(key)
+                if base is not None:
+                    entry.update(self.savings(base, entry))
+            else:
+                self.baseline[key] = value
+            self.entries.append(entry)
+        return entry
+
+    def savings(self, base: Any, entry: dict) -> dict:
+        """
+        Экономия замера относительно базового значения.
+
+        :param base: базовое значение
+        :param entry: замер
+        :type entry: dict
+        :return: поля экономии для замера
+        :rtype: dict
+        """
+        raise NotImplementedError
+
+    def summary(self) -> dict:
+        """
+        Сводка по замерам прогона.
+
+        :return: словарь со сводкой
+        :rtype: dict
+        """
+        with self._lock:
+            entries = list(self.entries)
+        summary = {self.MODE_KEY: self.optimized,
+                   self.COUNT_KEY: len(entries)}
+        for field in self.SUMMED:
+            summary[field] = round(sum(e.get(field, 0) for e in entries), 3)
+        return summary
+
+    def save_baseline(self) -> None:
+        """
+        Сохранить базовые значения (только в базовом режиме).
+
+        :return: None
+        """
+        if not self.optimized and self.entries:
+            write_json(self.baseline_file, self.baseline)
@@ -0,0 +1,219 @@
+import statistics
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from cache_helper import FileLock, read_json, write_json
+from load_runner import percentile
+from config import (benchmark_baseline_file, benchmark_threshold,
+                    benchmark_thresholds, benchmark_min_delta_ms,
+                    benchmark_update, benchmark_require_baseline)
+
+
+class BenchmarkReport:
+    """
+    Замеры бенчмарков и сравнение с базовыми значениями.
+
+    Каждый бенчмарк выполняется несколько раундов; с базовым значением
+    сравнивается медиана. Регрессией считается медиана, которая выросла
+    больше чем на порог (доля от базовой медианы) и при этом больше чем
+    на min_delta_ms: так шум в доли миллисекунды на быстрых операциях не
+    роняет прогон. Бенчмарк без базового значения записывает его, а
+    если базовые значения обязательны (CI) - считается проваленным; в
+    режиме обновления (CG_BENCHMARK_UPDATE=1) базовые значения
+    перезаписываются, а регрессии не проверяются.
+    """
+
+    def __init__(self, baseline_file: str = benchmark_baseline_file,
+                 threshold: float = benchmark_threshold,
+                 thresholds: Optional[Dict[str, float]] = None,
+                 min_delta_ms: float = benchmark_min_delta_ms,
+                 update: bool = benchmark_update,
+                 require_baseline: bool = benchmark_require_baseline
+                 ) -> None:
+        """
+        Инициализация отчёта.
+
+        :param baseline_file: файл базовых значений
+        :type baseline_file: str
+        :param threshold: допустимый рост медианы (0.25 - на 25%)
+        :type threshold: float
+        :param thresholds: пороги для отдельных бенчмарков
+        :type thresholds: dict
+        :param min_delta_ms: рост медианы, меньше которого регрессии
+            нет при любом пороге, мс
+        :type min_delta_ms: float
+        :param update: перезаписать базовые значения
+        :type update: bool
+        :param require_baseline: бенчмарк без базового значения -
+            ошибка, а не новое базовое значение
+        :type require_baseline: bool
+        """
+        self.baseline_file = baseline_file
+        self.threshold = threshold
+        self.thresholds = dict(benchmark_thresholds if thresholds is None
+                               else thresholds)
+        self.min_delta_ms = min_delta_ms
+        self.update = update
+        self.require_baseline = require_baseline and not update
+        self.baseline = read_json(baseline_file, {})
+        self.results = {}
+        self._lock = threading.Lock()
+
+    def run(self, name: str, func: Callable[[], object], rounds: int,
+            warmup: int = 0,
+            setup: Optional[Callable[[], object]] = None) -> dict:
+        """
+        Выполнить бенчмарк и сравнить его с базовым значением.
+
+        :param name: имя бенчмарка
+        :type name: str
+        :param func: замеряемая операция
+        :type func: Callable
+        :param rounds: число замеряемых раундов
+        :type rounds: int
+        :param warmup: число раундов прогрева (не замеряются)
+        :type warmup: int
+        :param setup: подготовка перед каждым раундом (не замеряется)
+        :type setup: Callable
+        :return: результат (мс) с полями baseline_ms и regression
+        :rtype: dict
+        """
+        for _ in range(warmup):
+            if setup is not None:
+                setup()
+            func()
+
+        timings = []
+        for _ in range(rounds):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        return self.add(name, timings)
+
+    def add(self, name: str, timings_ms: list) -> dict:
+        """
+        Учесть замеры бенчмарка, выполненного вне run().
+
+        :param name: имя бенчмарка
+        :type name: str
+        :param timings_ms: время раундов, мс
+        :type timings_ms: list
+        :return: результат (мс) с полями baseline_ms, regression и
+            missing_baseline
+        :rtype: dict
+        """
+        values = sorted(timings_ms)
+        result = {
+            "rounds": len(values),
+            "min_ms": round(values[0], 3),
+            "median_ms": round(statistics.median(values), 3),
+            "mean_ms": round(statistics.fmean(values), 3),
+            "p95_ms": round(percentile(values, 95), 3),
+            "max_ms": round(values[-1], 3),
+        }
+        base = self.baseline.get(name)
+        threshold = self.thresholds.get(name, self.threshold)
+        result["threshold"] = threshold
+        result["baseline_ms"] = base["median_ms"] if base else None
+        result["change"] = None
+        result["regression"] = False
+        result["missing_baseline"] = not base and self.require_baseline
+        if base:
+            delta = result["median_ms"] - base["median_ms"]
+            result["delta_ms"] = round(delta, 3)
+            # Медиана быстрых операций (куки из кэша) округляется до 0.0:
+            # относительного изменения тогда нет, и регрессия
+            # определяется только по абсолютному росту
+            if base["median_ms"]:
+                result["change"] = round(delta / base["median_ms"], 3)
+            result["regression"] = not self.update \
+                and delta > self.min_delta_ms \
+                and (result["change"] is None
+                     or result["change"] > threshold)
+        with self._lock:
+            self.results[name] = result
+        return result
+
+    @staticmethod
+    def describe(name: str, result: dict) -> str:
+        """
+        Строка с результатом бенчмарка для отчёта и сообщений.
+
+        :param name: имя бенчмарка
+        :type name: str
+        :param result: результат бенчмарка
+        :type result: dict
+        :return: описание
+        :rtype: str
+        """
+        line = (f"{name}: median {result['median_ms']} ms, "
+                f"p95 {result['p95_ms']} ms, min {result['min_ms']} ms, "
+                f"rounds {result['rounds']}")
+        if result["baseline_ms"] is None:
+            if result.get("missing_baseline"):
+                return line + ", NO BASELINE"
+            return line + ", baseline recorded"
+        change = f"{result['change']:+.0%}" \
+            if result["change"] is not None \
+            else f"{result.get('delta_ms', 0.0):+} ms"
+        line += (f", baseline {result['baseline_ms']} ms "
+                 f"({change}, threshold +{result['threshold']:.0%})")
+        if result["regression"]:
+            line += " REGRESSION"
+        return line
+
+    def summary(self) -> dict:
+        """
+        Сводка по бенчмаркам прогона.
+
+        :return: словарь со сводкой
+        :rtype: dict
+        """
+        with self._lock:
+            results = dict(self.results)
+        return {
+            "benchmarks": len(results),
+            "regressions": sorted(name for name, result in results.items()
+                                  if result["regression"]),
+            "new_baselines": sorted(name for name, result in results.items()
+                                    if result["baseline_ms"] is None
+                                    and not result["missing_baseline"]),
+            "missing_baselines": sorted(
+                name for name, result in results.items()
+                if result["missing_baseline"]),
+            "update": self.update,
+            "lines": [self.describe(name, result)
+                      for name, result in sorted(results.items())],
+        }
+
+    def save_baseline(self) -> None:
+        """
+        Записать базовые значения новых бенчмарков (в режиме обновления -
+        всех бенчмарков прогона). Когда базовые значения обязательны,
+        файл не меняется.
+
+        Файл обновляется под блокировкой, поэтому параллельные воркеры
+        не затирают базовые значения друг друга.
+
+        :return: None
+        """
+        with self._lock:
+            results = dict(self.results)
+        if not results or self.require_baseline:
+            return
+        with FileLock(self.baseline_file + ".lock"):
+            baseline = read_json(self.baseline_file, {})
+            changed = False
+            for name, result in results.items():
+                if self.update or name not in baseline:
+                    baseline[name] = {
+                        key: result[key] for key in
+                        ("rounds", "min_ms", "median_ms", "mean_ms",
+                         "p95_ms", "max_ms")
+                    }
+                    changed = True
+            if changed:
+                write_json(self.baseline_file, baseline)
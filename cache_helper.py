@@ -0,0 +1,164 @@
+import json
+import os
+import secrets
+import threading
+import time
+from typing import Any, Optional
+
+
+class FileLock:
+    """
+    Межпроцессная блокировка на основе lock-файла.
+
+    Работает одинаково на Linux, macOS и Windows: файл создаётся
+    атомарно (O_CREAT | O_EXCL), а «зависший» lock-файл упавшего
+    процесса снимается по истечении stale_after секунд. В lock-файл
+    пишется уникальная метка владельца (pid и случайное значение), и
+    release() удаляет файл, только если метка всё ещё его: блокировку,
+    снятую как брошенную и захваченную другим процессом, владелец не
+    освобождает.
+    """
+
+    def __init__(self, path: str, timeout: float = 30.0,
+                 stale_after: float = 60.0, poll: float = 0.05) -> None:
+        """
+        Инициализация блокировки.
+
+        :param path: путь к lock-файлу
+        :type path: str
+        :param timeout: максимальное время ожидания блокировки, сек
+        :type timeout: float
+        :param stale_after: возраст lock-файла, после которого он
+            считается брошенным, сек
+        :type stale_after: float
+        :param poll: интервал повторных попыток, сек
+        :type poll: float
+        """
+        self.path = path
+        self.timeout = timeout
+        self.stale_after = stale_after
+        self.poll = poll
+        self._token = None
+
+    def acquire(self) -> None:
+        """
+        Захватить блокировку.
+
+        :return: None
+        :raises TimeoutError: если блокировку не удалось получить
+        """
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                self._break_if_stale()
+                if time.monotonic() > deadline:
+                    raise TimeoutError(
+                        f"Не удалось захватить блокировку {self.path}"
+                    )
+                time.sleep(self.poll)
+                continue
+            self._token = f"{os.getpid()}:{secrets.token_hex(8)}"
+            with os.fdopen(fd, "w") as lock_file:
+                lock_file.write(self._token)
+            return
+
+    def release(self) -> None:
+        """
+        Освободить блокировку, если lock-файл всё ещё принадлежит ей.
+
+        :return: None
+        """
+        token, self._token = self._token, None
+        try:
+            with open(self.path, encoding="utf-8") as lock_file:
+                if lock_file.read() != token:
+                    # Блокировку сняли как брошенную и захватили заново
+                    return
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def _break_if_stale(self) -> None:
+        """
+        Удалить lock-файл, оставленный упавшим процессом.
+
+        Между проверкой возраста и удалением другой процесс мог сам
+        снять брошенный lock-файл и захватить блокировку. Поэтому файл
+        сначала атомарно переименовывается, и удаляется, только если
+        это тот же файл, возраст которого проверялся; свежий чужой
+        lock-файл возвращается на место.
+
+        :return: None
+        """
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return
+        if time.time() - stat.st_mtime <= self.stale_after:
+            return
+        stale_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}" \
+                     ".stale"
+        try:
+            os.rename(self.path, stale_path)
+        except OSError:
+            # Lock-файл уже снял другой процесс
+            return
+        try:
+            moved = os.stat(stale_path)
+            if (moved.st_ino, moved.st_mtime_ns) != (stat.st_ino,
+                                                     stat.st_mtime_ns):
+                # Переименован свежий lock-файл: вернуть его на место,
+                # не затирая lock-файл, созданный за это время
+                os.link(stale_path, self.path)
+        except OSError:
+            pass
+        try:
+            os.remove(stale_path)
+        except OSError:
+            pass
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
+
+
+def read_json(path: str, default: Optional[Any] = None) -> Any:
+    """
+    Прочитать JSON-файл.
+
+    :param path: путь к файлу
+    :type path: str
+    :param default: значение, если файла нет или он повреждён
+    :return: содержимое файла или default
+    """
+    try:
+        with open(path, encoding="utf-8") as json_file:
+            return json.load(json_file)
+    except (OSError, ValueError):
+        return default
+
+
+def write_json(path: str, data: Any) -> None:
+    """
+    Атомарно записать JSON-файл.
+
+    Данные пишутся во временный файл рядом с целевым и затем
+    переименовываются, поэтому параллельные читатели никогда не видят
+    недописанный файл.
+
+    :param path: путь к файлу
+    :type path: str
+    :param data: сериализуемые данные
+    :return: None
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as json_file:
+        json.dump(data, json_file, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
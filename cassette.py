@@ -0,0 +1,334 @@
+import hashlib
+import json
+import mmap
+import os
+import threading
+import time
+from datetime import timedelta
+from typing import Iterable, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from config import cassette_match_on, cassette_max_age_days
+
+INDEX_FILE = "index.json"
+BODIES_FILE = "bodies.bin"
+
+# Заголовки, которые теряют смысл после декодирования тела ответа
+DROPPED_HEADERS = ("Content-Encoding", "Transfer-Encoding", "Content-Length")
+
+
+class CassetteMissError(requests.exceptions.ConnectionError):
+    """
+    В кассете нет записи для запроса в режиме воспроизведения.
+    """
+
+
+class Cassette:
+    """
+    Кассета HTTP запросов и ответов.
+
+    Индекс с метаданными хранится в index.json, а тела ответов подряд
+    лежат в bodies.bin. При воспроизведении bodies.bin отображается в
+    память (mmap), поэтому тела читаются без сетевого ввода-вывода и
+    без загрузки всего файла.
+
+    Повторяющиеся запросы (например, GET корзины до и после удаления)
+    воспроизводятся в порядке записи; последний ответ повторяется.
+
+    При записи индекс сохраняется после каждого ответа, поэтому
+    прерванная запись сохраняет уже полученные ответы.
+    """
+
+    def __init__(self, path: str, mode: str = "replay",
+                 match_on: Iterable[str] = cassette_match_on,
+                 max_age_days: float = cassette_max_age_days) -> None:
+        """
+        Инициализация кассеты.
+
+        :param path: каталог кассеты
+        :type path: str
+        :param mode: "record" - записывать, "replay" - воспроизводить
+        :type mode: str
+        :param match_on: признаки сопоставления запросов: "method",
+            "host", "path", "query", "body"
+        :type match_on: Iterable[str]
+        :param max_age_days: возраст записи, после которого она
+            считается устаревшей, дней
+        :type max_age_days: float
+        """
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Неизвестный режим кассеты: {mode}")
+        self.path = path
+        self.mode = mode
+        self.match_on = tuple(match_on)
+        self.max_age = max_age_days * 86400
+
+        self.entries = []
+        self._by_key = {}
+        self._played = set()
+        self._positions = {}
+        self._bodies = None
+        self._bodies_file = None
+        self._offset = 0
+        self._lock = threading.Lock()
+
+        if mode == "record":
+            os.makedirs(path, exist_ok=True)
+            self._bodies = open(os.path.join(path, BODIES_FILE), "wb")
+        else:
+            self._load()
+
+    def _load(self) -> None:
+        """
+        Загрузить индекс и отобразить тела ответов в память.
+
+        :return: None
+        """
+        with open(os.path.join(self.path, INDEX_FILE),
+                  encoding="utf-8") as index_file:
+            index = json.load(index_file)
+        self.entries = index["entries"]
+        for number, entry in enumerate(self.entries):
+            # Ключ строится заново: match_on при воспроизведении может
+            # отличаться от match_on записи
+            key = (self._key(entry["match"]) if "match" in entry
+                   else entry["key"])
+            self._by_key.setdefault(key, []).append(number)
+
+        bodies_path = os.path.join(self.path, BODIES_FILE)
+        self._bodies_file = open(bodies_path, "rb")
+        if os.path.getsize(bodies_path):
+            self._bodies = mmap.mmap(self._bodies_file.fileno(), 0,
+                                     access=mmap.ACCESS_READ)
+
+    def request_key(self, request: requests.PreparedRequest) -> str:
+        """
+        Ключ сопоставления запроса по выбранным признакам.
+
+        :param request: подготовленный запрос
+        :type request: requests.PreparedRequest
+        :return: ключ записи
+        :rtype: str
+        """
+        return self._key(self.request_parts(request))
+
+    def _key(self, parts: dict) -> str:
+        """
+        Ключ записи из признаков запроса по match_on.
+
+        :param parts: признаки запроса
+        :type parts: dict
+        :return: ключ записи
+        :rtype: str
+        """
+        return "|".join(f"{name}={parts[name]}" for name in self.match_on)
+
+    @classmethod
+    def request_parts(cls, request: requests.PreparedRequest) -> dict:
+        """
+        Все признаки запроса, по которым возможно сопоставление.
+
+        :param request: подготовленный запрос
+        :type request: requests.PreparedRequest
+        :return: словарь признаков
+        :rtype: dict
+        """
+        url = urlsplit(request.url)
+        return {
+            "method": request.method,
+            "host": url.netloc,
+            "path": url.path,
+            "query": url.query,
+            "body": cls._body_digest(request.body),
+        }
+
+    @staticmethod
+    def _body_digest(body) -> str:
+        """
+        Хэш тела запроса; JSON нормализуется, чтобы порядок ключей
+        не влиял на сопоставление.
+
+        :param body: тело запроса
+        :return: хэш тела или пустая строка
+        :rtype: str
+        """
+        if not body:
+            return ""
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        try:
+            body = json.dumps(json.loads(body), sort_keys=True).encode()
+        except ValueError:
+            pass
+        return hashlib.sha1(body).hexdigest()[:16]
+
+    def record(self, request: requests.PreparedRequest,
+               response: requests.Response) -> None:
+        """
+        Записать пару запрос/ответ.
+
+        :param request: подготовленный запрос
+        :type request: requests.PreparedRequest
+        :param response: полученный ответ
+        :type response: requests.Response
+        :return: None
+        """
+        body = response.content or b""
+        headers = {name: value for name, value in response.headers.items()
+                   if name not in DROPPED_HEADERS}
+        cookies = [[c.name, c.value, c.domain, c.path, c.expires]
+                   for c in response.cookies]
+        parts = self.request_parts(request)
+        with self._lock:
+            self._bodies.write(body)
+            self.entries.append({
+                "key": self._key(parts),
+                "match": parts,
+                "method": request.method,
+                "url": request.url,
+                "status": response.status_code,
+                "reason": response.reason,
+                "headers": headers,
+                "cookies": cookies,
+                "offset": self._offset,
+                "length": len(body),
+                "recorded_at": time.time(),
+            })
+            self._offset += len(body)
+            # Тела сбрасываются на диск раньше индекса: индекс никогда
+            # не ссылается на незаписанные байты
+            self._bodies.flush()
+            self._write_index()
+
+    def _write_index(self) -> None:
+        """
+        Атомарно сохранить индекс записей (вызывается под блокировкой).
+
+        :return: None
+        """
+        index_path = os.path.join(self.path, INDEX_FILE)
+        tmp_path = f"{index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as index_file:
+            json.dump({"version": 1, "match_on": self.match_on,
+                       "entries": self.entries}, index_file,
+                      ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, index_path)
+
+    def play(self, request: requests.PreparedRequest) -> requests.Response:
+        """
+        Воспроизвести ответ на запрос.
+
+        :param request: подготовленный запрос
+        :type request: requests.PreparedRequest
+        :return: Response object
+        :rtype: requests.Response
+        :raises CassetteMissError: если запрос не записан
+        """
+        key = self.request_key(request)
+        with self._lock:
+            numbers = self._by_key.get(key)
+            if not numbers:
+                raise CassetteMissError(
+                    f"Нет записи в кассете {self.path}: {key}",
+                    request=request,
+                )
+            position = self._positions.get(key, 0)
+            number = numbers[min(position, len(numbers) - 1)]
+            self._positions[key] = position + 1
+            self._played.add(number)
+        entry = self.entries[number]
+
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response.reason = entry["reason"]
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response.elapsed = timedelta(0)
+        start = entry["offset"]
+        response._content = (self._bodies[start:start + entry["length"]]
+                             if entry["length"] else b"")
+        for name, value, domain, path, expires in entry["cookies"]:
+            response.cookies.set(name, value, domain=domain, path=path,
+                                 expires=expires)
+        return response
+
+    def report(self) -> dict:
+        """
+        Отчёт о записях: неиспользованные при воспроизведении и
+        устаревшие по возрасту.
+
+        :return: словарь с отчётом
+        :rtype: dict
+        """
+        now = time.time()
+        unused = [f"{e['method']} {e['url']}"
+                  for number, e in enumerate(self.entries)
+                  if self.mode == "replay" and number not in self._played]
+        stale = [f"{e['method']} {e['url']}" for e in self.entries
+                 if now - e["recorded_at"] > self.max_age]
+        return {
+            "mode": self.mode,
+            "entries": len(self.entries),
+            "played": len(self._played),
+            "unused": unused,
+            "stale": stale,
+        }
+
+    def close(self) -> None:
+        """
+        Сохранить индекс (в режиме записи) и освободить файлы.
+
+        :return: None
+        """
+        with self._lock:
+            if self.mode == "record" and self._bodies is not None:
+                self._bodies.close()
+                self._write_index()
+            elif self._bodies is not None:
+                self._bodies.close()
+            if self._bodies_file is not None:
+                self._bodies_file.close()
+            self._bodies = None
+            self._bodies_file = None
+
+
+class CassetteAdapter(BaseAdapter):
+    """
+    Адаптер requests, пропускающий запросы через кассету.
+
+    В режиме записи запрос уходит в реальный адаптер, а ответ
+    сохраняется; в режиме воспроизведения сеть не используется.
+    """
+
+    def __init__(self, cassette: Cassette,
+                 real_adapter: Optional[HTTPAdapter] = None) -> None:
+        """
+        Инициализация адаптера.
+
+        :param cassette: кассета
+        :type cassette: Cassette
+        :param real_adapter: адаптер для реальных запросов при записи
+        :type real_adapter: HTTPAdapter
+        """
+        super().__init__()
+        self.cassette = cassette
+        self.real_adapter = real_adapter or HTTPAdapter()
+
+    def send(self, request: requests.PreparedRequest,
+             **kwargs) -> requests.Response:
+        if self.cassette.mode == "replay":
+            response = self.cassette.play(request)
+            response.connection = self
+            return response
+        response = self.real_adapter.send(request, **kwargs)
+        self.cassette.record(request, response)
+        return response
+
+    def close(self) -> None:
+        self.real_adapter.close()
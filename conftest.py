@@ -0,0 +1,669 @@
+import os
+import tempfile
+from typing import Optional
+
+import allure
+import pytest
+from _pytest.mark.expression import Expression
+from benchmark import BenchmarkReport
+from cookie_helper import CookieProvider, get_cookie_provider
+from http_transport import (HTTPTransport, close_shared_transport,
+                            get_shared_transport)
+from driver_pool import DriverPool, create_driver, quit_driver
+from driver_resolver import get_driver_resolver
+from failure_artifacts import get_failure_artifacts
+from hybrid_state import (HandoffReport, browser_token, inject_session,
+                          seed_cart)
+from lean_browser import PageWeightReport
+from local_server import LocalWebGate
+from pages.api_client import CartAPI
+from pages.cart_ui_page import AddToCart
+from pages.search_ui_page import SearchPage
+from network_trace import NetworkTrace, get_network_trace
+from page_snapshots import MANIFEST_FILE, SnapshotServer
+from parallel_runner import worker_file
+from profile_template import get_profile_template
+from request_timing import get_timing_recorder
+from token_manager import TokenManager, get_token_manager, worker_token
+from wait_engine import ec, get_wait_stats
+from web_vitals import PageMetrics, get_page_metrics
+from webdriver_profiler import get_webdriver_profiler
+from config import (use_local_api, url_api, url_api_search, url_ui,
+                    timing_summary_file, driver_pool_enabled, lean_browser,
+                    hybrid_fixtures, url_ui_cart, book_title, product_id,
+                    snapshot_dir)
+
+# Маркеры тестов, которые запускаются только явно: через -m или
+# указанием файла теста
+OPT_IN_MARKERS = ("benchmark", "load")
+
+_transport_stats = {}
+_driver_pool_stats = {}
+_page_weight_stats = {}
+_handoff_stats = {}
+_benchmark_stats = {}
+_page_metrics_stats = {}
+_network_trace_stats = {}
+
+
+@pytest.fixture(scope="session")
+def transport() -> HTTPTransport:
+    """
+    Фикстура общего HTTP транспорта на весь прогон.
+
+    :yields: HTTPTransport - общий пул соединений
+    """
+    yield get_shared_transport()
+    stats = close_shared_transport()
+    if stats:
+        _transport_stats.update(stats)
+
+
+@pytest.fixture(scope="session")
+def web_gate() -> LocalWebGate:
+    """
+    Фикстура локальной замены web-gate.
+
+    Сервер запускается только при включённом use_local_api
+    (CG_LOCAL_API=1), иначе тесты работают с боевым API.
+
+    :yields: LocalWebGate или None
+    """
+    if not use_local_api:
+        yield None
+        return
+    with LocalWebGate() as gate:
+        yield gate
+
+
+@pytest.fixture(scope="session")
+def cart_api_url(web_gate: LocalWebGate) -> str:
+    """
+    Фикстура адреса API корзины.
+
+    :param web_gate: локальный web-gate или None
+    :type web_gate: LocalWebGate
+    :return: адрес API корзины
+    :rtype: str
+    """
+    return web_gate.url_api if web_gate else url_api
+
+
+@pytest.fixture(scope="session")
+def search_api_url(web_gate: LocalWebGate) -> str:
+    """
+    Фикстура адреса API поиска.
+
+    :param web_gate: локальный web-gate или None
+    :type web_gate: LocalWebGate
+    :return: адрес API поиска
+    :rtype: str
+    """
+    return web_gate.url_api_search if web_gate else url_api_search
+
+
+@pytest.fixture(scope="session")
+def cookie_provider(web_gate: LocalWebGate) -> CookieProvider:
+    """
+    Фикстура поставщика кук DDoS-Guard.
+
+    :param web_gate: локальный web-gate или None
+    :type web_gate: LocalWebGate
+    :return: CookieProvider instance
+    :rtype: CookieProvider
+    """
+    if web_gate is None:
+        return get_cookie_provider()
+    port = web_gate.base_url.rsplit(":", 1)[1]
+    return CookieProvider(
+        source_url=web_gate.url_ui,
+        cache_file=os.path.join(tempfile.gettempdir(),
+                                f"chitai_gorod_cookies_local_{port}.json"),
+    )
+
+
+@pytest.fixture(scope="session")
+def token_manager(web_gate: LocalWebGate, cookie_provider: CookieProvider,
+                  transport: HTTPTransport) -> TokenManager:
+    """
+    Фикстура поставщика анонимных токенов.
+
+    :param web_gate: локальный web-gate или None
+    :type web_gate: LocalWebGate
+    :param cookie_provider: поставщик кук DDoS-Guard
+    :type cookie_provider: CookieProvider
+    :param transport: общий HTTP транспорт прогона
+    :type transport: HTTPTransport
+    :return: TokenManager instance
+    :rtype: TokenManager
+    """
+    if web_gate is None:
+        return get_token_manager()
+    port = web_gate.base_url.rsplit(":", 1)[1]
+    return TokenManager(
+        auth_url=web_gate.url_auth,
+        cache_file=os.path.join(tempfile.gettempdir(),
+                                f"chitai_gorod_tokens_local_{port}.json"),
+        cookie_provider=cookie_provider,
+        transport=transport,
+    )
+
+
+@pytest.fixture
+def identity_token(token_manager: TokenManager) -> str:
+    """
+    Фикстура токена анонимного пользователя воркера.
+
+    Токен запрашивается перед каждым тестом: поставщик возвращает его
+    из кэша и заранее обновляет перед истечением.
+
+    :param token_manager: поставщик анонимных токенов
+    :type token_manager: TokenManager
+    :return: значение заголовка Authorization
+    :rtype: str
+    """
+    return worker_token(token_manager)
+
+
+@pytest.fixture(scope="session")
+def driver_pool() -> DriverPool:
+    """
+    Фикстура пула браузеров на весь прогон.
+
+    :yields: DriverPool или None, если пул отключён
+    """
+    if not driver_pool_enabled:
+        yield None
+        return
+    pool = DriverPool()
+    yield pool
+    pool.close()
+    _driver_pool_stats.update(pool.stats())
+
+
+@pytest.fixture(scope="session")
+def page_weight() -> PageWeightReport:
+    """
+    Фикстура учёта веса страниц (и экономии облегчённого режима).
+
+    :yields: PageWeightReport
+    """
+    report = PageWeightReport(lean=lean_browser)
+    yield report
+    report.save_baseline()
+    if report.entries:
+        _page_weight_stats.update(report.summary())
+
+
+def _record_page_weight(page_weight: PageWeightReport, driver) -> None:
+    """
+    Замерить вес текущей страницы и приложить его к Allure.
+
+    :param page_weight: отчёт о весе страниц
+    :type page_weight: PageWeightReport
+    :param driver: WebDriver - Экземпляр WebDriver
+    :return: None
+    """
+    entry = page_weight.record(driver)
+    if entry:
+        allure.attach(
+            "\n".join(f"{key}: {value}" for key, value in entry.items()),
+            name=f"Вес страницы {entry['page']}",
+            attachment_type=allure.attachment_type.TEXT,
+        )
+
+
+@pytest.fixture(scope="session")
+def page_metrics() -> PageMetrics:
+    """
+    Фикстура сбора метрик загрузки страниц и Web Vitals.
+
+    :yields: PageMetrics
+    """
+    metrics = get_page_metrics()
+    yield metrics
+    trend = metrics.save_trend()
+    if trend:
+        _page_metrics_stats.update(trend)
+
+
+@pytest.fixture(scope="session")
+def network_trace() -> NetworkTrace:
+    """
+    Фикстура трассировки сети браузера по шагам Allure.
+
+    :yields: NetworkTrace
+    """
+    trace = get_network_trace()
+    yield trace
+    if trace.steps:
+        _network_trace_stats.update(trace.stats())
+
+
+@pytest.fixture
+def driver(driver_pool: DriverPool, page_weight: PageWeightReport,
+           page_metrics: PageMetrics, network_trace: NetworkTrace):
+    """
+    Фикстура для инициализации браузера.
+
+    :param driver_pool: пул браузеров или None
+    :type driver_pool: DriverPool
+    :param page_weight: отчёт о весе страниц
+    :type page_weight: PageWeightReport
+    :param page_metrics: метрики загрузки страниц
+    :type page_metrics: PageMetrics
+    :param network_trace: трассировка сети
+    :type network_trace: NetworkTrace
+    :yields: WebDriver - Экземпляр WebDriver
+    """
+    if driver_pool is None:
+        driver = create_driver()
+        driver.get(url_ui)
+        get_profile_template().record_first_load(driver)
+        page_metrics.record(driver, "navigate:home")
+        _record_page_weight(page_weight, driver)
+        network_trace.bind(driver)
+        yield driver
+        network_trace.unbind()
+        _record_page_weight(page_weight, driver)
+        quit_driver(driver)
+        return
+
+    driver = driver_pool.acquire()
+    page_metrics.record(driver, "navigate:home")
+    _record_page_weight(page_weight, driver)
+    network_trace.bind(driver)
+    yield driver
+    network_trace.unbind()
+    _record_page_weight(page_weight, driver)
+    driver_pool.release(driver)
+
+
+@pytest.fixture(scope="session")
+def snapshot_server() -> SnapshotServer:
+    """
+    Фикстура локального сервера статических снимков страниц сайта.
+
+    Если снимков нет, тесты пропускаются.
+
+    :yields: SnapshotServer
+    """
+    if not os.path.isfile(os.path.join(snapshot_dir, MANIFEST_FILE)):
+        pytest.skip("Нет снимков страниц: python page_snapshots.py capture")
+    with SnapshotServer() as server:
+        yield server
+
+
+@pytest.fixture(scope="session")
+def offline_driver(snapshot_server: SnapshotServer):
+    """
+    Фикстура headless браузера для тестов page objects на снимках.
+
+    Браузер общий для тестов на снимках: каждый тест сам открывает
+    нужный снимок, а состояние страниц живёт только в их DOM.
+
+    :param snapshot_server: сервер снимков
+    :type snapshot_server: SnapshotServer
+    :yields: WebDriver - Экземпляр WebDriver
+    """
+    driver = create_driver(lean=True, warm_profile=False)
+    yield driver
+    quit_driver(driver)
+
+
+@pytest.fixture(scope="session")
+def handoff() -> HandoffReport:
+    """
+    Фикстура учёта времени подготовки состояния UI тестов.
+
+    :yields: HandoffReport
+    """
+    report = HandoffReport(hybrid=hybrid_fixtures)
+    yield report
+    report.save_baseline()
+    if report.entries:
+        _handoff_stats.update(report.summary())
+
+
+@pytest.fixture
+def cart_with_product(driver, transport: HTTPTransport,
+                      handoff: HandoffReport,
+                      page_metrics: PageMetrics) -> AddToCart:
+    """
+    Фикстура браузера, открытого на странице корзины с товаром.
+
+    По умолчанию товар добавляется через API от имени пользователя
+    воркера, куки и токен этого пользователя передаются браузеру, и
+    корзина открывается сразу по адресу. При CG_HYBRID=0 корзина
+    готовится через интерфейс: поиск, кнопка "Купить", переход в
+    корзину. В обоих режимах корзина очищается через API после теста.
+
+    :param driver: WebDriver - Экземпляр WebDriver
+    :param transport: общий HTTP транспорт прогона
+    :type transport: HTTPTransport
+    :param handoff: учёт времени подготовки
+    :type handoff: HandoffReport
+    :param page_metrics: метрики загрузки страниц
+    :type page_metrics: PageMetrics
+    :yields: AddToCart - page object открытой корзины
+    """
+    cart = AddToCart(driver)
+    api = None
+
+    with handoff.measure("cart_with_product") as entry:
+        if handoff.hybrid:
+            # Браузер работает с боевым сайтом, поэтому и токен, и
+            # корзина берутся у боевого API даже при CG_LOCAL_API=1
+            token = worker_token(get_token_manager())
+            api = CartAPI(transport=transport, token=token)
+            seed_cart(api, [product_id])
+            inject_session(driver, token, api.cookies.get_dict())
+            with page_metrics.step(driver, "navigate:cart"):
+                driver.get(url_ui_cart)
+        else:
+            SearchPage(driver).search_by_title(book_title)
+            cart.add_product_to_cart()
+            cart.open_cart()
+        cart.wait.until(ec.presence_of_element_located(cart.delete_button))
+    allure.attach(
+        "\n".join(f"{key}: {value}" for key, value in entry.items()),
+        name="Подготовка корзины",
+        attachment_type=allure.attachment_type.TEXT,
+    )
+
+    yield cart
+
+    # Корзина переживает сброс браузера: при подготовке через клики
+    # товар лежит в корзине анонимного пользователя браузера
+    if api is None:
+        token = browser_token(driver)
+        if token:
+            api = CartAPI(transport=transport, token=token)
+    if api is not None:
+        api.clear_cart()
+
+
+@pytest.fixture(scope="session")
+def benchmark_report() -> BenchmarkReport:
+    """
+    Фикстура отчёта бенчмарков на весь прогон.
+
+    :yields: BenchmarkReport
+    """
+    report = BenchmarkReport()
+    yield report
+    report.save_baseline()
+    if report.results:
+        _benchmark_stats.update(report.summary())
+
+
+@pytest.fixture(autouse=True)
+def request_timings() -> None:
+    """
+    Фикстура, прикладывающая к Allure таблицу замеров запросов теста.
+
+    :yields: None
+    """
+    recorder = get_timing_recorder()
+    position = recorder.mark()
+    yield
+    records = recorder.since(position)
+    if records:
+        allure.attach(recorder.table(records), name="Замеры запросов",
+                      attachment_type=allure.attachment_type.TEXT)
+
+
+def _selects_marker(expression: Optional[Expression], item,
+                    name: str) -> bool:
+    """
+    Проверить, что выражение -m выбирает тест именно по маркеру name:
+    тест подходит под выражение, а без этого маркера - уже нет.
+    Поэтому -m benchmark и -m "api and benchmark" включают бенчмарки,
+    а -m "not benchmark" и -m "not ui" - нет.
+
+    :param expression: разобранное выражение -m или None
+    :type expression: Expression
+    :param item: тест
+    :param name: имя маркера
+    :type name: str
+    :return: True, если маркер выбран явно
+    :rtype: bool
+    """
+    if expression is None:
+        return False
+    markers = {marker.name for marker in item.iter_markers()}
+    return expression.evaluate(markers.__contains__) \
+        and not expression.evaluate((markers - {name}).__contains__)
+
+
+def pytest_collection_modifyitems(config, items) -> None:
+    """
+    Исключить бенчмарки и нагрузку из обычного прогона.
+
+    Они долгие и записывают базовые значения бенчмарков, поэтому
+    выполняются, только если выражение -m выбирает их маркер или файл
+    теста указан в командной строке.
+
+    :param config: конфигурация pytest
+    :param items: собранные тесты
+    :return: None
+    """
+    markexpr = config.getoption("markexpr") or ""
+    expression = Expression.compile(markexpr) if markexpr else None
+    requested = {os.path.abspath(os.path.join(
+        str(config.invocation_params.dir), arg.split("::")[0]))
+        for arg in config.args}
+    selected, deselected = [], []
+    for item in items:
+        opt_in = [name for name in OPT_IN_MARKERS
+                  if item.get_closest_marker(name) is not None]
+        if opt_in and str(item.path) not in requested \
+                and not any(_selects_marker(expression, item, name)
+                            for name in opt_in):
+            deselected.append(item)
+        else:
+            selected.append(item)
+    if deselected:
+        config.hook.pytest_deselected(items=deselected)
+        items[:] = selected
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    """
+    Забрать артефакты из браузера упавшего UI теста.
+
+    Обработка идёт в фоне, пока выполняется teardown теста.
+
+    :param item: тест
+    :param call: информация о фазе теста
+    """
+    outcome = yield
+    report = outcome.get_result()
+    if report.when == "setup":
+        item.started_at = call.start
+    driver = getattr(item, "funcargs", {}).get("driver")
+    if report.failed and report.when in ("setup", "call") \
+            and driver is not None:
+        item.failure_artifacts = get_failure_artifacts().capture(
+            driver, item.nodeid, getattr(item, "started_at", None))
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_teardown(item):
+    """
+    Приложить артефакты упавшего UI теста к Allure.
+
+    :param item: тест
+    """
+    yield
+    pending = getattr(item, "failure_artifacts", None)
+    if pending is not None:
+        get_failure_artifacts().attach(pending)
+
+
+def pytest_sessionfinish(session) -> None:
+    """
+    Записать сводку замеров запросов за прогон.
+
+    :param session: сессия pytest
+    :return: None
+    """
+    get_timing_recorder().write_summary(worker_file(timing_summary_file))
+    get_failure_artifacts().close()
+    profiler = get_webdriver_profiler()
+    profiler.save(worker_file(profiler.report_file),
+                  worker_file(profiler.flame_file))
+
+
+def pytest_terminal_summary(terminalreporter) -> None:
+    """
+    Вывести в итог прогона статистику прогона: пулы WebDriver и HTTP
+    соединений, кэши драйвера и профиля, артефакты падений,
+    профилировщик и ожидания, подготовку состояния, бенчмарки, метрики
+    и вес страниц, трассировку сети и кассету.
+
+    :param terminalreporter: репортер pytest
+    :return: None
+    """
+    if _driver_pool_stats:
+        terminalreporter.write_sep("-", "WebDriver pool")
+        terminalreporter.write_line(
+            "launches: {launches}, reused sessions: {reuses}, "
+            "launches avoided: {launches_avoided}, recycled: {recycled}, "
+            "crashed: {crashed}".format(**_driver_pool_stats)
+        )
+
+    resolver = get_driver_resolver().stats()
+    if resolver["resolutions"] or resolver["cache_hits"]:
+        terminalreporter.write_sep("-", "Selenium Manager cache")
+        terminalreporter.write_line(
+            "resolutions: {resolutions} ({resolve_ms} ms), "
+            "cache hits: {cache_hits}, "
+            "resolution time saved: {saved_ms} ms".format(**resolver)
+        )
+
+    profile = get_profile_template().stats()
+    if profile["cold_sessions"] or profile["warm_sessions"]:
+        terminalreporter.write_sep("-", "Chrome profile template")
+        terminalreporter.write_line(
+            "first page load, cold: {cold_load_ms} ms "
+            "({cold_sessions} sessions), warm: {warm_load_ms} ms "
+            "({warm_sessions} sessions); template builds: {builds}, "
+            "copies: {copies} (avg {copy_ms} ms), "
+            "Chrome: {browser_version}".format(**profile)
+        )
+
+    artifacts = get_failure_artifacts().stats()
+    if artifacts["captured"]:
+        terminalreporter.write_sep("-", "Failure artifacts")
+        terminalreporter.write_line(
+            "captured: {captured} (avg {capture_ms} ms in test), "
+            "background processing: {process_ms} ms, "
+            "deduplicated DOM: {deduped}, skipped over size cap: "
+            "{over_limit}, late: {late}, attached: {bytes} bytes".format(
+                **artifacts)
+        )
+
+    profile = get_webdriver_profiler().summary()
+    if profile["commands"]:
+        terminalreporter.write_sep("-", "WebDriver profile")
+        terminalreporter.write_line(
+            "commands: {commands} ({command_ms} ms)".format(**profile))
+        for title, key in (("slowest commands", "top_commands"),
+                           ("slowest locators", "top_locators"),
+                           ("slowest waits", "top_waits")):
+            if profile[key]:
+                terminalreporter.write_line(f"{title}: " + "; ".join(
+                    f"{name} x{count} {total} ms"
+                    for name, count, total in profile[key]))
+        terminalreporter.write_line(
+            "full report and folded stacks: {}, {}".format(
+                worker_file(get_webdriver_profiler().report_file),
+                worker_file(get_webdriver_profiler().flame_file)))
+
+    waits = get_wait_stats().summary()
+    if waits["waits"]:
+        terminalreporter.write_sep("-", "Event waits")
+        terminalreporter.write_line(
+            "waits: {waits}, wait time: {wait_ms} ms, "
+            "estimated saved: {estimated_saved_ms} ms, "
+            "WebDriver calls: {round_trips}, "
+            "calls avoided: {round_trips_avoided}".format(**waits)
+        )
+
+    if _handoff_stats:
+        terminalreporter.write_sep("-", "UI state setup")
+        terminalreporter.write_line(
+            "via API: {hybrid}, setups: {setups}, time: {seconds} s, "
+            "saved vs click-through: {saved_seconds} s".format(
+                **_handoff_stats)
+        )
+
+    if _benchmark_stats:
+        terminalreporter.write_sep("-", "Benchmarks")
+        for line in _benchmark_stats["lines"]:
+            terminalreporter.write_line(line)
+        terminalreporter.write_line(
+            "benchmarks: {benchmarks}, regressions: {regressions}, "
+            "new baselines: {new_baselines}, "
+            "missing baselines: {missing_baselines}, update: {update}".format(
+                benchmarks=_benchmark_stats["benchmarks"],
+                regressions=len(_benchmark_stats["regressions"]),
+                new_baselines=len(_benchmark_stats["new_baselines"]),
+                missing_baselines=len(
+                    _benchmark_stats["missing_baselines"]),
+                update=_benchmark_stats["update"])
+        )
+
+    if _page_metrics_stats:
+        terminalreporter.write_sep("-", "Page metrics (median, trend)")
+        for step, metrics in sorted(_page_metrics_stats.items()):
+            terminalreporter.write_line(
+                "{step}: count {count}, duration {duration_ms} ms "
+                "(trend {trend_duration_ms}), load {load_ms} ms "
+                "(trend {trend_load_ms}), LCP {lcp_ms} ms "
+                "(trend {trend_lcp_ms}), CLS {cls}, "
+                "long tasks {long_tasks_ms} ms".format(step=step, **metrics)
+            )
+
+    if _network_trace_stats:
+        terminalreporter.write_sep("-", "Network trace")
+        slowest = _network_trace_stats["slowest"]
+        terminalreporter.write_line(
+            "traced steps: {steps}, requests: {requests}, "
+            "API calls: {api_calls}".format(**_network_trace_stats)
+        )
+        terminalreporter.write_line(
+            f"slowest request: {slowest['time']} ms {slowest['url']} "
+            f"(step \"{slowest['step']}\")"
+        )
+
+    if _page_weight_stats:
+        terminalreporter.write_sep("-", "Page weight")
+        terminalreporter.write_line(
+            "lean: {lean}, pages: {pages}, requests: {requests}, "
+            "bytes: {bytes}, requests saved: {requests_saved}, "
+            "bytes saved: {bytes_saved}".format(**_page_weight_stats)
+        )
+
+    if not _transport_stats:
+        return
+    terminalreporter.write_sep("-", "HTTP connection pool")
+    terminalreporter.write_line(
+        "requests: {requests}, reused (hits): {hits}, "
+        "new connections (misses): {misses}, "
+        "hit ratio: {hit_ratio}".format(**_transport_stats)
+    )
+
+    cassette = _transport_stats.get("cassette")
+    if cassette:
+        terminalreporter.write_sep("-", "HTTP cassette")
+        terminalreporter.write_line(
+            "mode: {mode}, entries: {entries}, played: {played}".format(
+                **cassette)
+        )
+        for entry in cassette["unused"]:
+            terminalreporter.write_line(f"unused: {entry}")
+        for entry in cassette["stale"]:
+            terminalreporter.write_line(f"stale: {entry}")
@@ -1,29 +1,205 @@
+import threading
+import time
+from typing import Optional, Tuple
+
 import requests
+from http_transport import get_shared_transport
+from cache_helper import FileLock, read_json, write_json
+from config import url_ui, cookie_ttl, cookie_cache_file
 
+FALLBACK_COOKIES = {'__ddg1': 'fallback_cookie_value'}
 
-def get_fresh_cookies() -> dict:
+# Заглушку не храним долго: сеть могла «моргнуть» лишь на мгновение
+FALLBACK_TTL = 30
+
+
+def _fetch_cookies(url: str = url_ui) -> Tuple[dict, Optional[float]]:
     """
-    Получить свежие куки через API запрос
+    Запросить куки DDoS-Guard с главной страницы.
 
-    :return: словарь с куками
-    :rtype: dict
+    :param url: адрес страницы, выдающей куки
+    :type url: str
+    :return: словарь с куками и ближайшее время их истечения (epoch)
+    :rtype: tuple
     """
     try:
         # Первый запрос для получения кук
-        response = requests.get("https://www.chitai-gorod.ru/", timeout=10)
+        response = get_shared_transport().request("GET", url, timeout=10)
         cookies_dict = {}
+        expires = None
 
         # Извлекаем нужные куки из ответа
         for cookie in response.cookies:
             if cookie.name.startswith('__ddg'):
                 cookies_dict[cookie.name] = cookie.value
+                if cookie.expires:
+                    expires = min(expires or cookie.expires, cookie.expires)
 
         # Если куки не получены, используем заглушку
         if not cookies_dict:
-            cookies_dict = {'__ddg1': 'fallback_cookie_value'}
+            return dict(FALLBACK_COOKIES), None
 
-        return cookies_dict
+        return cookies_dict, expires
 
     except Exception:
         # Fallback на случай ошибки
-        return {'__ddg1': 'fallback_cookie_value'}
+        return dict(FALLBACK_COOKIES), None
+
+
+def get_fresh_cookies() -> dict:
+    """
+    Получить свежие куки через API запрос
+
+    :return: словарь с куками
+    :rtype: dict
+    """
+    cookies_dict, _ = _fetch_cookies()
+    return cookies_dict
+
+
+class CookieProvider:
+    """
+    Кэширующий поставщик кук DDoS-Guard.
+
+    Куки хранятся в памяти и в общем файле, поэтому все клиенты процесса
+    и все параллельные воркеры используют один набор кук до истечения
+    TTL. Обновление выполняется только одним потоком/процессом за раз:
+    остальные ждут блокировку и забирают уже обновлённые куки из файла.
+    """
+
+    def __init__(self, ttl: float = cookie_ttl,
+                 cache_file: str = cookie_cache_file,
+                 source_url: str = url_ui) -> None:
+        """
+        Инициализация поставщика кук.
+
+        :param ttl: время жизни кук в кэше, сек
+        :type ttl: float
+        :param cache_file: путь к файлу общего кэша
+        :type cache_file: str
+        :param source_url: адрес страницы, выдающей куки
+        :type source_url: str
+        """
+        self.ttl = ttl
+        self.cache_file = cache_file
+        self.source_url = source_url
+        self.refresh_count = 0
+        self._entry = None
+        self._lock = threading.Lock()
+
+    def get(self) -> dict:
+        """
+        Получить действующие куки, обновив их только при необходимости.
+
+        :return: словарь с куками
+        :rtype: dict
+        """
+        entry = self._entry
+        if self._is_valid(entry):
+            return dict(entry["cookies"])
+
+        with self._lock:
+            if self._is_valid(self._entry):
+                return dict(self._entry["cookies"])
+
+            entry = read_json(self.cache_file)
+            if not self._is_valid(entry):
+                with FileLock(self.cache_file + ".lock"):
+                    # Пока ждали блокировку, куки мог обновить другой воркер
+                    entry = read_json(self.cache_file)
+                    if not self._is_valid(entry):
+                        entry = self._refresh()
+
+            self._entry = entry
+            return dict(entry["cookies"])
+
+    def invalidate(self, stale_cookies: Optional[dict] = None) -> None:
+        """
+        Сбросить кэш после ответа, показавшего, что куки устарели.
+
+        Файловый кэш удаляется, только если в нём лежат именно устаревшие
+        куки: более свежие куки, полученные другим воркером, сохраняются.
+
+        :param stale_cookies: куки, с которыми был получен отказ
+        :type stale_cookies: dict
+        :return: None
+        """
+        with self._lock:
+            self._entry = None
+            with FileLock(self.cache_file + ".lock"):
+                entry = read_json(self.cache_file)
+                if entry and (stale_cookies is None
+                              or entry.get("cookies") == stale_cookies):
+                    write_json(self.cache_file, {})
+
+    @staticmethod
+    def is_stale_response(response: requests.Response) -> bool:
+        """
+        Проверить, что ответ является отказом DDoS-Guard из-за кук.
+
+        Обычный 403 API (например, JSON с ошибкой доступа) отказом
+        DDoS-Guard не считается: это ответ самого сервера.
+
+        :param response: ответ сервера
+        :type response: requests.Response
+        :return: True, если куки нужно обновить
+        :rtype: bool
+        """
+        server = response.headers.get("Server", "").lower()
+        content_type = response.headers.get("Content-Type", "")
+        return "ddos-guard" in server and "text/html" in content_type
+
+    def _refresh(self) -> dict:
+        """
+        Запросить новые куки и записать их в общий кэш.
+
+        :return: запись кэша
+        :rtype: dict
+        """
+        cookies_dict, expires = _fetch_cookies(self.source_url)
+        self.refresh_count += 1
+
+        now = time.time()
+        if cookies_dict == FALLBACK_COOKIES:
+            entry = {"cookies": cookies_dict,
+                     "expires_at": now + min(self.ttl, FALLBACK_TTL)}
+            # Заглушку держим только в памяти этого процесса
+            return entry
+
+        expires_at = now + self.ttl
+        if expires:
+            expires_at = min(expires_at, expires)
+        entry = {"cookies": cookies_dict, "expires_at": expires_at}
+        write_json(self.cache_file, entry)
+        return entry
+
+    @staticmethod
+    def _is_valid(entry: Optional[dict]) -> bool:
+        """
+        Проверить, что запись кэша существует и не истекла.
+
+        :param entry: запись кэша
+        :type entry: dict
+        :return: True, если куки можно использовать
+        :rtype: bool
+        """
+        return bool(entry) and bool(entry.get("cookies")) \
+            and entry.get("expires_at", 0) > time.time()
+
+
+_default_provider = None
+_default_provider_lock = threading.Lock()
+
+
+def get_cookie_provider() -> CookieProvider:
+    """
+    Получить общий для процесса поставщик кук.
+
+    :return: CookieProvider instance
+    :rtype: CookieProvider
+    """
+    global _default_provider
+    with _default_provider_lock:
+        if _default_provider is None:
+            _default_provider = CookieProvider()
+        return _default_provider
@@ -0,0 +1,137 @@
+from typing import Dict, Iterable
+
+from selenium.webdriver.remote.webdriver import WebDriver
+
+# Поиск элемента по локатору Selenium (By, value) внутри браузера
+FIND_FUNCTION = """
+function find(locator) {
+    var by = locator[0], value = locator[1];
+    if (by === 'xpath') {
+        var snapshot = document.evaluate(value, document, null,
+            XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+        var nodes = [];
+        for (var i = 0; i < snapshot.snapshotLength; i++) {
+            nodes.push(snapshot.snapshotItem(i));
+        }
+        return nodes;
+    }
+    var css = value;
+    if (by === 'id') { css = '#' + CSS.escape(value); }
+    else if (by === 'class name') { css = '.' + CSS.escape(value); }
+    else if (by === 'name') { css = '[name="' + value + '"]'; }
+    return Array.prototype.slice.call(document.querySelectorAll(css));
+}
+"""
+
+SNAPSHOT_SCRIPT = FIND_FUNCTION + """
+var locators = arguments[0], attributes = arguments[1];
+var textLimit = arguments[2];
+var result = {};
+Object.keys(locators).forEach(function (name) {
+    var nodes = find(locators[name]);
+    var el = nodes[0];
+    var state = {exists: !!el, count: nodes.length, visible: false,
+                 text: null, attributes: {}};
+    if (el) {
+        state.visible = el.getClientRects().length > 0
+            && getComputedStyle(el).visibility !== 'hidden';
+        var text = (el.innerText || el.textContent || '').trim();
+        state.text = text.length > textLimit
+            ? text.slice(0, textLimit) : text;
+        attributes.forEach(function (attr) {
+            state.attributes[attr] = el.getAttribute(attr);
+        });
+    }
+    result[name] = state;
+});
+return result;
+"""
+
+CONTAINS_SCRIPT = FIND_FUNCTION + """
+var text = arguments[0], locator = arguments[1];
+var caseSensitive = arguments[2];
+var source;
+if (locator) {
+    var el = find(locator)[0];
+    if (!el) { return false; }
+    source = el.innerText || el.textContent || '';
+} else {
+    source = document.documentElement.outerHTML;
+}
+if (!caseSensitive) {
+    source = source.toLowerCase();
+    text = text.toLowerCase();
+}
+return source.indexOf(text) !== -1;
+"""
+
+
+def snapshot(driver: WebDriver, locators: Dict[str, tuple],
+             attributes: Iterable[str] = (),
+             text_limit: int = 1000) -> Dict[str, dict]:
+    """
+    Получить состояние нескольких элементов за один вызов WebDriver.
+
+    Для каждого локатора возвращается словарь с ключами exists, count,
+    visible, text (видимый текст первого найденного элемента, обрезанный
+    до text_limit символов) и attributes (значения getAttribute; None,
+    если атрибута нет).
+
+    :param driver: WebDriver - Экземпляр WebDriver
+    :type driver: WebDriver
+    :param locators: имя -> локатор page object, например
+        {"get_code": auth.get_code_button}
+    :type locators: dict
+    :param attributes: атрибуты для чтения, например ("disabled",)
+    :type attributes: Iterable[str]
+    :param text_limit: максимальная длина текста элемента
+    :type text_limit: int
+    :return: имя -> состояние элемента
+    :rtype: dict
+    """
+    return driver.execute_script(
+        SNAPSHOT_SCRIPT,
+        {name: list(locator) for name, locator in locators.items()},
+        list(attributes),
+        text_limit,
+    )
+
+
+def page_source_contains(driver: WebDriver, text: str,
+                         case_sensitive: bool = False) -> bool:
+    """
+    Проверить наличие подстроки в HTML страницы без передачи
+    driver.page_source по сети.
+
+    :param driver: WebDriver - Экземпляр WebDriver
+    :type driver: WebDriver
+    :param text: искомая подстрока
+    :type text: str
+    :param case_sensitive: учитывать регистр
+    :type case_sensitive: bool
+    :return: True, если подстрока найдена
+    :rtype: bool
+    """
+    return bool(driver.execute_script(CONTAINS_SCRIPT, text, None,
+                                      case_sensitive))
+
+
+def element_text_contains(driver: WebDriver, locator: tuple, text: str,
+                          case_sensitive: bool = False) -> bool:
+    """
+    Проверить наличие подстроки в видимом тексте элемента.
+
+    :param driver: WebDriver - Экземпляр WebDriver
+    :type driver: WebDriver
+    :param locator: локатор элемента
+    :type locator: tuple
+    :param text: искомая подстрока
+    :type text: str
+    :param case_sensitive: учитывать регистр
+    :type case_sensitive: bool
+    :return: True, если подстрока найдена (False и для отсутствующего
+        элемента)
+    :rtype: bool
+    """
+    return bool(driver.execute_script(CONTAINS_SCRIPT, text, list(locator),
+                                      case_sensitive))
@@ -0,0 +1,282 @@
+import threading
+from typing import Callable, Optional
+
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.remote.webdriver import WebDriver
+from driver_resolver import get_driver_resolver
+from lean_browser import apply_lean_options, enable_blocking
+from profile_template import ProfileTemplate, get_profile_template
+from web_vitals import install_observer
+from webdriver_profiler import get_webdriver_profiler
+from config import (url_ui, driver_max_uses, lean_browser,
+                    page_metrics_enabled, driver_cache_enabled,
+                    profile_template_enabled, failure_artifacts_enabled,
+                    network_trace_enabled, webdriver_profile_enabled)
+
+# Очистка хранилищ страницы выполняется на текущем origin
+CLEAR_STORAGE_SCRIPT = """
+try { window.localStorage.clear(); } catch (e) {}
+try { window.sessionStorage.clear(); } catch (e) {}
+"""
+
+
+def create_driver(lean: bool = lean_browser,
+                  warm_profile: bool = profile_template_enabled,
+                  user_data_dir: Optional[str] = None) -> WebDriver:
+    """
+    Запустить новый экземпляр Chrome.
+
+    Закрывать браузер нужно через quit_driver(), чтобы удалить копию
+    прогретого профиля.
+
+    :param lean: облегчённый режим: headless, фиксированное окно и
+        блокировка картинок, шрифтов и трекеров
+    :type lean: bool
+    :param warm_profile: стартовать с копии прогретого шаблона профиля
+    :type warm_profile: bool
+    :param user_data_dir: каталог профиля (используется как есть и не
+        удаляется)
+    :type user_data_dir: str
+    :return: WebDriver - Экземпляр WebDriver
+    :rtype: WebDriver
+    """
+    # Настройка опций Chrome
+    options = webdriver.ChromeOptions()
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    if lean:
+        apply_lean_options(options)
+    logging_prefs = {}
+    if failure_artifacts_enabled:
+        # Лог консоли для артефактов упавших тестов
+        logging_prefs["browser"] = "ALL"
+    if network_trace_enabled:
+        # Сетевые события DevTools для трассировки сети
+        logging_prefs["performance"] = "ALL"
+        options.add_experimental_option(
+            "perfLoggingPrefs", {"enableNetwork": True, "enablePage": False})
+    if logging_prefs:
+        options.set_capability("goog:loggingPrefs", logging_prefs)
+
+    # Selenium Manager автоматически загрузит правильный ChromeDriver;
+    # найденные им пути кэшируются между запусками и воркерами
+    service = None
+    browser_path = None
+    if driver_cache_enabled:
+        driver_path, browser_path = get_driver_resolver().resolve(options)
+        if browser_path:
+            options.binary_location = browser_path
+        service = Service(executable_path=driver_path)
+
+    profile_copy = None
+    if user_data_dir is None and warm_profile:
+        # Шаблон собирается браузером с теми же опциями и пустым профилем
+        profile_copy = user_data_dir = get_profile_template().checkout(
+            lambda path: create_driver(lean, warm_profile=False,
+                                       user_data_dir=path),
+            browser_path,
+        )
+    if user_data_dir:
+        options.add_argument(f"--user-data-dir={user_data_dir}")
+    try:
+        driver = webdriver.Chrome(options=options, service=service)
+    except WebDriverException:
+        ProfileTemplate.release(profile_copy)
+        raise
+    driver.profile_copy = profile_copy
+    if profile_copy:
+        get_profile_template().verify(driver)
+    if lean:
+        enable_blocking(driver)
+    else:
+        driver.maximize_window()
+    if page_metrics_enabled:
+        install_observer(driver)
+    if webdriver_profile_enabled:
+        get_webdriver_profiler().instrument(driver)
+    return driver
+
+
+def quit_driver(driver: WebDriver) -> None:
+    """
+    Закрыть браузер и удалить копию прогретого профиля.
+
+    :param driver: WebDriver - Экземпляр WebDriver
+    :type driver: WebDriver
+    :return: None
+    """
+    try:
+        driver.quit()
+    finally:
+        ProfileTemplate.release(getattr(driver, "profile_copy", None))
+
+
+class DriverPool:
+    """
+    Пул браузерных сессий на весь прогон (или на воркер).
+
+    Вместо запуска Chrome на каждый тест сессия возвращается в пул и
+    перед следующим тестом сбрасывается: удаляются куки (а с ними и
+    анонимная корзина), localStorage и sessionStorage, закрываются
+    лишние окна, после чего открывается стартовая страница. Сессия
+    пересоздаётся после max_uses тестов или если браузер перестал
+    отвечать.
+    """
+
+    def __init__(self, factory: Callable[[], WebDriver] = create_driver,
+                 max_uses: int = driver_max_uses,
+                 start_url: str = url_ui) -> None:
+        """
+        Инициализация пула.
+
+        :param factory: функция запуска нового браузера
+        :type factory: Callable
+        :param max_uses: число тестов до пересоздания сессии
+        :type max_uses: int
+        :param start_url: стартовая страница теста
+        :type start_url: str
+        """
+        self.factory = factory
+        self.max_uses = max_uses
+        self.start_url = start_url
+        self.launches = 0
+        self.reuses = 0
+        self.recycled = 0
+        self.crashed = 0
+        self._idle = []
+        self._uses = {}
+        self._lock = threading.Lock()
+
+    def acquire(self) -> WebDriver:
+        """
+        Получить браузер, открытый на стартовой странице.
+
+        :return: WebDriver - Экземпляр WebDriver
+        :rtype: WebDriver
+        """
+        driver = None
+        with self._lock:
+            while self._idle and driver is None:
+                candidate = self._idle.pop()
+                if self._is_alive(candidate):
+                    driver = candidate
+                    self.reuses += 1
+                else:
+                    self.crashed += 1
+                    self._discard(candidate)
+
+        launched = driver is None
+        if launched:
+            driver = self.factory()
+            with self._lock:
+                self.launches += 1
+
+        with self._lock:
+            self._uses[id(driver)] = self._uses.get(id(driver), 0) + 1
+        driver.get(self.start_url)
+        if launched:
+            get_profile_template().record_first_load(driver)
+        return driver
+
+    def release(self, driver: WebDriver) -> None:
+        """
+        Вернуть браузер в пул, сбросив его состояние.
+
+        :param driver: WebDriver - Экземпляр WebDriver
+        :type driver: WebDriver
+        :return: None
+        """
+        if self._uses.get(id(driver), 0) >= self.max_uses:
+            with self._lock:
+                self.recycled += 1
+            self._discard(driver)
+            return
+        try:
+            self.reset(driver)
+        except WebDriverException:
+            with self._lock:
+                self.crashed += 1
+            self._discard(driver)
+            return
+        with self._lock:
+            self._idle.append(driver)
+
+    @staticmethod
+    def reset(driver: WebDriver) -> None:
+        """
+        Сбросить состояние сессии браузера.
+
+        :param driver: WebDriver - Экземпляр WebDriver
+        :type driver: WebDriver
+        :return: None
+        """
+        handles = driver.window_handles
+        for handle in handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(handles[0])
+
+        driver.execute_script(CLEAR_STORAGE_SCRIPT)
+        try:
+            # Куки всех доменов, включая web-gate
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        except (AttributeError, WebDriverException):
+            driver.delete_all_cookies()
+
+    def close(self) -> None:
+        """
+        Закрыть все браузеры пула.
+
+        :return: None
+        """
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for driver in idle:
+            self._discard(driver)
+
+    def stats(self) -> dict:
+        """
+        Статистика пула.
+
+        :return: словарь со счётчиками
+        :rtype: dict
+        """
+        return {
+            "launches": self.launches,
+            "reuses": self.reuses,
+            "launches_avoided": self.reuses,
+            "recycled": self.recycled,
+            "crashed": self.crashed,
+        }
+
+    @staticmethod
+    def _is_alive(driver: WebDriver) -> bool:
+        """
+        Проверить, что браузер отвечает.
+
+        :param driver: WebDriver - Экземпляр WebDriver
+        :type driver: WebDriver
+        :return: True, если сессия жива
+        :rtype: bool
+        """
+        try:
+            driver.window_handles
+        except WebDriverException:
+            return False
+        return True
+
+    def _discard(self, driver: WebDriver) -> None:
+        """
+        Завершить сессию браузера.
+
+        :param driver: WebDriver - Экземпляр WebDriver
+        :type driver: WebDriver
+        :return: None
+        """
+        self._uses.pop(id(driver), None)
+        try:
+            quit_driver(driver)
+        except WebDriverException:
+            pass
@@ -0,0 +1,238 @@
+import os
+import subprocess
+import threading
+import time
+from typing import Optional, Tuple
+
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.common.options import ArgOptions
+from selenium.webdriver.common.selenium_manager import SeleniumManager
+from cache_helper import FileLock, read_json, write_json
+from config import driver_cache_file, driver_cache_ttl
+
+
+def binary_version(path: Optional[str]) -> Optional[str]:
+    """
+    Версия браузера или драйвера по выводу "--version".
+
+    :param path: путь к исполняемому файлу
+    :type path: str
+    :return: строка версии или None
+    :rtype: str
+    """
+    if not path:
+        return None
+    try:
+        completed = subprocess.run([path, "--version"], capture_output=True,
+                                   timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    output = completed.stdout.decode("utf-8", "replace").strip()
+    return output.split()[-1] if output else None
+
+
+def binary_fingerprint(path: Optional[str]) -> Optional[list]:
+    """
+    Отпечаток исполняемого файла: размер и время изменения. Меняется при
+    обновлении браузера, поэтому версию не нужно перечитывать запуском.
+
+    :param path: путь к файлу
+    :type path: str
+    :return: [размер, mtime] или None, если файла нет
+    :rtype: list
+    """
+    if not path:
+        return None
+    try:
+        stat = os.stat(os.path.realpath(path))
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime]
+
+
+class DriverResolver:
+    """
+    Кэш результата Selenium Manager: пути к chromedriver и Chrome.
+
+    Без кэша каждый webdriver.Chrome() запускает Selenium Manager,
+    который заново ищет браузер и подходящий драйвер. Результат
+    сохраняется в памяти и в общем файле вместе с версиями браузера и
+    драйвера. Запись используется, пока файлы на месте, отпечаток
+    браузера не изменился (то есть не обновилась его версия) и не
+    истёк TTL. Разрешение выполняет только один процесс за раз:
+    остальные ждут блокировку и забирают уже записанный результат.
+    """
+
+    def __init__(self, cache_file: str = driver_cache_file,
+                 ttl: float = driver_cache_ttl) -> None:
+        """
+        Инициализация кэша.
+
+        :param cache_file: путь к файлу общего кэша
+        :type cache_file: str
+        :param ttl: время жизни записи, сек
+        :type ttl: float
+        """
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.resolutions = 0
+        self.hits = 0
+        self.resolve_time = 0.0
+        self.saved_time = 0.0
+        self._entries = {}
+        self._lock = threading.Lock()
+        # Статистика обновляется и под self._lock, и без него
+        self._stats_lock = threading.Lock()
+
+    @staticmethod
+    def cache_key(options: ArgOptions) -> str:
+        """
+        Ключ кэша: браузер, запрошенная версия и путь к браузеру.
+
+        :param options: опции браузера
+        :type options: ArgOptions
+        :return: ключ
+        :rtype: str
+        """
+        return ":".join([
+            options.capabilities["browserName"],
+            str(options.browser_version or "stable"),
+            str(getattr(options, "binary_location", "") or ""),
+        ])
+
+    def resolve(self, options: ArgOptions) -> Tuple[str, Optional[str]]:
+        """
+        Получить пути к драйверу и браузеру для опций.
+
+        :param options: опции браузера
+        :type options: ArgOptions
+        :return: путь к драйверу и путь к браузеру (или None)
+        :rtype: tuple
+        """
+        key = self.cache_key(options)
+        entry = self._entries.get(key)
+        if self._is_valid(entry):
+            return self._hit(entry)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if self._is_valid(entry):
+                return self._hit(entry)
+
+            entry = read_json(self.cache_file, {}).get(key)
+            if self._is_valid(entry):
+                self._entries[key] = entry
+                return self._hit(entry)
+
+            with FileLock(self.cache_file + ".lock"):
+                # Пока ждали блокировку, драйвер мог найти другой воркер
+                cache = read_json(self.cache_file, {})
+                entry = cache.get(key)
+                if self._is_valid(entry):
+                    self._entries[key] = entry
+                    return self._hit(entry)
+                entry = self._resolve(options)
+                cache[key] = entry
+                write_json(self.cache_file, cache)
+            self._entries[key] = entry
+            return entry["driver_path"], entry["browser_path"]
+
+    def stats(self) -> dict:
+        """
+        Статистика кэша.
+
+        :return: словарь со статистикой
+        :rtype: dict
+        """
+        with self._stats_lock:
+            return {
+                "resolutions": self.resolutions,
+                "cache_hits": self.hits,
+                "resolve_ms": round(self.resolve_time * 1000, 1),
+                "saved_ms": round(self.saved_time * 1000, 1),
+            }
+
+    def _resolve(self, options: ArgOptions) -> dict:
+        """
+        Запустить Selenium Manager и собрать запись кэша.
+
+        :param options: опции браузера
+        :type options: ArgOptions
+        :return: запись кэша
+        :rtype: dict
+        :raises WebDriverException: если Selenium Manager не справился
+        """
+        start = time.perf_counter()
+        # Selenium Manager меняет опции (binary_location), поэтому
+        # разрешение выполняется на копии
+        probe = type(options)()
+        probe.browser_version = options.browser_version
+        if getattr(options, "binary_location", None):
+            probe.binary_location = options.binary_location
+        driver_path = SeleniumManager().driver_location(probe)
+        browser_path = getattr(probe, "binary_location", None) or None
+        if not driver_path:
+            raise WebDriverException("Selenium Manager не нашёл драйвер")
+        elapsed = time.perf_counter() - start
+        with self._stats_lock:
+            self.resolutions += 1
+            self.resolve_time += elapsed
+        return {
+            "driver_path": driver_path,
+            "browser_path": browser_path,
+            "driver_version": binary_version(driver_path),
+            "browser_version": binary_version(browser_path),
+            "browser_fingerprint": binary_fingerprint(browser_path),
+            "resolve_seconds": round(elapsed, 3),
+            "resolved_at": time.time(),
+        }
+
+    def _hit(self, entry: dict) -> Tuple[str, Optional[str]]:
+        """
+        Учесть попадание в кэш.
+
+        :param entry: запись кэша
+        :type entry: dict
+        :return: путь к драйверу и путь к браузеру
+        :rtype: tuple
+        """
+        with self._stats_lock:
+            self.hits += 1
+            self.saved_time += entry.get("resolve_seconds", 0.0)
+        return entry["driver_path"], entry["browser_path"]
+
+    def _is_valid(self, entry: Optional[dict]) -> bool:
+        """
+        Проверить, что запись можно использовать.
+
+        :param entry: запись кэша
+        :type entry: dict
+        :return: True, если драйвер на месте, браузер не обновлялся и
+            TTL не истёк
+        :rtype: bool
+        """
+        if not entry or time.time() - entry.get("resolved_at", 0) > self.ttl:
+            return False
+        if not os.path.isfile(entry.get("driver_path") or ""):
+            return False
+        browser_path = entry.get("browser_path")
+        return browser_path is None or binary_fingerprint(
+            browser_path) == entry.get("browser_fingerprint")
+
+
+_default_resolver = None
+_default_resolver_lock = threading.Lock()
+
+
+def get_driver_resolver() -> DriverResolver:
+    """
+    Получить общий для процесса кэш Selenium Manager.
+
+    :return: DriverResolver instance
+    :rtype: DriverResolver
+    """
+    global _default_resolver
+    with _default_resolver_lock:
+        if _default_resolver is None:
+            _default_resolver = DriverResolver()
+        return _default_resolver
@@ -0,0 +1,265 @@
+import base64
+import gzip
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from typing import Optional
+
+import allure
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.remote.webdriver import WebDriver
+from config import (failure_artifacts_enabled, failure_artifacts_workers,
+                    failure_artifacts_jpeg_quality,
+                    failure_artifacts_max_bytes, failure_artifacts_timeout)
+
+DOM_EXPRESSION = "document.documentElement.outerHTML"
+
+
+class FailureArtifacts:
+    """
+    Артефакты упавших UI тестов: скриншот, DOM, консоль браузера и URL.
+
+    В момент падения из браузера забираются только сырые данные через
+    DevTools: скриншот сразу в JPEG (без PNG во весь экран) и DOM одним
+    вызовом Runtime.evaluate вместо page_source. Декодирование, сжатие
+    DOM, поиск одинаковых DOM и учёт размера выполняются в фоновом пуле,
+    пока идёт teardown теста, а к Allure готовые артефакты прикладываются
+    в конце teardown. Одинаковые DOM прикладываются один раз, а после
+    max_bytes за прогон (воркер) прикладываются только URL и консоль.
+    """
+
+    def __init__(self, enabled: bool = failure_artifacts_enabled,
+                 workers: int = failure_artifacts_workers,
+                 jpeg_quality: int = failure_artifacts_jpeg_quality,
+                 max_bytes: int = failure_artifacts_max_bytes,
+                 timeout: float = failure_artifacts_timeout) -> None:
+        """
+        Инициализация сбора артефактов.
+
+        :param enabled: собирать артефакты
+        :type enabled: bool
+        :param workers: потоков фоновой обработки
+        :type workers: int
+        :param jpeg_quality: качество JPEG скриншота, 1-100
+        :type jpeg_quality: int
+        :param max_bytes: предел размера артефактов за прогон, байт
+        :type max_bytes: int
+        :param timeout: ожидание фоновой обработки в teardown, сек
+        :type timeout: float
+        """
+        self.enabled = enabled
+        self.workers = workers
+        self.jpeg_quality = jpeg_quality
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.captured = 0
+        self.deduped = 0
+        self.over_limit = 0
+        self.late = 0
+        self.bytes = 0
+        self.capture_time = 0.0
+        self.process_time = 0.0
+        self._doms = {}
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def capture(self, driver: WebDriver, name: str,
+                since: Optional[float] = None) -> Optional[Future]:
+        """
+        Забрать данные из браузера и отправить их на обработку.
+
+        :param driver: WebDriver - Экземпляр WebDriver
+        :type driver: WebDriver
+        :param name: имя теста (nodeid)
+        :type name: str
+        :param since: начало теста (time.time()); сообщения консоли до
+            него (от прошлых тестов в той же сессии пула) отбрасываются
+        :type since: float
+        :return: Future с артефактами для attach() или None, если сбор
+            отключён
+        :rtype: Future
+        """
+        if not self.enabled:
+            return None
+        start = time.perf_counter()
+        raw = {"name": name, "url": None, "screenshot": None,
+               "screenshot_type": "jpg", "dom": None, "console": []}
+        try:
+            raw["url"] = driver.current_url
+        except WebDriverException:
+            # Браузер не отвечает: собирать больше нечего
+            return None
+        try:
+            raw["screenshot"] = driver.execute_cdp_cmd(
+                "Page.captureScreenshot",
+                {"format": "jpeg", "quality": self.jpeg_quality},
+            )["data"]
+        except (AttributeError, WebDriverException):
+            try:
+                raw["screenshot"] = driver.get_screenshot_as_base64()
+                raw["screenshot_type"] = "png"
+            except WebDriverException:
+                pass
+        try:
+            raw["dom"] = driver.execute_cdp_cmd(
+                "Runtime.evaluate",
+                {"expression": DOM_EXPRESSION, "returnByValue": True},
+            )["result"].get("value")
+        except (AttributeError, KeyError, WebDriverException):
+            try:
+                raw["dom"] = driver.page_source
+            except WebDriverException:
+                pass
+        try:
+            since_ms = (since or 0) * 1000
+            raw["console"] = [entry for entry in driver.get_log("browser")
+                              if entry.get("timestamp", 0) >= since_ms]
+        except (AttributeError, WebDriverException):
+            # Лог консоли доступен только с goog:loggingPrefs
+            pass
+
+        with self._lock:
+            self.captured += 1
+            self.capture_time += time.perf_counter() - start
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix="failure-artifacts")
+            executor = self._executor
+        return executor.submit(self._process, raw)
+
+    def attach(self, pending: Future) -> None:
+        """
+        Приложить обработанные артефакты к текущему тесту Allure.
+
+        :param pending: результат capture()
+        :type pending: Future
+        :return: None
+        """
+        try:
+            artifacts = pending.result(timeout=self.timeout)
+        except TimeoutError:
+            with self._lock:
+                self.late += 1
+            allure.attach("Артефакты не обработаны за "
+                          f"{self.timeout} с", name="Артефакты падения",
+                          attachment_type=allure.attachment_type.TEXT)
+            return
+        for body, name, attachment_type, extension in artifacts:
+            allure.attach(body, name=name, attachment_type=attachment_type,
+                          extension=extension)
+
+    def close(self) -> None:
+        """
+        Дождаться фоновой обработки и остановить пул.
+
+        :return: None
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def stats(self) -> dict:
+        """
+        Статистика сбора артефактов.
+
+        :return: словарь со статистикой
+        :rtype: dict
+        """
+        with self._lock:
+            return {
+                "captured": self.captured,
+                "deduped": self.deduped,
+                "over_limit": self.over_limit,
+                "late": self.late,
+                "bytes": self.bytes,
+                "capture_ms": round(self.capture_time * 1000
+                                    / self.captured, 1)
+                if self.captured else None,
+                "process_ms": round(self.process_time * 1000, 1),
+            }
+
+    def _process(self, raw: dict) -> list:
+        """
+        Подготовить артефакты к Allure (выполняется в фоновом потоке).
+
+        :param raw: сырые данные из capture()
+        :type raw: dict
+        :return: список (тело, имя, тип, расширение) для allure.attach
+        :rtype: list
+        """
+        start = time.perf_counter()
+        artifacts = [(raw["url"] or "", "URL при падении",
+                      allure.attachment_type.URI_LIST, None)]
+        if raw["console"]:
+            artifacts.append((
+                "\n".join(f"[{entry.get('level')}] {entry.get('message')}"
+                          for entry in raw["console"]),
+                "Консоль браузера", allure.attachment_type.TEXT, None,
+            ))
+
+        heavy = []
+        if raw["screenshot"]:
+            attachment_type = allure.attachment_type.JPG \
+                if raw["screenshot_type"] == "jpg" \
+                else allure.attachment_type.PNG
+            heavy.append((base64.b64decode(raw["screenshot"]), "Скриншот",
+                          attachment_type, None))
+        if raw["dom"]:
+            dom = raw["dom"].encode("utf-8")
+            digest = hashlib.sha256(dom).hexdigest()
+            with self._lock:
+                first = self._doms.setdefault(digest, raw["name"])
+            if first != raw["name"]:
+                with self._lock:
+                    self.deduped += 1
+                artifacts.append((
+                    json.dumps({"sha256": digest, "same_as": first},
+                               ensure_ascii=False, indent=2),
+                    "DOM (как у другого теста)",
+                    allure.attachment_type.JSON, None,
+                ))
+            else:
+                heavy.append((gzip.compress(dom, compresslevel=6),
+                              "DOM", "application/gzip", "html.gz"))
+
+        for artifact in heavy:
+            size = len(artifact[0])
+            with self._lock:
+                allowed = self.bytes + size <= self.max_bytes
+                if allowed:
+                    self.bytes += size
+                else:
+                    self.over_limit += 1
+            if allowed:
+                artifacts.append(artifact)
+            else:
+                artifacts.append((f"{artifact[1]} ({size} байт) не "
+                                  "приложен: превышен предел размера "
+                                  "артефактов за прогон",
+                                  f"{artifact[1]} пропущен",
+                                  allure.attachment_type.TEXT, None))
+        with self._lock:
+            self.process_time += time.perf_counter() - start
+        return artifacts
+
+
+_default_artifacts = None
+_default_artifacts_lock = threading.Lock()
+
+
+def get_failure_artifacts() -> FailureArtifacts:
+    """
+    Получить общий для процесса сбор артефактов падений.
+
+    :return: FailureArtifacts instance
+    :rtype: FailureArtifacts
+    """
+    global _default_artifacts
+    with _default_artifacts_lock:
+        if _default_artifacts is None:
+            _default_artifacts = FailureArtifacts()
+        return _default_artifacts
@@ -0,0 +1,200 @@
+import http.cookiejar
+import socket
+import threading
+from typing import Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from cassette import Cassette, CassetteAdapter
+from request_timing import TIMED_POOL_CLASSES
+from config import (api_pool_connections, api_pool_maxsize,
+                    api_connect_timeout, api_read_timeout, api_tcp_keepalive,
+                    cassette_mode, cassette_dir)
+
+
+class KeepAliveAdapter(HTTPAdapter):
+    """
+    HTTP адаптер с включённым TCP keep-alive для соединений пула.
+
+    Соединения пула замеряют время установки (см. request_timing).
+    """
+
+    def __init__(self, tcp_keepalive: bool = True, **kwargs) -> None:
+        """
+        Инициализация адаптера.
+
+        :param tcp_keepalive: включить SO_KEEPALIVE на сокетах
+        :type tcp_keepalive: bool
+        """
+        self.tcp_keepalive = tcp_keepalive
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs) -> None:
+        if self.tcp_keepalive:
+            kwargs["socket_options"] = (
+                HTTPConnection.default_socket_options
+                + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+            )
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = TIMED_POOL_CLASSES
+
+
+class HTTPTransport:
+    """
+    Общий HTTP транспорт с пулом keep-alive соединений.
+
+    Один транспорт используется всеми API клиентами прогона, поэтому
+    TCP/TLS рукопожатия с web-gate выполняются один раз на соединение
+    пула, а не на каждый клиент. Транспорт не хранит куки: каждый
+    клиент передаёт свои куки и заголовки в каждом запросе.
+    """
+
+    def __init__(self, pool_connections: int = api_pool_connections,
+                 pool_maxsize: int = api_pool_maxsize,
+                 connect_timeout: float = api_connect_timeout,
+                 read_timeout: float = api_read_timeout,
+                 pool_block: bool = False,
+                 tcp_keepalive: bool = api_tcp_keepalive,
+                 cassette: Optional[Cassette] = None) -> None:
+        """
+        Инициализация транспорта.
+
+        :param pool_connections: число хостов, для которых хранится пул
+        :type pool_connections: int
+        :param pool_maxsize: максимум соединений в пуле одного хоста
+        :type pool_maxsize: int
+        :param connect_timeout: таймаут установки соединения, сек
+        :type connect_timeout: float
+        :param read_timeout: таймаут чтения ответа, сек
+        :type read_timeout: float
+        :param pool_block: ждать освобождения соединения вместо
+            открытия лишнего при исчерпании пула
+        :type pool_block: bool
+        :param tcp_keepalive: включить SO_KEEPALIVE на сокетах
+        :type tcp_keepalive: bool
+        :param cassette: кассета для записи или воспроизведения трафика
+        :type cassette: Cassette
+        """
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+
+        self.session = requests.Session()
+        # Куки принадлежат клиентам, общий jar их не сохраняет
+        self.session.cookies.set_policy(
+            http.cookiejar.DefaultCookiePolicy(allowed_domains=[])
+        )
+        self.adapter = KeepAliveAdapter(
+            tcp_keepalive=tcp_keepalive,
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+        )
+        self.cassette = cassette
+        mounted = self.adapter
+        if cassette is not None:
+            mounted = CassetteAdapter(cassette, self.adapter)
+        self.session.mount("https://", mounted)
+        self.session.mount("http://", mounted)
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        """
+        Таймауты (connect, read) для запросов.
+
+        :return: пара таймаутов
+        :rtype: tuple
+        """
+        return self.connect_timeout, self.read_timeout
+
+    def request(self, method: str, url: str,
+                **kwargs) -> requests.Response:
+        """
+        Выполнить запрос через общий пул соединений.
+
+        :param method: HTTP метод
+        :type method: str
+        :param url: адрес запроса
+        :type url: str
+        :return: Response object
+        :rtype: requests.Response
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.request(method, url, **kwargs)
+
+    def stats(self) -> dict:
+        """
+        Статистика пула: сколько запросов обслужено уже открытыми
+        соединениями (hits) и сколько потребовало нового (misses).
+
+        :return: словарь со счётчиками
+        :rtype: dict
+        """
+        requests_total = 0
+        connections = 0
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            requests_total += pool.num_requests
+            connections += pool.num_connections
+
+        hits = max(requests_total - connections, 0)
+        return {
+            "requests": requests_total,
+            "hits": hits,
+            "misses": connections,
+            "hit_ratio": round(hits / requests_total, 3)
+            if requests_total else 0.0,
+        }
+
+    def close(self) -> None:
+        """
+        Закрыть все соединения пула и сохранить кассету.
+
+        :return: None
+        """
+        self.session.close()
+        if self.cassette is not None:
+            self.cassette.close()
+
+
+_shared_transport = None
+_shared_transport_lock = threading.Lock()
+
+
+def get_shared_transport() -> HTTPTransport:
+    """
+    Получить общий для процесса транспорт.
+
+    :return: HTTPTransport instance
+    :rtype: HTTPTransport
+    """
+    global _shared_transport
+    with _shared_transport_lock:
+        if _shared_transport is None:
+            cassette = None
+            if cassette_mode != "off":
+                cassette = Cassette(cassette_dir, mode=cassette_mode)
+            _shared_transport = HTTPTransport(cassette=cassette)
+        return _shared_transport
+
+
+def close_shared_transport() -> Optional[dict]:
+    """
+    Закрыть общий транспорт, вернув его итоговую статистику.
+
+    :return: статистика пула или None, если транспорт не создавался
+    :rtype: dict
+    """
+    global _shared_transport
+    with _shared_transport_lock:
+        if _shared_transport is None:
+            return None
+        stats = _shared_transport.stats()
+        if _shared_transport.cassette is not None:
+            stats["cassette"] = _shared_transport.cassette.report()
+        _shared_transport.close()
+        _shared_transport = None
+        return stats
@@ -0,0 +1,130 @@
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import quote, unquote
+
+import requests
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.remote.webdriver import WebDriver
+from baseline_report import BaselineReport
+from pages.api_client import CartAPI
+from config import ui_cookie_domain, ui_token_cookie, hybrid_baseline_file
+
+
+def seed_cart(api: CartAPI,
+              product_ids: Iterable[int]) -> List[requests.Response]:
+    """
+    Положить товары в корзину через API.
+
+    :param api: API клиент пользователя, от имени которого работает браузер
+    :type api: CartAPI
+    :param product_ids: ID товаров
+    :type product_ids: Iterable[int]
+    :return: ответы на добавление
+    :rtype: list
+    """
+    responses = []
+    for product_id in product_ids:
+        resp = api.add_product_to_cart(product_id)
+        resp.raise_for_status()
+        responses.append(resp)
+    return responses
+
+
+def inject_session(driver: WebDriver, token: str, cookies: Dict[str, str],
+                   domain: str = ui_cookie_domain) -> None:
+    """
+    Передать браузеру сессию API клиента: куки DDoS-Guard и токен
+    пользователя (кука access-token), чтобы сайт открылся от имени того
+    же пользователя, для которого подготовлена корзина.
+
+    Куки ставятся через DevTools на весь домен сайта; без DevTools -
+    через add_cookie для текущей страницы, поэтому браузер должен быть
+    открыт на странице сайта.
+
+    :param driver: WebDriver - Экземпляр WebDriver
+    :type driver: WebDriver
+    :param token: значение заголовка Authorization (Bearer ...)
+    :type token: str
+    :param cookies: куки API клиента
+    :type cookies: dict
+    :param domain: домен кук
+    :type domain: str
+    :return: None
+    """
+    values = dict(cookies)
+    values[ui_token_cookie] = quote(token)
+    try:
+        driver.execute_cdp_cmd("Network.setCookies", {"cookies": [
+            {"name": name, "value": value, "domain": domain, "path": "/",
+             "secure": True}
+            for name, value in values.items()
+        ]})
+    except (AttributeError, WebDriverException):
+        for name, value in values.items():
+            driver.add_cookie({"name": name, "value": value, "path": "/"})
+
+
+def browser_token(driver: WebDriver) -> Optional[str]:
+    """
+    Токен пользователя, от имени которого работает браузер (кука
+    access-token).
+
+    :param driver: WebDriver - Экземпляр WebDriver
+    :type driver: WebDriver
+    :return: значение заголовка Authorization (Bearer ...) или None
+    :rtype: str
+    """
+    try:
+        cookie = driver.get_cookie(ui_token_cookie)
+    except WebDriverException:
+        return None
+    if not cookie or not cookie.get("value"):
+        return None
+    token = unquote(cookie["value"])
+    return token if token.startswith("Bearer ") else f"Bearer {token}"
+
+
+class HandoffReport(BaselineReport):
+    """
+    Учёт времени подготовки состояния UI тестов.
+
+    При подготовке через клики (CG_HYBRID=0) замеры сохраняются как
+    базовые значения для сценария; при подготовке через API экономия
+    считается относительно этих базовых значений.
+    """
+
+    MODE_KEY = "hybrid"
+    COUNT_KEY = "setups"
+    SUMMED = ("seconds", "saved_seconds")
+
+    def __init__(self, hybrid: bool,
+                 baseline_file: str = hybrid_baseline_file) -> None:
+        """
+        Инициализация отчёта.
+
+        :param hybrid: подготовка состояния через API
+        :type hybrid: bool
+        :param baseline_file: файл базовых значений
+        :type baseline_file: str
+        """
+        super().__init__(hybrid, baseline_file)
+        self.hybrid = hybrid
+
+    @contextmanager
+    def measure(self, flow: str):
+        """
+        Замерить подготовку состояния для сценария.
+
+        :param flow: имя сценария, например "cart_with_product"
+        :type flow: str
+        :yields: запись замера (заполняется после выхода из блока)
+        """
+        entry = {"flow": flow, "hybrid": self.hybrid}
+        start = time.perf_counter()
+        yield entry
+        entry["seconds"] = round(time.perf_counter() - start, 3)
+        self.add(flow, entry, entry["seconds"])
+
+    def savings(self, base: float, entry: dict) -> dict:
+        return {"saved_seconds": round(base - entry["seconds"], 3)}
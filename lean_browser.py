@@ -0,0 +1,145 @@
+from typing import Iterable, List, Optional
+from urllib.parse import urlsplit
+
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.remote.webdriver import WebDriver
+from baseline_report import BaselineReport
+from config import (lean_window_size, lean_block_resource_types,
+                    lean_block_url_patterns, lean_allowlist,
+                    page_weight_baseline_file)
+
+# Шаблоны URL по типам ресурсов для Network.setBlockedURLs
+RESOURCE_TYPE_PATTERNS = {
+    "image": ("*.png*", "*.jpg*", "*.jpeg*", "*.gif*", "*.webp*",
+              "*.avif*", "*.ico*"),
+    "font": ("*.woff*", "*.woff2*", "*.ttf*", "*.otf*", "*.eot*"),
+    "media": ("*.mp4*", "*.webm*", "*.mp3*", "*.ogg*"),
+}
+
+# Вес страницы по Resource/Navigation Timing API
+PAGE_WEIGHT_SCRIPT = """
+var nav = performance.getEntriesByType('navigation')[0];
+var resources = performance.getEntriesByType('resource');
+var bytes = nav ? nav.transferSize : 0;
+for (var i = 0; i < resources.length; i++) {
+    bytes += resources[i].transferSize || 0;
+}
+return {requests: resources.length + (nav ? 1 : 0), bytes: bytes};
+"""
+
+
+def blocked_patterns(resource_types: Iterable[str] = lean_block_resource_types,
+                     url_patterns: Iterable[str] = lean_block_url_patterns,
+                     allowlist: Iterable[str] = lean_allowlist) -> List[str]:
+    """
+    Список шаблонов URL для блокировки.
+
+    Network.setBlockedURLs не поддерживает исключения, поэтому
+    allowlist применяется к самому списку: в нём можно указать тип
+    ресурса ("font") или конкретный шаблон ("*.svg*"), и они не
+    попадут в блокировку.
+
+    :param resource_types: блокируемые типы ресурсов
+    :type resource_types: Iterable[str]
+    :param url_patterns: дополнительные шаблоны (трекеры, аналитика)
+    :type url_patterns: Iterable[str]
+    :param allowlist: разрешённые типы ресурсов и шаблоны
+    :type allowlist: Iterable[str]
+    :return: шаблоны для Network.setBlockedURLs
+    :rtype: list
+    """
+    allowed = set(allowlist)
+    patterns = []
+    for resource_type in resource_types:
+        if resource_type in allowed:
+            continue
+        patterns.extend(RESOURCE_TYPE_PATTERNS.get(resource_type, ()))
+    patterns.extend(url_patterns)
+    return [pattern for pattern in dict.fromkeys(patterns)
+            if pattern not in allowed]
+
+
+def apply_lean_options(options: webdriver.ChromeOptions,
+                       window_size: tuple = lean_window_size) -> None:
+    """
+    Настроить опции Chrome для облегчённого режима: headless и
+    фиксированный размер окна вместо maximize_window().
+
+    :param options: опции Chrome
+    :type options: webdriver.ChromeOptions
+    :param window_size: размер окна (ширина, высота)
+    :type window_size: tuple
+    :return: None
+    """
+    options.add_argument("--headless=new")
+    options.add_argument(f"--window-size={window_size[0]},{window_size[1]}")
+
+
+def enable_blocking(driver: WebDriver,
+                    patterns: Optional[List[str]] = None) -> None:
+    """
+    Включить блокировку запросов через DevTools.
+
+    :param driver: WebDriver - Экземпляр WebDriver
+    :type driver: WebDriver
+    :param patterns: шаблоны URL; по умолчанию blocked_patterns()
+    :type patterns: list
+    :return: None
+    """
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd(
+        "Network.setBlockedURLs",
+        {"urls": blocked_patterns() if patterns is None else patterns},
+    )
+
+
+class PageWeightReport(BaselineReport):
+    """
+    Учёт веса загруженных страниц и экономии облегчённого режима.
+
+    В обычном режиме замеры сохраняются как базовые значения для
+    страницы (по пути URL); в облегчённом режиме экономия считается
+    относительно этих базовых значений.
+    """
+
+    MODE_KEY = "lean"
+    COUNT_KEY = "pages"
+    SUMMED = ("requests", "bytes", "requests_saved", "bytes_saved")
+
+    def __init__(self, lean: bool,
+                 baseline_file: str = page_weight_baseline_file) -> None:
+        """
+        Инициализация отчёта.
+
+        :param lean: включён ли облегчённый режим
+        :type lean: bool
+        :param baseline_file: файл базовых значений
+        :type baseline_file: str
+        """
+        super().__init__(lean, baseline_file)
+        self.lean = lean
+
+    def record(self, driver: WebDriver) -> Optional[dict]:
+        """
+        Замерить вес текущей страницы.
+
+        :param driver: WebDriver - Экземпляр WebDriver
+        :type driver: WebDriver
+        :return: замер или None, если страница недоступна
+        :rtype: dict
+        """
+        try:
+            weight = driver.execute_script(PAGE_WEIGHT_SCRIPT)
+            page = urlsplit(driver.current_url).path or "/"
+        except WebDriverException:
+            return None
+
+        entry = {"page": page, "requests": weight["requests"],
+                 "bytes": weight["bytes"]}
+        return self.add(page, entry, {"requests": entry["requests"],
+                                      "bytes": entry["bytes"]})
+
+    def savings(self, base: dict, entry: dict) -> dict:
+        return {"requests_saved": base["requests"] - entry["requests"],
+                "bytes_saved": base["bytes"] - entry["bytes"]}
@@ -0,0 +1,399 @@
+import argparse
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from typing import List, Optional
+
+import allure
+from pages.api_client import CartAPI
+from cookie_helper import CookieProvider, get_cookie_provider
+from http_transport import HTTPTransport
+from local_server import LocalWebGate
+from request_timing import TimingRecorder
+from resilience import CircuitBreaker, RequestGuard, RetryPolicy
+from token_manager import TokenManager, get_token_manager
+from config import (url_api, product_id, bearer_token, load_users,
+                    load_ramp_up, load_duration, load_max_requests,
+                    load_report_file)
+
+# Границы корзин гистограммы задержек, мс
+HISTOGRAM_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500,
+                        1000, 2000, 5000, 10000)
+
+
+class LoadStats:
+    """
+    Потокобезопасный сборщик результатов нагрузочного прогона.
+    """
+
+    def __init__(self, max_requests: Optional[int] = None) -> None:
+        """
+        Инициализация сборщика.
+
+        :param max_requests: бюджет запросов на весь прогон
+        :type max_requests: int
+        """
+        self.max_requests = max_requests
+        self.latencies = {}
+        self.errors = {}
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def take_request(self) -> bool:
+        """
+        Зарезервировать запрос из бюджета.
+
+        :return: False, если бюджет исчерпан
+        :rtype: bool
+        """
+        with self._lock:
+            if self.max_requests is not None \
+                    and self.requests >= self.max_requests:
+                return False
+            self.requests += 1
+            return True
+
+    def add(self, operation: str, latency: float,
+            error: Optional[str] = None) -> None:
+        """
+        Учесть результат запроса.
+
+        :param operation: имя операции сценария
+        :type operation: str
+        :param latency: длительность запроса, сек
+        :type latency: float
+        :param error: описание ошибки или None
+        :type error: str
+        :return: None
+        """
+        with self._lock:
+            self.latencies.setdefault(operation, []).append(latency)
+            if error:
+                key = f"{operation}: {error}"
+                self.errors[key] = self.errors.get(key, 0) + 1
+
+    def add_error(self, operation: str, error: str) -> None:
+        """
+        Учесть ошибку сценария, не связанную с отдельным запросом.
+
+        :param operation: имя операции сценария
+        :type operation: str
+        :param error: описание ошибки
+        :type error: str
+        :return: None
+        """
+        with self._lock:
+            key = f"{operation}: {error}"
+            self.errors[key] = self.errors.get(key, 0) + 1
+
+
+def percentile(values: List[float], percent: float) -> float:
+    """
+    Перцентиль по методу ближайшего ранга.
+
+    :param values: отсортированные значения
+    :type values: list
+    :param percent: перцентиль (0..100)
+    :type percent: float
+    :return: значение перцентиля
+    :rtype: float
+    """
+    if not values:
+        return 0.0
+    rank = max(math.ceil(percent / 100 * len(values)) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+def summarize(latencies: List[float]) -> dict:
+    """
+    Сводка по задержкам: перцентили и гистограмма.
+
+    :param latencies: задержки, сек
+    :type latencies: list
+    :return: сводка в миллисекундах
+    :rtype: dict
+    """
+    values = sorted(latency * 1000 for latency in latencies)
+    histogram = {}
+    for value in values:
+        bucket = next((f"<={edge}ms" for edge in HISTOGRAM_BUCKETS_MS
+                       if value <= edge),
+                      f">{HISTOGRAM_BUCKETS_MS[-1]}ms")
+        histogram[bucket] = histogram.get(bucket, 0) + 1
+    return {
+        "count": len(values),
+        "min_ms": round(values[0], 2) if values else 0.0,
+        "p50_ms": round(percentile(values, 50), 2),
+        "p95_ms": round(percentile(values, 95), 2),
+        "p99_ms": round(percentile(values, 99), 2),
+        "max_ms": round(values[-1], 2) if values else 0.0,
+        "histogram": histogram,
+    }
+
+
+def _timed(stats: LoadStats, operation: str, call, *args):
+    """
+    Выполнить запрос сценария с учётом времени и ошибок.
+
+    :param stats: сборщик результатов
+    :type stats: LoadStats
+    :param operation: имя операции
+    :type operation: str
+    :param call: метод CartAPI
+    :return: ответ или None при сетевой ошибке
+    """
+    start = time.perf_counter()
+    try:
+        response = call(*args)
+    except Exception as error:
+        stats.add(operation, time.perf_counter() - start,
+                  type(error).__name__)
+        return None
+    error = None if response.status_code < 400 \
+        else str(response.status_code)
+    stats.add(operation, time.perf_counter() - start, error)
+    return response if error is None else None
+
+
+def run_scenario(client: CartAPI, stats: LoadStats,
+                 goods_id: int = product_id) -> bool:
+    """
+    Сценарий test_remove_product_from_cart: добавить товар, получить
+    корзину и удалить из неё добавленную позицию.
+
+    :param client: API клиент виртуального пользователя
+    :type client: CartAPI
+    :param stats: сборщик результатов
+    :type stats: LoadStats
+    :param goods_id: ID товара
+    :type goods_id: int
+    :return: False, если бюджет запросов исчерпан
+    :rtype: bool
+    """
+    if not stats.take_request():
+        return False
+    if _timed(stats, "add_product", client.add_product_to_cart,
+              goods_id) is None:
+        return True
+
+    if not stats.take_request():
+        return False
+    cart_result = _timed(stats, "get_cart", client.get_cart)
+    if cart_result is None:
+        return True
+    # 2xx с телом не в JSON (например, HTML заглушка) - ошибка сценария,
+    # а не падение потока виртуального пользователя
+    try:
+        products = cart_result.json().get("products", [])
+    except (ValueError, AttributeError):
+        stats.add_error("get_cart", "invalid body")
+        return True
+    item = next((p for p in products if p.get("goodsId") == goods_id),
+                products[0] if products else None)
+    if item is None:
+        stats.add_error("get_cart", "empty cart")
+        return True
+
+    if not stats.take_request():
+        return False
+    _timed(stats, "remove_product", client.remove_from_cart, item["id"])
+    return True
+
+
+def run_load(users: int = load_users, ramp_up: float = load_ramp_up,
+             duration: Optional[float] = load_duration,
+             max_requests: Optional[int] = load_max_requests,
+             base_url: str = url_api,
+             cookie_provider: Optional[CookieProvider] = None,
+             tokens: Optional[List[str]] = None,
+             goods_id: int = product_id,
+             token_manager: Optional[TokenManager] = None) -> dict:
+    """
+    Запустить нагрузку сценарием add -> get -> remove.
+
+    :param users: число виртуальных пользователей
+    :type users: int
+    :param ramp_up: время равномерного старта пользователей, сек
+    :type ramp_up: float
+    :param duration: длительность прогона, сек (None - без ограничения)
+    :type duration: float
+    :param max_requests: бюджет запросов (None - без ограничения)
+    :type max_requests: int
+    :param base_url: адрес API корзины
+    :type base_url: str
+    :param cookie_provider: поставщик кук DDoS-Guard
+    :type cookie_provider: CookieProvider
+    :param tokens: токены пользователей (по кругу); по умолчанию
+        config.bearer_token для всех, а без него - отдельный анонимный
+        токен на каждого пользователя от поставщика токенов
+    :type tokens: list
+    :param goods_id: ID товара
+    :type goods_id: int
+    :param token_manager: поставщик токенов; по умолчанию общий
+    :type token_manager: TokenManager
+    :return: отчёт о прогоне
+    :rtype: dict
+    """
+    if duration is None and max_requests is None:
+        raise ValueError("Нужно задать duration или max_requests")
+
+    if not tokens and bearer_token:
+        tokens = [bearer_token]
+    if not tokens:
+        token_manager = token_manager or get_token_manager()
+    stats = LoadStats(max_requests)
+    transport = HTTPTransport(pool_maxsize=max(users, 1))
+    cookie_provider = cookie_provider or get_cookie_provider()
+    # Замеры нагрузки не смешиваются с замерами функциональных тестов
+    timing_recorder = TimingRecorder()
+    # Нагрузка измеряет сам сервер: без ограничения частоты, повторов и
+    # circuit breaker, которые скрыли бы ошибки
+    guard = RequestGuard(retry=RetryPolicy(max_attempts=1),
+                         breaker=CircuitBreaker(
+                             failure_threshold=float("inf")))
+    stop = threading.Event()
+
+    def virtual_user(number: int) -> None:
+        if ramp_up and users > 1:
+            if stop.wait(ramp_up * number / users):
+                return
+        # Без заданных токенов у каждого пользователя своя корзина
+        token = tokens[number % len(tokens)] if tokens else None
+        try:
+            client = CartAPI(cookie_provider=cookie_provider,
+                             transport=transport, base_url=base_url,
+                             token=token, timing_recorder=timing_recorder,
+                             token_manager=token_manager,
+                             identity=f"vu-{number}", guard=guard)
+        except Exception as error:
+            # Пользователь без токена или кук не стартует, но ошибка
+            # попадает в отчёт
+            stats.add_error("start", type(error).__name__)
+            return
+        while not stop.is_set():
+            if not run_scenario(client, stats, goods_id):
+                return
+
+    threads = [threading.Thread(target=virtual_user, args=(number,),
+                                name=f"vu-{number}", daemon=True)
+               for number in range(users)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    if duration is not None:
+        stop.wait(duration)
+        stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    pool_stats = transport.stats()
+    transport.close()
+
+    all_latencies = [latency for values in stats.latencies.values()
+                     for latency in values]
+    total = len(all_latencies)
+    errors = sum(stats.errors.values())
+    return {
+        "base_url": base_url,
+        "users": users,
+        "ramp_up_s": ramp_up,
+        "duration_s": round(elapsed, 3),
+        "requests": total,
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "error_breakdown": stats.errors,
+        "latency": summarize(all_latencies),
+        "operations": {name: summarize(values)
+                       for name, values in stats.latencies.items()},
+        "connection_pool": pool_stats,
+    }
+
+
+def attach_report(report: dict, name: str = "Нагрузочный прогон") -> None:
+    """
+    Приложить отчёт нагрузочного прогона к отчёту Allure.
+
+    :param report: отчёт run_load
+    :type report: dict
+    :param name: имя вложения
+    :type name: str
+    :return: None
+    """
+    allure.attach(json.dumps(report, ensure_ascii=False, indent=2),
+                  name=name, attachment_type=allure.attachment_type.JSON)
+
+
+def main() -> None:
+    """
+    Запустить нагрузку из командной строки.
+
+    :return: None
+    """
+    parser = argparse.ArgumentParser(
+        description="Нагрузка на корзину сценарием add -> get -> remove"
+    )
+    parser.add_argument("--users", type=int, default=load_users)
+    parser.add_argument("--ramp-up", type=float, default=load_ramp_up)
+    parser.add_argument("--duration", type=float, default=load_duration)
+    parser.add_argument("--requests", type=int, default=None,
+                        help="бюджет запросов")
+    parser.add_argument("--base-url", default=url_api,
+                        help="адрес API корзины")
+    parser.add_argument("--local", action="store_true",
+                        help="запустить локальный web-gate")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="задержка локального web-gate, сек")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="доля ошибок локального web-gate")
+    parser.add_argument("--json", default=load_report_file,
+                        help="файл для JSON отчёта")
+    args = parser.parse_args()
+
+    max_requests = args.requests
+    if max_requests is None and args.duration is None:
+        max_requests = load_max_requests
+
+    gate = None
+    base_url = args.base_url
+    cookie_provider = None
+    token_manager = None
+    if args.local:
+        endpoints = ("cookies", "auth", "get_cart", "add_product",
+                     "remove_product")
+        gate = LocalWebGate(
+            latency={name: args.latency for name in endpoints},
+            error_rate={name: args.error_rate for name in endpoints},
+        ).start()
+        base_url = gate.url_api
+        cache_dir = tempfile.mkdtemp()
+        cookie_provider = CookieProvider(
+            source_url=gate.url_ui,
+            cache_file=os.path.join(cache_dir, "cookies.json"),
+        )
+        token_manager = TokenManager(
+            auth_url=gate.url_auth,
+            cache_file=os.path.join(cache_dir, "tokens.json"),
+            cookie_provider=cookie_provider,
+        )
+
+    try:
+        report = run_load(users=args.users, ramp_up=args.ramp_up,
+                          duration=args.duration,
+                          max_requests=max_requests, base_url=base_url,
+                          cookie_provider=cookie_provider,
+                          token_manager=token_manager)
+    finally:
+        if gate is not None:
+            gate.stop()
+
+    with open(args.json, "w", encoding="utf-8") as report_file:
+        json.dump(report, report_file, ensure_ascii=False, indent=2)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,580 @@
+import argparse
+import base64
+import json
+import random
+import re
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from typing import Optional
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import storefront
+from background_server import BackgroundServer
+from token_manager import token_expiry
+from config import (local_api_host, local_api_port, local_api_latency,
+                    local_api_error_rate, local_api_error_status,
+                    local_api_require_cookies, local_api_cookie_lifetime,
+                    local_api_token_lifetime)
+
+CART_PATH = "/api/v1/cart"
+CART_PRODUCT_PATH = "/api/v1/cart/product"
+CART_PRODUCT_ID_RE = re.compile(r"^/api/v1/cart/product/(\d+)$")
+AUTH_PATH = "/api/v1/auth/anonymous"
+SEARCH_PATH = "/api/v2/search/product"
+PAGE_PATHS = ("/", "/search", "/cart")
+
+
+class LocalWebGate(BackgroundServer):
+    """
+    Локальная замена web-gate.chitai-gorod.ru для API тестов.
+
+    Реализует эндпоинты корзины, которые использует CartAPI, поиск по
+    каталогу витрины для SearchAPI, эндпоинт анонимной авторизации,
+    выдающий JWT с exp, и главную страницу,
+    выдающую куки __ddg*. Главная, поиск (/search?phrase=) и корзина
+    (/cart) отдаются локальной витриной storefront с теми же
+    локаторами, что и у сайта, поэтому page objects работают с ней без
+    сети. Корзины хранятся отдельно для каждого значения
+    Authorization; истёкший JWT получает 401. Для каждого эндпоинта
+    можно задать задержку и долю ошибок, а проверка кук имитирует
+    DDoS-Guard: запрос без выданной сервером куки получает 403 с
+    HTML-заглушкой.
+
+    Имена эндпоинтов для latency/error_rate: "cookies", "pages",
+    "auth", "search", "get_cart", "add_product", "remove_product".
+    """
+
+    THREAD_NAME = "local-web-gate"
+
+    def __init__(self, host: str = local_api_host,
+                 port: int = local_api_port,
+                 latency: Optional[dict] = None,
+                 error_rate: Optional[dict] = None,
+                 error_status: int = local_api_error_status,
+                 require_cookies: bool = local_api_require_cookies,
+                 cookie_lifetime: float = local_api_cookie_lifetime,
+                 token_lifetime: float = local_api_token_lifetime,
+                 seed: int = 0) -> None:
+        """
+        Инициализация локального сервера.
+
+        :param host: адрес для прослушивания
+        :type host: str
+        :param port: порт (0 - выбрать свободный)
+        :type port: int
+        :param latency: задержка ответа по эндпоинтам, сек
+        :type latency: dict
+        :param error_rate: доля ответов с ошибкой по эндпоинтам (0..1)
+        :type error_rate: dict
+        :param error_status: HTTP статус внедряемых ошибок
+        :type error_status: int
+        :param require_cookies: проверять куки DDoS-Guard
+        :type require_cookies: bool
+        :param cookie_lifetime: время жизни выданных кук, сек
+        :type cookie_lifetime: float
+        :param token_lifetime: время жизни выданных токенов, сек
+        :type token_lifetime: float
+        :param seed: зерно генератора ошибок для воспроизводимости
+        :type seed: int
+        """
+        self.latency = dict(local_api_latency if latency is None
+                            else latency)
+        self.error_rate = dict(local_api_error_rate if error_rate is None
+                               else error_rate)
+        self.error_status = error_status
+        self.require_cookies = require_cookies
+        self.cookie_lifetime = cookie_lifetime
+        self.token_lifetime = token_lifetime
+
+        self.carts = {}
+        self.issued_cookies = {}
+        self.request_counts = {}
+        self._next_item_id = 1
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        super().__init__(host, port)
+
+    @property
+    def url_api(self) -> str:
+        return f"{self.base_url}{CART_PATH}"
+
+    @property
+    def url_api_product(self) -> str:
+        return f"{self.base_url}{CART_PRODUCT_PATH}"
+
+    @property
+    def url_auth(self) -> str:
+        return f"{self.base_url}{AUTH_PATH}"
+
+    @property
+    def url_api_search(self) -> str:
+        return f"{self.base_url}{SEARCH_PATH}"
+
+    def reset(self) -> None:
+        """
+        Очистить корзины, выданные куки и счётчики запросов.
+
+        :return: None
+        """
+        with self._lock:
+            self.carts.clear()
+            self.issued_cookies.clear()
+            self.request_counts.clear()
+
+    def issue_cookies(self) -> dict:
+        """
+        Выдать новый набор кук DDoS-Guard.
+
+        :return: словарь с куками
+        :rtype: dict
+        """
+        cookies = {"__ddg1_": secrets.token_hex(10),
+                   "__ddg2_": secrets.token_hex(8)}
+        with self._lock:
+            self.issued_cookies[cookies["__ddg1_"]] = (
+                time.time() + self.cookie_lifetime
+            )
+        return cookies
+
+    def issue_token(self) -> str:
+        """
+        Выдать анонимный токен: JWT с exp, как у боевого web-gate
+        (подпись не проверяется).
+
+        :return: значение заголовка Authorization (Bearer ...)
+        :rtype: str
+        """
+        now = int(time.time())
+        header = {"alg": "HS256", "typ": "JWT"}
+        payload = {"exp": now + int(self.token_lifetime), "iat": now,
+                   "iss": AUTH_PATH, "sub": secrets.token_hex(32),
+                   "type": 10}
+        parts = [
+            base64.urlsafe_b64encode(
+                json.dumps(part).encode("utf-8")).rstrip(b"=").decode()
+            for part in (header, payload)
+        ]
+        parts.append(secrets.token_urlsafe(32))
+        return "Bearer " + ".".join(parts)
+
+    @staticmethod
+    def token_valid(token: str) -> bool:
+        """
+        Проверить, что токен не истёк. Токены, не являющиеся JWT
+        (например, "Bearer local-vu-1"), принимаются без проверки.
+
+        :param token: значение заголовка Authorization
+        :type token: str
+        :return: False, если у JWT истёк exp
+        :rtype: bool
+        """
+        expires_at = token_expiry(token)
+        return expires_at is None or expires_at > time.time()
+
+    def cookies_valid(self, cookie_header: str) -> bool:
+        """
+        Проверить, что запрос содержит действующую куку __ddg1_.
+
+        :param cookie_header: значение заголовка Cookie
+        :type cookie_header: str
+        :return: True, если кука выдана сервером и не истекла
+        :rtype: bool
+        """
+        for part in cookie_header.split(";"):
+            name, _, value = part.strip().partition("=")
+            if name == "__ddg1_":
+                with self._lock:
+                    expires_at = self.issued_cookies.get(value)
+                return expires_at is not None and expires_at > time.time()
+        return False
+
+    def inject_fault(self, endpoint: str) -> bool:
+        """
+        Подождать заданную задержку и решить, внедрять ли ошибку.
+
+        :param endpoint: имя эндпоинта
+        :type endpoint: str
+        :return: True, если нужно ответить ошибкой
+        :rtype: bool
+        """
+        with self._lock:
+            self.request_counts[endpoint] = (
+                self.request_counts.get(endpoint, 0) + 1
+            )
+            fail = self._random.random() < self.error_rate.get(endpoint, 0)
+        delay = self.latency.get(endpoint, 0)
+        if delay:
+            time.sleep(delay)
+        return fail
+
+    def cart_for(self, token: str) -> list:
+        """
+        Получить корзину владельца токена.
+
+        :param token: значение заголовка Authorization
+        :type token: str
+        :return: список товаров корзины
+        :rtype: list
+        """
+        return self.carts.setdefault(token, [])
+
+    def add_product(self, token: str, goods_id: int) -> dict:
+        """
+        Добавить товар в корзину (повторное добавление увеличивает
+        количество).
+
+        :param token: значение заголовка Authorization
+        :type token: str
+        :param goods_id: ID товара
+        :type goods_id: int
+        :return: позиция корзины
+        :rtype: dict
+        """
+        with self._lock:
+            cart = self.cart_for(token)
+            for item in cart:
+                if item["goodsId"] == goods_id:
+                    item["quantity"] += 1
+                    return item
+            item = {"id": self._next_item_id, "goodsId": goods_id,
+                    "quantity": 1}
+            self._next_item_id += 1
+            cart.append(item)
+            return item
+
+    def remove_product(self, token: str, item_id: int) -> bool:
+        """
+        Удалить позицию из корзины.
+
+        :param token: значение заголовка Authorization
+        :type token: str
+        :param item_id: ID позиции корзины
+        :type item_id: int
+        :return: True, если позиция была в корзине
+        :rtype: bool
+        """
+        with self._lock:
+            cart = self.cart_for(token)
+            before = len(cart)
+            cart[:] = [item for item in cart if item["id"] != item_id]
+            return len(cart) != before
+
+    def _make_handler(self) -> type:
+        gate = self
+
+        class Handler(_WebGateHandler):
+            server_state = gate
+
+        return Handler
+
+
+class _WebGateHandler(BaseHTTPRequestHandler):
+    """
+    Обработчик запросов LocalWebGate.
+    """
+
+    protocol_version = "HTTP/1.1"
+    # Заголовки и тело уходят отдельными сегментами: без TCP_NODELAY
+    # Nagle и delayed ACK клиента добавляют ~40 мс к каждому ответу
+    disable_nagle_algorithm = True
+    server_state = None
+
+    def log_message(self, format, *args) -> None:
+        # Не засоряем вывод pytest журналом запросов
+        pass
+
+    def do_GET(self) -> None:
+        self._dispatch("GET")
+
+    def do_POST(self) -> None:
+        self._dispatch("POST")
+
+    def do_DELETE(self) -> None:
+        self._dispatch("DELETE")
+
+    def do_PUT(self) -> None:
+        self._dispatch("PUT")
+
+    def do_PATCH(self) -> None:
+        self._dispatch("PATCH")
+
+    def _dispatch(self, method: str) -> None:
+        """
+        Направить запрос в обработчик эндпоинта.
+
+        :param method: HTTP метод
+        :type method: str
+        :return: None
+        """
+        path = urlsplit(self.path).path.rstrip("/") or "/"
+        body = self._read_body()
+
+        if path in PAGE_PATHS:
+            self._page(method, path)
+            return
+
+        match = CART_PRODUCT_ID_RE.match(path)
+        if path == AUTH_PATH:
+            endpoint, allowed = "auth", ("POST",)
+        elif path == SEARCH_PATH:
+            endpoint, allowed = "search", ("GET",)
+        elif path == CART_PATH:
+            endpoint, allowed = "get_cart", ("GET",)
+        elif path == CART_PRODUCT_PATH:
+            endpoint, allowed = "add_product", ("POST",)
+        elif match:
+            endpoint, allowed = "remove_product", ("DELETE",)
+        else:
+            self._send_json(404, {"message": "Not Found"})
+            return
+
+        gate = self.server_state
+        if gate.inject_fault(endpoint):
+            self._send_json(gate.error_status,
+                            {"message": "Injected failure"})
+            return
+        if gate.require_cookies and not gate.cookies_valid(
+                self.headers.get("Cookie", "")):
+            self._send_challenge()
+            return
+        if endpoint == "auth":
+            if method in allowed:
+                self._issue_token()
+            else:
+                self._send_json(405, {"message": "Method Not Allowed"},
+                                {"Allow": ", ".join(allowed)})
+            return
+        token = self.headers.get("Authorization")
+        if not token or not gate.token_valid(token):
+            self._send_json(401, {"message": "Unauthorized"})
+            return
+        if method not in allowed:
+            self._send_json(405, {"message": "Method Not Allowed"},
+                            {"Allow": ", ".join(allowed)})
+            return
+
+        if endpoint == "search":
+            self._send_json(200, self._search_page())
+        elif endpoint == "get_cart":
+            with gate._lock:
+                products = [dict(item) for item in gate.cart_for(token)]
+            self._send_json(200, {"products": products})
+        elif endpoint == "add_product":
+            goods_id = self._parse_goods_id(body)
+            if goods_id is None:
+                self._send_json(400, {"message": "Bad Request",
+                                      "errors": {"id": "required"}})
+                return
+            gate.add_product(token, goods_id)
+            self._send_json(200, {})
+        else:
+            if gate.remove_product(token, int(match.group(1))):
+                self._send(204)
+            else:
+                self._send_json(404, {"message": "Not Found"})
+
+    def _page(self, method: str, path: str) -> None:
+        """
+        Страница локальной витрины.
+
+        Главная всегда выдаёт новые куки DDoS-Guard (по ней их получает
+        CookieProvider); остальные страницы выдают куки, только если у
+        браузера нет действующих. Браузер без куки access-token получает
+        анонимный токен, как на сайте.
+
+        :param method: HTTP метод
+        :type method: str
+        :param path: путь страницы
+        :type path: str
+        :return: None
+        """
+        gate = self.server_state
+        if gate.inject_fault("cookies" if path == "/" else "pages"):
+            self._send(gate.error_status)
+            return
+        if method != "GET":
+            self._send(405, headers=[("Allow", "GET")])
+            return
+
+        cookie_header = self.headers.get("Cookie", "")
+        headers = []
+        if path == "/" or not gate.cookies_valid(cookie_header):
+            max_age = int(gate.cookie_lifetime)
+            headers += [("Set-Cookie", f"{name}={value}; Path=/; "
+                                       f"Max-Age={max_age}")
+                        for name, value in gate.issue_cookies().items()]
+        token = self._cookie(cookie_header, "access-token")
+        if not token or not gate.token_valid(token):
+            token = gate.issue_token()
+            headers.append(("Set-Cookie", self._token_cookie(token)))
+
+        with gate._lock:
+            items = [dict(item) for item in gate.cart_for(token)]
+        if path == "/search":
+            query = parse_qs(urlsplit(self.path).query)
+            page = query.get("page", ["1"])[0]
+            body = storefront.render_search(
+                query.get("phrase", [""])[0], len(items),
+                int(page) if page.isdigit() else 1)
+        elif path == "/cart":
+            body = storefront.render_cart(items)
+        else:
+            body = storefront.render_home(len(items))
+        self._send(200, body, "text/html; charset=utf-8", headers)
+
+    @staticmethod
+    def _cookie(cookie_header: str, name: str) -> Optional[str]:
+        """
+        Прочитать куку из заголовка Cookie.
+
+        :param cookie_header: значение заголовка Cookie
+        :type cookie_header: str
+        :param name: имя куки
+        :type name: str
+        :return: значение куки или None
+        :rtype: str
+        """
+        for part in cookie_header.split(";"):
+            key, _, value = part.strip().partition("=")
+            if key == name:
+                return unquote(value)
+        return None
+
+    def _token_cookie(self, token: str) -> str:
+        """
+        Значение Set-Cookie для куки access-token.
+
+        :param token: значение заголовка Authorization (Bearer ...)
+        :type token: str
+        :return: значение заголовка Set-Cookie
+        :rtype: str
+        """
+        return (f"access-token=Bearer%20{token.split()[-1]}; Path=/; "
+                f"Max-Age={int(self.server_state.token_lifetime)}")
+
+    def _issue_token(self) -> None:
+        """
+        Выдать анонимный токен в JSON и в куке access-token.
+
+        :return: None
+        """
+        gate = self.server_state
+        token = gate.issue_token()
+        payload = {"token": {"accessToken": token.split()[-1],
+                             "expiresIn": int(gate.token_lifetime)}}
+        self._send_json(200, payload,
+                        {"Set-Cookie": self._token_cookie(token)})
+
+    def _search_page(self) -> dict:
+        """
+        Страница результатов поиска по каталогу витрины в формате JSON:API.
+
+        :return: тело ответа
+        :rtype: dict
+        """
+        query = parse_qs(urlsplit(self.path).query)
+
+        def number(name: str, default: int) -> int:
+            value = query.get(name, [""])[0]
+            return max(int(value), 1) if value.isdigit() else default
+
+        found = storefront.search(query.get("phrase", [""])[0])
+        page = number("products[page]", 1)
+        per_page = number("products[per-page]", 48)
+        offset = (page - 1) * per_page
+        data = [
+            {"type": "product", "id": goods_id,
+             "attributes": {**storefront.CATALOG[goods_id], "id": goods_id}}
+            for goods_id, _ in found[offset:offset + per_page]
+        ]
+        return {"data": data, "meta": {"pagination": {
+            "total": len(found), "count": len(data), "per_page": per_page,
+            "current_page": page,
+            "total_pages": max(-(-len(found) // per_page), 1),
+        }}}
+
+    def _send_challenge(self) -> None:
+        """
+        Ответить заглушкой DDoS-Guard.
+
+        :return: None
+        """
+        self._send(403, b"<html><body>DDoS-Guard</body></html>",
+                   "text/html; charset=utf-8", [("Server", "ddos-guard")])
+
+    @staticmethod
+    def _parse_goods_id(body: bytes) -> Optional[int]:
+        """
+        Извлечь ID товара из тела запроса.
+
+        :param body: тело запроса
+        :type body: bytes
+        :return: ID товара или None
+        :rtype: int
+        """
+        try:
+            goods_id = json.loads(body or b"null")["id"]
+        except (ValueError, TypeError, KeyError):
+            return None
+        return goods_id if isinstance(goods_id, int) else None
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send_json(self, status: int, payload: dict,
+                   headers: Optional[dict] = None) -> None:
+        self._send(status, json.dumps(payload).encode("utf-8"),
+                   "application/json", list((headers or {}).items()))
+
+    def _send(self, status: int, body: bytes = b"",
+              content_type: Optional[str] = None,
+              headers: Optional[list] = None) -> None:
+        self.send_response(status)
+        if content_type:
+            self.send_header("Content-Type", content_type)
+        for name, value in headers or []:
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+
+def main() -> None:
+    """
+    Запустить локальный web-gate из командной строки.
+
+    :return: None
+    """
+    parser = argparse.ArgumentParser(
+        description="Локальная замена web-gate для API тестов"
+    )
+    parser.add_argument("--host", default=local_api_host)
+    parser.add_argument("--port", type=int, default=local_api_port or 8080)
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="задержка всех эндпоинтов, сек")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="доля ошибок всех эндпоинтов (0..1)")
+    parser.add_argument("--no-cookie-check", action="store_true")
+    args = parser.parse_args()
+
+    endpoints = ("cookies", "pages", "auth", "search", "get_cart",
+                 "add_product", "remove_product")
+    gate = LocalWebGate(
+        host=args.host, port=args.port,
+        latency={name: args.latency for name in endpoints},
+        error_rate={name: args.error_rate for name in endpoints},
+        require_cookies=not args.no_cookie_check,
+    )
+    print(f"Local storefront: {gate.url_ui}")
+    print(f"Local web-gate: {gate.url_api}")
+    print(f"Anonymous auth: {gate.url_auth}")
+    gate.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,403 @@
+import json
+import threading
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional
+
+import allure
+import allure_commons
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.remote.webdriver import WebDriver
+from config import (network_trace_enabled, network_trace_slowest,
+                    network_trace_api_patterns, network_trace_width)
+
+
+def _headers(headers: Optional[dict]) -> List[dict]:
+    return [{"name": name, "value": str(value)}
+            for name, value in (headers or {}).items()]
+
+
+def _phase(timing: dict, start: str, end: str) -> float:
+    """
+    Длительность фазы запроса из Network.ResourceTiming.
+
+    :param timing: тайминги ответа
+    :type timing: dict
+    :param start: поле начала фазы
+    :type start: str
+    :param end: поле конца фазы
+    :type end: str
+    :return: длительность, мс, или -1, если фазы не было
+    :rtype: float
+    """
+    if timing.get(start, -1) < 0 or timing.get(end, -1) < 0:
+        return -1
+    return round(timing[end] - timing[start], 1)
+
+
+class NetworkTrace:
+    """
+    Трассировка сети браузера по шагам Allure (HAR).
+
+    Сетевые события Chrome читаются из performance лога WebDriver на
+    старте и в конце каждого шага allure.step и относятся к самому
+    вложенному открытому шагу; события вложенного шага входят и в
+    родительский. При закрытии шага к нему прикладываются HAR и
+    текстовый водопад, в котором отмечены самые долгие запросы и
+    запросы к API корзины и поиска.
+
+    Трассировка включается только в config.py (CG_NETWORK_TRACE=1):
+    без неё Chrome не пишет performance лог, а шаги не перехватываются.
+    """
+
+    def __init__(self, enabled: bool = network_trace_enabled,
+                 slowest: int = network_trace_slowest,
+                 api_patterns: Iterable[str] = network_trace_api_patterns,
+                 width: int = network_trace_width) -> None:
+        """
+        Инициализация трассировки.
+
+        :param enabled: трассировать сеть
+        :type enabled: bool
+        :param slowest: сколько самых долгих запросов отмечать
+        :type slowest: int
+        :param api_patterns: подстроки URL запросов к API
+        :type api_patterns: Iterable[str]
+        :param width: ширина полосы водопада, символов
+        :type width: int
+        """
+        self.enabled = enabled
+        self.slowest = slowest
+        self.api_patterns = tuple(api_patterns)
+        self.width = width
+        self.driver = None
+        self.steps = 0
+        self.requests = 0
+        self.api_calls = 0
+        self.slowest_request = None
+        self._stack = []
+        self._registered = False
+        self._lock = threading.Lock()
+
+    def bind(self, driver: WebDriver) -> None:
+        """
+        Трассировать браузер теста.
+
+        :param driver: WebDriver - Экземпляр WebDriver
+        :type driver: WebDriver
+        :return: None
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            if not self._registered:
+                allure_commons.plugin_manager.register(self)
+                self._registered = True
+        self.driver = driver
+        self._stack = []
+        # События до теста (прошлый тест в той же сессии пула)
+        self._read_events()
+
+    def unbind(self) -> None:
+        """
+        Прекратить трассировку браузера теста.
+
+        :return: None
+        """
+        self.driver = None
+        self._stack = []
+
+    @allure_commons.hookimpl
+    def start_step(self, uuid: str, title: str, params) -> None:
+        """
+        Хук Allure: открыт шаг.
+
+        :param uuid: идентификатор шага
+        :type uuid: str
+        :param title: название шага
+        :type title: str
+        :param params: параметры шага
+        :return: None
+        """
+        if self.driver is None:
+            return
+        self._collect()
+        self._stack.append({"uuid": uuid, "title": title, "events": [],
+                            "wall_time": datetime.now(timezone.utc)})
+
+    # Выполняется раньше хука отчёта Allure, пока шаг ещё открыт и
+    # вложения попадают в него
+    @allure_commons.hookimpl(tryfirst=True)
+    def stop_step(self, uuid: str, exc_type, exc_val, exc_tb) -> None:
+        """
+        Хук Allure: шаг закрыт. Приложить HAR и водопад шага.
+
+        :param uuid: идентификатор шага
+        :type uuid: str
+        :return: None
+        """
+        if self.driver is None or not self._stack \
+                or self._stack[-1]["uuid"] != uuid:
+            return
+        self._collect()
+        step = self._stack.pop()
+        if self._stack:
+            self._stack[-1]["events"].extend(step["events"])
+
+        har = self.build_har(step["title"], step["events"], step["wall_time"])
+        entries = har["log"]["entries"]
+        if not entries:
+            return
+        api_calls = [entry for entry in entries if entry["_api"]]
+        slowest = max(entries, key=lambda entry: entry["time"])
+        with self._lock:
+            self.steps += 1
+            self.requests += len(entries)
+            self.api_calls += len(api_calls)
+            if self.slowest_request is None \
+                    or slowest["time"] > self.slowest_request["time"]:
+                self.slowest_request = {"step": step["title"],
+                                        "url": slowest["request"]["url"],
+                                        "time": slowest["time"]}
+        allure.attach(self.waterfall(har), name=f"Сеть: {step['title']}",
+                      attachment_type=allure.attachment_type.TEXT)
+        allure.attach(json.dumps(har, ensure_ascii=False),
+                      name=f"HAR: {step['title']}", extension="har",
+                      attachment_type="application/json")
+
+    def build_har(self, title: str, events: List[dict],
+                  wall_time: Optional[datetime] = None) -> dict:
+        """
+        Собрать HAR из сетевых событий DevTools.
+
+        :param title: название шага (страница HAR)
+        :type title: str
+        :param events: события Network.* в порядке поступления
+        :type events: list
+        :param wall_time: время начала шага
+        :type wall_time: datetime
+        :return: HAR 1.2
+        :rtype: dict
+        """
+        requests, order = {}, []
+
+        def finish(request: dict, timestamp: float) -> None:
+            request["end"] = timestamp
+            order.append(request)
+
+        for event in events:
+            method, params = event.get("method"), event.get("params", {})
+            request_id = params.get("requestId")
+            if method == "Network.requestWillBeSent":
+                previous = requests.get(request_id)
+                if previous is not None and params.get("redirectResponse"):
+                    # Каждый переход редиректа - отдельная запись
+                    previous["response"] = params["redirectResponse"]
+                    finish(previous, params["timestamp"])
+                requests[request_id] = {
+                    "request": params["request"],
+                    "type": params.get("type"),
+                    "start": params["timestamp"],
+                    "wall_time": params.get("wallTime"),
+                    "response": None, "bytes": 0, "error": None,
+                }
+            elif request_id not in requests:
+                continue
+            elif method == "Network.responseReceived":
+                requests[request_id]["response"] = params["response"]
+            elif method == "Network.loadingFinished":
+                request = requests.pop(request_id)
+                request["bytes"] = params.get("encodedDataLength", 0)
+                finish(request, params["timestamp"])
+            elif method == "Network.loadingFailed":
+                request = requests.pop(request_id)
+                request["error"] = params.get("errorText")
+                finish(request, params["timestamp"])
+        # Запросы, не завершившиеся к концу шага
+        for request in requests.values():
+            request["end"] = None
+            request["error"] = "unfinished"
+            order.append(request)
+
+        started = (wall_time or datetime.now(timezone.utc)).isoformat()
+        entries = [self._entry(request, title) for request in order]
+        entries.sort(key=lambda entry: entry["_start"])
+        if len(entries) > self.slowest:
+            for flagged in sorted(entries, key=lambda entry: entry["time"],
+                                  reverse=True)[:self.slowest]:
+                flagged["_slow"] = True
+        return {"log": {
+            "version": "1.2",
+            "creator": {"name": "chitai-gorod-tests", "version": "1.0"},
+            "pages": [{"id": title, "title": title,
+                       "startedDateTime": started, "pageTimings": {}}],
+            "entries": entries,
+        }}
+
+    def waterfall(self, har: dict) -> str:
+        """
+        Компактный текстовый водопад запросов шага.
+
+        :param har: HAR шага
+        :type har: dict
+        :return: таблица: смещение, длительность, полоса, статус, URL;
+            SLOW - самые долгие запросы, API - запросы к API
+        :rtype: str
+        """
+        entries = har["log"]["entries"]
+        origin = min(entry["_start"] for entry in entries)
+        span = max(entry["_start"] + entry["time"] / 1000
+                   for entry in entries) - origin
+        scale = self.width / (span * 1000) if span > 0 else 0
+
+        api_calls = [entry for entry in entries if entry["_api"]]
+        lines = [
+            f"{har['log']['pages'][0]['title']}: {len(entries)} запросов, "
+            f"{sum(e['response']['bodySize'] for e in entries)} байт, "
+            f"{round(span * 1000)} мс; API: {len(api_calls)} запросов, "
+            f"{round(sum(e['time'] for e in api_calls))} мс",
+            "",
+        ]
+        for entry in entries:
+            offset = (entry["_start"] - origin) * 1000
+            bar = " " * int(offset * scale) \
+                + "#" * max(1, int(entry["time"] * scale))
+            flags = ("SLOW " if entry["_slow"] else "     ") \
+                + ("API " if entry["_api"] else "    ")
+            status = entry["response"]["status"] or entry["_error"] or "-"
+            lines.append(
+                f"{offset:8.0f} {entry['time']:8.1f} ms "
+                f"|{bar:<{self.width}}| {flags}{status} "
+                f"{entry['request']['method']} "
+                f"{entry['request']['url'][:120]}"
+            )
+        return "\n".join(lines)
+
+    def stats(self) -> dict:
+        """
+        Статистика трассировки.
+
+        :return: словарь со статистикой
+        :rtype: dict
+        """
+        with self._lock:
+            return {
+                "steps": self.steps,
+                "requests": self.requests,
+                "api_calls": self.api_calls,
+                "slowest": self.slowest_request,
+            }
+
+    def _entry(self, request: dict, page: str) -> dict:
+        """
+        Запись HAR для запроса.
+
+        :param request: собранные события запроса
+        :type request: dict
+        :param page: идентификатор страницы HAR
+        :type page: str
+        :return: запись HAR
+        :rtype: dict
+        """
+        response = request["response"] or {}
+        timing = response.get("timing") or {}
+        end = request["end"]
+        total = round((end - request["start"]) * 1000, 1) \
+            if end is not None else 0.0
+        timings = {"blocked": -1, "dns": _phase(timing, "dnsStart", "dnsEnd"),
+                   "connect": _phase(timing, "connectStart", "connectEnd"),
+                   "ssl": _phase(timing, "sslStart", "sslEnd"),
+                   "send": _phase(timing, "sendStart", "sendEnd"),
+                   "wait": _phase(timing, "sendEnd", "receiveHeadersEnd"),
+                   "receive": 0}
+        if timing:
+            request_time = timing["requestTime"]
+            timings["blocked"] = round(
+                max(0.0, request_time - request["start"]) * 1000, 1)
+            if end is not None:
+                timings["receive"] = round(max(
+                    0.0, (end - request_time) * 1000
+                    - timing.get("receiveHeadersEnd", 0)), 1)
+
+        wall_time = request["wall_time"]
+        url = request["request"]["url"]
+        protocol = response.get("protocol", "")
+        return {
+            "pageref": page,
+            "startedDateTime": datetime.fromtimestamp(
+                wall_time, timezone.utc).isoformat() if wall_time else "",
+            "time": total,
+            "request": {
+                "method": request["request"].get("method", "GET"),
+                "url": url,
+                "httpVersion": protocol,
+                "headers": _headers(request["request"].get("headers")),
+                "queryString": [], "cookies": [],
+                "headersSize": -1, "bodySize": -1,
+            },
+            "response": {
+                "status": response.get("status", 0),
+                "statusText": response.get("statusText", ""),
+                "httpVersion": protocol,
+                "headers": _headers(response.get("headers")),
+                "cookies": [],
+                "content": {"size": request["bytes"],
+                            "mimeType": response.get("mimeType", "")},
+                "redirectURL": "",
+                "headersSize": -1, "bodySize": request["bytes"],
+            },
+            "cache": {},
+            "timings": timings,
+            "_resourceType": request["type"],
+            "_fromCache": bool(response.get("fromDiskCache")
+                               or response.get("fromServiceWorker")),
+            "_error": request["error"],
+            "_slow": False,
+            "_api": any(pattern in url for pattern in self.api_patterns),
+            "_start": request["start"],
+        }
+
+    def _read_events(self) -> List[dict]:
+        """
+        Прочитать накопленные сетевые события из performance лога.
+
+        :return: события Network.*
+        :rtype: list
+        """
+        try:
+            logs = self.driver.get_log("performance")
+        except WebDriverException:
+            return []
+        events = []
+        for entry in logs:
+            message = json.loads(entry["message"])["message"]
+            if message.get("method", "").startswith("Network."):
+                events.append(message)
+        return events
+
+    def _collect(self) -> None:
+        """
+        Отнести накопленные события к текущему шагу.
+
+        :return: None
+        """
+        events = self._read_events()
+        if self._stack:
+            self._stack[-1]["events"].extend(events)
+
+
+_default_trace = None
+_default_trace_lock = threading.Lock()
+
+
+def get_network_trace() -> NetworkTrace:
+    """
+    Получить общую для процесса трассировку сети.
+
+    :return: NetworkTrace instance
+    :rtype: NetworkTrace
+    """
+    global _default_trace
+    with _default_trace_lock:
+        if _default_trace is None:
+            _default_trace = NetworkTrace()
+        return _default_trace
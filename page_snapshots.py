@@ -0,0 +1,469 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from http.server import BaseHTTPRequestHandler
+from typing import Dict, Iterable, List
+from urllib.parse import urlsplit
+
+from selenium.webdriver.remote.webdriver import WebDriver
+from background_server import BackgroundServer
+from cache_helper import read_json, write_json
+from dom_snapshot import FIND_FUNCTION, snapshot
+from driver_pool import create_driver, quit_driver
+from pages.auth_ui_page import AuthPage
+from pages.cart_ui_page import AddToCart
+from pages.search_ui_page import SearchPage
+from storefront import DELETED_TEXT
+from wait_engine import ec
+from config import (url_ui, url_ui_cart, book_title, local_api_host,
+                    snapshot_dir)
+
+# Снимок: адрес на локальном сервере снимков
+SNAPSHOT_PATHS = {"auth": "/", "search": "/search", "cart": "/cart"}
+MANIFEST_FILE = "manifest.json"
+
+# Внешние ресурсы снимку не нужны: CSP не даёт странице обратиться к
+# сети, даже если в разметке остались внешние адреса
+CSP = "default-src 'self' data: 'unsafe-inline'"
+
+# Сериализация текущей страницы в самодостаточный HTML: стили
+# встраиваются, скрипты, iframe и внешние ресурсы удаляются, значения
+# полей переносятся в атрибуты. Модальное окно (если задано) прячется до
+# нажатия кнопки, которая его открывает
+SERIALIZE_SCRIPT = FIND_FUNCTION + """
+var modalLocator = arguments[0], shim = arguments[1], csp = arguments[2];
+var css = [];
+Array.prototype.forEach.call(document.styleSheets, function (sheet) {
+    try {
+        Array.prototype.forEach.call(sheet.cssRules, function (rule) {
+            css.push(rule.cssText);
+        });
+    } catch (e) {}
+});
+
+if (modalLocator) {
+    var modal = find(modalLocator)[0];
+    for (var node = modal; node && node !== document.body;
+         node = node.parentElement) {
+        if (node.getAttribute('role') === 'dialog'
+            || /modal/.test(node.className || '')) {
+            modal = node;
+        }
+    }
+    if (modal) { modal.setAttribute('data-cg-modal', ''); }
+}
+document.querySelectorAll('input, textarea').forEach(function (field) {
+    field.setAttribute('value', field.value);
+});
+
+var root = document.documentElement.cloneNode(true);
+if (modalLocator) {
+    document.querySelectorAll('[data-cg-modal]').forEach(function (node) {
+        node.removeAttribute('data-cg-modal');
+    });
+}
+root.querySelectorAll('script, noscript, iframe, link, style, source, '
+    + 'object, embed, base').forEach(function (node) { node.remove(); });
+root.querySelectorAll('*').forEach(function (node) {
+    Array.prototype.slice.call(node.attributes).forEach(function (attr) {
+        if (/^on/i.test(attr.name) || attr.name === 'srcset') {
+            node.removeAttribute(attr.name);
+        }
+    });
+    if (node.tagName === 'IMG') {
+        node.setAttribute('src', 'data:image/gif;base64,'
+            + 'R0lGODlhAQABAAAAACH5BAEKAAEALAAAAAABAAEAAAICTAEAOw==');
+    }
+});
+root.querySelectorAll('[data-cg-modal]').forEach(function (node) {
+    node.style.setProperty('display', 'none', 'important');
+});
+
+var head = root.querySelector('head');
+if (!head) {
+    head = document.createElement('head');
+    root.insertBefore(head, root.firstChild);
+}
+var meta = document.createElement('meta');
+meta.setAttribute('http-equiv', 'Content-Security-Policy');
+meta.setAttribute('content', csp);
+head.insertBefore(meta, head.firstChild);
+var style = document.createElement('style');
+style.textContent = css.join('\\n');
+head.appendChild(style);
+var script = document.createElement('script');
+script.textContent = shim;
+root.querySelector('body').appendChild(script);
+return '<!DOCTYPE html>\\n' + root.outerHTML;
+"""
+
+# Поведение сайта, без которого не работают сценарии page objects:
+# поиск, добавление в корзину, переход в корзину, удаление товара и
+# открытие формы входа. Локаторы подставляются из page objects
+SHIM_SCRIPT = FIND_FUNCTION + """
+var actions = __ACTIONS__;
+function matches(locator, target) {
+    var nodes = find(locator);
+    for (var i = 0; i < nodes.length; i++) {
+        if (nodes[i] === target || nodes[i].contains(target)) {
+            return nodes[i];
+        }
+    }
+    return null;
+}
+function search() {
+    var input = find(actions.search_input)[0];
+    location.href = '/search?phrase='
+        + encodeURIComponent(input ? input.value : '');
+}
+document.addEventListener('click', function (event) {
+    var target = event.target, node;
+    if (matches(actions.search_button, target)) {
+        event.preventDefault();
+        search();
+    } else if (matches(actions.cart_icon, target)) {
+        event.preventDefault();
+        location.href = '/cart';
+    } else if (matches(actions.login_button, target)) {
+        event.preventDefault();
+        document.querySelectorAll('[data-cg-modal]').forEach(function (m) {
+            m.style.removeProperty('display');
+        });
+    } else if ((node = matches(actions.delete_button, target))) {
+        event.preventDefault();
+        var item = node.closest('.cart-item') || node.parentElement;
+        item.innerHTML = '<div class="cart-item-deleted__title">'
+            + '__DELETED__</div>';
+    } else if (matches(actions.buy_button, target)) {
+        event.preventDefault();
+        var cart = find(actions.cart_icon)[0];
+        var counter = find(actions.cart_counter)[0];
+        if (!counter && cart) {
+            counter = document.createElement('span');
+            counter.className = 'chg-indicator';
+            cart.appendChild(counter);
+        }
+        if (counter) {
+            counter.textContent = String(
+                (parseInt(counter.textContent, 10) || 0) + 1);
+        }
+    }
+}, true);
+document.addEventListener('keydown', function (event) {
+    if (event.key === 'Enter' && matches(actions.search_input,
+                                         event.target)) {
+        event.preventDefault();
+        search();
+    }
+}, true);
+document.addEventListener('submit', function (event) {
+    event.preventDefault();
+}, true);
+"""
+
+
+def page_locators(driver: WebDriver) -> Dict[str, Dict[str, tuple]]:
+    """
+    Локаторы page objects, которые проверяются на каждом снимке.
+
+    :param driver: WebDriver - Экземпляр WebDriver
+    :type driver: WebDriver
+    :return: снимок -> имя -> локатор
+    :rtype: dict
+    """
+    search, cart, auth = SearchPage(driver), AddToCart(driver), \
+        AuthPage(driver)
+    header = {"search_input": search.search,
+              "search_button": search.search_button,
+              "cart_icon": cart.cart_icon,
+              "login_button": auth.login_button}
+    return {
+        "auth": {**header, "phone_input": auth.phone_input,
+                 "get_code_button": auth.get_code_button},
+        "search": {**header, "search_results": search.search_results,
+                   "product_titles": search.product_titles,
+                   "product_prices": search.product_prices,
+                   "buy_buttons": search.buy_buttons,
+                   "buy_button": cart.buy_button},
+        "cart": {**header, "delete_button": cart.delete_button},
+    }
+
+
+def shim_script(driver: WebDriver) -> str:
+    """
+    Скрипт поведения снимка с локаторами из page objects.
+
+    :param driver: WebDriver - Экземпляр WebDriver
+    :type driver: WebDriver
+    :return: исходный код скрипта
+    :rtype: str
+    """
+    search, cart, auth = SearchPage(driver), AddToCart(driver), \
+        AuthPage(driver)
+    actions = {"search_input": search.search,
+               "search_button": search.search_button,
+               "buy_button": cart.buy_button,
+               "cart_icon": cart.cart_icon,
+               "cart_counter": cart.cart_counter,
+               "delete_button": cart.delete_button,
+               "login_button": auth.login_button}
+    return SHIM_SCRIPT.replace(
+        "__ACTIONS__",
+        json.dumps({name: list(locator)
+                    for name, locator in actions.items()},
+                   ensure_ascii=False),
+    ).replace("__DELETED__", DELETED_TEXT)
+
+
+def locator_state(driver: WebDriver, locators: Dict[str, tuple]) -> dict:
+    """
+    Состояние локаторов на текущей странице для сравнения снимков.
+
+    Число найденных элементов зависит от данных каталога, поэтому
+    сравнивается только наличие и видимость.
+
+    :param driver: WebDriver - Экземпляр WebDriver
+    :type driver: WebDriver
+    :param locators: имя -> локатор
+    :type locators: dict
+    :return: имя -> {"exists", "visible"}
+    :rtype: dict
+    """
+    return {name: {"exists": state["exists"], "visible": state["visible"]}
+            for name, state in snapshot(driver, locators, text_limit=0)
+            .items()}
+
+
+def diff_states(expected: dict, actual: dict) -> List[str]:
+    """
+    Расхождения состояния локаторов.
+
+    :param expected: сохранённое состояние
+    :type expected: dict
+    :param actual: текущее состояние
+    :type actual: dict
+    :return: строки вида "buy_button: exists True -> False"
+    :rtype: list
+    """
+    changes = []
+    for name in sorted(set(expected) | set(actual)):
+        before, after = expected.get(name), actual.get(name)
+        if before is None or after is None:
+            changes.append(f"{name}: {'added' if before is None else 'gone'}")
+            continue
+        for key in ("exists", "visible"):
+            if before[key] != after[key]:
+                changes.append(f"{name}: {key} {before[key]} -> {after[key]}")
+    return changes
+
+
+def open_page(driver: WebDriver, name: str) -> None:
+    """
+    Открыть страницу сайта в состоянии для снимка.
+
+    :param driver: WebDriver - Экземпляр WebDriver
+    :type driver: WebDriver
+    :param name: имя снимка: "search", "cart" или "auth"
+    :type name: str
+    :return: None
+    """
+    search, cart, auth = SearchPage(driver), AddToCart(driver), \
+        AuthPage(driver)
+    driver.get(url_ui)
+    if name == "auth":
+        auth.open_auth_form()
+        return
+    search.search_by_title(book_title)
+    if name == "cart":
+        cart.add_product_to_cart()
+        driver.get(url_ui_cart)
+        cart.wait.until(ec.element_to_be_clickable(cart.delete_button))
+
+
+def capture(driver: WebDriver, names: Iterable[str] = SNAPSHOT_PATHS,
+            directory: str = snapshot_dir) -> dict:
+    """
+    Снять статические снимки страниц сайта.
+
+    Для каждого снимка сохраняется HTML и в manifest.json - адрес,
+    время, хэш и состояние локаторов page objects на живой странице.
+
+    :param driver: WebDriver - Экземпляр WebDriver
+    :type driver: WebDriver
+    :param names: имена снимков
+    :type names: Iterable[str]
+    :param directory: каталог снимков
+    :type directory: str
+    :return: манифест
+    :rtype: dict
+    """
+    os.makedirs(directory, exist_ok=True)
+    manifest_path = os.path.join(directory, MANIFEST_FILE)
+    manifest = read_json(manifest_path, {})
+    locators = page_locators(driver)
+    shim = shim_script(driver)
+    for name in names:
+        open_page(driver, name)
+        state = locator_state(driver, locators[name])
+        modal = AuthPage(driver).phone_input if name == "auth" else None
+        html = driver.execute_script(SERIALIZE_SCRIPT,
+                                     list(modal) if modal else None, shim,
+                                     CSP)
+        data = html.encode("utf-8")
+        with open(os.path.join(directory, f"{name}.html"), "wb") as file:
+            file.write(data)
+        manifest[name] = {
+            "url": driver.current_url,
+            "path": SNAPSHOT_PATHS[name],
+            "captured_at": round(time.time()),
+            "sha256": hashlib.sha256(data).hexdigest(),
+            "bytes": len(data),
+            "locators": state,
+        }
+    write_json(manifest_path, manifest)
+    return manifest
+
+
+def compare(driver: WebDriver, names: Iterable[str] = SNAPSHOT_PATHS,
+            directory: str = snapshot_dir) -> Dict[str, List[str]]:
+    """
+    Сравнить живые страницы сайта со снимками.
+
+    Если на сайте изменилось наличие или видимость элементов page
+    objects, снимки устарели и их нужно снять заново.
+
+    :param driver: WebDriver - Экземпляр WebDriver
+    :type driver: WebDriver
+    :param names: имена снимков
+    :type names: Iterable[str]
+    :param directory: каталог снимков
+    :type directory: str
+    :return: снимок -> расхождения (пустой словарь - снимки актуальны)
+    :rtype: dict
+    """
+    manifest = read_json(os.path.join(directory, MANIFEST_FILE), {})
+    locators = page_locators(driver)
+    drift = {}
+    for name in names:
+        if name not in manifest:
+            drift[name] = ["snapshot missing"]
+            continue
+        open_page(driver, name)
+        changes = diff_states(manifest[name]["locators"],
+                              locator_state(driver, locators[name]))
+        if changes:
+            drift[name] = changes
+    return drift
+
+
+class SnapshotServer(BackgroundServer):
+    """
+    Локальный статический сервер снимков страниц.
+
+    Главная ("/") отдаёт снимок с формой входа, "/search" - снимок
+    результатов поиска (для любой фразы), "/cart" - снимок корзины.
+    """
+
+    THREAD_NAME = "snapshot-server"
+
+    def __init__(self, directory: str = snapshot_dir,
+                 host: str = local_api_host, port: int = 0) -> None:
+        """
+        Инициализация сервера.
+
+        :param directory: каталог снимков
+        :type directory: str
+        :param host: адрес для прослушивания
+        :type host: str
+        :param port: порт (0 - выбрать свободный)
+        :type port: int
+        """
+        self.directory = directory
+        self.manifest = read_json(os.path.join(directory, MANIFEST_FILE),
+                                  {})
+        super().__init__(host, port)
+
+    def url(self, name: str) -> str:
+        """
+        Адрес снимка на сервере.
+
+        :param name: имя снимка
+        :type name: str
+        :return: адрес
+        :rtype: str
+        """
+        return self.base_url + SNAPSHOT_PATHS[name]
+
+    def _make_handler(self) -> type:
+        pages = {path: os.path.join(self.directory, f"{name}.html")
+                 for name, path in SNAPSHOT_PATHS.items()}
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                path = pages.get(urlsplit(self.path).path.rstrip("/") or "/")
+                try:
+                    with open(path or "", "rb") as file:
+                        body = file.read()
+                    status = 200
+                except OSError:
+                    body, status = b"Not Found", 404
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+
+def main() -> None:
+    """
+    Снять, проверить или раздать снимки страниц из командной строки.
+
+    :return: None
+    """
+    parser = argparse.ArgumentParser(
+        description="Статические снимки страниц сайта для page objects"
+    )
+    parser.add_argument("command", choices=("capture", "check", "serve"))
+    parser.add_argument("--pages", nargs="*", default=list(SNAPSHOT_PATHS),
+                        choices=list(SNAPSHOT_PATHS))
+    parser.add_argument("--dir", default=snapshot_dir)
+    parser.add_argument("--port", type=int, default=8090)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        server = SnapshotServer(args.dir, port=args.port)
+        print(f"Snapshots: {server.url_ui}")
+        server.serve_forever()
+        return
+
+    driver = create_driver()
+    try:
+        if args.command == "capture":
+            manifest = capture(driver, args.pages, args.dir)
+            for name in args.pages:
+                print(f"{name}: {manifest[name]['bytes']} bytes, "
+                      f"{manifest[name]['url']}")
+            return
+        drift = compare(driver, args.pages, args.dir)
+    finally:
+        quit_driver(driver)
+    for name, changes in drift.items():
+        print(f"{name}: recapture needed")
+        for change in changes:
+            print(f"    {change}")
+    sys.exit(1 if drift else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,39 +1,226 @@
+import time
+from collections import deque
+from typing import List, Optional
+
 import requests
-from cookie_helper import get_fresh_cookies
-from config import url_api, bearer_token
+from requests.cookies import RequestsCookieJar
+from cookie_helper import CookieProvider, get_cookie_provider
+from http_transport import HTTPTransport, get_shared_transport
+from request_timing import (TimingRecorder, get_timing_recorder,
+                            reset_connect_time, connect_time)
+from resilience import (IDEMPOTENT_METHODS, RequestGuard,
+                        get_request_guard)
+from token_manager import TokenManager, get_token_manager
+from config import url_api, bearer_token, api_client_timings_max
 
 
-class CartAPI:
+class APIClient:
     """
-    API клиент для работы с корзиной.
+    Базовый API клиент web-gate: куки DDoS-Guard, токен пользователя,
+    защита запросов и замеры времени.
     """
 
-    def __init__(self) -> None:
+    # Адрес API по умолчанию задаёт клиент конкретного раздела
+    default_url = None
+
+    def __init__(self,
+                 cookie_provider: Optional[CookieProvider] = None,
+                 transport: Optional[HTTPTransport] = None,
+                 base_url: Optional[str] = None,
+                 token: Optional[str] = bearer_token,
+                 timing_recorder: Optional[TimingRecorder] = None,
+                 token_manager: Optional[TokenManager] = None,
+                 identity: Optional[str] = None,
+                 guard: Optional[RequestGuard] = None) -> None:
         """
         Инициализация API клиента со свежими куками.
+
+        :param cookie_provider: поставщик кук; по умолчанию общий
+            кэширующий поставщик процесса
+        :type cookie_provider: CookieProvider
+        :param transport: HTTP транспорт; по умолчанию общий пул
+            соединений процесса
+        :type transport: HTTPTransport
+        :param base_url: адрес API; по умолчанию default_url клиента
+        :type base_url: str
+        :param token: значение заголовка Authorization (Bearer ...);
+            None - токен идентичности от поставщика токенов
+        :type token: str
+        :param timing_recorder: регистратор замеров; по умолчанию общий
+            регистратор процесса
+        :type timing_recorder: TimingRecorder
+        :param token_manager: поставщик токенов (если token не задан);
+            по умолчанию общий поставщик процесса
+        :type token_manager: TokenManager
+        :param identity: идентичность для поставщика токенов; по
+            умолчанию текущий воркер
+        :type identity: str
+        :param guard: ограничение частоты, повторы и circuit breaker;
+            по умолчанию общая защита процесса для хоста base_url
+        :type guard: RequestGuard
         """
-        self.base_url = url_api
-        self.session = requests.Session()
+        self.base_url = base_url or self.default_url
+        self.guard = guard or get_request_guard(self.base_url)
+        self.timing_recorder = timing_recorder or get_timing_recorder()
+        self.timings = deque(maxlen=api_client_timings_max)
+        self.transport = transport or get_shared_transport()
+        self.cookie_provider = cookie_provider or get_cookie_provider()
+        self.cookies = RequestsCookieJar()
+        self.identity = identity
+        self.token_manager = None
+        if token is None:
+            self.token_manager = token_manager or get_token_manager()
+            token = self.token_manager.get(identity)
 
         # Получаем свежие куки
         self._update_cookies()
 
         # Базовые заголовки
-        self.session.headers.update({
+        self.headers = {
             'Content-Type': 'application/json',
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
                           'AppleWebKit/537.36',
-            'Authorization': bearer_token
-        })
+            'Authorization': token
+        }
 
     def _update_cookies(self) -> None:
         """
-        Обновить куки сессии.
+        Обновить куки клиента из кэша.
 
         :return: None
         """
-        fresh_cookies = get_fresh_cookies()
-        self.session.cookies.update(fresh_cookies)
+        fresh_cookies = self.cookie_provider.get()
+        self.cookies.update(fresh_cookies)
+        self._cookies = fresh_cookies
+
+    def _update_token(self) -> None:
+        """
+        Обновить токен клиента из кэша поставщика токенов.
+
+        :return: None
+        """
+        if self.token_manager is not None:
+            self.headers['Authorization'] = self.token_manager.get(
+                self.identity)
+
+    def _request(self, operation: str, method: str, url: str,
+                 idempotent: Optional[bool] = None,
+                 **kwargs) -> requests.Response:
+        """
+        Выполнить запрос с кэшированными куками и замером времени.
+
+        Если DDoS-Guard отклонил запрос из-за устаревших кук, куки
+        обновляются и запрос повторяется один раз; так же обрабатывается
+        401 для токена от поставщика токенов (например, отозванного).
+        Ответы 429 и 5xx повторяются защитой self.guard с ограничением
+        частоты и задержкой; неидемпотентные запросы (POST, DELETE)
+        повторяются только после 429 и таймаута соединения. Замер
+        (получение кук, установка соединения, TTFB, ожидание, общее
+        время и размеры) сохраняется в self.timings (последние
+        api_client_timings_max замеров) и в регистраторе замеров.
+        Время кук, соединения и TTFB суммируется по всем отправкам
+        запроса, включая повторы.
+
+        :param operation: имя операции для замеров
+        :type operation: str
+        :param method: HTTP метод
+        :type method: str
+        :param url: адрес запроса
+        :type url: str
+        :param idempotent: запрос можно повторить после таймаута чтения и
+            5xx; по умолчанию - для GET, HEAD и OPTIONS
+        :type idempotent: bool
+        :return: Response object
+        :rtype: requests.Response
+        :raises CircuitOpenError: если API признан недоступным
+        """
+        start = time.perf_counter()
+        reset_connect_time()
+        cookie_time = 0.0
+        connect_total = 0.0
+        ttfb_time = 0.0
+
+        def send() -> requests.Response:
+            # Соединения, открытые при обновлении кук и токена, уже
+            # учтены в cookie_s: считаются только соединения отправок
+            nonlocal connect_total, ttfb_time
+            connect_before = connect_time()
+            resp = self._send(method, url, **kwargs)
+            # elapsed включает установку соединения этой отправки
+            connect = connect_time() - connect_before
+            connect_total += connect
+            ttfb_time += max(resp.elapsed.total_seconds() - connect, 0.0)
+            return resp
+
+        def attempt() -> requests.Response:
+            nonlocal cookie_time
+            cookie_start = time.perf_counter()
+            self._update_cookies()
+            self._update_token()
+            cookie_time += time.perf_counter() - cookie_start
+            resp = send()
+
+            if CookieProvider.is_stale_response(resp):
+                self.cookie_provider.invalidate(self._cookies)
+                cookie_start = time.perf_counter()
+                self._update_cookies()
+                cookie_time += time.perf_counter() - cookie_start
+                resp = send()
+
+            if resp.status_code == 401 and self.token_manager is not None:
+                self.token_manager.invalidate(self.identity,
+                                              self.headers['Authorization'])
+                self._update_token()
+                resp = send()
+            return resp
+
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        resp, attempts = self.guard.call(attempt, idempotent=idempotent)
+
+        total = time.perf_counter() - start
+        body = resp.request.body or b""
+        record = {
+            "operation": operation,
+            "method": method,
+            "url": url,
+            "status": resp.status_code,
+            "cookie_s": cookie_time,
+            "connect_s": connect_total,
+            "ttfb_s": ttfb_time,
+            "total_s": total,
+            "wait_s": attempts["wait_s"],
+            "retries": attempts["retries"],
+            "request_bytes": len(body),
+            "response_bytes": len(resp.content),
+        }
+        self.timings.append(record)
+        self.timing_recorder.add(record)
+        return resp
+
+    def _send(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Отправить запрос через транспорт с заголовками и куками клиента.
+
+        :param method: HTTP метод
+        :type method: str
+        :param url: адрес запроса
+        :type url: str
+        :return: Response object
+        :rtype: requests.Response
+        """
+        resp = self.transport.request(method, url, headers=self.headers,
+                                      cookies=self.cookies, **kwargs)
+        self.cookies.update(resp.cookies)
+        return resp
+
+
+class CartAPI(APIClient):
+    """
+    API клиент для работы с корзиной.
+    """
+
+    default_url = url_api
 
     def add_product_to_cart(self, product_id: int) -> requests.Response:
         """
@@ -44,13 +231,12 @@ class CartAPI:
         :return: Response object
         :rtype: requests.Response
         """
-        self._update_cookies()
-
         url = f"{self.base_url}/product"
         payload = {
             "id": product_id
         }
-        resp = self.session.post(url, json=payload)
+        resp = self._request("add_product_to_cart", "POST", url,
+                             json=payload)
         return resp
 
     def add_product_without_id(self) -> requests.Response:
@@ -60,10 +246,8 @@ class CartAPI:
         :return: Response object
         :rtype: requests.Response
         """
-        self._update_cookies()
-
         url = f"{self.base_url}/product"
-        resp = self.session.post(url)
+        resp = self._request("add_product_without_id", "POST", url)
         return resp
 
     def get_cart(self) -> requests.Response:
@@ -73,9 +257,7 @@ class CartAPI:
         :return: Response object
         :rtype: requests.Response
         """
-        self._update_cookies()
-
-        resp = self.session.get(self.base_url)
+        resp = self._request("get_cart", "GET", self.base_url)
         return resp
 
     def remove_from_cart(self, cart_product_id: int) -> requests.Response:
@@ -87,10 +269,8 @@ class CartAPI:
         :return: Response object
         :rtype: requests.Response
         """
-        self._update_cookies()
-
         url = f"{self.base_url}/product/{cart_product_id}"
-        resp = self.session.delete(url)
+        resp = self._request("remove_from_cart", "DELETE", url)
         return resp
 
     def get_cart_with_wrong_method(self) -> requests.Response:
@@ -100,8 +280,19 @@ class CartAPI:
         :return: Response object
         :rtype: requests.Response
         """
-        self._update_cookies()
-
         # Используем POST вместо GET для негативного теста
-        resp = self.session.post(self.base_url)
+        resp = self._request("get_cart_with_wrong_method", "POST",
+                             self.base_url)
         return resp
+
+    def clear_cart(self) -> List[requests.Response]:
+        """
+        Удалить из корзины все товары.
+
+        :return: ответы на удаление в порядке товаров в корзине
+        :rtype: list
+        """
+        cart_result = self.get_cart()
+        cart_result.raise_for_status()
+        products = cart_result.json().get("products", [])
+        return [self.remove_from_cart(product["id"]) for product in products]
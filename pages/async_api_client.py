@@ -0,0 +1,226 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional
+
+import requests
+from pages.api_client import CartAPI
+from cookie_helper import CookieProvider
+from http_transport import HTTPTransport
+from token_manager import TokenManager
+from config import async_concurrency, url_api, bearer_token
+
+
+class AsyncCartAPI:
+    """
+    Асинхронный API клиент для работы с корзиной.
+
+    Повторяет методы CartAPI и добавляет массовые операции, которые
+    выполняются параллельно с ограничением concurrency. Запросы идут
+    через тот же общий пул соединений и кэш кук, что и у CartAPI:
+    каждый слот параллелизма владеет собственным экземпляром CartAPI,
+    поэтому куки клиентов не разделяются между потоками.
+    """
+
+    def __init__(self, concurrency: int = async_concurrency,
+                 cookie_provider: Optional[CookieProvider] = None,
+                 transport: Optional[HTTPTransport] = None,
+                 base_url: str = url_api,
+                 token: Optional[str] = bearer_token,
+                 token_manager: Optional[TokenManager] = None,
+                 identity: Optional[str] = None) -> None:
+        """
+        Инициализация асинхронного клиента.
+
+        :param concurrency: максимум одновременных запросов
+        :type concurrency: int
+        :param cookie_provider: поставщик кук
+        :type cookie_provider: CookieProvider
+        :param transport: HTTP транспорт
+        :type transport: HTTPTransport
+        :param base_url: адрес API корзины
+        :type base_url: str
+        :param token: значение заголовка Authorization (Bearer ...);
+            None - токен идентичности от поставщика токенов
+        :type token: str
+        :param token_manager: поставщик токенов (если token не задан)
+        :type token_manager: TokenManager
+        :param identity: идентичность для поставщика токенов
+        :type identity: str
+        """
+        self.concurrency = concurrency
+        self.base_url = base_url
+        self.token = token
+        self.token_manager = token_manager
+        self.identity = identity
+        self._cookie_provider = cookie_provider
+        self._transport = transport
+        self._executor = ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="async-cart"
+        )
+        self._clients = None
+        self._clients_loop = None
+
+    async def __aenter__(self) -> "AsyncCartAPI":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Остановить пул потоков клиента.
+
+        :return: None
+        """
+        self._executor.shutdown(wait=True)
+
+    async def _call(self, method: str, *args) -> requests.Response:
+        """
+        Выполнить метод CartAPI в свободном слоте параллелизма.
+
+        :param method: имя метода CartAPI
+        :type method: str
+        :return: Response object
+        :rtype: requests.Response
+        """
+        loop = asyncio.get_running_loop()
+        if self._clients_loop is not loop:
+            self._bind_clients(loop)
+        clients = self._clients
+
+        client = await clients.get()
+        try:
+            if client is None:
+                client = await loop.run_in_executor(
+                    self._executor, self._new_client
+                )
+            return await loop.run_in_executor(
+                self._executor, getattr(client, method), *args
+            )
+        finally:
+            clients.put_nowait(client)
+
+    def _bind_clients(self, loop: asyncio.AbstractEventLoop) -> None:
+        """
+        Создать очередь слотов параллелизма для работающего event loop.
+
+        asyncio.Queue привязана к event loop, в котором её ждали, поэтому
+        каждый новый loop (например, следующий asyncio.run()) получает
+        свою очередь. Свободные клиенты прежней очереди переходят в
+        новую, незанятые слоты заполняются None.
+
+        :param loop: работающий event loop
+        :type loop: asyncio.AbstractEventLoop
+        :return: None
+        """
+        clients = asyncio.Queue()
+        if self._clients is not None:
+            while not self._clients.empty():
+                clients.put_nowait(self._clients.get_nowait())
+        while clients.qsize() < self.concurrency:
+            clients.put_nowait(None)
+        self._clients = clients
+        self._clients_loop = loop
+
+    def _new_client(self) -> CartAPI:
+        """
+        Создать синхронный клиент для слота параллелизма.
+
+        :return: CartAPI instance
+        :rtype: CartAPI
+        """
+        return CartAPI(cookie_provider=self._cookie_provider,
+                       transport=self._transport, base_url=self.base_url,
+                       token=self.token, token_manager=self.token_manager,
+                       identity=self.identity)
+
+    async def add_product_to_cart(self,
+                                  product_id: int) -> requests.Response:
+        """
+        Добавить товар в корзину.
+
+        :param product_id: ID товара
+        :type product_id: int
+        :return: Response object
+        :rtype: requests.Response
+        """
+        return await self._call("add_product_to_cart", product_id)
+
+    async def add_product_without_id(self) -> requests.Response:
+        """
+        Добавить товар без ID.
+
+        :return: Response object
+        :rtype: requests.Response
+        """
+        return await self._call("add_product_without_id")
+
+    async def get_cart(self) -> requests.Response:
+        """
+        Получить содержимое корзины.
+
+        :return: Response object
+        :rtype: requests.Response
+        """
+        return await self._call("get_cart")
+
+    async def remove_from_cart(self,
+                               cart_product_id: int) -> requests.Response:
+        """
+        Удалить товар из корзины.
+
+        :param cart_product_id: ID товара в корзине (поле "id" из ответа)
+        :type cart_product_id: int
+        :return: Response object
+        :rtype: requests.Response
+        """
+        return await self._call("remove_from_cart", cart_product_id)
+
+    async def get_cart_with_wrong_method(self) -> requests.Response:
+        """
+        Просмотр товаров в корзине с неправильным методом (POST вместо GET).
+
+        :return: Response object
+        :rtype: requests.Response
+        """
+        return await self._call("get_cart_with_wrong_method")
+
+    async def add_many(self,
+                       product_ids: Iterable[int]) -> List[requests.Response]:
+        """
+        Добавить в корзину несколько товаров параллельно.
+
+        :param product_ids: ID товаров
+        :type product_ids: Iterable[int]
+        :return: ответы в порядке переданных ID
+        :rtype: list
+        """
+        return list(await asyncio.gather(
+            *(self.add_product_to_cart(pid) for pid in product_ids)
+        ))
+
+    async def remove_many(
+            self, cart_product_ids: Iterable[int]) -> List[requests.Response]:
+        """
+        Удалить из корзины несколько товаров параллельно.
+
+        :param cart_product_ids: ID товаров в корзине
+        :type cart_product_ids: Iterable[int]
+        :return: ответы в порядке переданных ID
+        :rtype: list
+        """
+        return list(await asyncio.gather(
+            *(self.remove_from_cart(cid) for cid in cart_product_ids)
+        ))
+
+    async def clear_cart(self) -> List[requests.Response]:
+        """
+        Удалить из корзины все товары.
+
+        :return: ответы на удаление в порядке товаров в корзине
+        :rtype: list
+        """
+        cart_result = await self.get_cart()
+        cart_result.raise_for_status()
+        products = cart_result.json().get("products", [])
+        return await self.remove_many(product["id"] for product in products)
@@ -1,7 +1,7 @@
 from selenium.webdriver.common.by import By
 from selenium.webdriver.remote.webdriver import WebDriver
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+from wait_engine import EventWait, ec
+from web_vitals import measured_step
 
 
 class AuthPage:
@@ -15,7 +15,7 @@ class AuthPage:
         :param driver: WebDriver - Экземпляр WebDriver
         """
         self.driver = driver
-        self.wait = WebDriverWait(driver, 10)
+        self.wait = EventWait(driver, 10)
 
         self.login_button = (
             By.CSS_SELECTOR,
@@ -27,6 +27,7 @@ class AuthPage:
             "button.auth-modal-content__button"
         )
 
+    @measured_step
     def open_auth_form(self) -> None:
         """
         Открыть форму авторизации нажатием на кнопку входа.
@@ -35,6 +36,10 @@ class AuthPage:
         login_btn = self.driver.find_element(*self.login_button)
         login_btn.click()
 
+        # Шаг завершается, когда форма открылась
+        self.wait.until(ec.visibility_of_element_located(self.phone_input))
+
+    @measured_step
     def enter_phone_number(self, phone: str) -> None:
         """
         Ввести номер телефона в поле ввода.
@@ -42,7 +47,7 @@ class AuthPage:
         :return: None
         """
         phone_field = self.wait.until(
-            EC.presence_of_element_located(self.phone_input)
+            ec.presence_of_element_located(self.phone_input)
         )
         phone_field.clear()
         phone_field.send_keys(phone)
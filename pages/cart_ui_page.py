@@ -1,7 +1,7 @@
 from selenium.webdriver.common.by import By
 from selenium.webdriver.remote.webdriver import WebDriver
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+from wait_engine import EventWait, ec
+from web_vitals import measured_step
 
 
 class AddToCart:
@@ -16,7 +16,7 @@ class AddToCart:
         :param driver: WebDriver - Экземпляр WebDriver
         """
         self.driver = driver
-        self.wait = WebDriverWait(driver, 10)
+        self.wait = EventWait(driver, 10)
 
         # Локаторы
         self.buy_button = (
@@ -33,6 +33,7 @@ class AddToCart:
             "button.cart-item__delete-button"
         )
 
+    @measured_step
     def add_product_to_cart(self) -> None:
         """
         Добавить товар в корзину.
@@ -40,15 +41,13 @@ class AddToCart:
         """
         self.driver.execute_script("window.scrollTo(0, 300);")
         element = self.wait.until(
-            EC.element_to_be_clickable(self.buy_button)
+            ec.element_to_be_clickable(self.buy_button)
         )
         self.driver.execute_script("arguments[0].click();", element)
 
-        self.wait.until(
-            lambda driver: driver.find_element(
-                *self.cart_counter).text.strip() != ""
-        )
+        self.wait.until(ec.element_text_not_empty(self.cart_counter))
 
+    @measured_step
     def open_cart(self) -> None:
         """
         Открыть корзину товаров.
@@ -57,12 +56,19 @@ class AddToCart:
         to_cart = self.driver.find_element(*self.cart_icon)
         to_cart.click()
 
+        # Метрики шага собираются после загрузки корзины, а не
+        # предыдущей страницы
+        self.wait.until(
+            ec.all_of(ec.url_contains("/cart"), ec.document_ready())
+        )
+
+    @measured_step
     def delete_from_cart(self) -> None:
         """
         Удалить товар из корзины.
         :return: None
         """
         delete_btn = self.wait.until(
-            EC.element_to_be_clickable(self.delete_button)
+            ec.element_to_be_clickable(self.delete_button)
         )
         delete_btn.click()
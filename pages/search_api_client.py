@@ -0,0 +1,252 @@
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+
+import requests
+from pages.api_client import APIClient
+from pages.search_ui_page import SearchResult
+from resilience import get_request_guard
+from response_cache import ResponseCache
+from config import (url_api_search, search_api_page_size, search_api_workers,
+                    search_cache_enabled, search_rate_limit_rps,
+                    search_rate_limit_burst)
+
+
+def load_queries(path: str) -> Iterator[str]:
+    """
+    Прочитать поисковые фразы из файла, по одной на строку.
+
+    Пустые строки и строки, начинающиеся с "#", пропускаются. Файл
+    читается построчно, поэтому подходит и для очень длинных списков.
+
+    :param path: путь к файлу
+    :type path: str
+    :return: генератор фраз
+    :rtype: Iterator[str]
+    """
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            phrase = line.strip()
+            if phrase and not phrase.startswith("#"):
+                yield phrase
+
+
+class SearchAPI(APIClient):
+    """
+    API клиент поиска по каталогу.
+
+    Ответы на поисковые запросы кэшируются на диске (ResponseCache):
+    повторные запросы в пределах TTL не уходят на сервер. Частота
+    запросов к боевому поиску ограничена своим лимитом
+    search_rate_limit_rps, а не общим лимитом корзины.
+    """
+
+    default_url = url_api_search
+
+    def __init__(self, cache: Optional[ResponseCache] = None,
+                 use_cache: bool = search_cache_enabled, **kwargs) -> None:
+        """
+        Инициализация клиента поиска.
+
+        Остальные параметры (именованные) - как у APIClient.
+
+        :param cache: кэш ответов; по умолчанию кэш из config.py
+        :type cache: ResponseCache
+        :param use_cache: кэшировать ответы
+        :type use_cache: bool
+        """
+        if kwargs.get("guard") is None:
+            kwargs["guard"] = get_request_guard(
+                kwargs.get("base_url") or self.default_url, scope="search",
+                rate=search_rate_limit_rps, burst=search_rate_limit_burst)
+        super().__init__(**kwargs)
+        self.cache = (cache or ResponseCache()) if use_cache else None
+        self._local = threading.local()
+
+    def search(self, phrase: str, page: int = 1,
+               per_page: int = search_api_page_size) -> requests.Response:
+        """
+        Найти товары по фразе (одна страница результатов).
+
+        :param phrase: поисковая фраза
+        :type phrase: str
+        :param page: номер страницы, начиная с 1
+        :type page: int
+        :param per_page: товаров на странице
+        :type per_page: int
+        :return: Response object
+        :rtype: requests.Response
+        """
+        params = {"phrase": phrase, "products[page]": page,
+                  "products[per-page]": per_page}
+        key = None
+        if self.cache is not None:
+            key = ResponseCache.key("GET", self.base_url, params)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        resp = self._request("search", "GET", self.base_url, params=params)
+        if key is not None and resp.status_code == 200:
+            self.cache.put(key, resp)
+        return resp
+
+    def iter_products(self, phrase: str,
+                      max_results: Optional[int] = None,
+                      max_pages: Optional[int] = None,
+                      per_page: int = search_api_page_size
+                      ) -> Iterator[SearchResult]:
+        """
+        Обойти результаты поиска по страницам.
+
+        Страница запрашивается, только когда прочитана предыдущая, и в
+        памяти хранится одна страница.
+
+        :param phrase: поисковая фраза
+        :type phrase: str
+        :param max_results: предел числа результатов
+        :type max_results: int
+        :param max_pages: предел числа страниц
+        :type max_pages: int
+        :param per_page: товаров на странице
+        :type per_page: int
+        :return: генератор товаров
+        :rtype: Iterator[SearchResult]
+        :raises requests.HTTPError: при ошибке ответа
+        """
+        produced = 0
+        page = 1
+        while True:
+            resp = self.search(phrase, page, per_page)
+            resp.raise_for_status()
+            body = resp.json()
+            for product in self.parse_products(body):
+                yield product
+                produced += 1
+                if max_results is not None and produced >= max_results:
+                    return
+            if page >= self.total_pages(body) or (max_pages is not None
+                                                  and page >= max_pages):
+                return
+            page += 1
+
+    def run_queries(self, phrases: Iterable[str],
+                    workers: int = search_api_workers,
+                    per_page: int = search_api_page_size
+                    ) -> Iterator[Tuple[str, Union[requests.Response,
+                                                   Exception]]]:
+        """
+        Выполнить поиск по списку фраз параллельно.
+
+        Одновременно выполняется не больше workers запросов, а фразы
+        берутся из phrases по мере освобождения потоков, поэтому список
+        может быть генератором любой длины (например, load_queries()).
+        Результаты выдаются по мере готовности, не в порядке фраз.
+        Каждый поток работает со своим клиентом (свои куки), а кэш и
+        пул соединений общие.
+
+        :param phrases: поисковые фразы
+        :type phrases: Iterable[str]
+        :param workers: число параллельных запросов
+        :type workers: int
+        :param per_page: товаров на странице
+        :type per_page: int
+        :return: генератор пар (фраза, ответ или исключение)
+        :rtype: Iterator[tuple]
+        """
+        phrases = iter(phrases)
+        with ThreadPoolExecutor(max_workers=workers,
+                                thread_name_prefix="search-api") as executor:
+            pending = {}
+
+            def submit() -> bool:
+                phrase = next(phrases, None)
+                if phrase is None:
+                    return False
+                future = executor.submit(self._search_in_worker, phrase,
+                                         per_page)
+                pending[future] = phrase
+                return True
+
+            for _ in range(workers):
+                if not submit():
+                    break
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    phrase = pending.pop(future)
+                    error = future.exception()
+                    yield phrase, error if error else future.result()
+                    submit()
+
+    def _search_in_worker(self, phrase: str,
+                          per_page: int) -> requests.Response:
+        """
+        Выполнить поиск клиентом текущего потока.
+
+        :param phrase: поисковая фраза
+        :type phrase: str
+        :param per_page: товаров на странице
+        :type per_page: int
+        :return: Response object
+        :rtype: requests.Response
+        """
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = SearchAPI(cache=self.cache,
+                               use_cache=self.cache is not None,
+                               cookie_provider=self.cookie_provider,
+                               transport=self.transport,
+                               base_url=self.base_url,
+                               token=self.headers["Authorization"],
+                               timing_recorder=self.timing_recorder,
+                               identity=self.identity, guard=self.guard)
+            # Токен от поставщика токенов обновляется и в клиенте потока
+            client.token_manager = self.token_manager
+            self._local.client = client
+        return client.search(phrase, per_page=per_page)
+
+    @staticmethod
+    def parse_products(body: dict) -> List[SearchResult]:
+        """
+        Товары из ответа поиска.
+
+        Поддерживается формат JSON:API web-gate ("data" с "attributes")
+        и простой список "products".
+
+        :param body: JSON ответа
+        :type body: dict
+        :return: товары страницы
+        :rtype: list
+        """
+        items = body.get("data")
+        if items is None:
+            items = body.get("products", [])
+        products = []
+        for item in items:
+            attributes = item.get("attributes", item)
+            product_id = item.get("id", attributes.get("id"))
+            price = attributes.get("price")
+            available = attributes.get("available")
+            if available is None:
+                available = (attributes.get("quantity") or 0) > 0
+            products.append(SearchResult(
+                int(product_id) if product_id is not None else None,
+                attributes.get("title"),
+                float(price) if price is not None else None,
+                bool(available),
+            ))
+        return products
+
+    @staticmethod
+    def total_pages(body: dict) -> int:
+        """
+        Число страниц результатов из ответа поиска.
+
+        :param body: JSON ответа
+        :type body: dict
+        :return: число страниц (1, если в ответе нет пагинации)
+        :rtype: int
+        """
+        pagination = body.get("meta", {}).get("pagination", {})
+        return int(pagination.get("total_pages") or 1)
@@ -1,8 +1,90 @@
+from typing import Iterator, Optional
+
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.remote.webdriver import WebDriver
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+from wait_engine import EventWait, ec
+from web_vitals import measured_step
+from config import search_scroll_timeout
+
+# Извлечение карточек результатов за один вызов: только карточки,
+# начиная с номера start (уже прочитанные пропускаются), и переход
+# дальше - ссылка на следующую страницу, кнопка "Показать ещё" или
+# прокрутка вниз для бесконечной ленты (только если на странице нет ни
+# пагинации, ни кнопки: иначе это последняя страница)
+EXTRACT_SCRIPT = r"""
+var selectors = arguments[0], start = arguments[1];
+var cards = Array.prototype.slice.call(
+    document.querySelectorAll(selectors.card)
+).filter(function (card) {
+    return !card.parentElement || !card.parentElement.closest(selectors.card);
+});
+
+function text(card, css) {
+    var el = card.querySelector(css);
+    return el ? (el.innerText || el.textContent || '').trim() : null;
+}
+
+function productId(card) {
+    var id = card.getAttribute('data-product-id')
+        || card.getAttribute('data-chg-product-id');
+    if (!id) {
+        var link = card.querySelector('a[href*="/product/"]');
+        var match = link && link.getAttribute('href').match(/(\d+)\/?$/);
+        id = match ? match[1] : null;
+    }
+    return id ? parseInt(id, 10) : null;
+}
+
+function price(card) {
+    var value = text(card, selectors.price);
+    if (!value) { return null; }
+    value = value.replace(/[^\d,.]/g, '').replace(',', '.');
+    return value ? parseFloat(value) : null;
+}
+
+var items = cards.slice(start).map(function (card) {
+    var button = card.querySelector(selectors.buy);
+    return [productId(card), text(card, selectors.title), price(card),
+            !!button && !button.disabled];
+});
+
+var next = document.querySelector(selectors.next);
+var more = document.querySelector(selectors.more);
+var action = 'end';
+if (next && next.href) {
+    action = next.href;
+} else if (more && !more.disabled) {
+    more.click();
+    action = 'more';
+} else if (!more && !document.querySelector(selectors.pagination)
+           && window.innerHeight + window.scrollY
+           < document.documentElement.scrollHeight - 1) {
+    window.scrollTo(0, document.documentElement.scrollHeight);
+    action = 'more';
+}
+return {items: items, total: cards.length, next: action};
+"""
+
+
+class SearchResult:
+    """
+    Карточка товара из результатов поиска.
+    """
+
+    __slots__ = ("product_id", "title", "price", "available")
+
+    def __init__(self, product_id: Optional[int], title: Optional[str],
+                 price: Optional[float], available: bool) -> None:
+        self.product_id = product_id
+        self.title = title
+        self.price = price
+        self.available = available
+
+    def __repr__(self) -> str:
+        return (f"SearchResult({self.product_id!r}, {self.title!r}, "
+                f"{self.price!r}, {self.available!r})")
 
 
 class SearchPage:
@@ -16,7 +98,7 @@ class SearchPage:
         :param driver: WebDriver - Экземпляр WebDriver
         """
         self.driver = driver
-        self.wait = WebDriverWait(driver, 15)
+        self.wait = EventWait(driver, 15)
 
         # Локаторы для поисковой строки
         self.search = (
@@ -34,7 +116,30 @@ class SearchPage:
             ".product-card, .catalog-product, [data-product-id]"
         )
         self.product_titles = (By.CSS_SELECTOR, ".product-card__title")
+        self.product_prices = (
+            By.CSS_SELECTOR,
+            ".product-card__price, .product-mini-card-price__price, "
+            "[class*='price']"
+        )
+        self.buy_buttons = (
+            By.CSS_SELECTOR,
+            "button.product-buttons__main-action"
+        )
+        # Локаторы перехода к следующим результатам
+        self.next_page = (
+            By.CSS_SELECTOR,
+            "a.pagination__next, a[rel='next']"
+        )
+        self.pagination = (
+            By.CSS_SELECTOR,
+            "nav.pagination, .pagination, [class*='pagination']"
+        )
+        self.show_more = (
+            By.CSS_SELECTOR,
+            "button.catalog-list__show-more, button.more-button"
+        )
 
+    @measured_step
     def search_by_title(self, book_title: str) -> None:
         """
         Выполнить поиск книги по названию.
@@ -42,7 +147,7 @@ class SearchPage:
         :return: None
         """
         search_input = self.wait.until(
-            EC.element_to_be_clickable(self.search)
+            ec.element_to_be_clickable(self.search)
         )
         search_input.clear()
         search_input.send_keys(book_title)
@@ -50,25 +155,18 @@ class SearchPage:
         search_button = self.driver.find_element(*self.search_button)
         search_button.click()
 
-        # Ожидание изменения URL на страницу результатов
-        WebDriverWait(self.driver, 10).until(
-            lambda d: "search" in d.current_url or "phrase" in d.current_url
-        )
-        # Ожидание полной загрузки страницы
-        WebDriverWait(self.driver, 10).until(
-            lambda d: d.execute_script(
-                "return document.readyState"
-            ) == "complete"
-        )
-        # Ожидание появления контейнеров товаров
+        # Переход на страницу результатов, её загрузка, контейнеры и
+        # заголовки товаров ожидаются одним условием в браузере
         self.wait.until(
-            EC.presence_of_element_located(self.search_results)
-        )
-        # Ожидание появления заголовков товаров
-        self.wait.until(
-            EC.presence_of_all_elements_located(self.product_titles)
+            ec.all_of(
+                ec.url_contains("search", "phrase"),
+                ec.document_ready(),
+                ec.presence_of_element_located(self.search_results),
+                ec.presence_of_all_elements_located(self.product_titles),
+            )
         )
 
+    @measured_step
     def search_negative(self, book_title: str) -> None:
         """
         Выполнить поиск по несуществующему названию.
@@ -76,7 +174,7 @@ class SearchPage:
         :return: None
         """
         search_input = self.wait.until(
-            EC.element_to_be_clickable(self.search)
+            ec.element_to_be_clickable(self.search)
         )
         search_input.clear()
         search_input.send_keys(book_title)
@@ -84,8 +182,66 @@ class SearchPage:
         search_input.send_keys(Keys.ENTER)
 
         # Ожидание полной загрузки страницы
-        WebDriverWait(self.driver, 10).until(
-            lambda d: d.execute_script(
-                "return document.readyState"
-            ) == "complete"
-        )
+        self.wait.until(ec.document_ready())
+
+    def iter_results(self, max_results: Optional[int] = None,
+                     max_pages: Optional[int] = None
+                     ) -> Iterator[SearchResult]:
+        """
+        Обойти результаты текущего поиска.
+
+        Генератор проходит страницы пагинации, кнопку "Показать ещё" или
+        бесконечную прокрутку. Карточки страницы читаются одним скриптом,
+        причём с каждой страницы берутся только ещё не прочитанные
+        карточки, поэтому память не растёт с числом результатов.
+
+        :param max_results: предел числа результатов
+        :type max_results: int
+        :param max_pages: предел числа страниц (или подгрузок ленты)
+        :type max_pages: int
+        :return: генератор карточек
+        :rtype: Iterator[SearchResult]
+        """
+        selectors = {
+            "card": self.search_results[1],
+            "title": self.product_titles[1],
+            "price": self.product_prices[1],
+            "buy": self.buy_buttons[1],
+            "next": self.next_page[1],
+            "more": self.show_more[1],
+            "pagination": self.pagination[1],
+        }
+        produced = 0
+        pages = 0
+        start = 0
+        while True:
+            batch = self.driver.execute_script(EXTRACT_SCRIPT, selectors,
+                                               start)
+            pages += 1
+            for product_id, title, price, available in batch["items"]:
+                yield SearchResult(product_id, title, price, available)
+                produced += 1
+                if max_results is not None and produced >= max_results:
+                    return
+            if batch["next"] == "end" or (max_pages is not None
+                                          and pages >= max_pages):
+                return
+
+            if batch["next"] == "more":
+                start = batch["total"]
+                # Карточки считаются так же, как в EXTRACT_SCRIPT: без
+                # вложенных в другую карточку
+                try:
+                    EventWait(self.driver, search_scroll_timeout).until(
+                        ec.number_of_elements_more_than(
+                            self.search_results, start, top_level=True)
+                    )
+                except TimeoutException:
+                    # Лента больше не подгружается
+                    return
+            else:
+                start = 0
+                self.driver.get(batch["next"])
+                self.wait.until(
+                    ec.presence_of_element_located(self.search_results)
+                )
@@ -0,0 +1,316 @@
+import argparse
+import heapq
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+from cache_helper import read_json, write_json
+from config import (parallel_workers, test_durations_file,
+                    default_test_duration)
+
+WORKER_ID_ENV = "CG_WORKER_ID"
+SHARD_FILE_ENV = "CG_SHARD_FILE"
+DURATIONS_OUT_ENV = "CG_DURATIONS_OUT"
+
+# Вес новой длительности при обновлении истории
+DURATION_SMOOTHING = 0.5
+
+
+def worker_id() -> str:
+    """
+    Идентификатор текущего воркера параллельного прогона.
+
+    :return: "gw0", "gw1", ... или "main" вне параллельного прогона
+    :rtype: str
+    """
+    return os.getenv(WORKER_ID_ENV, "main")
+
+
+def worker_index() -> int:
+    """
+    Номер текущего воркера (0 вне параллельного прогона).
+
+    :return: номер воркера
+    :rtype: int
+    """
+    wid = worker_id()
+    return int(wid[2:]) if wid.startswith("gw") else 0
+
+
+def worker_file(path: str) -> str:
+    """
+    Путь к файлу результатов, уникальный для воркера.
+
+    :param path: исходный путь
+    :type path: str
+    :return: путь с суффиксом воркера (или исходный вне воркеров)
+    :rtype: str
+    """
+    wid = worker_id()
+    if wid == "main":
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{wid}{ext}"
+
+
+def shard(test_ids: List[str], durations: Dict[str, float],
+          workers: int) -> List[List[str]]:
+    """
+    Распределить тесты по воркерам с учётом исторических длительностей
+    (жадный алгоритм LPT: самый долгий тест - наименее загруженному).
+
+    :param test_ids: идентификаторы тестов
+    :type test_ids: list
+    :param durations: длительности тестов из истории, сек
+    :type durations: dict
+    :param workers: число воркеров
+    :type workers: int
+    :return: списки тестов по воркерам
+    :rtype: list
+    :raises ValueError: если воркеров меньше одного
+    """
+    if workers < 1:
+        raise ValueError(f"Число воркеров должно быть не меньше 1: "
+                         f"{workers}")
+    known = [durations[t] for t in test_ids if t in durations]
+    fallback = sum(known) / len(known) if known else default_test_duration
+
+    heap = [(0.0, index) for index in range(workers)]
+    shards = [[] for _ in range(workers)]
+    ordered = sorted(test_ids, key=lambda t: durations.get(t, fallback),
+                     reverse=True)
+    for test_id in ordered:
+        load, index = heapq.heappop(heap)
+        shards[index].append(test_id)
+        heapq.heappush(heap, (load + durations.get(test_id, fallback),
+                              index))
+    # Исходный порядок внутри шарда сохраняет порядок зависимых тестов
+    position = {test_id: n for n, test_id in enumerate(test_ids)}
+    return [sorted(ids, key=position.get) for ids in shards]
+
+
+def collect(pytest_args: List[str]) -> List[str]:
+    """
+    Собрать идентификаторы тестов без запуска.
+
+    :param pytest_args: аргументы pytest
+    :type pytest_args: list
+    :return: идентификаторы тестов
+    :rtype: list
+    """
+    # Флаги подробности меняют формат вывода --collect-only
+    args = [arg for arg in pytest_args
+            if arg not in ("-q", "-qq", "--quiet", "-v", "-vv", "--verbose")]
+    output = subprocess.run(
+        [sys.executable, "-m", "pytest", "--collect-only", "-q", *args],
+        capture_output=True, text=True, check=False,
+    ).stdout
+    return [line.strip() for line in output.splitlines()
+            if "::" in line and not line.startswith(" ")]
+
+
+def split_clean_alluredir(
+        pytest_args: List[str]) -> Tuple[List[str], Optional[str]]:
+    """
+    Убрать --clean-alluredir из аргументов воркеров.
+
+    Все воркеры пишут в один --alluredir, поэтому с этим флагом они
+    удаляли бы результаты друг друга; каталог очищает один раз
+    родительский процесс.
+
+    :param pytest_args: аргументы pytest
+    :type pytest_args: list
+    :return: аргументы без флага и каталог для очистки (или None)
+    :rtype: tuple
+    """
+    if "--clean-alluredir" not in pytest_args:
+        return pytest_args, None
+    args = [arg for arg in pytest_args if arg != "--clean-alluredir"]
+    alluredir = None
+    for index, arg in enumerate(args):
+        if arg.startswith("--alluredir="):
+            alluredir = arg.split("=", 1)[1]
+        elif arg == "--alluredir" and index + 1 < len(args):
+            alluredir = args[index + 1]
+    return args, alluredir
+
+
+def merge_durations(path: str, new: Dict[str, float]) -> None:
+    """
+    Обновить историю длительностей сглаженными значениями.
+
+    :param path: файл истории
+    :type path: str
+    :param new: новые длительности
+    :type new: dict
+    :return: None
+    """
+    history = read_json(path, {})
+    for test_id, duration in new.items():
+        previous = history.get(test_id)
+        history[test_id] = duration if previous is None else round(
+            previous + DURATION_SMOOTHING * (duration - previous), 4)
+    write_json(path, history)
+
+
+def run(workers: int, pytest_args: List[str]) -> int:
+    """
+    Запустить тесты в нескольких процессах.
+
+    :param workers: число воркеров
+    :type workers: int
+    :param pytest_args: аргументы pytest (в т.ч. --alluredir)
+    :type pytest_args: list
+    :return: код завершения (наибольший из кодов воркеров)
+    :rtype: int
+    :raises ValueError: если воркеров меньше одного
+    """
+    if workers < 1:
+        raise ValueError(f"Число воркеров должно быть не меньше 1: "
+                         f"{workers}")
+    pytest_args, alluredir = split_clean_alluredir(pytest_args)
+    test_ids = collect(pytest_args)
+    if not test_ids:
+        print("Тесты не найдены")
+        return 5
+
+    if alluredir:
+        shutil.rmtree(alluredir, ignore_errors=True)
+
+    durations = read_json(test_durations_file, {})
+    shards = [ids for ids in shard(test_ids, durations, workers) if ids]
+    work_dir = tempfile.mkdtemp(prefix="cg-parallel-")
+
+    processes = []
+    for index, ids in enumerate(shards):
+        wid = f"gw{index}"
+        shard_file = os.path.join(work_dir, f"{wid}.shard")
+        with open(shard_file, "w", encoding="utf-8") as ids_file:
+            ids_file.write("\n".join(ids))
+        env = dict(os.environ, **{
+            WORKER_ID_ENV: wid,
+            SHARD_FILE_ENV: shard_file,
+            DURATIONS_OUT_ENV: os.path.join(work_dir, f"{wid}.json"),
+        })
+        log = open(os.path.join(work_dir, f"{wid}.log"), "w+",
+                   encoding="utf-8")
+        expected = sum(durations.get(t, default_test_duration) for t in ids)
+        print(f"[{wid}] {len(ids)} tests, expected ~{expected:.1f}s")
+        process = subprocess.Popen(
+            [sys.executable, "-m", "pytest", "-p", "parallel_runner",
+             *pytest_args],
+            env=env, stdout=log, stderr=subprocess.STDOUT,
+        )
+        processes.append((wid, process, log, time.perf_counter()))
+
+    exit_code = 0
+    new_durations = {}
+    for wid, process, log, started in processes:
+        code = process.wait()
+        elapsed = time.perf_counter() - started
+        exit_code = max(exit_code, code)
+        log.seek(0)
+        print(f"===== [{wid}] exit {code}, {elapsed:.1f}s =====")
+        print(log.read())
+        log.close()
+        new_durations.update(
+            read_json(os.path.join(work_dir, f"{wid}.json"), {})
+        )
+
+    merge_durations(test_durations_file, new_durations)
+    return exit_code
+
+
+# --- Плагин pytest для процесса-воркера ---------------------------------
+
+_durations: Dict[str, float] = {}
+
+
+def pytest_collection_modifyitems(config, items) -> None:
+    """
+    Оставить в воркере только тесты его шарда.
+
+    :param config: конфигурация pytest
+    :param items: собранные тесты
+    :return: None
+    """
+    shard_file = os.getenv(SHARD_FILE_ENV)
+    if not shard_file:
+        return
+    with open(shard_file, encoding="utf-8") as ids_file:
+        selected = set(ids_file.read().splitlines())
+    keep = [item for item in items if item.nodeid in selected]
+    deselected = [item for item in items if item.nodeid not in selected]
+    if deselected:
+        config.hook.pytest_deselected(items=deselected)
+    items[:] = keep
+
+
+def pytest_runtest_logreport(report) -> None:
+    """
+    Накопить длительность теста (setup + call + teardown).
+
+    :param report: отчёт фазы теста
+    :return: None
+    """
+    _durations[report.nodeid] = (_durations.get(report.nodeid, 0.0)
+                                 + report.duration)
+
+
+def pytest_sessionfinish(session) -> None:
+    """
+    Записать длительности тестов воркера для истории.
+
+    :param session: сессия pytest
+    :return: None
+    """
+    out = os.getenv(DURATIONS_OUT_ENV)
+    if out:
+        write_json(out, {test_id: round(duration, 4)
+                         for test_id, duration in _durations.items()})
+
+
+def _workers_count(value: str) -> int:
+    """
+    Разобрать число воркеров из командной строки.
+
+    :param value: значение опции -n
+    :type value: str
+    :return: число воркеров
+    :rtype: int
+    :raises argparse.ArgumentTypeError: если число меньше 1
+    """
+    try:
+        workers = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"не число: {value}")
+    if workers < 1:
+        raise argparse.ArgumentTypeError(
+            f"нужен хотя бы один воркер: {value}")
+    return workers
+
+
+def main() -> None:
+    """
+    Запустить параллельный прогон из командной строки.
+
+    Все аргументы после известных опций передаются pytest, например:
+    python parallel_runner.py -n 4 -m api --alluredir=allure-results
+
+    :return: None
+    """
+    parser = argparse.ArgumentParser(
+        description="Параллельный запуск тестов с балансировкой по времени"
+    )
+    parser.add_argument("-n", "--workers", type=_workers_count,
+                        default=parallel_workers)
+    args, pytest_args = parser.parse_known_args()
+    sys.exit(run(args.workers, pytest_args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,471 @@
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from typing import Callable, Iterable, Optional
+
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.remote.webdriver import WebDriver
+from cache_helper import FileLock, read_json, write_json
+from driver_resolver import binary_fingerprint
+from config import (profile_template_dir, profile_template_ttl,
+                    profile_warm_urls, profile_banner_selectors,
+                    profile_service_worker_timeout, ui_token_cookie)
+
+# Файлы, которые Chrome держит открытыми или пересоздаёт при запуске;
+# в шаблон и его копии они не попадают
+VOLATILE_FILES = ("SingletonLock", "SingletonSocket", "SingletonCookie",
+                  "lockfile", "LOCK", "Crashpad", "BrowserMetrics",
+                  "DevToolsActivePort")
+
+# Нажать видимые кнопки баннеров (куки, выбор региона)
+BANNER_SCRIPT = """
+var clicked = 0;
+arguments[0].forEach(function (selector) {
+    document.querySelectorAll(selector).forEach(function (element) {
+        if (element.offsetParent !== null) {
+            element.click();
+            clicked += 1;
+        }
+    });
+});
+return clicked;
+"""
+
+# Дождаться активации service worker страницы (если он есть)
+SERVICE_WORKER_SCRIPT = """
+var done = arguments[arguments.length - 1];
+if (!('serviceWorker' in navigator)) { done(false); return; }
+setTimeout(function () { done(false); }, arguments[0]);
+navigator.serviceWorker.getRegistration().then(function (registration) {
+    if (!registration) { done(false); return; }
+    navigator.serviceWorker.ready.then(function () { done(true); });
+}).catch(function () { done(false); });
+"""
+
+# Куки идентичности пользователя сайта: с ними все копии шаблона
+# начинали бы как один анонимный пользователь с общей корзиной
+IDENTITY_COOKIES = (ui_token_cookie,)
+
+LOAD_TIME_SCRIPT = """
+var nav = performance.getEntriesByType('navigation')[0];
+return nav && nav.loadEventEnd ? nav.loadEventEnd : null;
+"""
+
+
+def _ignore_volatile(directory: str, names: list) -> list:
+    return [name for name in names if name in VOLATILE_FILES]
+
+
+def page_load_ms(driver: WebDriver) -> Optional[float]:
+    """
+    Время загрузки текущей страницы по Navigation Timing.
+
+    :param driver: WebDriver - Экземпляр WebDriver
+    :type driver: WebDriver
+    :return: loadEventEnd, мс, или None, если страница не загружена
+    :rtype: float
+    """
+    try:
+        value = driver.execute_script(LOAD_TIME_SCRIPT)
+    except WebDriverException:
+        return None
+    return round(value, 1) if value is not None else None
+
+
+class ProfileTemplate:
+    """
+    Прогретый шаблон профиля Chrome.
+
+    Шаблон собирается один раз: браузер с пустым профилем открывает
+    warm_urls, принимает баннеры (куки, регион) и ждёт установки service
+    worker, после чего профиль с HTTP кэшем, кэшем скриптов, service
+    workers и куками баннеров сохраняется; куки идентичности (токен
+    пользователя) и сессионные куки удаляются, чтобы у каждой копии
+    была своя корзина. Каждая сессия получает свою копию
+    шаблона (Chrome не позволяет двум процессам открыть один профиль).
+    Шаблон пересобирается по истечении TTL, при обновлении Chrome
+    (изменился исполняемый файл) или если запущенный браузер сообщил
+    другую версию. Сборку выполняет один воркер, остальные ждут
+    блокировку и копируют готовый шаблон. Неудачная сборка не
+    повторяется в процессе до истечения TTL: сессии стартуют с пустым
+    профилем.
+    """
+
+    def __init__(self, template_dir: str = profile_template_dir,
+                 ttl: float = profile_template_ttl,
+                 warm_urls: Iterable[str] = profile_warm_urls,
+                 banner_selectors: Iterable[str] = profile_banner_selectors,
+                 service_worker_timeout: float = (
+                     profile_service_worker_timeout)) -> None:
+        """
+        Инициализация шаблона.
+
+        :param template_dir: каталог шаблонов
+        :type template_dir: str
+        :param ttl: время жизни шаблона, сек
+        :type ttl: float
+        :param warm_urls: страницы для прогрева
+        :type warm_urls: Iterable[str]
+        :param banner_selectors: CSS селекторы кнопок "принять" баннеров
+        :type banner_selectors: Iterable[str]
+        :param service_worker_timeout: ожидание service worker, сек
+        :type service_worker_timeout: float
+        """
+        self.template_dir = template_dir
+        self.meta_file = os.path.join(template_dir, "template.json")
+        self.ttl = ttl
+        self.warm_urls = list(warm_urls)
+        self.banner_selectors = list(banner_selectors)
+        self.service_worker_timeout = service_worker_timeout
+        self.builds = 0
+        self.copies = 0
+        self.copy_time = 0.0
+        self.cold_loads = []
+        self.warm_loads = []
+        self._meta = None
+        self._failed_at = None
+        self._lock = threading.Lock()
+
+    def checkout(self, launcher: Callable[[str], WebDriver],
+                 browser_path: Optional[str] = None) -> Optional[str]:
+        """
+        Получить копию шаблона для новой сессии.
+
+        :param launcher: функция запуска Chrome с заданным каталогом
+            профиля (для сборки шаблона)
+        :type launcher: Callable
+        :param browser_path: путь к Chrome, если известен
+        :type browser_path: str
+        :return: каталог копии профиля или None, если шаблон собрать
+            не удалось
+        :rtype: str
+        """
+        for _ in range(2):
+            meta = self.ensure(launcher, browser_path)
+            if meta is None:
+                return None
+            start = time.perf_counter()
+            copy = tempfile.mkdtemp(prefix="cg_profile_")
+            try:
+                shutil.copytree(meta["path"], copy, dirs_exist_ok=True,
+                                ignore=_ignore_volatile, symlinks=True)
+            except (OSError, shutil.Error):
+                # Шаблон пересобрал другой воркер, пока шло копирование
+                shutil.rmtree(copy, ignore_errors=True)
+                self.invalidate(meta)
+                continue
+            with self._lock:
+                self.copies += 1
+                self.copy_time += time.perf_counter() - start
+            return copy
+        return None
+
+    def ensure(self, launcher: Callable[[str], WebDriver],
+               browser_path: Optional[str] = None) -> Optional[dict]:
+        """
+        Проверить шаблон и собрать его, если он устарел.
+
+        :param launcher: функция запуска Chrome с каталогом профиля
+        :type launcher: Callable
+        :param browser_path: путь к Chrome, если известен
+        :type browser_path: str
+        :return: метаданные шаблона или None, если сборка не удалась
+        :rtype: dict
+        """
+        fingerprint = binary_fingerprint(browser_path)
+        meta = self._meta
+        if self._is_valid(meta, fingerprint):
+            return meta
+
+        with self._lock:
+            if self._failed_at is not None \
+                    and time.time() - self._failed_at < self.ttl:
+                return None
+            meta = read_json(self.meta_file)
+            if not self._is_valid(meta, fingerprint):
+                os.makedirs(self.template_dir, exist_ok=True)
+                # Сборка занимает десятки секунд: ждём её дольше
+                # обычного и не считаем lock-файл брошенным раньше
+                with FileLock(self.meta_file + ".lock", timeout=180,
+                              stale_after=240):
+                    meta = read_json(self.meta_file)
+                    if not self._is_valid(meta, fingerprint):
+                        meta = self._build(launcher, fingerprint)
+            # Иначе каждая новая сессия запускала бы ещё один Chrome
+            # для повторной сборки
+            self._failed_at = time.time() if meta is None else None
+            self._meta = meta
+            return meta
+
+    def verify(self, driver: WebDriver) -> bool:
+        """
+        Сверить версию запущенного Chrome с версией шаблона.
+
+        Нужна, если путь к Chrome неизвестен и обновление браузера не
+        видно по исполняемому файлу. При расхождении шаблон помечается
+        устаревшим и пересобирается для следующей сессии.
+
+        :param driver: WebDriver - Экземпляр WebDriver
+        :type driver: WebDriver
+        :return: True, если версии совпадают
+        :rtype: bool
+        """
+        meta = self._meta
+        version = driver.capabilities.get("browserVersion")
+        if meta is None or version == meta["browser_version"]:
+            return True
+        self.invalidate(meta)
+        return False
+
+    def invalidate(self, meta: Optional[dict] = None) -> None:
+        """
+        Пометить шаблон устаревшим.
+
+        :param meta: метаданные устаревшего шаблона; если шаблон уже
+            пересобран другим воркером, он не сбрасывается
+        :type meta: dict
+        :return: None
+        """
+        with self._lock:
+            self._meta = None
+            with FileLock(self.meta_file + ".lock", timeout=180,
+                          stale_after=240):
+                current = read_json(self.meta_file)
+                if current and (meta is None
+                                or current["path"] == meta["path"]):
+                    try:
+                        os.remove(self.meta_file)
+                    except OSError:
+                        pass
+
+    @staticmethod
+    def release(profile_dir: Optional[str]) -> None:
+        """
+        Удалить копию профиля после закрытия браузера.
+
+        :param profile_dir: каталог копии
+        :type profile_dir: str
+        :return: None
+        """
+        if profile_dir:
+            shutil.rmtree(profile_dir, ignore_errors=True)
+
+    def record_first_load(self, driver: WebDriver) -> Optional[float]:
+        """
+        Учесть загрузку первой страницы новой сессии.
+
+        Сессия с копией шаблона считается тёплой, с пустым профилем -
+        холодной.
+
+        :param driver: WebDriver - Экземпляр WebDriver
+        :type driver: WebDriver
+        :return: время загрузки, мс
+        :rtype: float
+        """
+        load_ms = page_load_ms(driver)
+        if load_ms is None:
+            return None
+        warm = getattr(driver, "profile_copy", None) is not None
+        with self._lock:
+            (self.warm_loads if warm else self.cold_loads).append(load_ms)
+        return load_ms
+
+    def stats(self) -> dict:
+        """
+        Статистика шаблона: холодная и тёплая загрузка первой страницы.
+
+        Если холодных сессий в прогоне не было, холодное время берётся
+        из последней сборки шаблона.
+
+        :return: словарь со статистикой
+        :rtype: dict
+        """
+        def median(values: list) -> Optional[float]:
+            return round(statistics.median(values), 1) if values else None
+
+        with self._lock:
+            meta = self._meta or read_json(self.meta_file) or {}
+            cold = median(self.cold_loads)
+            return {
+                "builds": self.builds,
+                "copies": self.copies,
+                "copy_ms": round(self.copy_time * 1000 / self.copies, 1)
+                if self.copies else None,
+                "cold_sessions": len(self.cold_loads),
+                "warm_sessions": len(self.warm_loads),
+                "cold_load_ms": cold if cold is not None
+                else meta.get("cold_load_ms"),
+                "warm_load_ms": median(self.warm_loads),
+                "browser_version": meta.get("browser_version"),
+                "template_age_s": round(time.time() - meta["built_at"])
+                if meta else None,
+            }
+
+    def _build(self, launcher: Callable[[str], WebDriver],
+               fingerprint: Optional[list]) -> Optional[dict]:
+        """
+        Собрать шаблон профиля.
+
+        :param launcher: функция запуска Chrome с каталогом профиля
+        :type launcher: Callable
+        :param fingerprint: отпечаток исполняемого файла Chrome
+        :type fingerprint: list
+        :return: метаданные шаблона или None, если Chrome не запустился
+        :rtype: dict
+        """
+        start = time.perf_counter()
+        build_dir = tempfile.mkdtemp(prefix="build_", dir=self.template_dir)
+        try:
+            driver = launcher(build_dir)
+        except WebDriverException:
+            shutil.rmtree(build_dir, ignore_errors=True)
+            return None
+        cold_load_ms = None
+        try:
+            for url in self.warm_urls:
+                driver.get(url)
+                if cold_load_ms is None:
+                    cold_load_ms = page_load_ms(driver)
+                self._accept_banners(driver)
+            # Повторный заход: service worker успел установиться и
+            # забрать свои ресурсы в Cache Storage
+            driver.get(self.warm_urls[0])
+            self._accept_banners(driver)
+            self._wait_service_worker(driver)
+            self._drop_identity_cookies(driver)
+            browser_version = driver.capabilities.get("browserVersion")
+        except WebDriverException:
+            shutil.rmtree(build_dir, ignore_errors=True)
+            return None
+        finally:
+            try:
+                driver.quit()
+            except WebDriverException:
+                pass
+
+        built_at = time.time()
+        path = os.path.join(self.template_dir, f"v{int(built_at * 1000)}")
+        os.replace(build_dir, path)
+        meta = {
+            "path": path,
+            "browser_version": browser_version,
+            "browser_fingerprint": fingerprint,
+            "built_at": built_at,
+            "build_seconds": round(time.perf_counter() - start, 1),
+            "cold_load_ms": cold_load_ms,
+        }
+        write_json(self.meta_file, meta)
+        # Старые версии и брошенные сборки (сборку выполняет только
+        # владелец блокировки). Старую версию могут ещё копировать:
+        # checkout() повторит копирование с новой
+        for name in os.listdir(self.template_dir):
+            stale = os.path.join(self.template_dir, name)
+            if stale != path and name.startswith(("v", "build_")):
+                shutil.rmtree(stale, ignore_errors=True)
+        self.builds += 1
+        return meta
+
+    def _accept_banners(self, driver: WebDriver) -> int:
+        """
+        Принять баннеры страницы (куки, регион).
+
+        :param driver: WebDriver - Экземпляр WebDriver
+        :type driver: WebDriver
+        :return: число нажатых кнопок
+        :rtype: int
+        """
+        if not self.banner_selectors:
+            return 0
+        try:
+            return driver.execute_script(BANNER_SCRIPT,
+                                         self.banner_selectors)
+        except WebDriverException:
+            return 0
+
+    @staticmethod
+    def _drop_identity_cookies(driver: WebDriver) -> int:
+        """
+        Удалить из профиля куки идентичности и сессионные куки.
+
+        Куки удаляются до закрытия браузера, поэтому в файл профиля
+        они не попадают. Куки DDoS-Guard и баннеров остаются.
+
+        :param driver: WebDriver - Экземпляр WebDriver
+        :type driver: WebDriver
+        :return: число удалённых кук
+        :rtype: int
+        """
+        try:
+            cookies = driver.execute_cdp_cmd("Network.getAllCookies",
+                                             {})["cookies"]
+        except (AttributeError, KeyError, WebDriverException):
+            # Без DevTools удаляются куки идентичности текущего сайта
+            for name in IDENTITY_COOKIES:
+                driver.delete_cookie(name)
+            return len(IDENTITY_COOKIES)
+        dropped = 0
+        for cookie in cookies:
+            if cookie["name"] in IDENTITY_COOKIES or cookie.get("session"):
+                driver.execute_cdp_cmd("Network.deleteCookies", {
+                    "name": cookie["name"], "domain": cookie["domain"],
+                    "path": cookie.get("path", "/")})
+                dropped += 1
+        return dropped
+
+    def _wait_service_worker(self, driver: WebDriver) -> bool:
+        """
+        Дождаться активации service worker текущей страницы.
+
+        :param driver: WebDriver - Экземпляр WebDriver
+        :type driver: WebDriver
+        :return: True, если service worker активен
+        :rtype: bool
+        """
+        timeout_ms = int(self.service_worker_timeout * 1000)
+        try:
+            driver.set_script_timeout(self.service_worker_timeout + 1)
+            return bool(driver.execute_async_script(SERVICE_WORKER_SCRIPT,
+                                                    timeout_ms))
+        except WebDriverException:
+            return False
+
+    def _is_valid(self, meta: Optional[dict],
+                  fingerprint: Optional[list]) -> bool:
+        """
+        Проверить, что шаблон можно использовать.
+
+        :param meta: метаданные шаблона
+        :type meta: dict
+        :param fingerprint: отпечаток исполняемого файла Chrome
+        :type fingerprint: list
+        :return: True, если шаблон на месте, TTL не истёк и Chrome не
+            обновлялся
+        :rtype: bool
+        """
+        if not meta or time.time() - meta.get("built_at", 0) > self.ttl:
+            return False
+        if not os.path.isdir(meta.get("path") or ""):
+            return False
+        return fingerprint is None \
+            or meta.get("browser_fingerprint") in (None, fingerprint)
+
+
+_default_template = None
+_default_template_lock = threading.Lock()
+
+
+def get_profile_template() -> ProfileTemplate:
+    """
+    Получить общий для процесса шаблон профиля.
+
+    :return: ProfileTemplate instance
+    :rtype: ProfileTemplate
+    """
+    global _default_template
+    with _default_template_lock:
+        if _default_template is None:
+            _default_template = ProfileTemplate()
+        return _default_template
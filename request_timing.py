@@ -0,0 +1,247 @@
+import threading
+import time
+from collections import deque
+from typing import List, Optional
+
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from cache_helper import write_json
+from config import timing_records_max
+
+_local = threading.local()
+
+
+def reset_connect_time() -> None:
+    """
+    Обнулить счётчик времени установки соединений текущего потока.
+
+    :return: None
+    """
+    _local.connect = 0.0
+
+
+def connect_time() -> float:
+    """
+    Время установки соединений с момента последнего сброса, сек.
+
+    :return: время соединения (0, если использовано открытое соединение)
+    :rtype: float
+    """
+    return getattr(_local, "connect", 0.0)
+
+
+class _TimedConnectMixin:
+    """
+    Замер времени connect() (TCP, а для HTTPS и TLS рукопожатия).
+    """
+
+    def connect(self) -> None:
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _local.connect = connect_time() + time.perf_counter() - start
+
+
+class TimedHTTPConnection(_TimedConnectMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(_TimedConnectMixin, HTTPSConnection):
+    pass
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+TIMED_POOL_CLASSES = {
+    "http": TimedHTTPConnectionPool,
+    "https": TimedHTTPSConnectionPool,
+}
+
+# Колонки таблицы замеров: (ключ записи, заголовок, множитель)
+TABLE_COLUMNS = (
+    ("operation", "operation", None),
+    ("status", "status", None),
+    ("cookie_s", "cookie ms", 1000),
+    ("connect_s", "connect ms", 1000),
+    ("ttfb_s", "ttfb ms", 1000),
+    ("wait_s", "wait ms", 1000),
+    ("retries", "retries", None),
+    ("total_s", "total ms", 1000),
+    ("request_bytes", "req B", None),
+    ("response_bytes", "resp B", None),
+)
+
+
+class TimingRecorder:
+    """
+    Потокобезопасное хранилище замеров запросов за прогон.
+
+    Память ограничена: в records остаются последние max_records
+    замеров (для таблиц в отчёте), а сводка по операциям считается
+    нарастающим итогом; медиана - по последним max_records замерам
+    операции.
+    """
+
+    def __init__(self, max_records: int = timing_records_max) -> None:
+        """
+        Инициализация хранилища.
+
+        :param max_records: сколько последних замеров хранить
+        :type max_records: int
+        """
+        self.max_records = max_records
+        self.records = deque(maxlen=max_records)
+        self._added = 0
+        self._operations = {}
+        self._lock = threading.Lock()
+
+    def add(self, record: dict) -> None:
+        """
+        Добавить замер запроса.
+
+        :param record: замер
+        :type record: dict
+        :return: None
+        """
+        with self._lock:
+            self.records.append(record)
+            self._added += 1
+            stats = self._operations.get(record["operation"])
+            if stats is None:
+                stats = self._operations[record["operation"]] = {
+                    "count": 0, "total_s": 0.0, "total_s_max": 0.0,
+                    "totals": deque(maxlen=self.max_records),
+                    "cookie_s": 0.0, "connect_s": 0.0, "ttfb_s": 0.0,
+                    "wait_s": 0.0, "retries": 0, "new_connections": 0,
+                    "request_bytes": 0, "response_bytes": 0,
+                }
+            stats["count"] += 1
+            stats["total_s"] += record["total_s"]
+            stats["total_s_max"] = max(stats["total_s_max"],
+                                       record["total_s"])
+            stats["totals"].append(record["total_s"])
+            for key in ("cookie_s", "connect_s", "ttfb_s",
+                        "request_bytes", "response_bytes"):
+                stats[key] += record[key]
+            stats["wait_s"] += record.get("wait_s", 0.0)
+            stats["retries"] += record.get("retries", 0)
+            stats["new_connections"] += 1 if record["connect_s"] else 0
+
+    def mark(self) -> int:
+        """
+        Текущая позиция, с которой можно получить новые замеры.
+
+        :return: число добавленных замеров
+        :rtype: int
+        """
+        with self._lock:
+            return self._added
+
+    def since(self, position: int) -> List[dict]:
+        """
+        Замеры, добавленные после позиции mark() (не старше последних
+        max_records).
+
+        :param position: позиция
+        :type position: int
+        :return: список замеров
+        :rtype: list
+        """
+        with self._lock:
+            skip = position - (self._added - len(self.records))
+            return list(self.records)[max(skip, 0):]
+
+    @staticmethod
+    def table(records: List[dict]) -> str:
+        """
+        Текстовая таблица замеров.
+
+        :param records: замеры
+        :type records: list
+        :return: таблица
+        :rtype: str
+        """
+        rows = [[title for _, title, _ in TABLE_COLUMNS]]
+        for record in records:
+            row = []
+            for key, _, scale in TABLE_COLUMNS:
+                value = record.get(key, "")
+                if scale:
+                    value = f"{value * scale:.1f}"
+                row.append(str(value))
+            rows.append(row)
+        widths = [max(len(row[i]) for row in rows)
+                  for i in range(len(TABLE_COLUMNS))]
+        return "\n".join(
+            "  ".join(cell.ljust(width) for cell, width in zip(row, widths))
+            for row in rows
+        )
+
+    def summary(self) -> dict:
+        """
+        Сводка за прогон по операциям.
+
+        :return: словарь операция -> агрегаты (мс, байты)
+        :rtype: dict
+        """
+        with self._lock:
+            operations = {operation: dict(stats, totals=sorted(
+                stats["totals"]))
+                for operation, stats in self._operations.items()}
+            requests_total = self._added
+
+        summary = {}
+        for operation, stats in operations.items():
+            count = stats["count"]
+            totals = stats["totals"]
+            summary[operation] = {
+                "count": count,
+                "total_ms_mean": round(stats["total_s"] / count * 1000, 2),
+                "total_ms_p50": round(
+                    totals[(len(totals) - 1) // 2] * 1000, 2),
+                "total_ms_max": round(stats["total_s_max"] * 1000, 2),
+                "cookie_ms_sum": round(stats["cookie_s"] * 1000, 2),
+                "connect_ms_sum": round(stats["connect_s"] * 1000, 2),
+                "ttfb_ms_mean": round(stats["ttfb_s"] / count * 1000, 2),
+                "wait_ms_sum": round(stats["wait_s"] * 1000, 2),
+                "retries": stats["retries"],
+                "new_connections": stats["new_connections"],
+                "request_bytes": stats["request_bytes"],
+                "response_bytes": stats["response_bytes"],
+            }
+        return {"requests": requests_total, "operations": summary}
+
+    def write_summary(self, path: str) -> Optional[dict]:
+        """
+        Записать сводку прогона в JSON.
+
+        :param path: путь к файлу
+        :type path: str
+        :return: сводка или None, если замеров не было
+        :rtype: dict
+        """
+        summary = self.summary()
+        if not summary["requests"]:
+            return None
+        write_json(path, summary)
+        return summary
+
+
+_recorder = TimingRecorder()
+
+
+def get_timing_recorder() -> TimingRecorder:
+    """
+    Получить общий для процесса регистратор замеров.
+
+    :return: TimingRecorder instance
+    :rtype: TimingRecorder
+    """
+    return _recorder
@@ -0,0 +1,478 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Iterable, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from cache_helper import FileLock, read_json, write_json
+from cassette import CassetteMissError
+from cookie_helper import CookieProvider
+from config import (rate_limit_rps, rate_limit_burst, rate_limit_min_rps,
+                    rate_limit_hosts, rate_limit_state_file,
+                    retry_max_attempts, retry_statuses, retry_base_delay,
+                    retry_max_delay, breaker_failure_threshold,
+                    breaker_reset_timeout)
+
+# Снижение частоты при отказе сервера и доля rate, на которую частота
+# растёт после каждого успешного запроса (AIMD)
+RATE_DECREASE = 0.5
+RATE_INCREASE = 0.05
+
+# Методы, повтор которых не меняет состояние на сервере: их можно
+# повторить после таймаута чтения и 5xx, когда запрос мог дойти
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """
+    Запрос не отправлен: circuit breaker разомкнут после серии неудач.
+    """
+
+
+class TokenBucket:
+    """
+    Ограничитель частоты запросов (token bucket).
+
+    Состояние корзины (токены, время обновления и текущая частота)
+    хранится в общем файле под FileLock, поэтому лимит действует на все
+    потоки и процессы прогона. Токен резервируется под блокировкой, а
+    ожидание выполняется уже без неё: при нехватке токенов их счётчик
+    уходит в минус, и каждый следующий запрос ждёт своей очереди.
+    """
+
+    def __init__(self, rate: float = rate_limit_rps,
+                 burst: int = rate_limit_burst,
+                 min_rate: float = rate_limit_min_rps,
+                 state_file: Optional[str] = rate_limit_state_file,
+                 name: str = "default") -> None:
+        """
+        Инициализация ограничителя.
+
+        :param rate: максимальная частота, запросов в секунду
+        :type rate: float
+        :param burst: ёмкость корзины (запросов без ожидания)
+        :type burst: int
+        :param min_rate: минимальная частота после снижений
+        :type min_rate: float
+        :param state_file: файл общего состояния; None - только в памяти
+            процесса
+        :type state_file: str
+        :param name: имя корзины в файле состояния (например, хост)
+        :type name: str
+        """
+        self.max_rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.state_file = state_file
+        self.name = name
+        self.rate = rate
+        self._state = {}
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Дождаться разрешения на запрос.
+
+        :return: время ожидания, сек
+        :rtype: float
+        """
+        with self._bucket() as bucket:
+            now = time.time()
+            tokens = min(self.burst, bucket["tokens"]
+                         + (now - bucket["updated"]) * bucket["rate"])
+            bucket["tokens"] = tokens - 1
+            bucket["updated"] = now
+            delay = max(-bucket["tokens"] / bucket["rate"], 0.0)
+        if delay:
+            time.sleep(delay)
+        return delay
+
+    def penalize(self) -> None:
+        """
+        Снизить частоту после отказа сервера (429, DDoS-Guard).
+
+        :return: None
+        """
+        with self._bucket() as bucket:
+            bucket["rate"] = max(self.min_rate,
+                                 bucket["rate"] * RATE_DECREASE)
+
+    def reward(self) -> None:
+        """
+        Плавно вернуть частоту к максимальной после успешного запроса.
+
+        :return: None
+        """
+        if self.rate >= self.max_rate:
+            return
+        with self._bucket() as bucket:
+            bucket["rate"] = min(
+                self.max_rate, bucket["rate"] + self.max_rate * RATE_INCREASE)
+
+    @contextmanager
+    def _bucket(self):
+        """
+        Получить состояние корзины под блокировкой и сохранить его.
+
+        :yields: словарь с ключами tokens, updated, rate
+        """
+        with self._lock:
+            if self.state_file is None:
+                yield self._load(self._state)
+                self.rate = self._state[self.name]["rate"]
+                return
+            with FileLock(self.state_file + ".lock", poll=0.002):
+                state = read_json(self.state_file, {})
+                yield self._load(state)
+                write_json(self.state_file, state)
+            self.rate = state[self.name]["rate"]
+
+    def _load(self, state: dict) -> dict:
+        """
+        Достать (или создать) состояние корзины из общего словаря.
+
+        :param state: состояние всех корзин
+        :type state: dict
+        :return: состояние этой корзины
+        :rtype: dict
+        """
+        bucket = state.get(self.name)
+        if not bucket or bucket.get("max_rate") != self.max_rate:
+            # Новая корзина или изменившийся в config.py лимит
+            bucket = {"tokens": float(self.burst), "updated": time.time(),
+                      "rate": self.max_rate, "max_rate": self.max_rate}
+            state[self.name] = bucket
+        return bucket
+
+
+class RetryPolicy:
+    """
+    Политика повторов: экспоненциальная задержка с полным джиттером,
+    Retry-After сервера имеет приоритет.
+    """
+
+    def __init__(self, max_attempts: int = retry_max_attempts,
+                 statuses: Iterable[int] = retry_statuses,
+                 base_delay: float = retry_base_delay,
+                 max_delay: float = retry_max_delay) -> None:
+        """
+        Инициализация политики.
+
+        :param max_attempts: всего попыток, включая первую
+        :type max_attempts: int
+        :param statuses: HTTP статусы для повтора
+        :type statuses: Iterable[int]
+        :param base_delay: базовая задержка, сек
+        :type base_delay: float
+        :param max_delay: предел задержки и Retry-After, сек
+        :type max_delay: float
+        """
+        self.max_attempts = max_attempts
+        self.statuses = frozenset(statuses)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def is_retryable(self, response: requests.Response,
+                     idempotent: bool = True) -> bool:
+        """
+        Проверить, что ответ стоит повторить.
+
+        Заглушку DDoS-Guard повторяет сам клиент API с новыми куками,
+        поэтому здесь она не повторяется. Неидемпотентный запрос
+        повторяется только после 429: при 5xx сервер мог его выполнить.
+
+        :param response: ответ сервера
+        :type response: requests.Response
+        :param idempotent: запрос можно безопасно выполнить повторно
+        :type idempotent: bool
+        :return: True для статусов из statuses (для неидемпотентных
+            запросов - только 429)
+        :rtype: bool
+        """
+        if not idempotent:
+            return response.status_code == 429 \
+                and 429 in self.statuses
+        return response.status_code in self.statuses
+
+    @staticmethod
+    def is_retryable_error(error: Exception,
+                           idempotent: bool = True) -> bool:
+        """
+        Проверить, что сетевую ошибку стоит повторить.
+
+        :param error: исключение при отправке запроса
+        :type error: Exception
+        :param idempotent: запрос можно безопасно выполнить повторно
+        :type idempotent: bool
+        :return: True для любой сетевой ошибки идемпотентного запроса и
+            для таймаута соединения (запрос не отправлен) остальных
+        :rtype: bool
+        """
+        if idempotent:
+            return True
+        return isinstance(error, requests.exceptions.ConnectTimeout)
+
+    @staticmethod
+    def is_throttled(response: requests.Response) -> bool:
+        """
+        Проверить, что сервер ограничивает частоту запросов.
+
+        :param response: ответ сервера
+        :type response: requests.Response
+        :return: True для 429 и заглушки DDoS-Guard
+        :rtype: bool
+        """
+        return response.status_code == 429 \
+            or CookieProvider.is_stale_response(response)
+
+    def delay(self, retry: int,
+              response: Optional[requests.Response] = None) -> float:
+        """
+        Задержка перед повтором.
+
+        :param retry: номер повтора, начиная с 0
+        :type retry: int
+        :param response: ответ сервера (None при сетевой ошибке)
+        :type response: requests.Response
+        :return: задержка, сек
+        :rtype: float
+        """
+        retry_after = self._retry_after(response)
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return random.uniform(
+            0, min(self.max_delay, self.base_delay * 2 ** retry))
+
+    @staticmethod
+    def _retry_after(
+            response: Optional[requests.Response]) -> Optional[float]:
+        """
+        Прочитать Retry-After (секунды или HTTP дата).
+
+        :param response: ответ сервера
+        :type response: requests.Response
+        :return: задержка, сек, или None
+        :rtype: float
+        """
+        if response is None:
+            return None
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            pass
+        try:
+            moment = parsedate_to_datetime(value).timestamp()
+        except (TypeError, ValueError):
+            return None
+        return max(moment - time.time(), 0.0)
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker для хоста API.
+
+    Неудачей считаются сетевые ошибки и повторяемые ответы, кроме
+    ограничения частоты (429, DDoS-Guard): сервер, который просит
+    замедлиться, работоспособен. После failure_threshold неудач подряд
+    цепь размыкается, и запросы сразу завершаются CircuitOpenError.
+    Через reset_timeout секунд пропускается один пробный запрос: успех
+    замыкает цепь, неудача снова размыкает её.
+    """
+
+    def __init__(self, failure_threshold: int = breaker_failure_threshold,
+                 reset_timeout: float = breaker_reset_timeout) -> None:
+        """
+        Инициализация circuit breaker.
+
+        :param failure_threshold: неудач подряд до размыкания
+        :type failure_threshold: int
+        :param reset_timeout: время до пробного запроса, сек
+        :type reset_timeout: float
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.rejected = 0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """
+        Состояние цепи: "closed", "open" или "half-open".
+
+        :return: состояние
+        :rtype: str
+        """
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return "open"
+        return "half-open"
+
+    def before_call(self) -> None:
+        """
+        Проверить, можно ли отправить запрос.
+
+        :return: None
+        :raises CircuitOpenError: если цепь разомкнута
+        """
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return
+            if state == "half-open" and not self._trial:
+                self._trial = True
+                return
+            self.rejected += 1
+        raise CircuitOpenError(
+            f"Circuit breaker разомкнут после {self.failures} неудач подряд"
+        )
+
+    def record_success(self) -> None:
+        """
+        Учесть успешный запрос.
+
+        :return: None
+        """
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self) -> None:
+        """
+        Учесть неудачный запрос.
+
+        :return: None
+        """
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial = False
+
+
+class RequestGuard:
+    """
+    Защита запросов к хосту: ограничение частоты, повторы с задержкой
+    и circuit breaker.
+    """
+
+    def __init__(self, limiter: Optional[TokenBucket] = None,
+                 retry: Optional[RetryPolicy] = None,
+                 breaker: Optional[CircuitBreaker] = None) -> None:
+        """
+        Инициализация защиты.
+
+        :param limiter: ограничитель частоты; None - без ограничения
+        :type limiter: TokenBucket
+        :param retry: политика повторов; по умолчанию из config.py
+        :type retry: RetryPolicy
+        :param breaker: circuit breaker; по умолчанию из config.py
+        :type breaker: CircuitBreaker
+        """
+        self.limiter = limiter
+        self.retry = retry or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+
+    def call(self, send: Callable[[], requests.Response],
+             idempotent: bool = True) -> Tuple[requests.Response, dict]:
+        """
+        Выполнить запрос с защитой.
+
+        :param send: функция, отправляющая запрос
+        :type send: Callable
+        :param idempotent: запрос можно безопасно выполнить повторно
+            (GET); для POST и DELETE повторяются только таймаут
+            соединения и 429
+        :type idempotent: bool
+        :return: ответ и сведения о попытках (retries, wait_s)
+        :rtype: tuple
+        :raises CircuitOpenError: если цепь разомкнута
+        """
+        retries = 0
+        waited = 0.0
+        while True:
+            self.breaker.before_call()
+            if self.limiter is not None:
+                waited += self.limiter.acquire()
+            last_attempt = retries + 1 >= self.retry.max_attempts
+            try:
+                response = send()
+            except CassetteMissError:
+                raise
+            except (requests.exceptions.ConnectionError,
+                    requests.exceptions.Timeout) as error:
+                self.breaker.record_failure()
+                if last_attempt \
+                        or not self.retry.is_retryable_error(error,
+                                                             idempotent):
+                    raise
+                response = None
+            else:
+                throttled = self.retry.is_throttled(response)
+                if self.limiter is not None:
+                    if throttled:
+                        self.limiter.penalize()
+                    else:
+                        self.limiter.reward()
+                # 5xx - неудача для circuit breaker, даже если запрос
+                # неидемпотентный и не повторяется
+                if throttled or not self.retry.is_retryable(response):
+                    self.breaker.record_success()
+                else:
+                    self.breaker.record_failure()
+                retryable = self.retry.is_retryable(response, idempotent)
+                if not retryable or last_attempt:
+                    return response, {"retries": retries, "wait_s": waited}
+
+            delay = self.retry.delay(retries, response)
+            time.sleep(delay)
+            waited += delay
+            retries += 1
+
+
+_guards: Dict[str, RequestGuard] = {}
+_guards_lock = threading.Lock()
+
+
+def get_request_guard(url: str, scope: Optional[str] = None,
+                      rate: float = rate_limit_rps,
+                      burst: int = rate_limit_burst) -> RequestGuard:
+    """
+    Получить общую для процесса защиту запросов к хосту URL.
+
+    Ограничение частоты включается только для хостов из
+    rate_limit_hosts (боевой web-gate); повторы и circuit breaker
+    действуют для всех хостов.
+
+    :param url: адрес запроса или базовый адрес API
+    :type url: str
+    :param scope: раздел API со своим лимитом частоты на том же хосте
+        (например, "search"); None - общий лимит хоста
+    :type scope: str
+    :param rate: частота раздела, запросов в секунду
+    :type rate: float
+    :param burst: ёмкость корзины токенов раздела
+    :type burst: int
+    :return: RequestGuard instance
+    :rtype: RequestGuard
+    """
+    host = urlsplit(url).netloc
+    name = f"{host}/{scope}" if scope else host
+    with _guards_lock:
+        guard = _guards.get(name)
+        if guard is None:
+            limiter = None
+            if rate and urlsplit(url).hostname in rate_limit_hosts:
+                limiter = TokenBucket(rate=rate, burst=burst, name=name)
+            guard = _guards[name] = RequestGuard(limiter=limiter)
+        return guard
@@ -0,0 +1,233 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import timedelta
+from typing import Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from cassette import DROPPED_HEADERS
+from config import search_cache_dir, search_cache_ttl, search_cache_max_bytes
+
+
+class ResponseCache:
+    """
+    Дисковый кэш ответов API с TTL и ограничением размера.
+
+    Каждый ответ хранится в отдельном файле: первая строка - JSON с
+    метаданными, дальше тело ответа. Файл записывается во временный и
+    переименовывается, поэтому параллельные процессы не видят частично
+    записанных ответов. Время изменения файла обновляется при каждом
+    попадании, и при превышении max_bytes удаляются давно не читанные
+    ответы (LRU).
+    """
+
+    def __init__(self, cache_dir: str = search_cache_dir,
+                 ttl: float = search_cache_ttl,
+                 max_bytes: int = search_cache_max_bytes) -> None:
+        """
+        Инициализация кэша.
+
+        :param cache_dir: каталог кэша
+        :type cache_dir: str
+        :param ttl: время жизни ответа, сек
+        :type ttl: float
+        :param max_bytes: предел размера кэша, байт
+        :type max_bytes: int
+        """
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evicted = 0
+        self._size = None
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(method: str, url: str, params: Optional[dict] = None) -> str:
+        """
+        Ключ кэша для запроса.
+
+        :param method: HTTP метод
+        :type method: str
+        :param url: адрес запроса
+        :type url: str
+        :param params: параметры строки запроса
+        :type params: dict
+        :return: ключ (sha256)
+        :rtype: str
+        """
+        raw = json.dumps([method.upper(), url, sorted((params or {}).items())],
+                         ensure_ascii=False, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[requests.Response]:
+        """
+        Получить ответ из кэша.
+
+        :param key: ключ кэша
+        :type key: str
+        :return: Response object или None, если ответа нет или он истёк
+        :rtype: requests.Response
+        """
+        path = self._path(key)
+        try:
+            with open(path, "rb") as file:
+                meta = json.loads(file.readline())
+                body = file.read()
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        if time.time() - meta["stored_at"] > self.ttl:
+            self._remove(path)
+            with self._lock:
+                self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+
+        response = requests.Response()
+        response.status_code = meta["status"]
+        response.reason = meta["reason"]
+        response.headers = CaseInsensitiveDict(meta["headers"])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = meta["url"]
+        response.elapsed = timedelta(0)
+        response._content = body
+        return response
+
+    def put(self, key: str, response: requests.Response) -> None:
+        """
+        Сохранить ответ в кэш.
+
+        :param key: ключ кэша
+        :type key: str
+        :param response: ответ сервера
+        :type response: requests.Response
+        :return: None
+        """
+        headers = {name: value for name, value in response.headers.items()
+                   if name not in DROPPED_HEADERS}
+        meta = {"status": response.status_code, "reason": response.reason,
+                "headers": headers, "url": response.url,
+                "stored_at": time.time()}
+        data = json.dumps(meta, ensure_ascii=False).encode("utf-8") \
+            + b"\n" + response.content
+        path = self._path(key)
+        temp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp, "wb") as file:
+            file.write(data)
+        try:
+            replaced = os.path.getsize(path)
+        except OSError:
+            replaced = 0
+        os.replace(temp, path)
+
+        with self._lock:
+            self.stores += 1
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += len(data) - replaced
+            over = self._size > self.max_bytes
+        if over:
+            self.evict()
+
+    def evict(self) -> int:
+        """
+        Удалить давно не читанные ответы, чтобы кэш занял не больше
+        90% max_bytes.
+
+        :return: число удалённых ответов
+        :rtype: int
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".cache"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            if self._remove(path):
+                total -= size
+                removed += 1
+        with self._lock:
+            self._size = total
+            self.evicted += removed
+        return removed
+
+    def stats(self) -> dict:
+        """
+        Статистика кэша.
+
+        :return: словарь со статистикой
+        :rtype: dict
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "evicted": self.evicted,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups
+                else 0.0,
+            }
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.cache")
+
+    def _scan_size(self) -> int:
+        """
+        Размер файлов кэша на диске.
+
+        :return: размер, байт
+        :rtype: int
+        """
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".cache"):
+                try:
+                    total += os.path.getsize(
+                        os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
+        return total
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        """
+        Удалить файл кэша (его мог уже удалить другой процесс).
+
+        :param path: путь к файлу
+        :type path: str
+        :return: True, если файл удалён
+        :rtype: bool
+        """
+        try:
+            os.remove(path)
+        except OSError:
+            return False
+        return True
@@ -0,0 +1,259 @@
+from html import escape
+from typing import List
+from urllib.parse import urlencode
+
+from config import product_id, storefront_page_size, storefront_series_size
+
+# Каталог локальной витрины: ID товара -> название, цена, наличие
+CATALOG = {
+    product_id: {"title": "Python. Книга рецептов", "price": 1899,
+                 "available": True},
+    2893580: {"title": "Изучаем Python. Том 1", "price": 2499,
+              "available": True},
+    2893581: {"title": "Python. К вершинам мастерства", "price": 3199,
+              "available": True},
+    2893582: {"title": "Чистый Python. Тонкости программирования",
+              "price": 1499, "available": False},
+    2893583: {"title": "Грокаем алгоритмы", "price": 1299,
+              "available": True},
+    2893584: {"title": "Совершенный код", "price": 2799, "available": True},
+}
+# Серия для проверок на сотнях результатов поиска
+CATALOG.update({
+    3000000 + number: {
+        "title": f"Python. Задачи и упражнения. Выпуск {number}",
+        "price": 500 + number * 10 % 900,
+        "available": number % 7 != 0,
+    }
+    for number in range(1, storefront_series_size + 1)
+})
+
+NOT_FOUND_TEXT = "Похоже, у нас такого нет"
+DELETED_TEXT = "Удалили товар из корзины"
+
+STYLE = """
+body { font-family: sans-serif; margin: 0; }
+header { display: flex; gap: 12px; align-items: center; padding: 12px; }
+.product-card { display: inline-block; width: 220px; margin: 12px; }
+.auth-modal { display: none; }
+.auth-modal.is-open { display: block; }
+"""
+
+# Поведение витрины: добавление в корзину, удаление и форма входа
+# работают через тот же API корзины, что и CartAPI
+SCRIPT = """
+function token() {
+    var match = document.cookie.match(/(?:^|; )access-token=([^;]*)/);
+    return match ? decodeURIComponent(match[1]) : '';
+}
+function api(method, path, body) {
+    return fetch(path, {method: method, credentials: 'same-origin',
+        headers: {'Content-Type': 'application/json',
+                  'Authorization': token()},
+        body: body ? JSON.stringify(body) : undefined});
+}
+document.addEventListener('click', function (event) {
+    var buy = event.target.closest('.product-buttons__main-action');
+    if (buy) {
+        api('POST', '/api/v1/cart/product', {id: +buy.dataset.goodsId})
+            .then(function () { return api('GET', '/api/v1/cart'); })
+            .then(function (resp) { return resp.json(); })
+            .then(function (cart) {
+                document.querySelector('.header-controls__btn .chg-indicator')
+                    .textContent = cart.products.length || '';
+                buy.textContent = 'Оформить';
+            });
+        return;
+    }
+    var remove = event.target.closest('.cart-item__delete-button');
+    if (remove) {
+        api('DELETE', '/api/v1/cart/product/' + remove.dataset.itemId)
+            .then(function () {
+                var item = remove.closest('.cart-item');
+                item.innerHTML = '<div class="cart-item-deleted__title">'
+                    + '""" + DELETED_TEXT + """</div>';
+            });
+        return;
+    }
+    if (event.target.closest('[aria-label="Корзина"]')) {
+        location.href = '/cart';
+        return;
+    }
+    if (event.target.closest('[aria-label="Меню профиля"]')) {
+        document.querySelector('.auth-modal').classList.add('is-open');
+    }
+});
+document.addEventListener('input', function (event) {
+    if (event.target.id === 'tid-input') {
+        var digits = event.target.value.replace(/\\D/g, '');
+        var valid = /^\\d+$/.test(event.target.value) && digits.length === 10;
+        document.querySelector('.auth-modal-content__button')
+            .disabled = !valid;
+    }
+});
+"""
+
+
+def _page(title: str, body: str, cart_count: int) -> bytes:
+    """
+    Собрать страницу витрины с общей шапкой.
+
+    :param title: заголовок страницы
+    :type title: str
+    :param body: содержимое страницы (HTML)
+    :type body: str
+    :param cart_count: число позиций корзины для счётчика
+    :type cart_count: int
+    :return: HTML страницы
+    :rtype: bytes
+    """
+    counter = str(cart_count) if cart_count else ""
+    html = f"""<!DOCTYPE html>
+<html lang="ru">
+<head>
+<meta charset="utf-8">
+<title>{escape(title)} | Читай-город</title>
+<style>{STYLE}</style>
+</head>
+<body>
+<header class="header-controls">
+  <form class="search-form" action="/search" method="get">
+    <input type="search" class="search-form__input" name="phrase"
+           placeholder="Я ищу...">
+    <button type="submit" class="search-form__button-search">Найти</button>
+  </form>
+  <button class="header-controls__btn" aria-label="Корзина">
+    Корзина <span class="chg-indicator">{counter}</span>
+  </button>
+  <button class="header-controls__btn" aria-label="Меню профиля">
+    Войти
+  </button>
+</header>
+<div class="auth-modal">
+  <div class="auth-modal-content">
+    <input id="tid-input" type="tel" placeholder="Телефон">
+    <button class="auth-modal-content__button" disabled>
+      Получить код
+    </button>
+  </div>
+</div>
+<main>{body}</main>
+<script>{SCRIPT}</script>
+</body>
+</html>"""
+    return html.encode("utf-8")
+
+
+def render_home(cart_count: int = 0) -> bytes:
+    """
+    Главная страница витрины.
+
+    :param cart_count: число позиций корзины
+    :type cart_count: int
+    :return: HTML страницы
+    :rtype: bytes
+    """
+    return _page("Главная", "<h1>Книжный интернет-магазин</h1>", cart_count)
+
+
+def search(phrase: str) -> List[tuple]:
+    """
+    Найти товары каталога по вхождению фразы в название.
+
+    :param phrase: поисковая фраза
+    :type phrase: str
+    :return: список (ID товара, название)
+    :rtype: list
+    """
+    phrase = phrase.strip().lower()
+    if not phrase:
+        return []
+    return [(goods_id, item["title"]) for goods_id, item in CATALOG.items()
+            if phrase in item["title"].lower()]
+
+
+def _card(goods_id: int) -> str:
+    """
+    Карточка товара в результатах поиска.
+
+    :param goods_id: ID товара
+    :type goods_id: int
+    :return: HTML карточки
+    :rtype: str
+    """
+    item = CATALOG[goods_id]
+    if item["available"]:
+        button = (f'<button class="product-buttons__main-action" '
+                  f'data-goods-id="{goods_id}">Купить</button>')
+    else:
+        button = ('<button class="product-buttons__main-action" '
+                  'disabled>Нет в наличии</button>')
+    return (f'<article class="product-card" data-product-id="{goods_id}">'
+            f'<div class="product-card__title">{escape(item["title"])}</div>'
+            f'<div class="product-card__price">{item["price"]} ₽</div>'
+            f'{button}</article>')
+
+
+def render_search(phrase: str, cart_count: int = 0, page: int = 1,
+                  page_size: int = storefront_page_size) -> bytes:
+    """
+    Страница результатов поиска с пагинацией.
+
+    :param phrase: поисковая фраза
+    :type phrase: str
+    :param cart_count: число позиций корзины
+    :type cart_count: int
+    :param page: номер страницы, начиная с 1
+    :type page: int
+    :param page_size: карточек на странице
+    :type page_size: int
+    :return: HTML страницы
+    :rtype: bytes
+    """
+    found = search(phrase)
+    if not found:
+        body = (f'<div class="catalog-stub">'
+                f'<h4 class="catalog-stub__title">{NOT_FOUND_TEXT}</h4>'
+                f'</div>')
+        return _page(f"Поиск «{phrase}»", body, cart_count)
+
+    page = max(page, 1)
+    offset = (page - 1) * page_size
+    cards = "\n".join(_card(goods_id) for goods_id, _ in
+                      found[offset:offset + page_size])
+    pagination = ""
+    if offset + page_size < len(found):
+        query = urlencode({"phrase": phrase, "page": page + 1})
+        pagination = (f'<nav class="pagination">'
+                      f'<a class="pagination__next" rel="next" '
+                      f'href="/search?{query}">Дальше</a></nav>')
+    elif page > 1:
+        # Последняя страница: пагинация есть, ссылки "Дальше" нет
+        pagination = f'<nav class="pagination">{page}</nav>'
+    body = (f"<h1>Результаты поиска «{escape(phrase)}»</h1>"
+            f'<section class="catalog">{cards}</section>{pagination}')
+    return _page(f"Поиск «{phrase}»", body, cart_count)
+
+
+def render_cart(items: List[dict]) -> bytes:
+    """
+    Страница корзины.
+
+    :param items: позиции корзины (id, goodsId, quantity)
+    :type items: list
+    :return: HTML страницы
+    :rtype: bytes
+    """
+    rows = "\n".join(
+        f'<div class="cart-item">'
+        f'<div class="cart-item__title">'
+        f'{escape(CATALOG.get(item["goodsId"], {}).get("title", ""))}'
+        f'</div>'
+        f'<div class="cart-item__quantity">{item["quantity"]}</div>'
+        f'<button class="cart-item__delete-button" '
+        f'data-item-id="{item["id"]}">Удалить</button>'
+        f'</div>'
+        for item in items
+    )
+    body = f"<h1>Корзина</h1>{rows or '<p>Корзина пуста</p>'}"
+    return _page("Корзина", body, len(items))
@@ -1,18 +1,59 @@
 import pytest
 import allure
+import asyncio
 from pages.api_client import CartAPI
-from config import product_id
+from pages.async_api_client import AsyncCartAPI
+from pages.search_api_client import SearchAPI, load_queries
+from cookie_helper import CookieProvider
+from http_transport import HTTPTransport
+from config import (product_id, bulk_product_ids, book_title, invalid_title,
+                    search_queries_file)
 
 
 @pytest.fixture
-def api_client() -> CartAPI:
+def api_client(transport: HTTPTransport, cookie_provider: CookieProvider,
+               cart_api_url: str, identity_token: str) -> CartAPI:
     """
     Фикстура для создания API клиента.
 
+    :param transport: общий HTTP транспорт прогона
+    :type transport: HTTPTransport
+    :param cookie_provider: поставщик кук DDoS-Guard
+    :type cookie_provider: CookieProvider
+    :param cart_api_url: адрес API корзины
+    :type cart_api_url: str
+    :param identity_token: токен анонимного пользователя воркера
+    :type identity_token: str
     :return: CartAPI instance
     :rtype: CartAPI
     """
-    return CartAPI()
+    return CartAPI(cookie_provider=cookie_provider, transport=transport,
+                   base_url=cart_api_url, token=identity_token)
+
+
+@pytest.fixture
+def search_api(transport: HTTPTransport, cookie_provider: CookieProvider,
+               search_api_url: str, identity_token: str) -> SearchAPI:
+    """
+    Фикстура для создания API клиента поиска.
+
+    Кэш ответов отключён: функциональные тесты всегда обращаются к
+    серверу.
+
+    :param transport: общий HTTP транспорт прогона
+    :type transport: HTTPTransport
+    :param cookie_provider: поставщик кук DDoS-Guard
+    :type cookie_provider: CookieProvider
+    :param search_api_url: адрес API поиска
+    :type search_api_url: str
+    :param identity_token: токен анонимного пользователя воркера
+    :type identity_token: str
+    :return: SearchAPI instance
+    :rtype: SearchAPI
+    """
+    return SearchAPI(use_cache=False, cookie_provider=cookie_provider,
+                     transport=transport, base_url=search_api_url,
+                     token=identity_token)
 
 
 @allure.epic("Читай-город API")
@@ -146,3 +187,180 @@ def test_get_cart_with_wrong_method(api_client: CartAPI) -> None:
 
     with allure.step("Проверить, что вернулась ошибка 405"):
         assert result.status_code == 405
+
+
+@allure.epic("Читай-город API")
+@allure.feature("Корзина")
+@allure.title("Массовое добавление и очистка корзины. POSITIVE")
+@allure.description("Тест проверяет параллельное добавление нескольких "
+                    "товаров и очистку корзины асинхронным клиентом.")
+@allure.severity("NORMAL")
+@pytest.mark.api
+@pytest.mark.cart
+def test_add_many_and_clear_cart(transport: HTTPTransport,
+                                 cookie_provider: CookieProvider,
+                                 cart_api_url: str,
+                                 identity_token: str) -> None:
+    """
+    Тест массового добавления товаров и очистки корзины.
+
+    :param transport: общий HTTP транспорт прогона
+    :type transport: HTTPTransport
+    :param cookie_provider: поставщик кук DDoS-Guard
+    :type cookie_provider: CookieProvider
+    :param cart_api_url: адрес API корзины
+    :type cart_api_url: str
+    :param identity_token: токен анонимного пользователя воркера
+    :type identity_token: str
+    :return: None
+    """
+    async def scenario() -> tuple:
+        async with AsyncCartAPI(cookie_provider=cookie_provider,
+                                transport=transport,
+                                base_url=cart_api_url,
+                                token=identity_token) as client:
+            added = await client.add_many(bulk_product_ids)
+            removed = await client.clear_cart()
+            cart_result = await client.get_cart()
+        return added, removed, cart_result
+
+    with allure.step("Добавить товары и очистить корзину"):
+        added, removed, cart_result = asyncio.run(scenario())
+
+    with allure.step("Проверить успешное добавление"):
+        assert [r.status_code for r in added] == [200] * len(
+            bulk_product_ids)
+
+    with allure.step("Проверить успешное удаление"):
+        assert [r.status_code for r in removed] == [204] * len(
+            bulk_product_ids)
+
+    with allure.step("Проверить что корзина пуста"):
+        assert cart_result.status_code == 200
+        assert len(cart_result.json()["products"]) == 0
+
+
+@allure.epic("Читай-город API")
+@allure.feature("Корзина")
+@allure.title("Асинхронный клиент в нескольких event loop. POSITIVE")
+@allure.description("Тест проверяет, что один асинхронный клиент "
+                    "работает в последовательных вызовах asyncio.run().")
+@allure.severity("NORMAL")
+@pytest.mark.api
+@pytest.mark.cart
+def test_async_client_across_loops(transport: HTTPTransport,
+                                   cookie_provider: CookieProvider,
+                                   cart_api_url: str,
+                                   identity_token: str) -> None:
+    """
+    Тест массовых операций одного клиента в двух event loop.
+
+    Товаров больше, чем слотов параллелизма, поэтому запросы ждут
+    свободный слот в очереди клиента.
+
+    :param transport: общий HTTP транспорт прогона
+    :type transport: HTTPTransport
+    :param cookie_provider: поставщик кук DDoS-Guard
+    :type cookie_provider: CookieProvider
+    :param cart_api_url: адрес API корзины
+    :type cart_api_url: str
+    :param identity_token: токен анонимного пользователя воркера
+    :type identity_token: str
+    :return: None
+    """
+    client = AsyncCartAPI(concurrency=2, cookie_provider=cookie_provider,
+                          transport=transport, base_url=cart_api_url,
+                          token=identity_token)
+    try:
+        with allure.step("Добавить товары в первом event loop"):
+            added = asyncio.run(client.add_many(bulk_product_ids))
+            assert [r.status_code for r in added] == [200] * len(
+                bulk_product_ids)
+
+        with allure.step("Очистить корзину во втором event loop"):
+            removed = asyncio.run(client.clear_cart())
+            assert [r.status_code for r in removed] == [204] * len(
+                bulk_product_ids)
+    finally:
+        client.close()
+
+
+@allure.epic("Читай-город API")
+@allure.feature("Поиск")
+@allure.title("Поиск товаров по названию. POSITIVE")
+@allure.description("Тест проходит результаты поиска через API по "
+                    "страницам и проверяет данные товаров.")
+@allure.severity("CRITICAL")
+@pytest.mark.api
+@pytest.mark.search
+def test_search_products(search_api: SearchAPI) -> None:
+    """
+    Тест поиска товаров по названию через API.
+
+    :param search_api: API клиент поиска
+    :type search_api: SearchAPI
+    :return: None
+    """
+    with allure.step("Обойти результаты поиска"):
+        products = list(search_api.iter_products(book_title, max_pages=3))
+
+    with allure.step("Проверить, что товары найдены"):
+        assert products
+        assert all(product.product_id and product.title
+                   for product in products)
+        assert any(book_title.lower() in product.title.lower()
+                   for product in products)
+
+
+@allure.epic("Читай-город API")
+@allure.feature("Поиск")
+@allure.title("Поиск по несуществующему названию. NEGATIVE")
+@allure.description("Тест проверяет, что поиск по несуществующему "
+                    "названию через API не находит товаров.")
+@allure.severity("NORMAL")
+@pytest.mark.api
+@pytest.mark.search
+@pytest.mark.negative
+def test_search_products_negative(search_api: SearchAPI) -> None:
+    """
+    Негативный тест поиска через API.
+
+    :param search_api: API клиент поиска
+    :type search_api: SearchAPI
+    :return: None
+    """
+    with allure.step("Найти товары по несуществующему названию"):
+        result = search_api.search(invalid_title)
+
+    with allure.step("Проверить, что товаров нет"):
+        assert result.status_code == 200
+        assert SearchAPI.parse_products(result.json()) == []
+
+
+@allure.epic("Читай-город API")
+@allure.feature("Поиск")
+@allure.title("Параллельный поиск по списку фраз. POSITIVE")
+@allure.description("Тест выполняет поиск по фразам из файла "
+                    "параллельно и проверяет ответы.")
+@allure.severity("NORMAL")
+@pytest.mark.api
+@pytest.mark.search
+def test_search_queries(search_api: SearchAPI) -> None:
+    """
+    Тест параллельного поиска по фразам из search_queries_file.
+
+    :param search_api: API клиент поиска
+    :type search_api: SearchAPI
+    :return: None
+    """
+    phrases = list(load_queries(search_queries_file))
+
+    with allure.step("Выполнить поиск по всем фразам"):
+        results = dict(search_api.run_queries(phrases))
+
+    with allure.step("Проверить ответы"):
+        assert set(results) == set(phrases)
+        errors = {phrase: result for phrase, result in results.items()
+                  if isinstance(result, Exception)
+                  or result.status_code != 200}
+        assert not errors, errors
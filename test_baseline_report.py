@@ -0,0 +1,90 @@
+from types import SimpleNamespace
+
+import pytest
+import allure
+from cache_helper import read_json
+from hybrid_state import HandoffReport
+from lean_browser import PageWeightReport
+
+
+def _page(path: str, requests: int, size: int) -> SimpleNamespace:
+    """
+    Браузер с загруженной страницей заданного веса.
+
+    :param path: путь страницы
+    :type path: str
+    :param requests: число запросов страницы
+    :type requests: int
+    :param size: вес страницы, байт
+    :type size: int
+    :return: объект с execute_script и current_url
+    :rtype: SimpleNamespace
+    """
+    return SimpleNamespace(
+        current_url=f"https://www.chitai-gorod.ru{path}",
+        execute_script=lambda script: {"requests": requests, "bytes": size},
+    )
+
+
+@allure.epic("Читай-город")
+@allure.feature("Базовые значения")
+@allure.title("Вес страниц: базовые значения и экономия")
+@allure.severity("NORMAL")
+@pytest.mark.api
+def test_page_weight_baseline(tmp_path) -> None:
+    """
+    Тест: обычный режим сохраняет вес страниц, облегчённый считает
+    экономию относительно него.
+
+    :param tmp_path: временный каталог теста
+    :return: None
+    """
+    baseline_file = str(tmp_path / "weight.json")
+
+    with allure.step("Обычный режим сохраняет базовые значения"):
+        full = PageWeightReport(lean=False, baseline_file=baseline_file)
+        full.record(_page("/cart", 80, 5000))
+        full.save_baseline()
+        assert read_json(baseline_file) == {
+            "/cart": {"requests": 80, "bytes": 5000}}
+
+    with allure.step("Облегчённый режим считает экономию"):
+        lean = PageWeightReport(lean=True, baseline_file=baseline_file)
+        entry = lean.record(_page("/cart", 30, 2000))
+        assert entry["requests_saved"] == 50
+        assert entry["bytes_saved"] == 3000
+        assert "requests_saved" not in lean.record(_page("/", 10, 100))
+        assert lean.summary() == {
+            "lean": True, "pages": 2, "requests": 40, "bytes": 2100,
+            "requests_saved": 50, "bytes_saved": 3000}
+        lean.save_baseline()
+        assert "/" not in read_json(baseline_file)
+
+
+@allure.epic("Читай-город")
+@allure.feature("Базовые значения")
+@allure.title("Подготовка состояния: базовые значения и экономия")
+@allure.severity("NORMAL")
+@pytest.mark.api
+def test_handoff_baseline(tmp_path) -> None:
+    """
+    Тест: подготовка через клики сохраняет время сценария, подготовка
+    через API считает экономию относительно него.
+
+    :param tmp_path: временный каталог теста
+    :return: None
+    """
+    baseline_file = str(tmp_path / "handoff.json")
+    clicks = HandoffReport(hybrid=False, baseline_file=baseline_file)
+    with clicks.measure("cart_with_product") as entry:
+        pass
+    clicks.baseline["cart_with_product"] = 10.0
+    clicks.save_baseline()
+
+    hybrid = HandoffReport(hybrid=True, baseline_file=baseline_file)
+    with hybrid.measure("cart_with_product") as entry:
+        pass
+    assert entry["saved_seconds"] == pytest.approx(10.0 - entry["seconds"])
+    summary = hybrid.summary()
+    assert summary["hybrid"] is True and summary["setups"] == 1
+    assert summary["saved_seconds"] == pytest.approx(10.0, abs=0.01)
@@ -0,0 +1,297 @@
+import os
+import tempfile
+
+import pytest
+import allure
+from benchmark import BenchmarkReport
+from cookie_helper import CookieProvider
+from driver_pool import create_driver, quit_driver
+from http_transport import HTTPTransport
+from local_server import LocalWebGate
+from pages.api_client import CartAPI
+from pages.auth_ui_page import AuthPage
+from pages.cart_ui_page import AddToCart
+from pages.search_ui_page import SearchPage
+from config import (product_id, book_title, benchmark_rounds,
+                    benchmark_warmup, benchmark_driver_rounds)
+
+
+@pytest.fixture(scope="module")
+def bench_gate() -> LocalWebGate:
+    """
+    Фикстура отдельного локального web-gate и витрины для бенчмарков.
+
+    Бенчмарки всегда работают без сети, независимо от CG_LOCAL_API.
+
+    :yields: LocalWebGate
+    """
+    with LocalWebGate(port=0, latency={}, error_rate={}) as gate:
+        yield gate
+
+
+@pytest.fixture(scope="module")
+def bench_cookie_provider(bench_gate: LocalWebGate) -> CookieProvider:
+    """
+    Фикстура поставщика кук локального web-gate бенчмарков.
+
+    :param bench_gate: локальный web-gate бенчмарков
+    :type bench_gate: LocalWebGate
+    :return: CookieProvider instance
+    :rtype: CookieProvider
+    """
+    port = bench_gate.base_url.rsplit(":", 1)[1]
+    return CookieProvider(
+        source_url=bench_gate.url_ui,
+        cache_file=os.path.join(tempfile.gettempdir(),
+                                f"chitai_gorod_cookies_bench_{port}.json"),
+    )
+
+
+@pytest.fixture(scope="module")
+def bench_driver(bench_gate: LocalWebGate):
+    """
+    Фикстура браузера для UI бенчмарков, открытого на локальной витрине.
+
+    :param bench_gate: локальный web-gate бенчмарков
+    :type bench_gate: LocalWebGate
+    :yields: WebDriver - Экземпляр WebDriver
+    """
+    # Шаблон профиля прогревается на боевом сайте: бенчмарки работают
+    # без сети и с пустым профилем
+    driver = create_driver(warm_profile=False)
+    driver.get(bench_gate.url_ui)
+    yield driver
+    quit_driver(driver)
+
+
+def _check(report: BenchmarkReport, name: str, result: dict) -> None:
+    """
+    Приложить результат бенчмарка к Allure и проверить регрессию.
+
+    :param report: отчёт бенчмарков
+    :type report: BenchmarkReport
+    :param name: имя бенчмарка
+    :type name: str
+    :param result: результат бенчмарка
+    :type result: dict
+    :return: None
+    """
+    description = report.describe(name, result)
+    allure.attach(description, name=f"Бенчмарк {name}",
+                  attachment_type=allure.attachment_type.TEXT)
+    assert not result["missing_baseline"], (
+        f"Нет базового значения: {description}")
+    assert not result["regression"], description
+
+
+@allure.epic("Читай-город API")
+@allure.feature("Бенчмарки")
+@allure.title("Сравнение с нулевым базовым значением")
+@allure.description("Тест проверяет, что медиана 0.0 в базовых значениях "
+                    "(операция быстрее микросекунды) не роняет сравнение и "
+                    "отчёт, а регрессия определяется по абсолютному росту.")
+@allure.severity("NORMAL")
+@pytest.mark.api
+def test_benchmark_zero_baseline(tmp_path) -> None:
+    """
+    Тест BenchmarkReport.add и describe с нулевой базовой медианой.
+
+    :param tmp_path: временный каталог теста
+    :type tmp_path: Path
+    :return: None
+    """
+    baseline_file = str(tmp_path / "baseline.json")
+    first = BenchmarkReport(baseline_file=baseline_file, threshold=0.25,
+                            thresholds={}, min_delta_ms=0.5, update=False,
+                            require_baseline=False)
+    first.add("fast", [0.0001, 0.0002, 0.0001])
+    first.save_baseline()
+
+    report = BenchmarkReport(baseline_file=baseline_file, threshold=0.25,
+                             thresholds={}, min_delta_ms=0.5, update=False,
+                             require_baseline=True)
+    with allure.step("Рост в пределах min_delta_ms не регрессия"):
+        result = report.add("fast", [0.0002, 0.0003, 0.0004])
+        assert result["baseline_ms"] == 0.0
+        assert result["change"] is None
+        assert not result["regression"]
+        assert "baseline 0.0 ms" in report.describe("fast", result)
+
+    with allure.step("Рост больше min_delta_ms - регрессия"):
+        result = report.add("fast", [1.0, 1.0, 1.0])
+        assert result["regression"]
+        assert "+1.0 ms" in report.describe("fast", result)
+        assert report.summary()["regressions"] == ["fast"]
+
+    with allure.step("Без базового значения в CI - ошибка"):
+        result = report.add("new", [1.0, 1.0, 1.0])
+        assert result["missing_baseline"]
+        assert "NO BASELINE" in report.describe("new", result)
+        assert report.summary()["missing_baselines"] == ["new"]
+        report.save_baseline()
+        assert "new" not in BenchmarkReport(
+            baseline_file=baseline_file).baseline
+
+
+@allure.epic("Читай-город API")
+@allure.feature("Бенчмарки")
+@allure.title("Время операций CartAPI")
+@allure.description("Тест замеряет операции CartAPI на локальном web-gate "
+                    "и сравнивает медиану с базовым значением.")
+@allure.severity("NORMAL")
+@pytest.mark.api
+@pytest.mark.benchmark
+@pytest.mark.parametrize("operation", ["add_product_to_cart", "get_cart",
+                                       "remove_from_cart"])
+def test_cart_api_benchmark(operation: str, bench_gate: LocalWebGate,
+                            bench_cookie_provider: CookieProvider,
+                            transport: HTTPTransport,
+                            benchmark_report: BenchmarkReport) -> None:
+    """
+    Бенчмарк операции CartAPI.
+
+    :param operation: имя операции CartAPI
+    :type operation: str
+    :param bench_gate: локальный web-gate бенчмарков
+    :type bench_gate: LocalWebGate
+    :param bench_cookie_provider: поставщик кук web-gate бенчмарков
+    :type bench_cookie_provider: CookieProvider
+    :param transport: общий HTTP транспорт прогона
+    :type transport: HTTPTransport
+    :param benchmark_report: отчёт бенчмарков
+    :type benchmark_report: BenchmarkReport
+    :return: None
+    """
+    api = CartAPI(cookie_provider=bench_cookie_provider, transport=transport,
+                  base_url=bench_gate.url_api,
+                  token=bench_gate.issue_token())
+    items = []
+
+    def setup() -> None:
+        if operation == "remove_from_cart":
+            api.add_product_to_cart(product_id)
+            items[:] = api.get_cart().json()["products"]
+
+    def call() -> None:
+        if operation == "add_product_to_cart":
+            resp = api.add_product_to_cart(product_id)
+        elif operation == "get_cart":
+            resp = api.get_cart()
+        else:
+            resp = api.remove_from_cart(items[0]["id"])
+        resp.raise_for_status()
+
+    with allure.step(f"Замерить {operation}"):
+        name = f"cart_api.{operation}"
+        result = benchmark_report.run(name, call, rounds=benchmark_rounds,
+                                      warmup=benchmark_warmup, setup=setup)
+    with allure.step("Сравнить с базовым значением"):
+        _check(benchmark_report, name, result)
+
+
+@allure.epic("Читай-город API")
+@allure.feature("Бенчмарки")
+@allure.title("Время получения кук DDoS-Guard")
+@allure.description("Тест замеряет получение кук с сервера и из кэша "
+                    "CookieProvider.")
+@allure.severity("NORMAL")
+@pytest.mark.api
+@pytest.mark.benchmark
+@pytest.mark.parametrize("cached", [False, True], ids=["fetch", "cached"])
+def test_cookie_benchmark(cached: bool,
+                          bench_cookie_provider: CookieProvider,
+                          benchmark_report: BenchmarkReport) -> None:
+    """
+    Бенчмарк получения кук: запросом к серверу или из кэша.
+
+    :param cached: замерять получение из кэша
+    :type cached: bool
+    :param bench_cookie_provider: поставщик кук web-gate бенчмарков
+    :type bench_cookie_provider: CookieProvider
+    :param benchmark_report: отчёт бенчмарков
+    :type benchmark_report: BenchmarkReport
+    :return: None
+    """
+    def setup() -> None:
+        if not cached:
+            bench_cookie_provider.invalidate()
+
+    with allure.step("Замерить получение кук"):
+        name = "cookies.cached" if cached else "cookies.fetch"
+        result = benchmark_report.run(name, bench_cookie_provider.get,
+                                      rounds=benchmark_rounds,
+                                      warmup=benchmark_warmup, setup=setup)
+    with allure.step("Сравнить с базовым значением"):
+        _check(benchmark_report, name, result)
+
+
+@allure.epic("Читай-город UI")
+@allure.feature("Бенчмарки")
+@allure.title("Время запуска Chrome")
+@allure.description("Тест замеряет запуск и закрытие браузера.")
+@allure.severity("NORMAL")
+@pytest.mark.ui
+@pytest.mark.benchmark
+def test_driver_startup_benchmark(
+        benchmark_report: BenchmarkReport) -> None:
+    """
+    Бенчмарк запуска Chrome.
+
+    :param benchmark_report: отчёт бенчмарков
+    :type benchmark_report: BenchmarkReport
+    :return: None
+    """
+    with allure.step("Замерить запуск и закрытие Chrome"):
+        result = benchmark_report.run(
+            "driver_startup",
+            lambda: quit_driver(create_driver(warm_profile=False)),
+            rounds=benchmark_driver_rounds, warmup=1)
+    with allure.step("Сравнить с базовым значением"):
+        _check(benchmark_report, "driver_startup", result)
+
+
+@allure.epic("Читай-город UI")
+@allure.feature("Бенчмарки")
+@allure.title("Время сценариев page objects")
+@allure.description("Тест замеряет сценарии page objects на локальной "
+                    "витрине.")
+@allure.severity("NORMAL")
+@pytest.mark.ui
+@pytest.mark.benchmark
+@pytest.mark.parametrize("flow", ["search_by_title", "add_product_to_cart",
+                                  "open_auth_form"])
+def test_page_flow_benchmark(flow: str, bench_gate: LocalWebGate,
+                             bench_driver,
+                             benchmark_report: BenchmarkReport) -> None:
+    """
+    Бенчмарк сценария page object.
+
+    :param flow: имя сценария
+    :type flow: str
+    :param bench_gate: локальный web-gate бенчмарков
+    :type bench_gate: LocalWebGate
+    :param bench_driver: WebDriver на локальной витрине
+    :param benchmark_report: отчёт бенчмарков
+    :type benchmark_report: BenchmarkReport
+    :return: None
+    """
+    search = SearchPage(bench_driver)
+    cart = AddToCart(bench_driver)
+    auth = AuthPage(bench_driver)
+    start_url = bench_gate.url_ui
+    if flow == "add_product_to_cart":
+        start_url = f"{bench_gate.base_url}/search?phrase={book_title}"
+
+    flows = {
+        "search_by_title": lambda: search.search_by_title(book_title),
+        "add_product_to_cart": cart.add_product_to_cart,
+        "open_auth_form": auth.open_auth_form,
+    }
+
+    with allure.step(f"Замерить {flow}"):
+        name = f"page_flow.{flow}"
+        result = benchmark_report.run(
+            name, flows[flow], rounds=benchmark_driver_rounds, warmup=1,
+            setup=lambda: bench_driver.get(start_url))
+    with allure.step("Сравнить с базовым значением"):
+        _check(benchmark_report, name, result)
@@ -0,0 +1,195 @@
+import os
+import time
+
+import pytest
+import allure
+from cassette import INDEX_FILE, Cassette, CassetteMissError
+from cache_helper import read_json
+from http_transport import HTTPTransport
+from local_server import LocalWebGate
+
+
+def _scenario(transport: HTTPTransport, gate_url: str,
+              token: str) -> list:
+    """
+    Сценарий корзины: GET, добавление товаров и повторный GET.
+
+    :param transport: HTTP транспорт
+    :type transport: HTTPTransport
+    :param gate_url: базовый адрес web-gate
+    :type gate_url: str
+    :param token: заголовок Authorization
+    :type token: str
+    :return: ответы сценария
+    :rtype: list
+    """
+    headers = {"Authorization": token}
+    cart = f"{gate_url}/api/v1/cart"
+    return [
+        transport.request("GET", cart, headers=headers),
+        transport.request("POST", f"{cart}/product", headers=headers,
+                          json={"id": 2893580, "adData": {}}),
+        transport.request("POST", f"{cart}/product", headers=headers,
+                          json={"adData": {}, "id": 2893581}),
+        transport.request("GET", cart, headers=headers),
+    ]
+
+
+@pytest.fixture
+def recorded(tmp_path) -> tuple:
+    """
+    Фикстура кассеты, записанной на локальном web-gate.
+
+    :param tmp_path: временный каталог теста
+    :return: каталог кассеты и записанные ответы
+    :rtype: tuple
+    """
+    path = str(tmp_path / "cassette")
+    with LocalWebGate(port=0, latency={}, error_rate={},
+                      require_cookies=False) as gate:
+        transport = HTTPTransport(cassette=Cassette(path, mode="record"))
+        responses = _scenario(transport, gate.base_url, gate.issue_token())
+        transport.close()
+        base_url = gate.base_url
+    return path, base_url, responses
+
+
+@allure.epic("Читай-город API")
+@allure.feature("Кассеты")
+@allure.title("Запись и воспроизведение сценария корзины")
+@allure.severity("CRITICAL")
+@pytest.mark.api
+def test_cassette_round_trip(recorded: tuple) -> None:
+    """
+    Тест: ответы, записанные на локальном web-gate, воспроизводятся
+    без сервера в порядке записи.
+
+    :param recorded: записанная кассета
+    :type recorded: tuple
+    :return: None
+    """
+    path, base_url, responses = recorded
+    assert [r.status_code for r in responses] == [200, 200, 200, 200]
+
+    with allure.step("Воспроизвести сценарий при остановленном сервере"):
+        cassette = Cassette(path, mode="replay")
+        transport = HTTPTransport(cassette=cassette)
+        replayed = _scenario(transport, base_url, "Bearer other")
+
+    with allure.step("Сравнить ответы с записанными"):
+        for original, copy in zip(responses, replayed):
+            assert copy.status_code == original.status_code
+            assert copy.content == original.content
+            assert (copy.headers["Content-Type"]
+                    == original.headers["Content-Type"])
+        assert replayed[0].json() == {"products": []}
+        assert len(replayed[3].json()["products"]) == 2
+
+    with allure.step("Все записи использованы"):
+        report = cassette.report()
+        assert report["entries"] == report["played"] == 4
+        assert report["unused"] == [] and report["stale"] == []
+        transport.close()
+
+
+@allure.epic("Читай-город API")
+@allure.feature("Кассеты")
+@allure.title("Сопоставление запросов и промах кассеты")
+@allure.severity("NORMAL")
+@pytest.mark.api
+def test_cassette_match_on(recorded: tuple) -> None:
+    """
+    Тест match_on: тело JSON сравнивается без учёта порядка ключей,
+    незаписанный запрос даёт CassetteMissError, а без "body" в
+    match_on тело не учитывается.
+
+    :param recorded: записанная кассета
+    :type recorded: tuple
+    :return: None
+    """
+    path, base_url, _ = recorded
+    product = f"{base_url}/api/v1/cart/product"
+
+    with allure.step("Порядок ключей JSON не влияет на ключ записи"):
+        transport = HTTPTransport(cassette=Cassette(path, mode="replay"))
+        response = transport.request("POST", product,
+                                     json={"adData": {}, "id": 2893580})
+        assert response.status_code == 200
+
+    with allure.step("Другое тело запроса - промах кассеты"):
+        with pytest.raises(CassetteMissError):
+            transport.request("POST", product,
+                              json={"id": 1, "adData": {}})
+        with pytest.raises(CassetteMissError):
+            transport.request("DELETE", f"{product}/1")
+        transport.close()
+
+    with allure.step("Без body в match_on тело не сравнивается"):
+        cassette = Cassette(path, mode="replay",
+                            match_on=("method", "path"))
+        transport = HTTPTransport(cassette=cassette)
+        response = transport.request("POST", product,
+                                     json={"id": 1, "adData": {}})
+        assert response.status_code == 200
+        report = cassette.report()
+        assert report["played"] == 1
+        assert len(report["unused"]) == 3
+        assert f"GET {base_url}/api/v1/cart" in report["unused"]
+        transport.close()
+
+
+@allure.epic("Читай-город API")
+@allure.feature("Кассеты")
+@allure.title("Устаревшие записи в отчёте кассеты")
+@allure.severity("NORMAL")
+@pytest.mark.api
+def test_cassette_stale_report(recorded: tuple) -> None:
+    """
+    Тест: записи старше max_age_days попадают в отчёт.
+
+    :param recorded: записанная кассета
+    :type recorded: tuple
+    :return: None
+    """
+    path, _, _ = recorded
+    fresh = Cassette(path, mode="replay", max_age_days=1)
+    assert fresh.report()["stale"] == []
+    fresh.close()
+
+    time.sleep(0.01)
+    stale = Cassette(path, mode="replay", max_age_days=0)
+    assert len(stale.report()["stale"]) == 4
+    stale.close()
+
+
+@allure.epic("Читай-город API")
+@allure.feature("Кассеты")
+@allure.title("Прерванная запись сохраняет полученные ответы")
+@allure.severity("NORMAL")
+@pytest.mark.api
+def test_cassette_interrupted_recording(tmp_path) -> None:
+    """
+    Тест: индекс сохраняется после каждого ответа, поэтому запись
+    без close() воспроизводится.
+
+    :param tmp_path: временный каталог теста
+    :return: None
+    """
+    path = str(tmp_path / "cassette")
+    with LocalWebGate(port=0, latency={}, error_rate={},
+                      require_cookies=False) as gate:
+        transport = HTTPTransport(cassette=Cassette(path, mode="record"))
+        responses = _scenario(transport, gate.base_url, gate.issue_token())
+        base_url = gate.base_url
+
+        index = read_json(os.path.join(path, INDEX_FILE))
+        assert len(index["entries"]) == 4
+        assert sorted(os.listdir(path)) == ["bodies.bin", INDEX_FILE]
+
+        cassette = Cassette(path, mode="replay")
+        replay = HTTPTransport(cassette=cassette)
+        replayed = _scenario(replay, base_url, "Bearer other")
+        assert [r.content for r in replayed] == [
+            r.content for r in responses]
+        replay.close()
+        transport.close()
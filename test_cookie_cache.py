@@ -0,0 +1,312 @@
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+import allure
+import cache_helper
+import cookie_helper
+from cache_helper import FileLock, read_json, write_json
+from cookie_helper import FALLBACK_COOKIES, CookieProvider
+from local_server import LocalWebGate
+
+
+@pytest.fixture(scope="module")
+def cookie_gate() -> LocalWebGate:
+    """
+    Фикстура локального web-gate, выдающего куки DDoS-Guard.
+
+    Выдача кук замедлена, чтобы параллельные запросы кук пересекались.
+
+    :yields: LocalWebGate
+    """
+    with LocalWebGate(port=0, latency={"cookies": 0.2},
+                      error_rate={}) as gate:
+        yield gate
+
+
+@pytest.fixture
+def provider(cookie_gate: LocalWebGate, tmp_path) -> CookieProvider:
+    """
+    Фикстура поставщика кук с отдельным файловым кэшем.
+
+    :param cookie_gate: локальный web-gate
+    :type cookie_gate: LocalWebGate
+    :param tmp_path: временный каталог теста
+    :return: CookieProvider instance
+    :rtype: CookieProvider
+    """
+    cookie_gate.reset()
+    return CookieProvider(ttl=60, cache_file=str(tmp_path / "cookies.json"),
+                          source_url=cookie_gate.url_ui)
+
+
+@allure.epic("Читай-город API")
+@allure.feature("Кэш кук")
+@allure.title("Атомарная запись и чтение JSON")
+@allure.severity("NORMAL")
+@pytest.mark.api
+def test_read_write_json(tmp_path) -> None:
+    """
+    Тест read_json и write_json.
+
+    :param tmp_path: временный каталог теста
+    :return: None
+    """
+    path = str(tmp_path / "nested" / "data.json")
+    assert read_json(path, {"default": True}) == {"default": True}
+    write_json(path, {"name": "Мастер"})
+    assert read_json(path) == {"name": "Мастер"}
+    assert os.listdir(os.path.dirname(path)) == ["data.json"]
+
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("{broken")
+    assert read_json(path, []) == []
+
+
+@allure.epic("Читай-город API")
+@allure.feature("Кэш кук")
+@allure.title("FileLock: взаимное исключение и таймаут")
+@allure.severity("NORMAL")
+@pytest.mark.api
+def test_file_lock_exclusive(tmp_path) -> None:
+    """
+    Тест: блокировку держит только один владелец.
+
+    :param tmp_path: временный каталог теста
+    :return: None
+    """
+    path = str(tmp_path / "test.lock")
+    with FileLock(path):
+        assert os.path.exists(path)
+        with pytest.raises(TimeoutError):
+            FileLock(path, timeout=0.1, poll=0.01).acquire()
+    assert not os.path.exists(path)
+
+    inside = []
+    overlaps = []
+
+    def worker() -> None:
+        for _ in range(20):
+            with FileLock(path, poll=0.001):
+                inside.append(1)
+                if len(inside) > 1:
+                    overlaps.append(1)
+                inside.pop()
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not overlaps
+
+
+@allure.epic("Читай-город API")
+@allure.feature("Кэш кук")
+@allure.title("FileLock: снятие брошенного lock-файла")
+@allure.severity("NORMAL")
+@pytest.mark.api
+def test_file_lock_breaks_stale(tmp_path) -> None:
+    """
+    Тест: lock-файл старше stale_after снимается, свежий - нет.
+
+    :param tmp_path: временный каталог теста
+    :return: None
+    """
+    path = str(tmp_path / "test.lock")
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("12345")
+    old = time.time() - 120
+    os.utime(path, (old, old))
+
+    with pytest.raises(TimeoutError):
+        FileLock(path, timeout=0.1, stale_after=300, poll=0.01).acquire()
+    with FileLock(path, timeout=1, stale_after=60):
+        with open(path, encoding="utf-8") as file:
+            assert file.read().startswith(f"{os.getpid()}:")
+    assert os.listdir(tmp_path) == []
+
+
+@allure.epic("Читай-город API")
+@allure.feature("Кэш кук")
+@allure.title("FileLock: чужая блокировка не освобождается")
+@allure.severity("CRITICAL")
+@pytest.mark.api
+def test_file_lock_release_owner(tmp_path) -> None:
+    """
+    Тест: блокировку долгого владельца сочли брошенной и захватили
+    заново. Освобождение первого владельца не удаляет чужой lock-файл.
+
+    :param tmp_path: временный каталог теста
+    :return: None
+    """
+    path = str(tmp_path / "test.lock")
+    slow = FileLock(path)
+    slow.acquire()
+    old = time.time() - 120
+    os.utime(path, (old, old))
+
+    with allure.step("Другой процесс снимает lock-файл как брошенный"):
+        other = FileLock(path, timeout=1, stale_after=60)
+        other.acquire()
+
+    with allure.step("Первый владелец не удаляет чужой lock-файл"):
+        slow.release()
+        assert os.path.exists(path)
+        with pytest.raises(TimeoutError):
+            FileLock(path, timeout=0.1, poll=0.01).acquire()
+
+    with allure.step("Владелец освобождает свою блокировку"):
+        other.release()
+        assert os.listdir(tmp_path) == []
+
+
+@allure.epic("Читай-город API")
+@allure.feature("Кэш кук")
+@allure.title("FileLock: свежая блокировка другого процесса не снимается")
+@allure.severity("CRITICAL")
+@pytest.mark.api
+def test_file_lock_stale_break_race(tmp_path, monkeypatch) -> None:
+    """
+    Тест гонки: пока процесс решал снять брошенный lock-файл, другой
+    процесс уже снял его и захватил блокировку. Свежий lock-файл
+    должен остаться на месте.
+
+    :param tmp_path: временный каталог теста
+    :param monkeypatch: фикстура pytest
+    :return: None
+    """
+    path = str(tmp_path / "test.lock")
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("stale")
+    old = time.time() - 120
+    os.utime(path, (old, old))
+
+    rename = os.rename
+
+    def racing_rename(source: str, target: str) -> None:
+        # Другой процесс успел снять брошенный файл и создать свой
+        os.remove(path)
+        with open(path, "w", encoding="utf-8") as lock_file:
+            lock_file.write("fresh")
+        rename(source, target)
+
+    monkeypatch.setattr(cache_helper.os, "rename", racing_rename)
+    FileLock(path, stale_after=60)._break_if_stale()
+    monkeypatch.undo()
+
+    with open(path, encoding="utf-8") as file:
+        assert file.read() == "fresh"
+    assert os.listdir(tmp_path) == ["test.lock"]
+
+
+@allure.epic("Читай-город API")
+@allure.feature("Кэш кук")
+@allure.title("CookieProvider: кэш в памяти и в файле до истечения TTL")
+@allure.severity("CRITICAL")
+@pytest.mark.api
+def test_cookie_provider_ttl(provider: CookieProvider,
+                             cookie_gate: LocalWebGate,
+                             monkeypatch) -> None:
+    """
+    Тест TTL кэша кук.
+
+    :param provider: поставщик кук
+    :type provider: CookieProvider
+    :param cookie_gate: локальный web-gate
+    :type cookie_gate: LocalWebGate
+    :param monkeypatch: фикстура pytest
+    :return: None
+    """
+    now = [time.time()]
+    monkeypatch.setattr(cookie_helper, "time",
+                        SimpleNamespace(time=lambda: now[0]))
+
+    with allure.step("Первый запрос получает куки с сервера"):
+        cookies = provider.get()
+        assert "__ddg1_" in cookies and cookies != FALLBACK_COOKIES
+        assert provider.refresh_count == 1
+
+    with allure.step("До истечения TTL куки берутся из кэша"):
+        now[0] += 59
+        assert provider.get() == cookies
+        other = CookieProvider(ttl=60, cache_file=provider.cache_file,
+                               source_url=provider.source_url)
+        assert other.get() == cookies
+        assert other.refresh_count == 0
+
+    with allure.step("После TTL куки запрашиваются заново"):
+        now[0] += 2
+        assert provider.get() != cookies
+        assert provider.refresh_count == 2
+        assert len(cookie_gate.issued_cookies) == 2
+
+
+@allure.epic("Читай-город API")
+@allure.feature("Кэш кук")
+@allure.title("CookieProvider: одно обновление на все потоки и процессы")
+@allure.severity("CRITICAL")
+@pytest.mark.api
+def test_cookie_provider_single_flight(provider: CookieProvider,
+                                       cookie_gate: LocalWebGate) -> None:
+    """
+    Тест: параллельные запросы кук выполняют одно обновление.
+
+    Второй поставщик с тем же файлом кэша изображает другой воркер.
+
+    :param provider: поставщик кук
+    :type provider: CookieProvider
+    :param cookie_gate: локальный web-gate
+    :type cookie_gate: LocalWebGate
+    :return: None
+    """
+    other = CookieProvider(ttl=60, cache_file=provider.cache_file,
+                           source_url=provider.source_url)
+    results = []
+
+    def worker(source: CookieProvider) -> None:
+        results.append(source.get())
+
+    threads = [threading.Thread(target=worker,
+                                args=(provider if n % 2 else other,))
+               for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(results) == 8
+    assert all(result == results[0] for result in results)
+    assert provider.refresh_count + other.refresh_count == 1
+    assert len(cookie_gate.issued_cookies) == 1
+
+
+@allure.epic("Читай-город API")
+@allure.feature("Кэш кук")
+@allure.title("CookieProvider: invalidate сохраняет более свежие куки")
+@allure.severity("NORMAL")
+@pytest.mark.api
+def test_cookie_provider_invalidate(provider: CookieProvider) -> None:
+    """
+    Тест invalidate: устаревшие куки сбрасываются, а куки, уже
+    обновлённые другим воркером, остаются в файловом кэше.
+
+    :param provider: поставщик кук
+    :type provider: CookieProvider
+    :return: None
+    """
+    stale = provider.get()
+
+    with allure.step("Сброс устаревших кук"):
+        provider.invalidate(stale)
+        fresh = provider.get()
+        assert fresh != stale
+        assert provider.refresh_count == 2
+
+    with allure.step("Сброс с чужими устаревшими куками"):
+        provider.invalidate(stale)
+        assert provider.get() == fresh
+        assert provider.refresh_count == 2
+        assert read_json(provider.cache_file)["cookies"] == fresh
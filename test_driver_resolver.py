@@ -0,0 +1,135 @@
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+import allure
+import driver_resolver
+from selenium.webdriver import ChromeOptions
+from cache_helper import read_json
+from driver_resolver import DriverResolver, binary_fingerprint
+
+
+class _CountingResolver(DriverResolver):
+    """
+    Кэш Selenium Manager, в котором разрешение не запускает Selenium
+    Manager, а возвращает заданные файлы драйвера и браузера.
+    """
+
+    def __init__(self, driver_path: str, browser_path: str,
+                 cache_file: str) -> None:
+        super().__init__(cache_file=cache_file, ttl=3600)
+        self.driver_path = driver_path
+        self.browser_path = browser_path
+
+    def _resolve(self, options: ChromeOptions) -> dict:
+        self.resolutions += 1
+        return {
+            "driver_path": self.driver_path,
+            "browser_path": self.browser_path,
+            "browser_fingerprint": binary_fingerprint(self.browser_path),
+            "resolve_seconds": 0.5,
+            "resolved_at": time.time(),
+        }
+
+
+@pytest.fixture
+def binaries(tmp_path) -> SimpleNamespace:
+    """
+    Фикстура файлов драйвера и браузера.
+
+    :param tmp_path: временный каталог теста
+    :return: пути к файлам
+    :rtype: SimpleNamespace
+    """
+    driver = tmp_path / "chromedriver"
+    browser = tmp_path / "chrome"
+    driver.write_bytes(b"driver")
+    browser.write_bytes(b"chrome 120")
+    return SimpleNamespace(driver=str(driver), browser=str(browser))
+
+
+@allure.epic("Читай-город")
+@allure.feature("Кэш драйвера")
+@allure.title("Проверка записи кэша драйвера")
+@allure.severity("NORMAL")
+@pytest.mark.api
+def test_driver_entry_validity(binaries, tmp_path, monkeypatch) -> None:
+    """
+    Тест _is_valid: запись не используется после TTL, без файла
+    драйвера и после обновления браузера.
+
+    :param binaries: файлы драйвера и браузера
+    :param tmp_path: временный каталог теста
+    :param monkeypatch: фикстура pytest
+    :return: None
+    """
+    now = [time.time()]
+    monkeypatch.setattr(driver_resolver, "time",
+                        SimpleNamespace(time=lambda: now[0]))
+    resolver = DriverResolver(cache_file=str(tmp_path / "drivers.json"),
+                              ttl=60)
+    entry = {"driver_path": binaries.driver,
+             "browser_path": binaries.browser,
+             "browser_fingerprint": binary_fingerprint(binaries.browser),
+             "resolved_at": now[0]}
+
+    with allure.step("Свежая запись используется"):
+        assert resolver._is_valid(entry)
+        assert resolver._is_valid(dict(entry, browser_path=None))
+        assert not resolver._is_valid(None)
+
+    with allure.step("Запись старше TTL не используется"):
+        now[0] += 61
+        assert not resolver._is_valid(entry)
+        now[0] -= 61
+
+    with allure.step("Запись без файла драйвера не используется"):
+        assert not resolver._is_valid(
+            dict(entry, driver_path=binaries.driver + ".missing"))
+
+    with allure.step("Обновлённый браузер делает запись устаревшей"):
+        with open(binaries.browser, "ab") as file:
+            file.write(b" update")
+        assert not resolver._is_valid(entry)
+
+
+@allure.epic("Читай-город")
+@allure.feature("Кэш драйвера")
+@allure.title("Общий файловый кэш драйвера процессов")
+@allure.severity("NORMAL")
+@pytest.mark.api
+def test_driver_file_cache(binaries, tmp_path) -> None:
+    """
+    Тест: драйвер разрешается один раз, второй процесс берёт результат
+    из общего файла, а после обновления браузера драйвер разрешается
+    заново.
+
+    :param binaries: файлы драйвера и браузера
+    :param tmp_path: временный каталог теста
+    :return: None
+    """
+    cache_file = str(tmp_path / "drivers.json")
+    options = ChromeOptions()
+    first = _CountingResolver(binaries.driver, binaries.browser, cache_file)
+    second = _CountingResolver(binaries.driver, binaries.browser,
+                               cache_file)
+
+    with allure.step("Первый процесс разрешает драйвер"):
+        assert first.resolve(options) == (binaries.driver, binaries.browser)
+        assert first.resolve(options) == (binaries.driver, binaries.browser)
+        assert first.stats()["resolutions"] == 1
+        assert first.stats()["cache_hits"] == 1
+        assert DriverResolver.cache_key(options) in read_json(cache_file)
+        assert not os.path.exists(cache_file + ".lock")
+
+    with allure.step("Второй процесс берёт результат из файла"):
+        assert second.resolve(options) == (binaries.driver, binaries.browser)
+        assert second.stats() == {"resolutions": 0, "cache_hits": 1,
+                                  "resolve_ms": 0.0, "saved_ms": 500.0}
+
+    with allure.step("После обновления браузера драйвер разрешается"):
+        with open(binaries.browser, "ab") as file:
+            file.write(b" update")
+        second.resolve(options)
+        assert second.stats()["resolutions"] == 1
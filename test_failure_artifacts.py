@@ -0,0 +1,102 @@
+import base64
+import gzip
+
+import pytest
+import allure
+from failure_artifacts import FailureArtifacts
+
+
+def _raw(name: str, dom: str, screenshot: bytes = b"jpeg") -> dict:
+    """
+    Сырые данные упавшего теста, как их возвращает capture().
+
+    :param name: имя теста
+    :type name: str
+    :param dom: DOM страницы
+    :type dom: str
+    :param screenshot: скриншот
+    :type screenshot: bytes
+    :return: сырые данные
+    :rtype: dict
+    """
+    return {"name": name, "url": "https://www.chitai-gorod.ru/cart",
+            "screenshot": base64.b64encode(screenshot).decode("ascii"),
+            "screenshot_type": "jpg", "dom": dom,
+            "console": [{"level": "SEVERE", "message": "boom"}]}
+
+
+def _names(artifacts: list) -> list:
+    """
+    Имена артефактов для Allure.
+
+    :param artifacts: результат _process()
+    :type artifacts: list
+    :return: имена артефактов
+    :rtype: list
+    """
+    return [artifact[1] for artifact in artifacts]
+
+
+@allure.epic("Читай-город")
+@allure.feature("Артефакты падений")
+@allure.title("Одинаковый DOM прикладывается один раз")
+@allure.severity("NORMAL")
+@pytest.mark.api
+def test_artifacts_dom_dedup() -> None:
+    """
+    Тест _process: DOM сжимается, а одинаковый DOM другого теста
+    заменяется ссылкой на первый тест.
+
+    :return: None
+    """
+    artifacts = FailureArtifacts(max_bytes=1024 * 1024)
+    dom = "<html><body>Корзина пуста</body></html>"
+
+    with allure.step("Первый тест получает скриншот и сжатый DOM"):
+        first = artifacts._process(_raw("test_a", dom))
+        assert _names(first) == ["URL при падении", "Консоль браузера",
+                                 "Скриншот", "DOM"]
+        assert first[1][0] == "[SEVERE] boom"
+        assert first[2][0] == b"jpeg"
+        assert gzip.decompress(first[3][0]).decode("utf-8") == dom
+
+    with allure.step("Второй тест с тем же DOM получает ссылку"):
+        second = artifacts._process(_raw("test_b", dom))
+        assert "DOM" not in _names(second)
+        assert "DOM (как у другого теста)" in _names(second)
+        assert '"same_as": "test_a"' in second[2][0]
+
+    with allure.step("Повтор того же теста снова прикладывает DOM"):
+        assert "DOM" in _names(artifacts._process(_raw("test_a", dom)))
+        assert artifacts.stats()["deduped"] == 1
+
+
+@allure.epic("Читай-город")
+@allure.feature("Артефакты падений")
+@allure.title("Предел размера артефактов за прогон")
+@allure.severity("NORMAL")
+@pytest.mark.api
+def test_artifacts_size_cap() -> None:
+    """
+    Тест _process: после max_bytes за прогон скриншоты и DOM заменяются
+    пометкой, а URL и консоль прикладываются всегда.
+
+    :return: None
+    """
+    artifacts = FailureArtifacts(max_bytes=150)
+
+    with allure.step("Первый скриншот помещается в предел"):
+        first = artifacts._process(_raw("test_a", "", b"x" * 100))
+        assert _names(first) == ["URL при падении", "Консоль браузера",
+                                 "Скриншот"]
+
+    with allure.step("Следующий скриншот в предел не помещается"):
+        second = artifacts._process(_raw("test_b", "", b"y" * 100))
+        assert _names(second) == ["URL при падении", "Консоль браузера",
+                                  "Скриншот пропущен"]
+        assert "100 байт" in second[2][0]
+
+    with allure.step("Статистика"):
+        stats = artifacts.stats()
+        assert stats["bytes"] == 100
+        assert stats["over_limit"] == 1
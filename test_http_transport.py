@@ -0,0 +1,87 @@
+import pytest
+import allure
+import http_transport
+from http_transport import (HTTPTransport, close_shared_transport,
+                            get_shared_transport)
+from local_server import LocalWebGate
+
+
+@pytest.fixture(scope="module")
+def pool_gate() -> LocalWebGate:
+    """
+    Фикстура локального web-gate для проверки пула соединений.
+
+    :yields: LocalWebGate
+    """
+    with LocalWebGate(port=0, latency={}, error_rate={}) as gate:
+        yield gate
+
+
+@allure.epic("Читай-город API")
+@allure.feature("Пул соединений")
+@allure.title("Повторное использование соединений пула")
+@allure.severity("NORMAL")
+@pytest.mark.api
+def test_transport_reuses_connections(pool_gate: LocalWebGate) -> None:
+    """
+    Тест stats: последовательные запросы к одному хосту идут по одному
+    keep-alive соединению.
+
+    :param pool_gate: локальный web-gate
+    :type pool_gate: LocalWebGate
+    :return: None
+    """
+    transport = HTTPTransport()
+    try:
+        with allure.step("Статистика до запросов"):
+            assert transport.stats() == {"requests": 0, "hits": 0,
+                                         "misses": 0, "hit_ratio": 0.0}
+
+        with allure.step("Пять запросов по одному соединению"):
+            for _ in range(5):
+                assert transport.request("GET",
+                                         pool_gate.url_ui).status_code == 200
+            assert transport.stats() == {"requests": 5, "hits": 4,
+                                         "misses": 1, "hit_ratio": 0.8}
+    finally:
+        transport.close()
+
+
+@allure.epic("Читай-город API")
+@allure.feature("Пул соединений")
+@allure.title("Закрытие общего транспорта возвращает его статистику")
+@allure.severity("NORMAL")
+@pytest.mark.api
+def test_close_shared_transport(pool_gate: LocalWebGate,
+                                monkeypatch) -> None:
+    """
+    Тест close_shared_transport: итоговая статистика общего транспорта,
+    после закрытия создаётся новый транспорт.
+
+    :param pool_gate: локальный web-gate
+    :type pool_gate: LocalWebGate
+    :param monkeypatch: фикстура pytest
+    :return: None
+    """
+    # Общий транспорт прогона не трогается: тест работает со своим
+    monkeypatch.setattr(http_transport, "_shared_transport", None)
+    monkeypatch.setattr(http_transport, "cassette_mode", "off")
+
+    with allure.step("Без транспорта статистики нет"):
+        assert close_shared_transport() is None
+
+    with allure.step("Статистика общего транспорта при закрытии"):
+        shared = get_shared_transport()
+        assert get_shared_transport() is shared
+        for _ in range(3):
+            shared.request("GET", pool_gate.url_ui)
+        stats = close_shared_transport()
+        assert stats == {"requests": 3, "hits": 2, "misses": 1,
+                         "hit_ratio": 0.667}
+        assert "cassette" not in stats
+
+    with allure.step("После закрытия создаётся новый транспорт"):
+        fresh = get_shared_transport()
+        assert fresh is not shared
+        assert fresh.stats()["requests"] == 0
+        close_shared_transport()
@@ -0,0 +1,106 @@
+from types import SimpleNamespace
+
+import pytest
+import allure
+import requests
+from cookie_helper import CookieProvider
+from http_transport import HTTPTransport
+from load_runner import LoadStats, run_load, run_scenario, attach_report
+from local_server import LocalWebGate
+from token_manager import TokenManager
+from config import load_users, load_ramp_up, load_duration, load_max_requests
+
+
+@allure.epic("Читай-город API")
+@allure.feature("Нагрузка")
+@allure.title("Сценарий добавления и удаления товара под нагрузкой")
+@allure.description("Тест выполняет сценарий add -> get -> remove "
+                    "несколькими виртуальными пользователями и прикладывает "
+                    "отчёт с пропускной способностью и перцентилями.")
+@allure.severity("NORMAL")
+@pytest.mark.api
+@pytest.mark.load
+def test_cart_scenario_under_load(cookie_provider: CookieProvider,
+                                  token_manager: TokenManager,
+                                  cart_api_url: str) -> None:
+    """
+    Нагрузочный тест сценария корзины.
+
+    :param cookie_provider: поставщик кук DDoS-Guard
+    :type cookie_provider: CookieProvider
+    :param token_manager: поставщик анонимных токенов
+    :type token_manager: TokenManager
+    :param cart_api_url: адрес API корзины
+    :type cart_api_url: str
+    :return: None
+    """
+    with allure.step("Выполнить нагрузочный прогон"):
+        report = run_load(users=load_users, ramp_up=load_ramp_up,
+                          duration=load_duration,
+                          max_requests=load_max_requests,
+                          base_url=cart_api_url,
+                          cookie_provider=cookie_provider,
+                          token_manager=token_manager)
+        attach_report(report)
+
+    with allure.step("Проверить, что запросы выполнены без ошибок"):
+        assert report["requests"] > 0
+        assert report["errors"] == 0, report["error_breakdown"]
+
+
+@allure.epic("Читай-город API")
+@allure.feature("Нагрузка")
+@allure.title("Ответ корзины не в JSON учитывается как ошибка")
+@allure.severity("NORMAL")
+@pytest.mark.api
+def test_scenario_invalid_cart_body() -> None:
+    """
+    Тест: 200 с HTML вместо JSON не роняет виртуального пользователя,
+    а попадает в разбивку ошибок.
+
+    :return: None
+    """
+    page = requests.Response()
+    page.status_code = 200
+    page.headers["Content-Type"] = "text/html"
+    page._content = b"<html>challenge</html>"
+    client = SimpleNamespace(
+        add_product_to_cart=lambda goods_id: SimpleNamespace(
+            status_code=200),
+        get_cart=lambda: page,
+    )
+    stats = LoadStats(max_requests=10)
+
+    assert run_scenario(client, stats)
+    assert stats.errors == {"get_cart: invalid body": 1}
+    assert stats.requests == 2
+
+
+@allure.epic("Читай-город API")
+@allure.feature("Нагрузка")
+@allure.title("Ошибка запуска виртуального пользователя в отчёте")
+@allure.severity("NORMAL")
+@pytest.mark.api
+def test_load_start_error(tmp_path) -> None:
+    """
+    Тест: если токен пользователя получить не удалось, поток не
+    падает молча, а ошибка попадает в отчёт.
+
+    :param tmp_path: временный каталог теста
+    :return: None
+    """
+    with LocalWebGate(port=0, latency={}, error_rate={"auth": 1.0}) as gate:
+        cookies = CookieProvider(ttl=60,
+                                 cache_file=str(tmp_path / "cookies.json"),
+                                 source_url=gate.url_ui)
+        transport = HTTPTransport()
+        manager = TokenManager(auth_url=gate.url_auth,
+                               cache_file=str(tmp_path / "tokens.json"),
+                               cookie_provider=cookies, transport=transport)
+        report = run_load(users=2, ramp_up=0, duration=None,
+                          max_requests=10, base_url=gate.url_api,
+                          cookie_provider=cookies, token_manager=manager)
+        transport.close()
+
+    assert report["requests"] == 0
+    assert report["error_breakdown"] == {"start: HTTPError": 2}
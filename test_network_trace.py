@@ -0,0 +1,146 @@
+from typing import Optional
+
+import pytest
+import allure
+from network_trace import NetworkTrace
+
+
+def _sent(request_id: str, url: str, timestamp: float,
+          redirect: Optional[dict] = None) -> dict:
+    """
+    Событие Network.requestWillBeSent.
+
+    :param request_id: идентификатор запроса
+    :type request_id: str
+    :param url: адрес запроса
+    :type url: str
+    :param timestamp: время события, сек
+    :type timestamp: float
+    :param redirect: ответ с редиректом на этот адрес
+    :type redirect: dict
+    :return: событие DevTools
+    :rtype: dict
+    """
+    params = {"requestId": request_id, "timestamp": timestamp,
+              "wallTime": 1_700_000_000 + timestamp, "type": "Document",
+              "request": {"method": "GET", "url": url, "headers": {}}}
+    if redirect is not None:
+        params["redirectResponse"] = redirect
+    return {"method": "Network.requestWillBeSent", "params": params}
+
+
+def _event(method: str, request_id: str, **params) -> dict:
+    params["requestId"] = request_id
+    return {"method": f"Network.{method}", "params": params}
+
+
+@pytest.fixture
+def har() -> dict:
+    """
+    Фикстура HAR шага: редирект, запрос к API, упавший и незавершённый
+    запросы.
+
+    :return: HAR шага
+    :rtype: dict
+    """
+    timing = {"requestTime": 1.15, "dnsStart": -1, "dnsEnd": -1,
+              "connectStart": 1, "connectEnd": 11, "sslStart": -1,
+              "sslEnd": -1, "sendStart": 12, "sendEnd": 13,
+              "receiveHeadersEnd": 113}
+    events = [
+        _sent("1", "http://chitai-gorod.test/", 1.0),
+        _sent("1", "https://chitai-gorod.test/", 1.1,
+              redirect={"status": 301, "statusText": "Moved"}),
+        _event("responseReceived", "1", response={
+            "status": 200, "protocol": "h2", "timing": timing}),
+        _sent("2", "https://chitai-gorod.test/api/v1/cart", 1.2),
+        _event("responseReceived", "2", response={"status": 200}),
+        _event("loadingFinished", "2", timestamp=1.3,
+               encodedDataLength=200),
+        _sent("3", "https://chitai-gorod.test/broken.js", 1.25),
+        _event("loadingFailed", "3", timestamp=1.3,
+               errorText="net::ERR_FAILED"),
+        _sent("4", "https://chitai-gorod.test/pixel.gif", 1.4),
+        _event("loadingFinished", "1", timestamp=1.5,
+               encodedDataLength=1000),
+        # События запроса, начатого до шага, пропускаются
+        _event("loadingFinished", "0", timestamp=1.5),
+    ]
+    trace = NetworkTrace(enabled=False, slowest=1, api_patterns=("/api/",),
+                         width=20)
+    return trace.build_har("Открыть корзину", events)
+
+
+@allure.epic("Читай-город")
+@allure.feature("Трассировка сети")
+@allure.title("HAR: редиректы и незавершённые запросы")
+@allure.severity("NORMAL")
+@pytest.mark.api
+def test_har_entries(har) -> None:
+    """
+    Тест build_har: каждый переход редиректа - отдельная запись,
+    упавший и незавершённый запросы отмечаются ошибкой, записи идут по
+    времени начала.
+
+    :param har: HAR шага
+    :return: None
+    """
+    entries = har["log"]["entries"]
+
+    with allure.step("Записи по времени начала"):
+        assert [entry["request"]["url"].split("/", 3)[-1]
+                for entry in entries] == [
+            "", "", "api/v1/cart", "broken.js", "pixel.gif"]
+        assert har["log"]["pages"][0]["title"] == "Открыть корзину"
+
+    with allure.step("Редирект разбит на две записи"):
+        redirect, final = entries[0], entries[1]
+        assert redirect["request"]["url"].startswith("http://")
+        assert redirect["response"]["status"] == 301
+        assert redirect["time"] == pytest.approx(100.0)
+        assert final["response"]["status"] == 200
+        assert final["time"] == pytest.approx(400.0)
+        assert final["response"]["bodySize"] == 1000
+
+    with allure.step("Фазы запроса из ResourceTiming"):
+        timings = final["timings"]
+        assert timings["blocked"] == pytest.approx(50.0)
+        assert timings["dns"] == -1
+        assert timings["connect"] == pytest.approx(10.0)
+        assert timings["wait"] == pytest.approx(100.0)
+        assert timings["receive"] == pytest.approx(237.0)
+
+    with allure.step("Упавший и незавершённый запросы"):
+        assert entries[3]["_error"] == "net::ERR_FAILED"
+        assert entries[4]["_error"] == "unfinished"
+        assert entries[4]["time"] == 0.0
+
+
+@allure.epic("Читай-город")
+@allure.feature("Трассировка сети")
+@allure.title("HAR: отметки долгих запросов и запросов к API")
+@allure.severity("NORMAL")
+@pytest.mark.api
+def test_har_flags(har) -> None:
+    """
+    Тест build_har и waterfall: отмечаются самый долгий запрос и
+    запросы к API.
+
+    :param har: HAR шага
+    :return: None
+    """
+    entries = har["log"]["entries"]
+
+    with allure.step("Флаги записей"):
+        assert [entry["_slow"] for entry in entries] == [
+            False, True, False, False, False]
+        assert [entry["_api"] for entry in entries] == [
+            False, False, True, False, False]
+
+    with allure.step("Водопад"):
+        lines = NetworkTrace(enabled=False, width=20).waterfall(har)
+        lines = lines.splitlines()
+        assert lines[0].startswith("Открыть корзину: 5 запросов, 1200 байт")
+        assert "API: 1 запросов" in lines[0]
+        assert "SLOW" in lines[3] and "API" in lines[4]
+        assert "unfinished GET" in lines[6]
@@ -0,0 +1,208 @@
+import os
+import re
+
+import pytest
+import allure
+import requests
+from selenium.webdriver.common.by import By
+from pages.search_ui_page import SearchPage
+from pages.cart_ui_page import AddToCart
+from pages.auth_ui_page import AuthPage
+from cache_helper import read_json
+from dom_snapshot import snapshot
+from page_snapshots import (MANIFEST_FILE, SNAPSHOT_PATHS, SnapshotServer,
+                            compare, diff_states, locator_state,
+                            page_locators)
+from storefront import DELETED_TEXT
+from wait_engine import ec
+from config import book_title, phone, snapshot_dir
+
+
+@allure.epic("Читай-город")
+@allure.feature("Снимки страниц")
+@allure.title("Локаторы page objects на снимке. POSITIVE")
+@allure.description("Тест проверяет, что на снимке страницы локаторы "
+                    "page objects находятся так же, как на живом сайте "
+                    "в момент снятия снимка.")
+@allure.severity("NORMAL")
+@pytest.mark.ui
+@pytest.mark.offline
+@pytest.mark.parametrize("name", list(SNAPSHOT_PATHS))
+def test_offline_locators(offline_driver, snapshot_server, name):
+    """
+    Тест локаторов page objects на снимке страницы.
+
+    :param offline_driver: WebDriver instance
+    :type offline_driver: WebDriver
+    :param snapshot_server: сервер снимков
+    :type snapshot_server: SnapshotServer
+    :param name: имя снимка
+    :type name: str
+    :return: None
+    """
+    manifest = read_json(os.path.join(snapshot_dir, MANIFEST_FILE), {})
+    if name not in manifest:
+        pytest.skip(f"Нет снимка {name}")
+
+    with allure.step("Открыть снимок страницы"):
+        offline_driver.get(snapshot_server.url(name))
+        if name == "auth":
+            AuthPage(offline_driver).open_auth_form()
+
+    with allure.step("Сравнить локаторы с сохранёнными при снятии"):
+        state = locator_state(offline_driver,
+                              page_locators(offline_driver)[name])
+        changes = diff_states(manifest[name]["locators"], state)
+        assert not changes, changes
+
+
+@allure.epic("Читай-город")
+@allure.feature("Снимки страниц")
+@allure.title("Поиск и добавление товара в корзину на снимках. POSITIVE")
+@allure.description("Тест проходит поиск и добавление товара в корзину "
+                    "page objects на снимках страниц.")
+@allure.severity("NORMAL")
+@pytest.mark.ui
+@pytest.mark.offline
+def test_offline_search_and_add_to_cart(offline_driver, snapshot_server):
+    """
+    Тест поиска и добавления товара в корзину на снимках.
+
+    :param offline_driver: WebDriver instance
+    :type offline_driver: WebDriver
+    :param snapshot_server: сервер снимков
+    :type snapshot_server: SnapshotServer
+    :return: None
+    """
+    search = SearchPage(offline_driver)
+    cart = AddToCart(offline_driver)
+
+    def cart_count() -> int:
+        text = snapshot(offline_driver, {"counter": cart.cart_counter})[
+            "counter"]["text"] or ""
+        digits = re.sub(r"\D", "", text)
+        return int(digits) if digits else 0
+
+    with allure.step("Найти книгу по названию"):
+        offline_driver.get(snapshot_server.url_ui)
+        search.search_by_title(book_title)
+        before = cart_count()
+
+    with allure.step("Нажать на кнопку 'Купить'"):
+        cart.add_product_to_cart()
+
+    with allure.step("Проверить, что счётчик корзины вырос на один"):
+        assert cart_count() == before + 1
+
+
+@allure.epic("Читай-город")
+@allure.feature("Снимки страниц")
+@allure.title("Удаление товара из корзины на снимке. POSITIVE")
+@allure.description("Тест проверяет удаление товара page object корзины "
+                    "на снимке страницы корзины.")
+@allure.severity("NORMAL")
+@pytest.mark.ui
+@pytest.mark.offline
+def test_offline_delete_from_cart(offline_driver, snapshot_server):
+    """
+    Тест удаления товара из корзины на снимке.
+
+    :param offline_driver: WebDriver instance
+    :type offline_driver: WebDriver
+    :param snapshot_server: сервер снимков
+    :type snapshot_server: SnapshotServer
+    :return: None
+    """
+    cart = AddToCart(offline_driver)
+
+    with allure.step("Открыть снимок корзины"):
+        offline_driver.get(snapshot_server.url("cart"))
+
+    with allure.step("Удалить товар из корзины"):
+        cart.delete_from_cart()
+
+    with allure.step("Проверить, что товар удален"):
+        deleted = cart.wait.until(ec.presence_of_element_located(
+            (By.CSS_SELECTOR, ".cart-item-deleted__title")))
+        assert deleted.text == DELETED_TEXT
+
+
+@allure.epic("Читай-город")
+@allure.feature("Снимки страниц")
+@allure.title("Ввод номера в форму входа на снимке. POSITIVE")
+@allure.description("Тест открывает форму входа и вводит номер телефона "
+                    "page object авторизации на снимке главной страницы.")
+@allure.severity("NORMAL")
+@pytest.mark.ui
+@pytest.mark.offline
+def test_offline_auth_form(offline_driver, snapshot_server):
+    """
+    Тест формы входа на снимке.
+
+    :param offline_driver: WebDriver instance
+    :type offline_driver: WebDriver
+    :param snapshot_server: сервер снимков
+    :type snapshot_server: SnapshotServer
+    :return: None
+    """
+    auth = AuthPage(offline_driver)
+
+    with allure.step("Нажать на кнопку 'Войти'"):
+        offline_driver.get(snapshot_server.url("auth"))
+        auth.open_auth_form()
+
+    with allure.step("Ввести номер телефона"):
+        auth.enter_phone_number(phone)
+
+    with allure.step("Проверить, что номер введён"):
+        phone_field = offline_driver.find_element(*auth.phone_input)
+        assert phone_field.get_property("value")
+
+
+@allure.epic("Читай-город")
+@allure.feature("Снимки страниц")
+@allure.title("Снимки страниц актуальны")
+@allure.description("Тест сравнивает живые страницы сайта со снимками: "
+                    "если элементы page objects изменились, снимки нужно "
+                    "снять заново.")
+@allure.severity("MINOR")
+@pytest.mark.ui
+def test_snapshots_up_to_date(driver):
+    """
+    Тест актуальности снимков страниц.
+
+    :param driver: WebDriver instance
+    :type driver: WebDriver
+    :return: None
+    """
+    if not os.path.isfile(os.path.join(snapshot_dir, MANIFEST_FILE)):
+        pytest.skip("Нет снимков страниц: python page_snapshots.py capture")
+
+    with allure.step("Сравнить живые страницы со снимками"):
+        drift = compare(driver)
+
+    with allure.step("Проверить, что расхождений нет"):
+        assert not drift, ("Снимки устарели, снимите заново: "
+                           f"python page_snapshots.py capture\n{drift}")
+
+
+@allure.epic("Читай-город")
+@allure.feature("Снимки страниц")
+@allure.title("Сервер снимков отдаёт снятые страницы")
+@allure.severity("NORMAL")
+@pytest.mark.api
+def test_snapshot_server(tmp_path) -> None:
+    """
+    Тест сервера снимков: снятая страница отдаётся по своему адресу,
+    отсутствующая - 404.
+
+    :param tmp_path: временный каталог теста
+    :return: None
+    """
+    (tmp_path / "search.html").write_text("<p>Снимок</p>", encoding="utf-8")
+    with SnapshotServer(str(tmp_path), port=0) as server:
+        page = requests.get(server.url("search") + "?phrase=Python",
+                            timeout=5)
+        assert page.status_code == 200
+        assert page.text == "<p>Снимок</p>"
+        assert requests.get(server.url("cart"), timeout=5).status_code == 404
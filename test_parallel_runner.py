@@ -0,0 +1,49 @@
+import pytest
+import allure
+from parallel_runner import shard, split_clean_alluredir
+
+
+@allure.epic("Читай-город")
+@allure.feature("Параллельный прогон")
+@allure.title("Распределение тестов по воркерам")
+@allure.severity("NORMAL")
+@pytest.mark.api
+def test_shard_balance() -> None:
+    """
+    Тест распределения тестов по длительностям (LPT).
+
+    :return: None
+    """
+    durations = {"a": 10.0, "b": 6.0, "c": 5.0, "d": 1.0}
+
+    with allure.step("Тест без истории весит как средний известный"):
+        shards = shard(["a", "b", "c", "d", "e"], durations, 2)
+        assert sorted(map(sorted, shards)) == [["a", "c"], ["b", "d", "e"]]
+
+    with allure.step("Воркеров больше, чем тестов"):
+        assert shard(["a"], durations, 3) == [["a"], [], []]
+
+    with allure.step("Без воркеров - ошибка"):
+        with pytest.raises(ValueError):
+            shard(["a"], durations, 0)
+
+
+@allure.epic("Читай-город")
+@allure.feature("Параллельный прогон")
+@allure.title("--clean-alluredir не передаётся воркерам")
+@allure.severity("NORMAL")
+@pytest.mark.api
+def test_split_clean_alluredir() -> None:
+    """
+    Тест: флаг очистки убирается из аргументов воркеров, а каталог
+    очищает родительский процесс.
+
+    :return: None
+    """
+    assert split_clean_alluredir(["-m", "api"]) == (["-m", "api"], None)
+    assert split_clean_alluredir(
+        ["--alluredir=out", "--clean-alluredir", "-m", "api"]
+    ) == (["--alluredir=out", "-m", "api"], "out")
+    assert split_clean_alluredir(
+        ["--clean-alluredir", "--alluredir", "out"]
+    ) == (["--alluredir", "out"], "out")
@@ -0,0 +1,107 @@
+import os
+import time
+from types import SimpleNamespace
+from typing import Optional
+
+import pytest
+import allure
+import profile_template
+from cache_helper import read_json, write_json
+from profile_template import ProfileTemplate
+
+
+def _meta(template: ProfileTemplate, name: str, built_at: float,
+          fingerprint: Optional[list] = None) -> dict:
+    """
+    Метаданные шаблона с каталогом профиля.
+
+    :param template: шаблон профиля
+    :type template: ProfileTemplate
+    :param name: имя каталога версии шаблона
+    :type name: str
+    :param built_at: время сборки
+    :type built_at: float
+    :param fingerprint: отпечаток исполняемого файла Chrome
+    :type fingerprint: list
+    :return: метаданные шаблона
+    :rtype: dict
+    """
+    path = os.path.join(template.template_dir, name)
+    os.makedirs(path, exist_ok=True)
+    return {"path": path, "browser_version": "120.0",
+            "browser_fingerprint": fingerprint, "built_at": built_at}
+
+
+@allure.epic("Читай-город")
+@allure.feature("Шаблон профиля")
+@allure.title("Проверка шаблона профиля")
+@allure.severity("NORMAL")
+@pytest.mark.api
+def test_template_validity(tmp_path, monkeypatch) -> None:
+    """
+    Тест _is_valid: шаблон не используется после TTL, без каталога и
+    после обновления Chrome.
+
+    :param tmp_path: временный каталог теста
+    :param monkeypatch: фикстура pytest
+    :return: None
+    """
+    now = [time.time()]
+    monkeypatch.setattr(profile_template, "time",
+                        SimpleNamespace(time=lambda: now[0]))
+    template = ProfileTemplate(template_dir=str(tmp_path), ttl=60)
+    meta = _meta(template, "v1", now[0], fingerprint=[100, 1.0])
+
+    with allure.step("Свежий шаблон используется"):
+        assert template._is_valid(meta, [100, 1.0])
+        assert template._is_valid(meta, None)
+        assert template._is_valid(dict(meta, browser_fingerprint=None),
+                                  [200, 2.0])
+        assert not template._is_valid(None, None)
+
+    with allure.step("Шаблон старше TTL не используется"):
+        now[0] += 61
+        assert not template._is_valid(meta, [100, 1.0])
+        now[0] -= 61
+
+    with allure.step("Обновлённый Chrome делает шаблон устаревшим"):
+        assert not template._is_valid(meta, [200, 2.0])
+
+    with allure.step("Шаблон без каталога не используется"):
+        os.rmdir(meta["path"])
+        assert not template._is_valid(meta, [100, 1.0])
+
+
+@allure.epic("Читай-город")
+@allure.feature("Шаблон профиля")
+@allure.title("invalidate не сбрасывает пересобранный шаблон")
+@allure.severity("NORMAL")
+@pytest.mark.api
+def test_template_invalidate(tmp_path) -> None:
+    """
+    Тест invalidate: устаревший шаблон сбрасывается, а шаблон, уже
+    пересобранный другим воркером, остаётся.
+
+    :param tmp_path: временный каталог теста
+    :return: None
+    """
+    template = ProfileTemplate(template_dir=str(tmp_path), ttl=60)
+    stale = _meta(template, "v1", time.time())
+    fresh = _meta(template, "v2", time.time())
+    write_json(template.meta_file, fresh)
+    template._meta = stale
+
+    with allure.step("Шаблон пересобран другим воркером"):
+        template.invalidate(stale)
+        assert template._meta is None
+        assert read_json(template.meta_file) == fresh
+        assert not os.path.exists(template.meta_file + ".lock")
+
+    with allure.step("Устаревший шаблон сбрасывается"):
+        template.invalidate(fresh)
+        assert read_json(template.meta_file) is None
+
+    with allure.step("Без метаданных шаблон сбрасывается всегда"):
+        write_json(template.meta_file, fresh)
+        template.invalidate()
+        assert read_json(template.meta_file) is None
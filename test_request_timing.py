@@ -0,0 +1,160 @@
+import pytest
+import allure
+from cookie_helper import CookieProvider
+from http_transport import HTTPTransport
+from local_server import LocalWebGate
+from pages.api_client import CartAPI
+from request_timing import TimingRecorder
+from resilience import CircuitBreaker, RequestGuard, RetryPolicy
+
+
+def _record(operation: str, total_s: float) -> dict:
+    """
+    Замер запроса для тестов.
+
+    :param operation: имя операции
+    :type operation: str
+    :param total_s: общее время, сек
+    :type total_s: float
+    :return: замер
+    :rtype: dict
+    """
+    return {"operation": operation, "status": 200, "cookie_s": 0.0,
+            "connect_s": 0.001, "ttfb_s": total_s / 2, "total_s": total_s,
+            "wait_s": 0.0, "retries": 0, "request_bytes": 10,
+            "response_bytes": 100}
+
+
+@allure.epic("Читай-город API")
+@allure.feature("Замеры запросов")
+@allure.title("Ограниченное хранение замеров и сводка нарастающим итогом")
+@allure.severity("NORMAL")
+@pytest.mark.api
+def test_timing_recorder_bounded() -> None:
+    """
+    Тест: в памяти остаются последние max_records замеров, а сводка
+    учитывает все замеры прогона.
+
+    :return: None
+    """
+    recorder = TimingRecorder(max_records=5)
+    position = recorder.mark()
+    for number in range(1, 9):
+        recorder.add(_record("get_cart", number / 1000))
+
+    with allure.step("Хранятся только последние замеры"):
+        assert len(recorder.records) == 5
+        assert recorder.mark() == 8
+        assert [r["total_s"] for r in recorder.since(position)] == [
+            0.004, 0.005, 0.006, 0.007, 0.008]
+        assert [r["total_s"] for r in recorder.since(6)] == [0.007, 0.008]
+
+    with allure.step("Сводка учитывает вытесненные замеры"):
+        summary = recorder.summary()
+        operation = summary["operations"]["get_cart"]
+        assert summary["requests"] == 8
+        assert operation["count"] == 8
+        assert operation["total_ms_mean"] == pytest.approx(4.5)
+        assert operation["total_ms_max"] == pytest.approx(8.0)
+        assert operation["total_ms_p50"] == pytest.approx(6.0)
+        assert operation["new_connections"] == 8
+        assert operation["response_bytes"] == 800
+
+
+@allure.epic("Читай-город API")
+@allure.feature("Замеры запросов")
+@allure.title("TTFB учитывает все отправки запроса")
+@allure.severity("NORMAL")
+@pytest.mark.api
+def test_ttfb_counts_every_send(tmp_path) -> None:
+    """
+    Тест: после отказа DDoS-Guard из-за устаревших кук запрос
+    отправляется повторно, и TTFB замера складывается из обеих
+    отправок, а не только из последнего ответа.
+
+    :param tmp_path: временный каталог теста
+    :return: None
+    """
+    with LocalWebGate(port=0, latency={"get_cart": 0.2},
+                      error_rate={}) as gate:
+        cookies = CookieProvider(ttl=60,
+                                 cache_file=str(tmp_path / "cookies.json"),
+                                 source_url=gate.url_ui)
+        transport = HTTPTransport()
+        guard = RequestGuard(retry=RetryPolicy(base_delay=0),
+                             breaker=CircuitBreaker(failure_threshold=100))
+        client = CartAPI(cookie_provider=cookies, transport=transport,
+                         base_url=gate.url_api, token=gate.issue_token(),
+                         guard=guard, timing_recorder=TimingRecorder())
+
+        with allure.step("Куки клиента устаревают на сервере"):
+            gate.reset()
+            assert client.get_cart().status_code == 200
+            assert gate.request_counts["get_cart"] == 2
+
+        with allure.step("TTFB включает обе отправки"):
+            record = client.timings[-1]
+            assert record["ttfb_s"] >= 0.4
+            assert record["total_s"] >= record["ttfb_s"]
+        transport.close()
+
+
+class _ReconnectingCookies:
+    """
+    Поставщик кук, который при каждом обращении открывает новое
+    соединение: так обновление кук в замере запроса видно по
+    счётчику соединений потока.
+    """
+
+    def __init__(self, provider: CookieProvider, page_url: str) -> None:
+        self.provider = provider
+        self.page_url = page_url
+
+    def get(self) -> dict:
+        transport = HTTPTransport()
+        transport.request("GET", self.page_url)
+        transport.close()
+        return self.provider.get()
+
+    def invalidate(self, cookies: dict) -> None:
+        self.provider.invalidate(cookies)
+
+
+@allure.epic("Читай-город API")
+@allure.feature("Замеры запросов")
+@allure.title("Соединения обновления кук не входят в connect")
+@allure.severity("NORMAL")
+@pytest.mark.api
+def test_connect_excludes_cookie_refresh(tmp_path) -> None:
+    """
+    Тест: время соединений, открытых при получении кук, учитывается в
+    cookie_s, а connect_s и new_connections считают только соединения
+    самих отправок запроса.
+
+    :param tmp_path: временный каталог теста
+    :return: None
+    """
+    with LocalWebGate(port=0, latency={}, error_rate={}) as gate:
+        provider = CookieProvider(ttl=60,
+                                  cache_file=str(tmp_path / "cookies.json"),
+                                  source_url=gate.url_ui)
+        transport = HTTPTransport()
+        recorder = TimingRecorder()
+        client = CartAPI(cookie_provider=_ReconnectingCookies(
+                             provider, gate.url_ui),
+                         transport=transport, base_url=gate.url_api,
+                         token=gate.issue_token(),
+                         timing_recorder=recorder)
+
+        with allure.step("Первый запрос открывает соединение клиента"):
+            client.get_cart()
+            assert client.timings[-1]["connect_s"] > 0
+
+        with allure.step("Повторный запрос идёт по открытому соединению"):
+            client.get_cart()
+            record = client.timings[-1]
+            assert record["connect_s"] == 0
+            assert record["cookie_s"] > 0
+            operation = recorder.summary()["operations"]["get_cart"]
+            assert operation["new_connections"] == 1
+        transport.close()
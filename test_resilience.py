@@ -0,0 +1,318 @@
+import json
+from email.utils import format_datetime
+from datetime import datetime, timezone
+
+import pytest
+import allure
+import requests
+import resilience
+from cookie_helper import CookieProvider
+from resilience import (CircuitBreaker, CircuitOpenError, RequestGuard,
+                        RetryPolicy, TokenBucket)
+
+
+class FakeClock:
+    """
+    Часы теста вместо модуля time в resilience: sleep только сдвигает
+    время.
+    """
+
+    def __init__(self, now: float = 1_000_000.0) -> None:
+        self.now = now
+        self.slept = []
+
+    def time(self) -> float:
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    """
+    Фикстура поддельных часов модуля resilience.
+
+    :param monkeypatch: фикстура pytest
+    :return: FakeClock
+    :rtype: FakeClock
+    """
+    fake = FakeClock()
+    monkeypatch.setattr(resilience, "time", fake)
+    return fake
+
+
+def _response(status: int, headers: dict = None,
+              body: bytes = b"") -> requests.Response:
+    """
+    Ответ сервера для тестов.
+
+    :param status: HTTP статус
+    :type status: int
+    :param headers: заголовки
+    :type headers: dict
+    :param body: тело ответа
+    :type body: bytes
+    :return: Response object
+    :rtype: requests.Response
+    """
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    response._content = body
+    return response
+
+
+def _guard(**retry) -> RequestGuard:
+    """
+    Защита без ограничения частоты и с нулевой задержкой повторов.
+
+    :return: RequestGuard instance
+    :rtype: RequestGuard
+    """
+    return RequestGuard(retry=RetryPolicy(base_delay=0, **retry),
+                        breaker=CircuitBreaker(failure_threshold=100))
+
+
+@allure.epic("Читай-город API")
+@allure.feature("Защита запросов")
+@allure.title("TokenBucket: burst, ожидание и AIMD")
+@allure.severity("NORMAL")
+@pytest.mark.api
+def test_token_bucket(clock: FakeClock) -> None:
+    """
+    Тест ограничителя частоты в памяти процесса.
+
+    :param clock: поддельные часы
+    :type clock: FakeClock
+    :return: None
+    """
+    bucket = TokenBucket(rate=2.0, burst=2, min_rate=0.5, state_file=None)
+
+    with allure.step("Запросы в пределах burst не ждут"):
+        assert bucket.acquire() == 0
+        assert bucket.acquire() == 0
+
+    with allure.step("Следующий запрос ждёт токен"):
+        assert bucket.acquire() == pytest.approx(0.5)
+
+    with allure.step("Отказ сервера снижает частоту до min_rate"):
+        bucket.penalize()
+        assert bucket.rate == pytest.approx(1.0)
+        bucket.penalize()
+        bucket.penalize()
+        assert bucket.rate == pytest.approx(0.5)
+
+    with allure.step("Успешные запросы плавно возвращают частоту"):
+        for _ in range(100):
+            bucket.reward()
+        assert bucket.rate == pytest.approx(2.0)
+
+
+@allure.epic("Читай-город API")
+@allure.feature("Защита запросов")
+@allure.title("TokenBucket: общее состояние в файле")
+@allure.severity("NORMAL")
+@pytest.mark.api
+def test_token_bucket_shared_state(clock: FakeClock, tmp_path) -> None:
+    """
+    Тест общего для процессов состояния ограничителя.
+
+    :param clock: поддельные часы
+    :type clock: FakeClock
+    :param tmp_path: временный каталог теста
+    :return: None
+    """
+    state_file = str(tmp_path / "rate.json")
+    first = TokenBucket(rate=1.0, burst=1, state_file=state_file,
+                        name="host")
+    second = TokenBucket(rate=1.0, burst=1, state_file=state_file,
+                         name="host")
+
+    assert first.acquire() == 0
+    assert second.acquire() == pytest.approx(1.0)
+    with open(state_file, encoding="utf-8") as file:
+        assert "host" in json.load(file)
+
+
+@allure.epic("Читай-город API")
+@allure.feature("Защита запросов")
+@allure.title("RetryPolicy: статусы, Retry-After и задержка")
+@allure.severity("NORMAL")
+@pytest.mark.api
+def test_retry_policy(clock: FakeClock) -> None:
+    """
+    Тест политики повторов.
+
+    :param clock: поддельные часы
+    :type clock: FakeClock
+    :return: None
+    """
+    policy = RetryPolicy(statuses=(429, 503), base_delay=1, max_delay=10)
+
+    with allure.step("Повторяемые ответы"):
+        assert policy.is_retryable(_response(503))
+        assert policy.is_retryable(_response(429))
+        assert not policy.is_retryable(_response(403))
+        assert not policy.is_retryable(_response(503), idempotent=False)
+        assert policy.is_retryable(_response(429), idempotent=False)
+
+    with allure.step("Сетевые ошибки"):
+        read_timeout = requests.exceptions.ReadTimeout()
+        connect_timeout = requests.exceptions.ConnectTimeout()
+        assert policy.is_retryable_error(read_timeout)
+        assert not policy.is_retryable_error(read_timeout, idempotent=False)
+        assert policy.is_retryable_error(connect_timeout, idempotent=False)
+
+    with allure.step("Retry-After в секундах и HTTP датой"):
+        assert policy.delay(0, _response(429, {"Retry-After": "3"})) == 3
+        assert policy.delay(0, _response(429, {"Retry-After": "60"})) == 10
+        moment = datetime.fromtimestamp(clock.now + 5, timezone.utc)
+        header = {"Retry-After": format_datetime(moment, usegmt=True)}
+        assert policy.delay(0, _response(503, header)) == pytest.approx(5)
+        past = datetime.fromtimestamp(clock.now - 5, timezone.utc)
+        header = {"Retry-After": format_datetime(past, usegmt=True)}
+        assert policy.delay(0, _response(503, header)) == 0
+
+    with allure.step("Экспоненциальная задержка с пределом"):
+        for retry in range(6):
+            assert 0 <= policy.delay(retry) <= min(10, 2 ** retry)
+
+
+@allure.epic("Читай-город API")
+@allure.feature("Защита запросов")
+@allure.title("CircuitBreaker: размыкание и пробный запрос")
+@allure.severity("NORMAL")
+@pytest.mark.api
+def test_circuit_breaker(clock: FakeClock) -> None:
+    """
+    Тест состояний circuit breaker.
+
+    :param clock: поддельные часы
+    :type clock: FakeClock
+    :return: None
+    """
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+
+    with allure.step("Цепь размыкается после серии неудач"):
+        breaker.record_failure()
+        assert breaker.state == "closed"
+        breaker.record_failure()
+        assert breaker.state == "open"
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+        assert breaker.rejected == 1
+
+    with allure.step("После reset_timeout пропускается один запрос"):
+        clock.sleep(30)
+        assert breaker.state == "half-open"
+        breaker.before_call()
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+
+    with allure.step("Неудача пробного запроса снова размыкает цепь"):
+        breaker.record_failure()
+        assert breaker.state == "open"
+
+    with allure.step("Успех пробного запроса замыкает цепь"):
+        clock.sleep(30)
+        breaker.before_call()
+        breaker.record_success()
+        assert breaker.state == "closed"
+        breaker.before_call()
+
+
+@allure.epic("Читай-город API")
+@allure.feature("Защита запросов")
+@allure.title("RequestGuard: повторы по идемпотентности")
+@allure.severity("CRITICAL")
+@pytest.mark.api
+def test_request_guard_idempotency(clock: FakeClock) -> None:
+    """
+    Тест повторов RequestGuard для GET и POST.
+
+    :param clock: поддельные часы
+    :type clock: FakeClock
+    :return: None
+    """
+    def sender(*outcomes):
+        calls = []
+
+        def send() -> requests.Response:
+            outcome = outcomes[len(calls)]
+            calls.append(outcome)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+        return send, calls
+
+    with allure.step("GET повторяется после 5xx и таймаута чтения"):
+        send, calls = sender(_response(503),
+                             requests.exceptions.ReadTimeout(),
+                             _response(200))
+        response, attempts = _guard().call(send)
+        assert response.status_code == 200
+        assert attempts["retries"] == 2
+
+    with allure.step("POST не повторяется после 5xx"):
+        send, calls = sender(_response(503), _response(200))
+        response, _ = _guard().call(send, idempotent=False)
+        assert response.status_code == 503
+        assert len(calls) == 1
+
+    with allure.step("POST не повторяется после таймаута чтения"):
+        send, calls = sender(requests.exceptions.ReadTimeout(),
+                             _response(200))
+        with pytest.raises(requests.exceptions.ReadTimeout):
+            _guard().call(send, idempotent=False)
+        assert len(calls) == 1
+
+    with allure.step("POST повторяется после 429 и таймаута соединения"):
+        send, calls = sender(_response(429),
+                             requests.exceptions.ConnectTimeout(),
+                             _response(200))
+        response, attempts = _guard().call(send, idempotent=False)
+        assert response.status_code == 200
+        assert attempts["retries"] == 2
+
+
+@allure.epic("Читай-город API")
+@allure.feature("Защита запросов")
+@allure.title("RequestGuard: 403 API и заглушка DDoS-Guard не повторяются")
+@allure.severity("CRITICAL")
+@pytest.mark.api
+def test_request_guard_forbidden(clock: FakeClock) -> None:
+    """
+    Тест: 403 самого API - не заглушка DDoS-Guard, и ни 403, ни
+    заглушка не повторяются защитой (заглушку повторяет клиент API с
+    новыми куками).
+
+    :param clock: поддельные часы
+    :type clock: FakeClock
+    :return: None
+    """
+    forbidden = _response(403, {"Content-Type": "application/json"},
+                          b'{"message": "Forbidden"}')
+    challenge = _response(403, {"Server": "ddos-guard",
+                                "Content-Type": "text/html"})
+    assert not CookieProvider.is_stale_response(forbidden)
+    assert CookieProvider.is_stale_response(challenge)
+
+    bucket = TokenBucket(rate=5.0, burst=10, state_file=None)
+    for response in (forbidden, challenge):
+        calls = []
+        guard = RequestGuard(limiter=bucket,
+                             retry=RetryPolicy(base_delay=0))
+
+        def send() -> requests.Response:
+            calls.append(1)
+            return response
+
+        assert guard.call(send)[0] is response
+        assert len(calls) == 1
+    # Заглушка DDoS-Guard снижает частоту один раз, 403 API - нет
+    assert bucket.rate == pytest.approx(2.5)
@@ -0,0 +1,149 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+import allure
+import requests
+import response_cache
+from response_cache import ResponseCache
+
+
+def _response(body: bytes) -> requests.Response:
+    """
+    Ответ поиска для сохранения в кэш.
+
+    :param body: тело ответа
+    :type body: bytes
+    :return: Response object
+    :rtype: requests.Response
+    """
+    response = requests.Response()
+    response.status_code = 200
+    response.reason = "OK"
+    response.headers.update({"Content-Type": "application/json",
+                             "Content-Length": str(len(body))})
+    response.url = "https://example.test/search"
+    response._content = body
+    return response
+
+
+@allure.epic("Читай-город API")
+@allure.feature("Кэш ответов поиска")
+@allure.title("Попадание, промах и статистика кэша")
+@allure.severity("NORMAL")
+@pytest.mark.api
+def test_response_cache_hit_miss(tmp_path) -> None:
+    """
+    Тест сохранения ответа и статистики попаданий.
+
+    :param tmp_path: временный каталог теста
+    :return: None
+    """
+    cache = ResponseCache(cache_dir=str(tmp_path), ttl=60,
+                          max_bytes=1024 * 1024)
+    key = ResponseCache.key("GET", "https://example.test/search",
+                            {"phrase": "Мастер"})
+    assert key == ResponseCache.key("get", "https://example.test/search",
+                                    {"phrase": "Мастер"})
+
+    with allure.step("Промах до сохранения"):
+        assert cache.get(key) is None
+
+    with allure.step("Попадание после сохранения"):
+        cache.put(key, _response(b'{"data": []}'))
+        cached = cache.get(key)
+        assert cached.status_code == 200
+        assert cached.json() == {"data": []}
+        assert "Content-Length" not in cached.headers
+
+    with allure.step("Статистика"):
+        assert cache.stats() == {"hits": 1, "misses": 1, "stores": 1,
+                                 "evicted": 0, "hit_ratio": 0.5}
+
+
+@allure.epic("Читай-город API")
+@allure.feature("Кэш ответов поиска")
+@allure.title("Истечение TTL ответа")
+@allure.severity("NORMAL")
+@pytest.mark.api
+def test_response_cache_ttl(tmp_path, monkeypatch) -> None:
+    """
+    Тест: ответ старше TTL не отдаётся и удаляется с диска.
+
+    :param tmp_path: временный каталог теста
+    :param monkeypatch: фикстура pytest
+    :return: None
+    """
+    now = [1_000_000.0]
+    monkeypatch.setattr(response_cache, "time",
+                        SimpleNamespace(time=lambda: now[0]))
+    cache = ResponseCache(cache_dir=str(tmp_path), ttl=60,
+                          max_bytes=1024 * 1024)
+    cache.put("key", _response(b"{}"))
+
+    now[0] += 59
+    assert cache.get("key") is not None
+    now[0] += 2
+    assert cache.get("key") is None
+    assert not os.listdir(tmp_path)
+    assert cache.stats()["misses"] == 1
+
+
+@allure.epic("Читай-город API")
+@allure.feature("Кэш ответов поиска")
+@allure.title("Вытеснение давно не читанных ответов")
+@allure.severity("NORMAL")
+@pytest.mark.api
+def test_response_cache_lru_eviction(tmp_path) -> None:
+    """
+    Тест LRU вытеснения при превышении max_bytes.
+
+    :param tmp_path: временный каталог теста
+    :return: None
+    """
+    body = b"x" * 300
+    cache = ResponseCache(cache_dir=str(tmp_path), ttl=60,
+                          max_bytes=1024 * 1024)
+    for age, key in ((300, "a"), (200, "b"), (100, "c")):
+        cache.put(key, _response(body))
+        # Три ответа помещаются в кэш, четвёртый - уже нет
+        cache.max_bytes = int(os.path.getsize(cache._path(key)) * 3.5)
+        # Время последнего чтения задаётся явно: точность mtime на
+        # разных файловых системах различается
+        moment = os.path.getmtime(cache._path(key)) - age
+        os.utime(cache._path(key), (moment, moment))
+
+    with allure.step("Чтение обновляет время использования"):
+        assert cache.get("a") is not None
+
+    with allure.step("Новый ответ вытесняет самый давно не читанный"):
+        cache.put("d", _response(body))
+        assert cache.get("b") is None
+        for key in ("a", "c", "d"):
+            assert cache.get(key) is not None, key
+        assert cache.stats()["evicted"] == 1
+
+
+@allure.epic("Читай-город API")
+@allure.feature("Кэш ответов поиска")
+@allure.title("Перезапись ответа не раздувает размер кэша")
+@allure.severity("NORMAL")
+@pytest.mark.api
+def test_response_cache_overwrite_size(tmp_path) -> None:
+    """
+    Тест: при перезаписи ответа по тому же ключу размер кэша учитывает
+    только новый файл, а не сумму всех сохранённых версий.
+
+    :param tmp_path: временный каталог теста
+    :return: None
+    """
+    cache = ResponseCache(cache_dir=str(tmp_path), ttl=60,
+                          max_bytes=1024 * 1024)
+    cache.put("a", _response(b"x" * 300))
+    cache.put("b", _response(b"y" * 300))
+
+    with allure.step("Размер после перезаписи равен размеру на диске"):
+        for size in (400, 200, 400):
+            cache.put("a", _response(b"x" * size))
+            assert cache._size == cache._scan_size()
+        assert cache.stats()["stores"] == 5
@@ -0,0 +1,151 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+import allure
+import token_manager
+from cache_helper import read_json
+from cookie_helper import CookieProvider
+from http_transport import HTTPTransport
+from local_server import LocalWebGate
+from token_manager import TokenManager, token_expiry
+
+
+@pytest.fixture(scope="module")
+def token_gate() -> LocalWebGate:
+    """
+    Фикстура локального web-gate, выдающего JWT на две минуты.
+
+    :yields: LocalWebGate
+    """
+    with LocalWebGate(port=0, latency={}, error_rate={},
+                      token_lifetime=120) as gate:
+        yield gate
+
+
+@pytest.fixture
+def make_manager(token_gate: LocalWebGate, tmp_path):
+    """
+    Фабрика поставщиков токенов с общим файловым кэшем: каждый вызов
+    изображает отдельный процесс.
+
+    :param token_gate: локальный web-gate
+    :type token_gate: LocalWebGate
+    :param tmp_path: временный каталог теста
+    :yields: функция, создающая TokenManager
+    """
+    cookies = CookieProvider(ttl=60, cache_file=str(tmp_path / "cookies.json"),
+                             source_url=token_gate.url_ui)
+    transport = HTTPTransport()
+
+    def make() -> TokenManager:
+        return TokenManager(auth_url=token_gate.url_auth,
+                            cache_file=str(tmp_path / "tokens.json"),
+                            refresh_ahead=60, cookie_provider=cookies,
+                            transport=transport)
+
+    yield make
+    transport.close()
+
+
+@allure.epic("Читай-город API")
+@allure.feature("Токены")
+@allure.title("Токен обновляется в окне до exp")
+@allure.severity("CRITICAL")
+@pytest.mark.api
+def test_token_refresh_window(make_manager, monkeypatch) -> None:
+    """
+    Тест: токен берётся из кэша, пока до exp больше refresh_ahead, и
+    обновляется заранее, когда окно обновления наступило.
+
+    :param make_manager: фабрика поставщиков токенов
+    :param monkeypatch: фикстура pytest
+    :return: None
+    """
+    now = [time.time()]
+    monkeypatch.setattr(token_manager, "time",
+                        SimpleNamespace(time=lambda: now[0]))
+    manager = make_manager()
+
+    with allure.step("Первый запрос получает JWT с сервера"):
+        token = manager.get("gw0")
+        expires_at = token_expiry(token)
+        assert expires_at == pytest.approx(now[0] + 120, abs=2)
+        assert manager.fetch_count == 1
+
+    with allure.step("До окна обновления токен берётся из кэша"):
+        now[0] = expires_at - 61
+        assert manager.get("gw0") == token
+        assert manager.fetch_count == 1
+
+    with allure.step("В окне обновления токен запрашивается заново"):
+        now[0] = expires_at - 59
+        fresh = manager.get("gw0")
+        assert fresh != token
+        assert manager.fetch_count == 2
+        assert read_json(manager.cache_file)["gw0"]["token"] == fresh
+
+
+@allure.epic("Читай-город API")
+@allure.feature("Токены")
+@allure.title("Общий файловый кэш токенов процессов")
+@allure.severity("CRITICAL")
+@pytest.mark.api
+def test_token_file_cache(make_manager) -> None:
+    """
+    Тест: второй процесс берёт токен идентичности из общего файла, а
+    разные идентичности получают разные токены.
+
+    :param make_manager: фабрика поставщиков токенов
+    :return: None
+    """
+    first = make_manager()
+    second = make_manager()
+
+    with allure.step("Второй процесс не запрашивает токен повторно"):
+        token = first.get("gw0")
+        assert second.get("gw0") == token
+        assert second.fetch_count == 0
+
+    with allure.step("У каждой идентичности свой токен"):
+        tokens = second.pool(3)
+        assert len(set(tokens + [token])) == 4
+        assert first.pool(3) == tokens
+        assert first.fetch_count == 1
+        assert sorted(read_json(first.cache_file)) == [
+            "gw0", "vu-0", "vu-1", "vu-2"]
+
+
+@allure.epic("Читай-город API")
+@allure.feature("Токены")
+@allure.title("invalidate сохраняет более свежий токен")
+@allure.severity("NORMAL")
+@pytest.mark.api
+def test_token_invalidate(make_manager) -> None:
+    """
+    Тест invalidate: отклонённый токен сбрасывается, а токен, уже
+    обновлённый другим процессом, остаётся в файловом кэше.
+
+    :param make_manager: фабрика поставщиков токенов
+    :return: None
+    """
+    first = make_manager()
+    second = make_manager()
+    stale = first.get("gw0")
+    assert second.get("gw0") == stale
+
+    with allure.step("Первый процесс сбрасывает отклонённый токен"):
+        first.invalidate("gw0", stale_token=stale)
+        fresh = first.get("gw0")
+        assert fresh != stale
+
+    with allure.step("Второй процесс сбрасывает тот же токен позже"):
+        second.invalidate("gw0", stale_token=stale)
+        assert second.get("gw0") == fresh
+        assert second.fetch_count == 0
+        assert read_json(first.cache_file)["gw0"]["token"] == fresh
+
+    with allure.step("Без stale_token токен сбрасывается всегда"):
+        second.invalidate("gw0")
+        assert "gw0" not in read_json(first.cache_file)
+        assert second.get("gw0") not in (stale, fresh)
@@ -1,33 +1,15 @@
 import pytest
 import allure
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from pages.search_ui_page import SearchPage
 from pages.cart_ui_page import AddToCart
 from pages.auth_ui_page import AuthPage
-from config import url_ui, book_title, invalid_title, phone, invalid_phone
-
-
-@pytest.fixture
-def driver():
-    """
-    Фикстура для инициализации браузера.
-
-    :yields: WebDriver - Экземпляр WebDriver
-    """
-    # Настройка опций Chrome
-    options = webdriver.ChromeOptions()
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-
-    # Selenium Manager автоматически загрузит правильный ChromeDriver
-    driver = webdriver.Chrome(options=options)
-    driver.maximize_window()
-    driver.get(url_ui)
-    yield driver
-    driver.quit()
+from dom_snapshot import snapshot, page_source_contains
+from wait_engine import ec
+from config import (book_title, invalid_title, phone, invalid_phone,
+                    search_max_results)
 
 
 @allure.epic("Читай-город")
@@ -50,8 +32,39 @@ def test_search_by_title(driver):
         search.search_by_title(book_title)
 
     with allure.step("Проверить, что поиск по названию успешен"):
-        page_text = driver.page_source.lower()
-        assert book_title.lower() in page_text
+        assert page_source_contains(driver, book_title)
+
+
+@allure.epic("Читай-город")
+@allure.feature("Поиск товаров")
+@allure.title("Обход результатов поиска. POSITIVE")
+@allure.description("Тест проходит результаты поиска по страницам и "
+                    "проверяет данные карточек товаров.")
+@allure.severity("NORMAL")
+@pytest.mark.ui
+@pytest.mark.search
+def test_search_results_stream(driver):
+    """
+    Тест обхода результатов поиска.
+
+    :param driver: WebDriver instance
+    :type driver: WebDriver
+    :return: None
+    """
+    search = SearchPage(driver)
+
+    with allure.step("Найти книгу по названию"):
+        search.search_by_title(book_title)
+
+    with allure.step("Обойти результаты поиска"):
+        count = 0
+        for result in search.iter_results(max_results=search_max_results):
+            count += 1
+            assert result.product_id, result
+            assert result.title, result
+
+    with allure.step("Проверить, что результаты найдены"):
+        assert count > 0
 
 
 @allure.epic("Читай-город")
@@ -111,9 +124,8 @@ def test_add_product_to_cart(driver):
         cart.add_product_to_cart()
 
     with allure.step("Проверяем, что товар добавлен в корзину"):
-        count = driver.find_element(
-            By.CSS_SELECTOR, ".header-controls__btn .chg-indicator"
-        ).text.strip()
+        count = snapshot(driver, {"counter": cart.cart_counter})[
+            "counter"]["text"]
         print(f"✓ Товар добавлен в корзину. Количество: {count}")
 
 
@@ -124,25 +136,17 @@ def test_add_product_to_cart(driver):
 @allure.severity("CRITICAL")
 @pytest.mark.ui
 @pytest.mark.cart
-def test_delete_from_cart(driver):
+def test_delete_from_cart(driver, cart_with_product):
     """
     Тест удаления товара из корзины.
 
     :param driver: WebDriver instance
     :type driver: WebDriver
+    :param cart_with_product: открытая корзина с товаром
+    :type cart_with_product: AddToCart
     :return: None
     """
-    search = SearchPage(driver)
-    cart = AddToCart(driver)
-
-    with allure.step("Найти книгу по названию"):
-        search.search_by_title(book_title)
-
-    with allure.step("Нажать на кнопку 'Купить'"):
-        cart.add_product_to_cart()
-
-    with allure.step("Открыть корзину"):
-        cart.open_cart()
+    cart = cart_with_product
 
     with allure.step("Удалить товар из корзины"):
         cart.delete_from_cart()
@@ -180,8 +184,9 @@ def test_auth_form(driver):
 
     with allure.step("Проверить, что кнопка 'Получить код' "
                      "неактивна при пустом поле"):
-        get_code_btn = driver.find_element(*auth.get_code_button)
-        assert get_code_btn.get_attribute("disabled") is not None
+        state = snapshot(driver, {"get_code": auth.get_code_button},
+                         attributes=("disabled",))
+        assert state["get_code"]["attributes"]["disabled"] is not None
 
     with allure.step("Ввести корректный номер телефона"):
         auth.enter_phone_number(phone)
@@ -189,10 +194,11 @@ def test_auth_form(driver):
     with allure.step("Проверить, что кнопка 'Получить код' "
                      "стала активной"):
         auth.wait.until(
-            EC.element_to_be_clickable(auth.get_code_button)
+            ec.element_to_be_clickable(auth.get_code_button)
         )
-        get_code_btn = driver.find_element(*auth.get_code_button)
-        assert get_code_btn.get_attribute("disabled") is None
+        state = snapshot(driver, {"get_code": auth.get_code_button},
+                         attributes=("disabled",))
+        assert state["get_code"]["attributes"]["disabled"] is None
 
 
 @allure.epic("Читай-город")
@@ -222,5 +228,6 @@ def test_auth_form_invalid_phone(driver):
 
     with allure.step("Проверить, что кнопка 'Получить код' "
                      "осталась неактивной"):
-        get_code_btn = driver.find_element(*auth.get_code_button)
-        assert get_code_btn.get_attribute("disabled") is not None
+        state = snapshot(driver, {"get_code": auth.get_code_button},
+                         attributes=("disabled",))
+        assert state["get_code"]["attributes"]["disabled"] is not None
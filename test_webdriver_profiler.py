@@ -0,0 +1,87 @@
+from types import SimpleNamespace
+
+import pytest
+import allure
+import webdriver_profiler
+from webdriver_profiler import WebDriverProfiler
+
+
+@allure.epic("Читай-город")
+@allure.feature("Профилирование WebDriver")
+@allure.title("Собственное время кадров в folded stacks")
+@allure.severity("NORMAL")
+@pytest.mark.api
+def test_profiler_folded_stacks(tmp_path, monkeypatch) -> None:
+    """
+    Тест _pop: закрытие шага закрывает незакрытые вложенные кадры, а в
+    folded stacks для каждого кадра записано собственное время без
+    времени вложенных кадров.
+
+    :param tmp_path: временный каталог теста
+    :param monkeypatch: фикстура pytest
+    :return: None
+    """
+    now = [0.0]
+    monkeypatch.setattr(webdriver_profiler, "time",
+                        SimpleNamespace(perf_counter=lambda: now[0]))
+    profiler = WebDriverProfiler(enabled=True, top=10)
+
+    with allure.step("Метод page object с ожиданием и шагом"):
+        with profiler.frame("page:open"):
+            now[0] = 1.0
+            with profiler.wait("visible"):
+                now[0] = 3.0
+            now[0] = 4.0
+            profiler.start_step("step-1", "Open cart", {})
+            now[0] = 4.5
+            # Команда, не закрытая к концу шага (исключение внутри)
+            profiler._push("cmd:findElement", "findElement")
+            now[0] = 6.0
+            profiler.stop_step("step-1", None, None, None)
+            now[0] = 10.0
+        assert profiler._stack() == []
+
+    with allure.step("Собственное время кадров"):
+        assert profiler.folded == {
+            "page:open;wait:visible": 2_000_000,
+            "page:open;step:Open_cart;cmd:findElement": 1_500_000,
+            "page:open;step:Open_cart": 500_000,
+            "page:open": 6_000_000,
+        }
+
+    with allure.step("Рейтинги методов, шагов и ожиданий"):
+        assert profiler.frames == {"page:open": (1, 10.0),
+                                   "step:Open cart": (1, 2.0)}
+        assert profiler.waits == {"visible": (1, 2.0)}
+        assert "Wait conditions" in profiler.report()
+
+    with allure.step("Файл folded stacks"):
+        flame_file = tmp_path / "profile.folded"
+        assert profiler.save(str(tmp_path / "profile.txt"), str(flame_file))
+        assert flame_file.read_text(encoding="utf-8").splitlines() == [
+            "page:open 6000000",
+            "page:open;step:Open_cart 500000",
+            "page:open;step:Open_cart;cmd:findElement 1500000",
+            "page:open;wait:visible 2000000",
+        ]
+
+
+@allure.epic("Читай-город")
+@allure.feature("Профилирование WebDriver")
+@allure.title("Выключенный профилировщик ничего не записывает")
+@allure.severity("MINOR")
+@pytest.mark.api
+def test_profiler_disabled(tmp_path) -> None:
+    """
+    Тест: без CG_WEBDRIVER_PROFILE кадры не открываются и файлы не
+    пишутся.
+
+    :param tmp_path: временный каталог теста
+    :return: None
+    """
+    profiler = WebDriverProfiler(enabled=False)
+    with profiler.frame("page:open"):
+        pass
+    assert profiler._stack() == []
+    assert not profiler.save(str(tmp_path / "profile.txt"),
+                             str(tmp_path / "profile.folded"))
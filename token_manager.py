@@ -0,0 +1,249 @@
+import base64
+import json
+import threading
+import time
+from typing import List, Optional
+from urllib.parse import unquote
+
+import requests
+from cache_helper import FileLock, read_json, write_json
+from cookie_helper import CookieProvider, get_cookie_provider
+from http_transport import HTTPTransport, get_shared_transport
+from parallel_runner import worker_id, worker_index
+from config import (url_auth, token_cache_file, token_refresh_ahead,
+                    token_fallback_ttl, bearer_token, worker_tokens,
+                    ui_token_cookie)
+
+
+def token_expiry(token: str) -> Optional[float]:
+    """
+    Прочитать время истечения (exp) из JWT без проверки подписи.
+
+    :param token: токен (с префиксом Bearer или без него)
+    :type token: str
+    :return: время истечения (epoch) или None, если это не JWT
+    :rtype: float
+    """
+    try:
+        payload = token.split()[-1].split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+    except (IndexError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _extract_token(response: requests.Response) -> Optional[str]:
+    """
+    Извлечь токен из ответа эндпоинта анонимной авторизации: из куки
+    access-token или из JSON тела.
+
+    :param response: ответ сервера
+    :type response: requests.Response
+    :return: значение заголовка Authorization (Bearer ...) или None
+    :rtype: str
+    """
+    token = response.cookies.get(ui_token_cookie)
+    if token:
+        token = unquote(token)
+    else:
+        try:
+            body = response.json()
+        except ValueError:
+            return None
+        if isinstance(body, dict) and isinstance(body.get("token"), dict):
+            body = body["token"]
+        if not isinstance(body, dict):
+            return None
+        token = (body.get("accessToken") or body.get("access_token")
+                 or body.get("token"))
+        if not isinstance(token, str):
+            return None
+    return token if token.startswith("Bearer ") else f"Bearer {token}"
+
+
+class TokenManager:
+    """
+    Поставщик анонимных токенов с кэшем по времени жизни JWT.
+
+    Каждая идентичность (воркер "gw0", виртуальный пользователь "vu-3"
+    и т.п.) получает свой токен, а значит и свою корзину. Токены хранятся
+    в памяти и в общем файле, поэтому параллельные процессы не запрашивают
+    токен повторно. Токен обновляется заранее, за refresh_ahead секунд до
+    exp, чтобы запросы не получали 401 из-за истёкшего токена.
+    """
+
+    def __init__(self, auth_url: str = url_auth,
+                 cache_file: str = token_cache_file,
+                 refresh_ahead: float = token_refresh_ahead,
+                 cookie_provider: Optional[CookieProvider] = None,
+                 transport: Optional[HTTPTransport] = None) -> None:
+        """
+        Инициализация поставщика токенов.
+
+        :param auth_url: адрес эндпоинта анонимной авторизации
+        :type auth_url: str
+        :param cache_file: путь к файлу общего кэша
+        :type cache_file: str
+        :param refresh_ahead: за сколько секунд до exp обновлять токен
+        :type refresh_ahead: float
+        :param cookie_provider: поставщик кук DDoS-Guard; по умолчанию
+            общий поставщик процесса
+        :type cookie_provider: CookieProvider
+        :param transport: HTTP транспорт; по умолчанию общий пул
+            соединений процесса
+        :type transport: HTTPTransport
+        """
+        self.auth_url = auth_url
+        self.cache_file = cache_file
+        self.refresh_ahead = refresh_ahead
+        self.cookie_provider = cookie_provider
+        self.transport = transport
+        self.fetch_count = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, identity: Optional[str] = None) -> str:
+        """
+        Получить действующий токен идентичности.
+
+        :param identity: имя идентичности; по умолчанию текущий воркер
+        :type identity: str
+        :return: значение заголовка Authorization (Bearer ...)
+        :rtype: str
+        """
+        identity = identity or worker_id()
+        entry = self._entries.get(identity)
+        if self._is_fresh(entry):
+            return entry["token"]
+
+        with self._lock:
+            entry = self._entries.get(identity)
+            if self._is_fresh(entry):
+                return entry["token"]
+
+            entry = read_json(self.cache_file, {}).get(identity)
+            if not self._is_fresh(entry):
+                with FileLock(self.cache_file + ".lock"):
+                    # Пока ждали блокировку, токен мог получить другой воркер
+                    cache = read_json(self.cache_file, {})
+                    entry = cache.get(identity)
+                    if not self._is_fresh(entry):
+                        entry = self._fetch()
+                        cache[identity] = entry
+                        write_json(self.cache_file, cache)
+
+            self._entries[identity] = entry
+            return entry["token"]
+
+    def pool(self, size: int, prefix: str = "vu") -> List[str]:
+        """
+        Получить токены для нескольких идентичностей (prefix-0 ...).
+
+        :param size: число идентичностей
+        :type size: int
+        :param prefix: префикс имён идентичностей
+        :type prefix: str
+        :return: токены по порядку идентичностей
+        :rtype: list
+        """
+        return [self.get(f"{prefix}-{number}") for number in range(size)]
+
+    def invalidate(self, identity: Optional[str] = None,
+                   stale_token: Optional[str] = None) -> None:
+        """
+        Сбросить токен, отклонённый сервером.
+
+        Токен в файле удаляется, только если это именно отклонённый
+        токен: более свежий токен другого воркера сохраняется.
+
+        :param identity: имя идентичности; по умолчанию текущий воркер
+        :type identity: str
+        :param stale_token: отклонённый токен
+        :type stale_token: str
+        :return: None
+        """
+        identity = identity or worker_id()
+        with self._lock:
+            self._entries.pop(identity, None)
+            with FileLock(self.cache_file + ".lock"):
+                cache = read_json(self.cache_file, {})
+                entry = cache.get(identity)
+                if entry and (stale_token is None
+                              or entry.get("token") == stale_token):
+                    del cache[identity]
+                    write_json(self.cache_file, cache)
+
+    def _fetch(self) -> dict:
+        """
+        Запросить новый анонимный токен.
+
+        :return: запись кэша с токеном и временем истечения
+        :rtype: dict
+        """
+        cookie_provider = self.cookie_provider or get_cookie_provider()
+        transport = self.transport or get_shared_transport()
+
+        cookies = cookie_provider.get()
+        response = transport.request("POST", self.auth_url, cookies=cookies)
+        if CookieProvider.is_stale_response(response):
+            cookie_provider.invalidate(cookies)
+            response = transport.request("POST", self.auth_url,
+                                         cookies=cookie_provider.get())
+        response.raise_for_status()
+
+        token = _extract_token(response)
+        if not token:
+            raise ValueError(f"В ответе {self.auth_url} нет токена")
+        self.fetch_count += 1
+        expires_at = token_expiry(token) or time.time() + token_fallback_ttl
+        return {"token": token, "expires_at": expires_at}
+
+    def _is_fresh(self, entry: Optional[dict]) -> bool:
+        """
+        Проверить, что токен есть и не попадает в окно обновления.
+
+        :param entry: запись кэша
+        :type entry: dict
+        :return: True, если токен можно использовать
+        :rtype: bool
+        """
+        return bool(entry) and bool(entry.get("token")) \
+            and entry.get("expires_at", 0) - self.refresh_ahead > time.time()
+
+
+_default_manager = None
+_default_manager_lock = threading.Lock()
+
+
+def get_token_manager() -> TokenManager:
+    """
+    Получить общий для процесса поставщик токенов.
+
+    :return: TokenManager instance
+    :rtype: TokenManager
+    """
+    global _default_manager
+    with _default_manager_lock:
+        if _default_manager is None:
+            _default_manager = TokenManager()
+        return _default_manager
+
+
+def worker_token(manager: Optional[TokenManager] = None) -> str:
+    """
+    Токен анонимного пользователя текущего воркера.
+
+    Токены, заданные вручную (CG_BEARER_TOKENS по воркерам или один
+    CG_BEARER_TOKEN), имеют приоритет; иначе воркер получает свой токен
+    от поставщика токенов.
+
+    :param manager: поставщик токенов; по умолчанию общий
+    :type manager: TokenManager
+    :return: значение заголовка Authorization
+    :rtype: str
+    """
+    if worker_tokens:
+        return worker_tokens[worker_index() % len(worker_tokens)]
+    if bearer_token:
+        return bearer_token
+    return (manager or get_token_manager()).get()
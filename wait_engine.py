@@ -0,0 +1,350 @@
+import math
+import threading
+import time
+from typing import List
+
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.remote.webdriver import WebDriver
+from selenium.webdriver.support.ui import WebDriverWait
+from dom_snapshot import FIND_FUNCTION
+from webdriver_profiler import get_webdriver_profiler
+
+# Запас таймаута скрипта сверх таймаута ожидания, сек
+SCRIPT_TIMEOUT_MARGIN = 5
+
+# Условия проверяются в браузере при каждой мутации DOM, событиях
+# загрузки и навигации по истории; редкий таймер страхует изменения,
+# которые не порождают событий (pushState, раскладка страницы).
+WAIT_SCRIPT = FIND_FUNCTION + """
+var specs = arguments[0], timeoutMs = arguments[1];
+var done = arguments[arguments.length - 1];
+
+function visible(el) {
+    return !!el && el.getClientRects().length > 0
+        && getComputedStyle(el).visibility !== 'hidden';
+}
+
+// Только элементы, не вложенные в другой найденный элемент (карточка
+// внутри карточки считается один раз)
+function topLevel(nodes) {
+    var found = new Set(nodes);
+    return nodes.filter(function (node) {
+        for (var p = node.parentElement; p; p = p.parentElement) {
+            if (found.has(p)) { return false; }
+        }
+        return true;
+    });
+}
+
+function evaluate(spec) {
+    var el;
+    switch (spec.type) {
+    case 'url':
+        return spec.parts.some(function (p) {
+            return location.href.indexOf(p) !== -1;
+        });
+    case 'ready':
+        // loadEventEnd появляется после обработчиков load: метрики
+        // Navigation Timing к этому моменту уже заполнены
+        var nav = performance.getEntriesByType('navigation')[0];
+        return document.readyState === 'complete'
+            && (!nav || nav.loadEventEnd > 0);
+    case 'present':
+        return find(spec.locator)[0] || null;
+    case 'all_present':
+        var nodes = find(spec.locator);
+        return nodes.length ? nodes : null;
+    case 'count_above':
+        var matched = find(spec.locator);
+        if (spec.top_level) { matched = topLevel(matched); }
+        return matched.length > spec.count;
+    case 'visible':
+        el = find(spec.locator)[0];
+        return visible(el) ? el : null;
+    case 'clickable':
+        el = find(spec.locator)[0];
+        return visible(el) && !el.disabled ? el : null;
+    case 'text_not_empty':
+        el = find(spec.locator)[0];
+        return el && el.textContent.trim() !== '' ? el : null;
+    }
+    return null;
+}
+
+function check() {
+    var value = true;
+    for (var i = 0; i < specs.length; i++) {
+        value = evaluate(specs[i]);
+        if (!value) { return null; }
+    }
+    return {value: value};
+}
+
+var first = check();
+if (first) { done(first); return; }
+
+var finished = false, observer, timer, ticker;
+function onChange() {
+    var result = check();
+    if (result) { finish(result); }
+}
+function finish(result) {
+    if (finished) { return; }
+    finished = true;
+    observer.disconnect();
+    clearTimeout(timer);
+    clearInterval(ticker);
+    document.removeEventListener('readystatechange', onChange);
+    window.removeEventListener('load', onChange);
+    window.removeEventListener('popstate', onChange);
+    window.removeEventListener('hashchange', onChange);
+    done(result);
+}
+observer = new MutationObserver(onChange);
+observer.observe(document, {childList: true, subtree: true,
+                            attributes: true, characterData: true});
+document.addEventListener('readystatechange', onChange);
+window.addEventListener('load', onChange);
+window.addEventListener('popstate', onChange);
+window.addEventListener('hashchange', onChange);
+ticker = setInterval(onChange, 100);
+timer = setTimeout(function () { finish({timeout: true}); }, timeoutMs);
+"""
+
+
+class JsCondition:
+    """
+    Условие ожидания, которое проверяется внутри браузера.
+
+    Несколько условий объединяются через all_of() и разрешаются одним
+    вызовом execute_async_script.
+    """
+
+    def __init__(self, specs: List[dict], description: str) -> None:
+        """
+        Инициализация условия.
+
+        :param specs: описания проверок для WAIT_SCRIPT
+        :type specs: list
+        :param description: описание для сообщения о таймауте
+        :type description: str
+        """
+        self.specs = specs
+        self.description = description
+
+    def __repr__(self) -> str:
+        return self.description
+
+
+class ec:
+    """
+    Условия ожидания с теми же именами и аргументами, что и в
+    selenium.webdriver.support.expected_conditions, и условие
+    number_of_elements_more_than для подгружаемых списков.
+    """
+
+    @staticmethod
+    def url_contains(*parts: str) -> JsCondition:
+        return JsCondition([{"type": "url", "parts": list(parts)}],
+                           f"url_contains{parts}")
+
+    @staticmethod
+    def document_ready() -> JsCondition:
+        return JsCondition([{"type": "ready"}], "document_ready")
+
+    @staticmethod
+    def presence_of_element_located(locator: tuple) -> JsCondition:
+        return JsCondition([{"type": "present", "locator": list(locator)}],
+                           f"presence_of_element_located{locator}")
+
+    @staticmethod
+    def presence_of_all_elements_located(locator: tuple) -> JsCondition:
+        return JsCondition(
+            [{"type": "all_present", "locator": list(locator)}],
+            f"presence_of_all_elements_located{locator}",
+        )
+
+    @staticmethod
+    def visibility_of_element_located(locator: tuple) -> JsCondition:
+        return JsCondition([{"type": "visible", "locator": list(locator)}],
+                           f"visibility_of_element_located{locator}")
+
+    @staticmethod
+    def element_to_be_clickable(locator: tuple) -> JsCondition:
+        return JsCondition([{"type": "clickable", "locator": list(locator)}],
+                           f"element_to_be_clickable{locator}")
+
+    @staticmethod
+    def element_text_not_empty(locator: tuple) -> JsCondition:
+        return JsCondition(
+            [{"type": "text_not_empty", "locator": list(locator)}],
+            f"element_text_not_empty{locator}",
+        )
+
+    @staticmethod
+    def number_of_elements_more_than(locator: tuple, count: int,
+                                     top_level: bool = False
+                                     ) -> JsCondition:
+        # top_level: не считать элементы, вложенные в другой найденный
+        return JsCondition(
+            [{"type": "count_above", "locator": list(locator),
+              "count": count, "top_level": top_level}],
+            f"number_of_elements_more_than{locator, count}",
+        )
+
+    @staticmethod
+    def all_of(*conditions: JsCondition) -> JsCondition:
+        specs = [spec for condition in conditions
+                 for spec in condition.specs]
+        return JsCondition(specs, "all_of(" + ", ".join(
+            condition.description for condition in conditions) + ")")
+
+
+class WaitStats:
+    """
+    Статистика ожиданий и оценка сэкономленного времени.
+
+    Экономия оценивается относительно WebDriverWait: опрос находит
+    выполненное условие только на следующем тике poll_frequency, а
+    цепочка из N ожиданий тратит на проверки минимум N обращений к
+    WebDriver вместо одного.
+    """
+
+    def __init__(self) -> None:
+        self.waits = 0
+        self.wait_time = 0.0
+        self.saved_time = 0.0
+        self.round_trips = 0
+        self.round_trips_avoided = 0
+        self._lock = threading.Lock()
+
+    def add(self, elapsed: float, poll: float, conditions: int,
+            round_trips: int) -> None:
+        """
+        Учесть завершённое ожидание.
+
+        :param elapsed: длительность ожидания, сек
+        :type elapsed: float
+        :param poll: интервал опроса WebDriverWait, сек
+        :type poll: float
+        :param conditions: число объединённых условий
+        :type conditions: int
+        :param round_trips: число обращений к WebDriver
+        :type round_trips: int
+        :return: None
+        """
+        polls = math.ceil(elapsed / poll) if elapsed > 0 else 0
+        with self._lock:
+            self.waits += 1
+            self.wait_time += elapsed
+            if polls:
+                self.saved_time += polls * poll - elapsed
+            self.round_trips += round_trips
+            self.round_trips_avoided += max(
+                polls + conditions - round_trips, 0)
+
+    def summary(self) -> dict:
+        """
+        Сводка статистики.
+
+        :return: словарь со статистикой
+        :rtype: dict
+        """
+        with self._lock:
+            return {
+                "waits": self.waits,
+                "wait_ms": round(self.wait_time * 1000, 1),
+                "estimated_saved_ms": round(self.saved_time * 1000, 1),
+                "round_trips": self.round_trips,
+                "round_trips_avoided": self.round_trips_avoided,
+            }
+
+
+_stats = WaitStats()
+
+
+def get_wait_stats() -> WaitStats:
+    """
+    Получить общую для процесса статистику ожиданий.
+
+    :return: WaitStats instance
+    :rtype: WaitStats
+    """
+    return _stats
+
+
+class EventWait(WebDriverWait):
+    """
+    Ожидание по событиям DOM вместо опроса.
+
+    Условия JsCondition разрешаются в браузере через MutationObserver
+    и события загрузки, поэтому тест продолжается сразу после
+    изменения страницы, а не на следующем тике опроса. Любые другие
+    условия (например, из expected_conditions) обрабатываются как в
+    WebDriverWait.
+    """
+
+    def until(self, method, message: str = ""):
+        with get_webdriver_profiler().wait(self._describe(method)):
+            return self._until(method, message)
+
+    @staticmethod
+    def _describe(method) -> str:
+        """
+        Описание условия для профилировщика.
+
+        :param method: условие ожидания
+        :return: описание JsCondition или имя фабрики условия из
+            expected_conditions
+        :rtype: str
+        """
+        if isinstance(method, JsCondition):
+            return method.description
+        name = getattr(method, "__qualname__", None) or repr(method)
+        return name.split(".<locals>")[0]
+
+    def _until(self, method, message: str = ""):
+        if not isinstance(method, JsCondition):
+            return super().until(method, message)
+
+        start = time.monotonic()
+        end = start + self._timeout
+        self._ensure_script_timeout()
+        round_trips = 0
+        while True:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutException(message or f"Не дождались: {method}")
+            try:
+                result = self._driver.execute_async_script(
+                    WAIT_SCRIPT, method.specs, int(remaining * 1000)
+                )
+            except WebDriverException as error:
+                round_trips += 1
+                # Переход на новую страницу прерывает скрипт:
+                # продолжаем ожидание уже в новом документе
+                if "unload" in str(error.msg or "").lower():
+                    continue
+                raise
+            round_trips += 1
+            if not result:
+                continue
+            if result.get("timeout"):
+                raise TimeoutException(message or f"Не дождались: {method}")
+            _stats.add(time.monotonic() - start, self._poll,
+                       len(method.specs), round_trips)
+            return result["value"]
+
+    def _ensure_script_timeout(self) -> None:
+        """
+        Увеличить таймаут асинхронных скриптов драйвера до таймаута
+        ожидания (один раз на драйвер).
+
+        :return: None
+        """
+        driver: WebDriver = self._driver
+        needed = self._timeout + SCRIPT_TIMEOUT_MARGIN
+        if getattr(driver, "_event_wait_script_timeout", 0) >= needed:
+            return
+        driver.set_script_timeout(needed)
+        driver._event_wait_script_timeout = needed
@@ -0,0 +1,347 @@
+import functools
+import json
+import statistics
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+import allure
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.remote.webdriver import WebDriver
+from cache_helper import FileLock, read_json, write_json
+from parallel_runner import worker_id
+from webdriver_profiler import get_webdriver_profiler
+from config import (page_metrics_enabled, page_metrics_trend_file,
+                    page_metrics_trend_runs, page_metrics_slowest_resources)
+
+# Наблюдатели LCP, CLS и длинных задач. Скрипт добавляется в каждый
+# новый документ до скриптов страницы; если этого не сделать (не Chrome),
+# его выполняет COLLECT_SCRIPT, и буферизованные записи всё равно
+# попадают в наблюдатели через takeRecords()
+OBSERVER_SCRIPT = """
+(function () {
+    if (window.__cgVitals) { return; }
+    var vitals = window.__cgVitals = {
+        lcp: 0, shifts: [], longTasks: [], observers: []
+    };
+    var handlers = {
+        'largest-contentful-paint': function (entry) {
+            vitals.lcp = entry.renderTime || entry.loadTime
+                || entry.startTime;
+        },
+        'layout-shift': function (entry) {
+            if (!entry.hadRecentInput) {
+                vitals.shifts.push([entry.startTime, entry.value]);
+            }
+        },
+        'longtask': function (entry) {
+            vitals.longTasks.push([entry.startTime, entry.duration]);
+        }
+    };
+    Object.keys(handlers).forEach(function (type) {
+        var handle = function (entries) {
+            entries.forEach(handlers[type]);
+        };
+        try {
+            var observer = new PerformanceObserver(function (list) {
+                handle(list.getEntries());
+            });
+            observer.observe({type: type, buffered: true});
+            vitals.observers.push([observer, handle]);
+        } catch (e) {}
+    });
+    vitals.flush = function () {
+        vitals.observers.forEach(function (pair) {
+            pair[1](pair[0].takeRecords());
+        });
+    };
+})();
+"""
+
+MARK_SCRIPT = """
+return {origin: performance.timeOrigin, now: performance.now()};
+"""
+
+# Метрики текущего документа с момента since (performance.now() на
+# старте шага); если за шаг произошёл переход, документ новый и метрики
+# считаются с его начала вместе с Navigation Timing
+COLLECT_SCRIPT = OBSERVER_SCRIPT + """
+var markOrigin = arguments[0], since = arguments[1], slowest = arguments[2];
+var navigated = markOrigin !== performance.timeOrigin;
+if (navigated) { since = 0; }
+var vitals = window.__cgVitals;
+vitals.flush();
+var round = function (value) { return Math.round(value * 10) / 10; };
+
+var result = {url: location.href, navigated: navigated};
+var nav = performance.getEntriesByType('navigation')[0];
+if (since === 0 && nav) {
+    result.navigation = {
+        ttfb_ms: round(nav.responseStart),
+        dom_interactive_ms: round(nav.domInteractive),
+        dom_content_loaded_ms: round(nav.domContentLoadedEventEnd),
+        load_ms: round(nav.loadEventEnd),
+        transfer_bytes: nav.transferSize || 0
+    };
+    var fcp = performance.getEntriesByName('first-contentful-paint')[0];
+    result.navigation.fcp_ms = fcp ? round(fcp.startTime) : null;
+}
+
+var resources = performance.getEntriesByType('resource').filter(
+    function (entry) { return entry.startTime >= since; });
+var bytes = 0;
+resources.forEach(function (entry) { bytes += entry.transferSize || 0; });
+result.resources = {
+    count: resources.length,
+    bytes: bytes,
+    slowest: resources.slice().sort(function (a, b) {
+        return b.duration - a.duration;
+    }).slice(0, slowest).map(function (entry) {
+        return {url: entry.name.slice(0, 200), type: entry.initiatorType,
+                duration_ms: round(entry.duration)};
+    })
+};
+
+var cls = 0;
+vitals.shifts.forEach(function (shift) {
+    if (shift[0] >= since) { cls += shift[1]; }
+});
+var tasks = vitals.longTasks.filter(function (task) {
+    return task[0] >= since;
+});
+var blocking = 0;
+tasks.forEach(function (task) { blocking += task[1]; });
+// LCP документа, отрисованный до шага без перехода, шагу не относится
+result.lcp_ms = vitals.lcp && vitals.lcp >= since ? round(vitals.lcp)
+    : null;
+result.cls = Math.round(cls * 1000) / 1000;
+result.long_tasks = {count: tasks.length, total_ms: round(blocking)};
+return result;
+"""
+
+
+def install_observer(driver: WebDriver) -> bool:
+    """
+    Добавить наблюдатели Web Vitals в каждый новый документ (CDP).
+
+    :param driver: WebDriver - Экземпляр WebDriver
+    :type driver: WebDriver
+    :return: True, если скрипт добавлен
+    :rtype: bool
+    """
+    try:
+        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument",
+                               {"source": OBSERVER_SCRIPT})
+    except (AttributeError, WebDriverException):
+        return False
+    return True
+
+
+class PageMetrics:
+    """
+    Метрики загрузки страниц и Web Vitals по шагам UI тестов.
+
+    Шаг - переход на страницу или метод page object. Для шага
+    собираются Navigation Timing (если шаг открыл новый документ),
+    Resource Timing, LCP, CLS и длинные задачи; запись прикладывается к
+    текущему шагу Allure. В конце прогона медианы по шагам добавляются в
+    файл тренда, где хранятся последние trend_runs прогонов, и
+    сравниваются с медианой предыдущих прогонов.
+
+    Сбор включается только в config.py (CG_PAGE_METRICS=1): каждый шаг
+    добавляет два вызова execute_script.
+    """
+
+    def __init__(self, enabled: bool = page_metrics_enabled,
+                 trend_file: str = page_metrics_trend_file,
+                 trend_runs: int = page_metrics_trend_runs,
+                 slowest_resources: int = page_metrics_slowest_resources
+                 ) -> None:
+        """
+        Инициализация сбора метрик.
+
+        :param enabled: собирать метрики
+        :type enabled: bool
+        :param trend_file: файл тренда между прогонами
+        :type trend_file: str
+        :param trend_runs: сколько последних прогонов хранить
+        :type trend_runs: int
+        :param slowest_resources: сколько самых долгих ресурсов
+            сохранять для шага
+        :type slowest_resources: int
+        """
+        self.enabled = enabled
+        self.trend_file = trend_file
+        self.trend_runs = trend_runs
+        self.slowest_resources = slowest_resources
+        self.steps = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def step(self, driver: WebDriver, name: str):
+        """
+        Собрать метрики шага, выполняемого внутри блока.
+
+        Если шаг завершился ошибкой, метрики не собираются.
+
+        :param driver: WebDriver - Экземпляр WebDriver
+        :type driver: WebDriver
+        :param name: имя шага, например "SearchPage.search_by_title"
+        :type name: str
+        :yields: None
+        """
+        if not self.enabled:
+            yield
+            return
+        try:
+            mark = driver.execute_script(MARK_SCRIPT)
+        except WebDriverException:
+            mark = {"origin": None, "now": 0}
+        start = time.perf_counter()
+        yield
+        self.record(driver, name, mark["origin"], mark["now"],
+                    time.perf_counter() - start)
+
+    def record(self, driver: WebDriver, name: str,
+               origin: Optional[float] = None, since: float = 0,
+               duration: Optional[float] = None) -> Optional[dict]:
+        """
+        Собрать метрики текущего документа и приложить их к Allure.
+
+        :param driver: WebDriver - Экземпляр WebDriver
+        :type driver: WebDriver
+        :param name: имя шага
+        :type name: str
+        :param origin: performance.timeOrigin на старте шага; None -
+            метрики документа целиком
+        :type origin: float
+        :param since: performance.now() на старте шага, мс
+        :type since: float
+        :param duration: длительность шага, сек
+        :type duration: float
+        :return: метрики шага или None, если страница недоступна
+        :rtype: dict
+        """
+        if not self.enabled:
+            return None
+        try:
+            entry = driver.execute_script(COLLECT_SCRIPT, origin, since,
+                                          self.slowest_resources)
+        except WebDriverException:
+            return None
+        entry = {"step": name, "duration_ms": None if duration is None
+                 else round(duration * 1000, 1), **entry}
+        with self._lock:
+            self.steps.append(entry)
+        allure.attach(json.dumps(entry, ensure_ascii=False, indent=2),
+                      name=f"Метрики страницы: {name}",
+                      attachment_type=allure.attachment_type.JSON)
+        return entry
+
+    def aggregate(self) -> dict:
+        """
+        Медианы метрик по шагам прогона.
+
+        :return: словарь шаг -> метрики
+        :rtype: dict
+        """
+        with self._lock:
+            steps = list(self.steps)
+
+        grouped = {}
+        for entry in steps:
+            grouped.setdefault(entry["step"], []).append(entry)
+
+        def median(values: list) -> Optional[float]:
+            values = [value for value in values if value is not None]
+            return round(statistics.median(values), 1) if values else None
+
+        result = {}
+        for name, entries in grouped.items():
+            navigations = [e["navigation"] for e in entries
+                           if e.get("navigation")]
+            result[name] = {
+                "count": len(entries),
+                "duration_ms": median([e["duration_ms"] for e in entries]),
+                "load_ms": median([n["load_ms"] for n in navigations]),
+                "ttfb_ms": median([n["ttfb_ms"] for n in navigations]),
+                "lcp_ms": median([e["lcp_ms"] for e in entries]),
+                "cls": max(e["cls"] for e in entries),
+                "long_tasks_ms": median(
+                    [e["long_tasks"]["total_ms"] for e in entries]),
+                "resources": median(
+                    [e["resources"]["count"] for e in entries]),
+                "bytes": median([e["resources"]["bytes"] for e in entries]),
+            }
+        return result
+
+    def save_trend(self) -> Optional[dict]:
+        """
+        Добавить прогон в файл тренда и сравнить с прошлыми прогонами.
+
+        :return: сводка: шаг -> текущие медианы и медианы прошлых
+            прогонов (trend_*); None, если метрик не было
+        :rtype: dict
+        """
+        current = self.aggregate()
+        if not current:
+            return None
+        with FileLock(self.trend_file + ".lock"):
+            runs = read_json(self.trend_file, [])
+            previous = list(runs)
+            runs.append({"time": round(time.time()), "worker": worker_id(),
+                         "steps": current})
+            write_json(self.trend_file, runs[-self.trend_runs:])
+
+        summary = {}
+        for name, metrics in current.items():
+            history = [run["steps"][name] for run in previous
+                       if name in run.get("steps", {})]
+            line = dict(metrics)
+            for key in ("duration_ms", "load_ms", "lcp_ms"):
+                values = [item[key] for item in history
+                          if item.get(key) is not None]
+                line[f"trend_{key}"] = (round(statistics.median(values), 1)
+                                        if values else None)
+            summary[name] = line
+        return summary
+
+
+_default_metrics = None
+_default_metrics_lock = threading.Lock()
+
+
+def get_page_metrics() -> PageMetrics:
+    """
+    Получить общий для процесса сбор метрик страниц.
+
+    :return: PageMetrics instance
+    :rtype: PageMetrics
+    """
+    global _default_metrics
+    with _default_metrics_lock:
+        if _default_metrics is None:
+            _default_metrics = PageMetrics()
+        return _default_metrics
+
+
+def measured_step(method: Callable) -> Callable:
+    """
+    Декоратор метода page object: собрать метрики страницы за вызов.
+
+    Имя шага - "Класс.метод"; драйвер берётся из self.driver. Вызов
+    также становится кадром профилировщика WebDriver.
+
+    :param method: метод page object
+    :type method: Callable
+    :return: обёрнутый метод
+    :rtype: Callable
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        name = f"{type(self).__name__}.{method.__name__}"
+        with get_webdriver_profiler().frame(name), \
+                get_page_metrics().step(self.driver, name):
+            return method(self, *args, **kwargs)
+    return wrapper
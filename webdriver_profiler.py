@@ -0,0 +1,346 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+import allure_commons
+from selenium.webdriver.remote.command import Command
+from selenium.webdriver.remote.webdriver import WebDriver
+from config import (webdriver_profile_enabled, webdriver_profile_file,
+                    webdriver_profile_flame_file, webdriver_profile_top)
+
+# Команды поиска элементов: их время - время разрешения локатора
+FIND_COMMANDS = (Command.FIND_ELEMENT, Command.FIND_ELEMENTS,
+                 Command.FIND_CHILD_ELEMENT, Command.FIND_CHILD_ELEMENTS)
+
+
+def _stack_name(name: str) -> str:
+    # В формате folded stacks ";" разделяет кадры, а пробел - стек и
+    # значение
+    return name.replace(";", ",").replace(" ", "_")
+
+
+class WebDriverProfiler:
+    """
+    Профилировщик UI тестов на уровне команд WebDriver.
+
+    Каждая команда драйвера (в том числе команды WebElement) замеряется
+    и учитывается по имени, а поиск элементов - ещё и по локатору.
+    Время ожиданий EventWait учитывается по условию. Команды и ожидания
+    относятся к стеку кадров: шаг Allure, метод page object
+    (measured_step), ожидание. Результат - отчёт с рейтингами и файл в
+    формате folded stacks (flamegraph.pl, speedscope), в котором для
+    каждого кадра записано собственное время в микросекундах.
+    """
+
+    def __init__(self, enabled: bool = webdriver_profile_enabled,
+                 report_file: str = webdriver_profile_file,
+                 flame_file: str = webdriver_profile_flame_file,
+                 top: int = webdriver_profile_top) -> None:
+        """
+        Инициализация профилировщика.
+
+        :param enabled: профилировать
+        :type enabled: bool
+        :param report_file: файл текстового отчёта
+        :type report_file: str
+        :param flame_file: файл folded stacks
+        :type flame_file: str
+        :param top: строк в каждом рейтинге отчёта
+        :type top: int
+        """
+        self.enabled = enabled
+        self.report_file = report_file
+        self.flame_file = flame_file
+        self.top = top
+        self.commands = {}
+        self.locators = {}
+        self.waits = {}
+        self.frames = {}
+        self.frame_commands = {}
+        self.folded = {}
+        self._local = threading.local()
+        self._registered = False
+        self._lock = threading.Lock()
+
+    def instrument(self, driver: WebDriver) -> WebDriver:
+        """
+        Замерять команды драйвера.
+
+        Подменяется метод execute экземпляра: через него проходят все
+        команды драйвера и его элементов.
+
+        :param driver: WebDriver - Экземпляр WebDriver
+        :type driver: WebDriver
+        :return: тот же драйвер
+        :rtype: WebDriver
+        """
+        if not self.enabled or getattr(driver, "profiled", False):
+            return driver
+        with self._lock:
+            if not self._registered:
+                allure_commons.plugin_manager.register(self)
+                self._registered = True
+        execute = driver.execute
+
+        def profiled_execute(driver_command: str, params: dict = None):
+            with self._lock:
+                for key in {frame["key"] for frame in self._stack()}:
+                    self.frame_commands[key] = \
+                        self.frame_commands.get(key, 0) + 1
+            with self.frame(f"cmd:{driver_command}", self.commands,
+                            driver_command):
+                if driver_command not in FIND_COMMANDS or not params:
+                    return execute(driver_command, params)
+                locator = f"{params.get('using')}: {params.get('value')}"
+                with self._timed(locator, self.locators):
+                    return execute(driver_command, params)
+
+        driver.execute = profiled_execute
+        driver.profiled = True
+        return driver
+
+    @contextmanager
+    def frame(self, name: str, table: Optional[dict] = None,
+              key: Optional[str] = None):
+        """
+        Кадр стека: метод page object, ожидание или команда.
+
+        :param name: имя кадра в стеке
+        :type name: str
+        :param table: рейтинг, в котором учесть время кадра; по
+            умолчанию - рейтинг методов и шагов
+        :type table: dict
+        :param key: имя строки рейтинга; по умолчанию имя кадра
+        :type key: str
+        :yields: None
+        """
+        if not self.enabled:
+            yield
+            return
+        key = key or name
+        self._push(name, key)
+        try:
+            with self._timed(key, self.frames if table is None else table):
+                yield
+        finally:
+            self._pop(key)
+
+    def wait(self, description: str):
+        """
+        Кадр ожидания условия.
+
+        :param description: описание условия
+        :type description: str
+        :return: контекстный менеджер кадра
+        """
+        return self.frame(f"wait:{description}", self.waits, description)
+
+    @allure_commons.hookimpl
+    def start_step(self, uuid: str, title: str, params) -> None:
+        """
+        Хук Allure: открыт шаг - новый кадр стека.
+
+        :param uuid: идентификатор шага
+        :type uuid: str
+        :param title: название шага
+        :type title: str
+        :param params: параметры шага
+        :return: None
+        """
+        self._push(f"step:{title}", f"step:{title}", uuid)
+
+    @allure_commons.hookimpl
+    def stop_step(self, uuid: str, exc_type, exc_val, exc_tb) -> None:
+        """
+        Хук Allure: шаг закрыт.
+
+        :param uuid: идентификатор шага
+        :type uuid: str
+        :return: None
+        """
+        keys = [frame["key"] for frame in self._stack()
+                if frame["uuid"] == uuid]
+        if not keys:
+            return
+        elapsed = self._pop(keys[0], uuid)
+        with self._lock:
+            self._account(self.frames, keys[0], elapsed)
+
+    def report(self) -> str:
+        """
+        Текстовый отчёт: рейтинги команд, локаторов, ожиданий и
+        методов page object / шагов по суммарному времени.
+
+        :return: отчёт
+        :rtype: str
+        """
+        sections = (("WebDriver commands", self.commands),
+                    ("Locators (find element time)", self.locators),
+                    ("Wait conditions", self.waits),
+                    ("Page object methods and Allure steps", self.frames))
+        lines = []
+        with self._lock:
+            for title, table in sections:
+                if not table:
+                    continue
+                lines.append(title)
+                lines.append(f"{'total ms':>10} {'count':>6} {'avg ms':>8} "
+                             f"{'cmds':>6}  name")
+                ranked = sorted(table.items(), key=lambda item: item[1][1],
+                                reverse=True)
+                for name, (count, total) in ranked[:self.top]:
+                    # Команды WebDriver внутри метода, шага или ожидания
+                    commands = count if table in (self.commands,
+                                                  self.locators) \
+                        else self.frame_commands.get(name, "")
+                    lines.append(f"{total * 1000:10.1f} {count:6d} "
+                                 f"{total * 1000 / count:8.1f} "
+                                 f"{commands:>6}  {name}")
+                lines.append("")
+        return "\n".join(lines)
+
+    def save(self, report_file: Optional[str] = None,
+             flame_file: Optional[str] = None) -> bool:
+        """
+        Записать отчёт и folded stacks.
+
+        :param report_file: файл отчёта; по умолчанию из config.py
+        :type report_file: str
+        :param flame_file: файл folded stacks; по умолчанию из config.py
+        :type flame_file: str
+        :return: True, если было что записать
+        :rtype: bool
+        """
+        with self._lock:
+            folded = sorted(self.folded.items())
+        if not folded:
+            return False
+        with open(report_file or self.report_file, "w",
+                  encoding="utf-8") as file:
+            file.write(self.report())
+        with open(flame_file or self.flame_file, "w",
+                  encoding="utf-8") as file:
+            for stack, micros in folded:
+                file.write(f"{stack} {micros}\n")
+        return True
+
+    def summary(self) -> dict:
+        """
+        Сводка для итога прогона: самые долгие команды, локаторы и
+        ожидания.
+
+        :return: словарь с рейтингами (имя, число, всего мс)
+        :rtype: dict
+        """
+        def ranked(table: dict, limit: int = 3) -> list:
+            items = sorted(table.items(), key=lambda item: item[1][1],
+                           reverse=True)[:limit]
+            return [(name, count, round(total * 1000, 1))
+                    for name, (count, total) in items]
+
+        with self._lock:
+            return {
+                "commands": sum(count for count, _ in
+                                self.commands.values()),
+                "command_ms": round(sum(total for _, total in
+                                        self.commands.values()) * 1000, 1),
+                "top_commands": ranked(self.commands),
+                "top_locators": ranked(self.locators),
+                "top_waits": ranked(self.waits),
+            }
+
+    def _stack(self) -> list:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _push(self, name: str, key: str,
+              uuid: Optional[str] = None) -> None:
+        """
+        Открыть кадр стека текущего потока.
+
+        :param name: имя кадра в стеке
+        :type name: str
+        :param key: имя строки рейтинга
+        :type key: str
+        :param uuid: идентификатор шага Allure
+        :type uuid: str
+        :return: None
+        """
+        if not self.enabled:
+            return
+        self._stack().append({"name": _stack_name(name), "key": key,
+                              "uuid": uuid, "start": time.perf_counter(),
+                              "children": 0.0})
+
+    def _pop(self, key: str, uuid: Optional[str] = None) -> float:
+        """
+        Закрыть кадр (и незакрытые вложенные кадры) и записать
+        собственное время кадра в folded stacks.
+
+        :param key: имя строки рейтинга кадра
+        :type key: str
+        :param uuid: идентификатор шага Allure
+        :type uuid: str
+        :return: длительность кадра, сек
+        :rtype: float
+        """
+        stack = self._stack()
+        elapsed = 0.0
+        while stack:
+            path = ";".join(frame["name"] for frame in stack)
+            frame = stack.pop()
+            elapsed = time.perf_counter() - frame["start"]
+            own = max(elapsed - frame["children"], 0.0)
+            if stack:
+                stack[-1]["children"] += elapsed
+            with self._lock:
+                self.folded[path] = self.folded.get(path, 0) \
+                    + int(own * 1_000_000)
+            if frame["key"] == key and frame["uuid"] == uuid:
+                break
+        return elapsed
+
+    @contextmanager
+    def _timed(self, name: str, table: dict):
+        """
+        Учесть время блока в рейтинге.
+
+        :param name: имя строки рейтинга
+        :type name: str
+        :param table: рейтинг
+        :type table: dict
+        :yields: None
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._account(table, name, elapsed)
+
+    @staticmethod
+    def _account(table: dict, name: str, elapsed: float) -> None:
+        count, total = table.get(name, (0, 0.0))
+        table[name] = (count + 1, total + elapsed)
+
+
+_default_profiler = None
+_default_profiler_lock = threading.Lock()
+
+
+def get_webdriver_profiler() -> WebDriverProfiler:
+    """
+    Получить общий для процесса профилировщик WebDriver.
+
+    :return: WebDriverProfiler instance
+    :rtype: WebDriverProfiler
+    """
+    global _default_profiler
+    with _default_profiler_lock:
+        if _default_profiler is None:
+            _default_profiler = WebDriverProfiler()
+        return _default_profiler